@@ -3,7 +3,6 @@
 Advanced Performance Dashboard for Solana Trading Bot
 Tracks both simulation and real trading with advanced analytics
 """
-import sqlite3
 import json
 import time
 import os
@@ -16,6 +15,8 @@ from typing import Dict, List, Tuple, Optional
 import asyncio
 import aiohttp
 
+from core.storage.connection_pool import connect
+
 # Initialize colorama
 init()
 
@@ -62,9 +63,9 @@ class AdvancedPerformanceDashboard:
                 return 9.05
     
     def get_connection(self, mode: str = 'simulation'):
-        """Get database connection for specified mode"""
+        """Get read-only WAL connection for specified mode"""
         db_path = self.real_db_path if mode == 'real' else self.sim_db_path
-        return sqlite3.connect(db_path)
+        return connect(db_path, read_only=True)
     
     def detect_active_modes(self) -> Dict[str, bool]:
         """Detect which modes are actively trading"""
@@ -10,13 +10,15 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 from enum import Enum
-import talib
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.preprocessing import StandardScaler
-import xgboost as xgb
-import tensorflow as tf
 from collections import deque
 
+from utils.lazy import LazyComponent, lazy_import
+
+# Heavy, optional dependencies: imported when the strategy using them first runs
+talib = lazy_import('talib')
+xgb = lazy_import('xgboost')
+tf = lazy_import('tensorflow')
+
 logger = logging.getLogger(__name__)
 
 class StrategyType(Enum):
@@ -54,29 +56,56 @@ class CitadelMultiStrategy:
         }
         
         # Initialize ML models if not provided
+        self._model_components = {}
+        self.scaler = None
         if not self.ml_models:
             self._initialize_ml_models()
     
     def _initialize_ml_models(self):
-        """Initialize ensemble ML models"""
-        self.ml_models = {
-            'rf': RandomForestClassifier(
-                n_estimators=200,
-                max_depth=10,
-                min_samples_split=50,
-                random_state=42
-            ),
-            'xgboost': xgb.XGBClassifier(
-                n_estimators=200,
-                max_depth=6,
-                learning_rate=0.05,
-                random_state=42
-            ),
-            'lstm': self._build_lstm_model()
+        """
+        Register ensemble ML models
+
+        Nothing is imported or built here: each model is constructed the
+        first time the ML alpha strategy asks for it, and never if that
+        strategy is disabled.
+        """
+        enabled = self.citadel_config['strategies']['ml_alpha'].get('enabled', True)
+        self._model_components = {
+            'rf': LazyComponent('citadel-rf', self._build_random_forest, enabled),
+            'xgboost': LazyComponent('citadel-xgboost', self._build_xgboost, enabled),
+            'lstm': LazyComponent('citadel-lstm', self._build_lstm_model, enabled)
         }
+    
+    def _get_model(self, name: str):
+        """Model from the ensemble, built on first use (None if unavailable)"""
+        if name not in self.ml_models:
+            component = self._model_components.get(name)
+            model = component.get() if component else None
+            if model is None:
+                return None
+            self.ml_models[name] = model
+        return self.ml_models[name]
+    
+    def _build_random_forest(self):
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import StandardScaler
         
         # Feature scaler
         self.scaler = StandardScaler()
+        return RandomForestClassifier(
+            n_estimators=200,
+            max_depth=10,
+            min_samples_split=50,
+            random_state=42
+        )
+    
+    def _build_xgboost(self):
+        return xgb.XGBClassifier(
+            n_estimators=200,
+            max_depth=6,
+            learning_rate=0.05,
+            random_state=42
+        )
     
     def _build_lstm_model(self):
         """Build LSTM model for price prediction"""
@@ -282,12 +311,13 @@ class CitadelMultiStrategy:
         predictions = {}
         
         for model_name in config['ensemble_models']:
-            if model_name in self.ml_models and model_name != 'lstm':
+            model = self._get_model(model_name) if model_name != 'lstm' else None
+            if model is not None:
                 try:
-                    if hasattr(self.ml_models[model_name], 'predict_proba'):
-                        pred = self.ml_models[model_name].predict_proba(features)[:, 1][0]
+                    if hasattr(model, 'predict_proba'):
+                        pred = model.predict_proba(features)[:, 1][0]
                     else:
-                        pred = self.ml_models[model_name].predict(features)[0]
+                        pred = model.predict(features)[0]
                     predictions[model_name] = pred
                 except:
                     logger.warning(f"ML model {model_name} prediction failed")
@@ -14,12 +14,14 @@ from scipy.optimize import minimize
 import warnings
 warnings.filterwarnings('ignore')
 
+from core.analysis.covariance import StreamingCovariance, get_covariance_service
+
 logger = logging.getLogger(__name__)
 
 class CitadelRiskManager:
     """Advanced risk management system inspired by Citadel's approach"""
     
-    def __init__(self, config: Dict, db):
+    def __init__(self, config: Dict, db, covariance: Optional[StreamingCovariance] = None):
         self.config = config
         self.db = db
         self.risk_config = config.get('citadel_mode', {}).get('risk_metrics', {})
@@ -50,6 +52,12 @@ class CitadelRiskManager:
         self.optimization_window = 30  # days
         self.rebalance_threshold = 0.1  # 10% deviation triggers rebalance
         
+        # Streaming EW covariance of per-bar returns (shared with the bot, which feeds it);
+        # return statistics are per bar, scaled to days/years of round-the-clock trading
+        self.covariance = covariance or get_covariance_service()
+        self.periods_per_day = 86400 / self.covariance.bar_seconds
+        self.periods_per_year = 365 * self.periods_per_day
+        
     async def assess_portfolio_risk(self, positions: Dict, market_data: Dict) -> Dict:
         """Comprehensive portfolio risk assessment"""
         
@@ -73,7 +81,7 @@ class CitadelRiskManager:
             }
         
         # Calculate risk metrics
-        self._update_risk_metrics(returns_data, market_data)
+        self._update_risk_metrics(returns_data, market_data, positions)
         
         # Assess risk levels
         risk_assessment = self._assess_risk_levels()
@@ -177,16 +185,25 @@ class CitadelRiskManager:
         # Limit adjustment
         return np.clip(risk_parity_weight, 0.5, 2.0)
     
-    def _update_risk_metrics(self, returns_data: pd.DataFrame, market_data: Dict):
+    def _update_risk_metrics(self, returns_data: pd.DataFrame, market_data: Dict,
+                             positions: Optional[Dict] = None):
         """Update all risk metrics"""
         
         # Basic statistics
         returns = returns_data['portfolio_return'].values
-        self.risk_metrics['volatility'] = np.std(returns) * np.sqrt(252)
-        
-        # VaR and CVaR
-        self.risk_metrics['var_1d'] = self._calculate_var(returns, self.var_confidence)
-        self.risk_metrics['cvar_1d'] = self._calculate_cvar(returns, self.cvar_confidence)
+        self.risk_metrics['volatility'] = np.std(returns) * np.sqrt(self.periods_per_year)
+        
+        # VaR and CVaR: parametric from the EW covariance when every holding has one,
+        # historical from the portfolio's bar returns otherwise
+        moments = self._get_return_moments(list(positions)) if positions else None
+        if moments is not None:
+            _, weights = self._position_weights(positions)
+            mean, cov = moments
+            self.risk_metrics['var_1d'] = self._calculate_parametric_var(weights, mean, cov, self.var_confidence)
+            self.risk_metrics['cvar_1d'] = self._calculate_parametric_cvar(weights, mean, cov, self.cvar_confidence)
+        else:
+            self.risk_metrics['var_1d'] = self._calculate_var(returns, self.var_confidence)
+            self.risk_metrics['cvar_1d'] = self._calculate_cvar(returns, self.cvar_confidence)
         
         # Sharpe and Sortino ratios
         self.risk_metrics['sharpe_ratio'] = self._calculate_sharpe_ratio(returns)
@@ -197,7 +214,7 @@ class CitadelRiskManager:
         
         # Downside volatility
         negative_returns = returns[returns < 0]
-        self.risk_metrics['downside_volatility'] = np.std(negative_returns) * np.sqrt(252) if len(negative_returns) > 0 else 0
+        self.risk_metrics['downside_volatility'] = np.std(negative_returns) * np.sqrt(self.periods_per_year) if len(negative_returns) > 0 else 0
         
         # Beta to market
         if 'market_return' in market_data:
@@ -209,21 +226,35 @@ class CitadelRiskManager:
         self.risk_metrics['last_update'] = datetime.now()
     
     def _calculate_var(self, returns: np.ndarray, confidence: float) -> float:
-        """Calculate Value at Risk"""
-        return np.percentile(returns, (1 - confidence) * 100) * np.sqrt(252)
+        """Calculate one-day Value at Risk from per-bar returns"""
+        return np.percentile(returns, (1 - confidence) * 100) * np.sqrt(self.periods_per_day)
     
     def _calculate_cvar(self, returns: np.ndarray, confidence: float) -> float:
-        """Calculate Conditional Value at Risk (Expected Shortfall)"""
-        var = self._calculate_var(returns, confidence)
-        return np.mean(returns[returns <= var]) * np.sqrt(252)
+        """Calculate one-day Conditional Value at Risk (Expected Shortfall) from per-bar returns"""
+        cutoff = np.percentile(returns, (1 - confidence) * 100)
+        return np.mean(returns[returns <= cutoff]) * np.sqrt(self.periods_per_day)
+    
+    def _calculate_parametric_var(self, weights: np.ndarray, mean: np.ndarray, cov: np.ndarray,
+                                  confidence: float) -> float:
+        """One-day Gaussian VaR of the weighted portfolio from per-bar return moments"""
+        mu = float(weights @ mean) * self.periods_per_day
+        sigma = np.sqrt(max(float(weights @ cov @ weights), 0.0) * self.periods_per_day)
+        return mu - stats.norm.ppf(confidence) * sigma
+    
+    def _calculate_parametric_cvar(self, weights: np.ndarray, mean: np.ndarray, cov: np.ndarray,
+                                   confidence: float) -> float:
+        """One-day Gaussian expected shortfall of the weighted portfolio"""
+        mu = float(weights @ mean) * self.periods_per_day
+        sigma = np.sqrt(max(float(weights @ cov @ weights), 0.0) * self.periods_per_day)
+        return mu - sigma * stats.norm.pdf(stats.norm.ppf(confidence)) / (1 - confidence)
     
     def _calculate_sharpe_ratio(self, returns: np.ndarray) -> float:
         """Calculate Sharpe ratio"""
         if len(returns) < 2:
             return 0.0
         
-        mean_return = np.mean(returns) * 252
-        volatility = np.std(returns) * np.sqrt(252)
+        mean_return = np.mean(returns) * self.periods_per_year
+        volatility = np.std(returns) * np.sqrt(self.periods_per_year)
         
         return mean_return / volatility if volatility > 0 else 0.0
     
@@ -232,13 +263,13 @@ class CitadelRiskManager:
         if len(returns) < 2:
             return 0.0
         
-        mean_return = np.mean(returns) * 252
+        mean_return = np.mean(returns) * self.periods_per_year
         downside_returns = returns[returns < 0]
         
         if len(downside_returns) == 0:
             return float('inf')
         
-        downside_vol = np.std(downside_returns) * np.sqrt(252)
+        downside_vol = np.std(downside_returns) * np.sqrt(self.periods_per_year)
         
         return mean_return / downside_vol if downside_vol > 0 else 0.0
     
@@ -306,27 +337,21 @@ class CitadelRiskManager:
         if len(positions) < 2:
             return {'high_correlations': [], 'avg_correlation': 0.0}
         
-        # Get correlation matrix from database or calculate
-        correlation_matrix = self._get_correlation_matrix(list(positions.keys()))
-        
-        # Find high correlations
-        high_correlations = []
-        total_correlation = 0
-        count = 0
-        
-        for i in range(len(correlation_matrix)):
-            for j in range(i + 1, len(correlation_matrix)):
-                corr = correlation_matrix[i, j]
-                total_correlation += abs(corr)
-                count += 1
-                
-                if abs(corr) > self.correlation_limit:
-                    high_correlations.append({
-                        'pair': (list(positions.keys())[i], list(positions.keys())[j]),
-                        'correlation': corr
-                    })
+        # Current EW correlations of the holdings
+        tokens = list(positions.keys())
+        correlation_matrix = self._get_correlation_matrix(tokens)
+        self.risk_metrics['correlation_matrix'] = correlation_matrix
+        
+        # Every pair once (upper triangle)
+        rows, cols = np.triu_indices(len(tokens), k=1)
+        pair_correlations = correlation_matrix[rows, cols]
+        high = np.flatnonzero(np.abs(pair_correlations) > self.correlation_limit)
+        high_correlations = [
+            {'pair': (tokens[rows[k]], tokens[cols[k]]), 'correlation': float(pair_correlations[k])}
+            for k in high
+        ]
         
-        avg_correlation = total_correlation / count if count > 0 else 0
+        avg_correlation = float(np.abs(pair_correlations).mean()) if len(pair_correlations) else 0
         
         return {
             'high_correlations': high_correlations,
@@ -434,15 +459,14 @@ class CitadelRiskManager:
         if len(positions) < 2:
             return {'optimized': False, 'reason': 'Insufficient positions'}
         
-        # Get historical returns
-        returns_matrix = await self._get_returns_matrix(positions)
+        # Expected returns and covariance from the streaming EW estimates
+        moments = self._get_return_moments(list(positions.keys()))
         
-        if returns_matrix.empty:
+        if moments is None:
             return {'optimized': False, 'reason': 'Insufficient data'}
         
-        # Calculate expected returns and covariance
-        expected_returns = returns_matrix.mean() * 252
-        cov_matrix = returns_matrix.cov() * 252
+        expected_returns = moments[0] * self.periods_per_year
+        cov_matrix = moments[1] * self.periods_per_year
         
         # Optimization constraints
         n_assets = len(positions)
@@ -497,18 +521,42 @@ class CitadelRiskManager:
         
         return {'optimized': False, 'reason': 'Optimization failed'}
     
+    def _position_weights(self, positions: Dict) -> Tuple[List[str], np.ndarray]:
+        """Tokens and their portfolio weights by current value"""
+        tokens = list(positions.keys())
+        values = np.array([pos['amount'] * pos.get('current_price', 1.0) for pos in positions.values()],
+                          dtype=float)
+        total = values.sum()
+        weights = values / total if total > 0 else np.full(len(tokens), 1.0 / max(len(tokens), 1))
+        return tokens, weights
+    
+    def _get_return_moments(self, tokens: List[str]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        EW mean and covariance of per-bar log returns
+        
+        :param tokens: Token addresses
+        :return: (mean (n,), PSD covariance (n, n)), or None until every token has enough history
+        """
+        mean = self.covariance.mean(tokens)
+        cov = self.covariance.covariance(tokens, psd=True)
+        if not (np.isfinite(mean).all() and np.isfinite(cov).all()):
+            return None
+        return mean, cov
+    
     async def _get_portfolio_returns(self, positions: Dict) -> pd.DataFrame:
-        """Get portfolio returns from database"""
-        # This would query your database
-        # Returning mock structure for now
-        return pd.DataFrame()
+        """Value-weighted per-bar portfolio returns over the bars every holding was priced"""
+        returns_matrix = await self._get_returns_matrix(positions)
+        if len(returns_matrix) < self.covariance.min_periods:
+            return pd.DataFrame()
+        _, weights = self._position_weights(positions)
+        portfolio_return = np.expm1(returns_matrix.values) @ weights
+        return pd.DataFrame({'portfolio_return': portfolio_return}, index=returns_matrix.index)
     
     def _get_correlation_matrix(self, tokens: List[str]) -> np.ndarray:
-        """Get correlation matrix for tokens"""
-        # This would calculate from historical data
-        # Returning mock data for now
-        n = len(tokens)
-        return np.eye(n)
+        """Get EW correlation matrix for tokens (pairs without enough history count as uncorrelated)"""
+        correlation = np.nan_to_num(self.covariance.correlation(tokens), nan=0.0)
+        np.fill_diagonal(correlation, 1.0)
+        return correlation
     
     def _get_portfolio_value(self) -> float:
         """Get current portfolio value"""
@@ -516,6 +564,8 @@ class CitadelRiskManager:
         return 10.0  # Mock value
     
     async def _get_returns_matrix(self, positions: Dict) -> pd.DataFrame:
-        """Get returns matrix for portfolio optimization"""
-        # This would query your database
-        return pd.DataFrame()
+        """Recent per-bar log returns of the holdings (bars where all have one)"""
+        bar_times, returns = self.covariance.returns_history(list(positions.keys()))
+        frame = pd.DataFrame(returns, columns=list(positions.keys()),
+                             index=pd.to_datetime(bar_times, unit='s', utc=True))
+        return frame.dropna()
@@ -5,14 +5,10 @@ for Solana token trading
 """
 
 import numpy as np
-import pandas as pd
 from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 from datetime import datetime, timezone
 import logging
-from scipy import stats
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +38,194 @@ class BarraFactors:
     systematic_risk: float     # Market-wide risk exposure
 
 
+# Exposure columns of the cross-sectional engine, in BarraFactors order
+FACTOR_NAMES = ('market_beta', 'sol_beta', 'momentum', 'volatility', 'liquidity', 'size',
+                'volume_stability', 'holder_quality', 'defi_correlation', 'meme_factor')
+ALPHA_NAMES = ('momentum', 'mean_reversion', 'volume_breakout', 'ml_prediction')
+
+# Token fields the factors and alphas read; missing values become NaN
+INPUT_FIELDS = ('price_change_1h', 'price_change_6h', 'price_change_24h', 'volume_24h', 'liquidity_usd',
+                'mcap', 'holders', 'rsi', 'avg_volume_7d', 'ml_confidence')
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def token_columns(tokens: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Convert token dicts to the engine's columnar input
+
+    :param tokens: Token dicts as passed to calculate_barra_factors()
+    :return: {field: float array} for every INPUT_FIELDS entry, NaN where a token lacks the field
+    """
+    return {field: np.fromiter((_as_float(token.get(field)) for token in tokens), dtype=float, count=len(tokens))
+            for field in INPUT_FIELDS}
+
+
+def _fill(column: Optional[np.ndarray], n: int, default: float) -> np.ndarray:
+    if column is None:
+        return np.full(n, default)
+    column = np.asarray(column, dtype=float)
+    return np.where(np.isnan(column), default, column)
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator, 0 where the denominator is not positive"""
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+
+
+@dataclass
+class FactorFrame:
+    """Factor exposures, alphas and ranking for a candidate universe (one row per token)"""
+    exposures: np.ndarray           # (n, len(FACTOR_NAMES)), same values as calculate_barra_factors()
+    zscores: np.ndarray             # exposures standardized across the universe
+    systematic_risk: np.ndarray
+    idiosyncratic_risk: np.ndarray
+    alphas: np.ndarray              # (n, len(ALPHA_NAMES)), same values as generate_alpha_signals()
+    combined_alpha: np.ndarray
+    rank: np.ndarray                # 1 = highest combined alpha
+    order: np.ndarray               # row indices, best first
+
+    def __len__(self) -> int:
+        return len(self.combined_alpha)
+
+    def factors(self, i: int) -> BarraFactors:
+        """BarraFactors of row i"""
+        values = {name: float(value) for name, value in zip(FACTOR_NAMES, self.exposures[i])}
+        return BarraFactors(idiosyncratic_risk=float(self.idiosyncratic_risk[i]),
+                            systematic_risk=float(self.systematic_risk[i]), **values)
+
+    def alpha_signals(self, i: int) -> Dict[str, float]:
+        """Alpha signals of row i, keyed like generate_alpha_signals()"""
+        return {name: float(value) for name, value in zip(ALPHA_NAMES, self.alphas[i])}
+
+    def factor_zscores(self, i: int) -> Dict[str, float]:
+        return {name: float(value) for name, value in zip(FACTOR_NAMES, self.zscores[i])}
+
+    def top(self, k: Optional[int] = None) -> np.ndarray:
+        """Row indices of the k best candidates (all when k is None)"""
+        return self.order if k is None else self.order[:k]
+
+
+class CrossSectionalFactorEngine:
+    """
+    Barra factors and alpha signals for a whole candidate set at once
+
+    Takes the universe as columns (token_columns()) and computes every
+    exposure and alpha with array operations, following the per-token
+    formulas of CitadelBarraStrategy exactly, including their defaults for
+    missing fields. Exposures are then z-scored across the universe.
+    """
+
+    def __init__(self, factor_weights: Dict[str, float], winsorize: float = 3.0):
+        """
+        :param factor_weights: Alpha weights, as CitadelBarraStrategy.factor_weights
+        :param winsorize: Clip z-scores to +/- this many standard deviations
+        """
+        self.factor_weights = factor_weights
+        self.winsorize = winsorize
+
+    def compute(self, columns: Dict[str, np.ndarray]) -> FactorFrame:
+        """
+        :param columns: {field: array} with NaN for missing values (absent fields count as missing)
+        :return: FactorFrame for the universe
+        """
+        n = len(next(iter(columns.values()))) if columns else 0
+        missing = np.full(n, np.nan)
+        pc = np.column_stack([np.asarray(columns.get(f'price_change_{tf}', missing), dtype=float)
+                              for tf in ('1h', '6h', '24h')]) if n else np.empty((0, 3))
+        present = ~np.isnan(pc)
+        changes = np.where(present, pc, 0.0)
+        count = present.sum(axis=1)
+
+        volume = _fill(columns.get('volume_24h'), n, 0.0)
+        liquidity_usd = _fill(columns.get('liquidity_usd'), n, 1.0)
+        mcap = columns.get('mcap')
+        holders = _fill(columns.get('holders'), n, 0.0)
+
+        market_beta = np.where(present[:, 2], np.clip(changes[:, 2] / 100 / 0.02, -2.0, 3.0), 1.0)
+        sol_beta = market_beta * 0.8
+
+        # Same accumulation order as _calculate_momentum_factor; absent timeframes add 0
+        momentum = 0.0 + changes[:, 0] / 100 * 0.2
+        momentum += changes[:, 1] / 100 * 0.3
+        momentum += changes[:, 2] / 100 * 0.5
+        momentum = np.tanh(momentum * 2)
+
+        mean_change = np.abs(changes).sum(axis=1) / np.maximum(count, 1)
+        volatility = np.where(count > 0, mean_change * np.sqrt(365) / 100, 1.0)
+
+        turnover = _ratio(volume, _fill(mcap, n, 1.0))
+        liquidity = np.clip(_ratio(volume, liquidity_usd) * 0.6 + turnover * 0.4, 0, 5.0)
+
+        size_mcap = _fill(mcap, n, 0.0)
+        size = np.select([size_mcap < 100_000, size_mcap < 1_000_000, size_mcap < 10_000_000],
+                         [-1.0, -0.5, 0.0], 0.5)
+
+        volume_stability = np.select([(turnover >= 0.1) & (turnover <= 2.0), turnover < 0.1],
+                                     [np.ones(n), turnover / 0.1], _ratio(np.full(n, 2.0), turnover))
+
+        holder_quality = np.select([holders < 50, holders < 500], [0.0, 0.5], np.minimum(1.0, holders / 1000))
+        defi_correlation = np.full(n, 0.5)
+        meme_factor = 0.0 + (volatility > 2.0) * 0.3 + (liquidity > 2.0) * 0.3 + (holders > 1000) * 0.4
+
+        systematic_risk = np.abs(market_beta) * 0.6 + np.abs(sol_beta) * 0.4
+        idiosyncratic_risk = 1.0 - np.minimum(systematic_risk, 0.8)
+
+        exposures = np.column_stack([market_beta, sol_beta, momentum, volatility, liquidity, size,
+                                     volume_stability, holder_quality, defi_correlation, meme_factor])
+
+        # Alphas
+        all_present = present.all(axis=1)
+        trend = np.where(all_present & (pc > 0).all(axis=1), 1.0,
+                         np.where(all_present & (pc < 0).all(axis=1), -1.0, 0.0))
+        momentum_alpha = momentum * (volume_stability * holder_quality) * (1 + trend * 0.5)
+
+        rsi = _fill(columns.get('rsi'), n, 50.0)
+        reversion = np.select([rsi < 30, rsi > 70], [(30 - rsi) / 30, (70 - rsi) / 30], 0.0)
+        mean_reversion_alpha = reversion * (1.0 / (1.0 + volatility))
+
+        avg_volume = columns.get('avg_volume_7d')
+        avg_volume = volume if avg_volume is None else np.where(np.isnan(avg_volume), volume, avg_volume)
+        volume_ratio = _ratio(volume, avg_volume)
+        breakout_alpha = np.where((avg_volume > 0) & (volume_ratio > 2.0),
+                                  np.minimum(1.0, (volume_ratio - 2.0) / 3.0), 0.0)
+
+        confidence = columns.get('ml_confidence')
+        ml_alpha = np.zeros(n) if confidence is None else \
+            np.where(np.isnan(confidence), 0.0, (np.asarray(confidence, dtype=float) - 0.5) * 2)
+
+        alphas = np.column_stack([momentum_alpha, mean_reversion_alpha, breakout_alpha, ml_alpha])
+        combined_alpha = np.zeros(n)
+        for j, name in enumerate(ALPHA_NAMES):
+            combined_alpha = combined_alpha + alphas[:, j] * self.factor_weights.get(name, 0)
+
+        order = np.argsort(-combined_alpha, kind='stable')
+        rank = np.empty(n, dtype=int)
+        rank[order] = np.arange(1, n + 1)
+
+        return FactorFrame(exposures=exposures, zscores=self.standardize(exposures),
+                           systematic_risk=systematic_risk, idiosyncratic_risk=idiosyncratic_risk,
+                           alphas=alphas, combined_alpha=combined_alpha, rank=rank, order=order)
+
+    def standardize(self, exposures: np.ndarray) -> np.ndarray:
+        """
+        Cross-sectional z-scores per factor, winsorized
+
+        :param exposures: (n, k) exposure matrix
+        :return: (n, k) z-scores; 0 for factors with no dispersion across the universe
+        """
+        if len(exposures) == 0:
+            return exposures.copy()
+        std = exposures.std(axis=0)
+        z = np.divide(exposures - exposures.mean(axis=0), std, out=np.zeros_like(exposures), where=std > 0)
+        return np.clip(z, -self.winsorize, self.winsorize)
+
+
 class CitadelBarraStrategy:
     """
     Implements a Citadel-inspired multi-factor strategy with Barra risk management
@@ -79,6 +263,10 @@ class CitadelBarraStrategy:
         self.market_data_cache = {}
         self.factor_history = []
         
+        # Bulk scoring of a whole candidate set
+        self.factor_engine = CrossSectionalFactorEngine(self.factor_weights,
+                                                        config.get('factor_zscore_winsorize', 3.0))
+        
         logger.info("Citadel-Barra Strategy initialized with multi-factor model")
     
     def calculate_barra_factors(self, token_data: Dict) -> BarraFactors:
@@ -424,9 +612,11 @@ class CitadelBarraStrategy:
     
     def _ml_prediction_alpha(self, token_data: Dict) -> float:
         """Get alpha signal from ML model"""
-        # This would interface with your existing ML predictor
-        # For now, return neutral signal
-        return 0.0
+        # Entry confidence from the ML predictor, when the caller attached one; neutral otherwise
+        confidence = token_data.get('ml_confidence')
+        if confidence is None:
+            return 0.0
+        return (float(confidence) - 0.5) * 2
     
     # === Risk Management Methods ===
     
@@ -488,11 +678,12 @@ class CitadelBarraStrategy:
             for name, signal in alpha_signals.items()
         )
         
-        # Make recommendation
-        recommendation = combined_alpha > 0.3  # Threshold for entry
-        
+        return self._signals(factors, alpha_signals, combined_alpha)
+    
+    def _signals(self, factors: BarraFactors, alpha_signals: Dict[str, float], combined_alpha: float) -> Dict:
+        """analyze_token() result for one token's factors and signals"""
         return {
-            'recommendation': recommendation,
+            'recommendation': combined_alpha > 0.3,  # Threshold for entry
             'factors': factors,
             'alpha_signals': alpha_signals,
             'combined_alpha': combined_alpha,
@@ -500,6 +691,40 @@ class CitadelBarraStrategy:
             'reasons': self._generate_reasons(factors, alpha_signals)
         }
     
+    def score_universe(self, tokens: List[Dict]) -> FactorFrame:
+        """
+        Factors, alpha signals and ranking for a whole candidate set in one vectorized pass
+
+        :param tokens: Token dicts as passed to analyze_token()
+        :return: FactorFrame with one row per token, in input order
+        """
+        return self.factor_engine.compute(token_columns(tokens))
+    
+    def rank_candidates(self, tokens: List[Dict], top: Optional[int] = None) -> List[Dict]:
+        """
+        Bulk equivalent of analyze_token() for a candidate set, best first
+
+        :param tokens: Token dicts
+        :param top: Only return the best ``top`` candidates
+        :return: analyze_token()-shaped dicts plus 'token', 'rank' and 'factor_zscores'
+        """
+        frame = self.score_universe(tokens)
+        ranked = []
+        for i in frame.top(top):
+            ranked.append(dict(self.candidate_signals(frame, i), token=tokens[i], rank=int(frame.rank[i]),
+                               factor_zscores=frame.factor_zscores(i)))
+        return ranked
+    
+    def candidate_signals(self, frame: FactorFrame, i: int) -> Dict:
+        """
+        analyze_token() result for one row of a score_universe() frame
+
+        :param frame: FactorFrame from score_universe()
+        :param i: Row (input order)
+        :return: Dict with recommendation, factors, alpha_signals, combined_alpha, final_score and reasons
+        """
+        return self._signals(frame.factors(i), frame.alpha_signals(i), float(frame.combined_alpha[i]))
+    
     def _generate_reasons(self, factors: BarraFactors, signals: Dict[str, float]) -> List[str]:
         """Generate human-readable reasons for the decision"""
         reasons = []
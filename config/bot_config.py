@@ -27,7 +27,60 @@ class BotConfiguration:
         'JUPITER_SWAP_API': os.getenv('JUPITER_SWAP_API', 'https://quote-api.jup.ag/v6/swap'),
         'BIRDEYE_API_KEY': os.getenv('BIRDEYE_API_KEY', '')
     }
-    
+
+    # Request budgets per API (see utils/rate_limiter.py). 'endpoints' sets
+    # tighter per-path budgets inside the API-wide one.
+    API_RATE_LIMITS = {
+        'birdeye': {
+            'requests_per_minute': float(os.getenv('BIRDEYE_REQUESTS_PER_MINUTE', 100)),  # Starter package
+            'burst': int(os.getenv('BIRDEYE_BURST', 5)),
+            'endpoints': {}
+        },
+        'dexscreener': {
+            'requests_per_minute': float(os.getenv('DEXSCREENER_REQUESTS_PER_MINUTE', 30)),
+            'burst': 2
+        },
+        'coingecko': {
+            'requests_per_minute': float(os.getenv('COINGECKO_REQUESTS_PER_MINUTE', 10)),  # Free tier is very limited
+            'burst': 1
+        },
+        'twitter': {
+            'requests_per_minute': float(os.getenv('TWITTER_REQUESTS_PER_MINUTE', 4)),  # Basic: 60 searches / 15 min
+            'burst': 3,
+            'endpoints': {}
+        }
+    }
+
+    # Shared aiohttp connection pool (see utils/http_client.py)
+    HTTP_CLIENT_SETTINGS = {
+        'limit': int(os.getenv('HTTP_POOL_LIMIT', 100)),
+        'limit_per_host': int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 10)),
+        'ttl_dns_cache': 300,
+        'keepalive_timeout': 30,
+        'total_timeout': float(os.getenv('HTTP_TIMEOUT', 30)),
+        'connect_timeout': 10,
+        'sock_read_timeout': 20
+    }
+
+    # Response caches (see utils/response_cache.py): entry cap and TTL seconds,
+    # optionally per endpoint
+    API_CACHE_SETTINGS = {
+        'birdeye': {
+            'max_entries': int(os.getenv('BIRDEYE_CACHE_MAX_ENTRIES', 5000)),
+            'default_ttl': 300,  # 5 minutes
+            'ttls': {
+                '/defi/price': 5,               # prices drive exits, so keep them fresh
+                '/defi/multi_price': 5,
+                '/defi/token_overview': 300,
+                '/defi/token_security': 6 * 3600  # authorities and holder split rarely change
+            }
+        },
+        'token_data': {
+            'max_entries': 2000,
+            'default_ttl': 3600  # 1 hour
+        }
+    }
+
     # Trading parameters with defaults - updated with your parameters
     TRADING_PARAMETERS = {
         # Core trading parameters
@@ -5,12 +5,15 @@ Sends notifications for important events via Discord, Telegram, or console
 """
 
 import json
+import asyncio
 import logging
-import requests
+import aiohttp
 from datetime import datetime
 from typing import Dict, Optional
 from enum import Enum
 
+from utils.http_client import get_http_session
+
 logger = logging.getLogger(__name__)
 
 class AlertLevel(Enum):
@@ -20,14 +23,22 @@ class AlertLevel(Enum):
     CRITICAL = "critical"
 
 class AlertManager:
-    """Manages alerts and notifications"""
+    """
+    Manages alerts and notifications
+    
+    Webhook deliveries run as background tasks on the shared HTTP session, so
+    sending an alert from the trading loop never waits on Discord or Telegram.
+    """
     
-    def __init__(self, config: Dict):
+    def __init__(self, config: Dict, session: Optional[aiohttp.ClientSession] = None):
         self.config = config
         self.webhook_url = config.get('alert_webhook_url', '')
         self.enabled = config.get('alerts_enabled', True)
         self.min_alert_interval = 60  # Minimum seconds between similar alerts
         self.last_alerts = {}
+        self.timeout = config.get('alert_timeout', 10)
+        self.session = session  # None: use the shared pooled session
+        self._pending = set()
         
     def send_alert(self, message: str, level: AlertLevel = AlertLevel.INFO, data: Dict = None):
         """Send alert through configured channels"""
@@ -117,8 +128,7 @@ class AlertManager:
                 }]
             }
             
-            response = requests.post(self.webhook_url, json=payload, timeout=10)
-            response.raise_for_status()
+            self._post(self.webhook_url, payload, "Discord")
             
         except Exception as e:
             logger.error(f"Failed to send Discord alert: {e}")
@@ -133,12 +143,49 @@ class AlertManager:
                 "parse_mode": "Markdown"
             }
             
-            response = requests.post(url, json=payload, timeout=10)
-            response.raise_for_status()
+            self._post(url, payload, "Telegram")
             
         except Exception as e:
             logger.error(f"Failed to send Telegram alert: {e}")
     
+    def _post(self, url: str, payload: Dict, channel: str):
+        """Deliver a webhook payload without blocking the running loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop running (e.g. start-up), so there is nothing to stall
+            asyncio.run(self._deliver(url, payload, channel, standalone=True))
+            return
+            
+        task = loop.create_task(self._deliver(url, payload, channel))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _deliver(self, url: str, payload: Dict, channel: str, standalone: bool = False):
+        """POST one payload, logging instead of raising"""
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        try:
+            if standalone:
+                # The pooled session belongs to the bot's loop, not this temporary one
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    async with session.post(url, json=payload) as response:
+                        response.raise_for_status()
+            else:
+                session = get_http_session(self.session)
+                async with session.post(url, json=payload, timeout=timeout) as response:
+                    response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Failed to send {channel} alert: {e}")
+    
+    async def flush(self, timeout: Optional[float] = None):
+        """
+        Wait for alerts still being delivered (call before shutdown)
+        
+        :param timeout: Seconds to wait (defaults to the per-alert timeout)
+        """
+        if self._pending:
+            await asyncio.wait(set(self._pending), timeout=timeout or self.timeout)
+    
     # Convenience methods for different alert types
     def trade_alert(self, action: str, token: str, amount: float, price: float, tx_hash: str = None):
         """Alert for trade execution"""
@@ -0,0 +1,421 @@
+# core/analysis/covariance.py
+"""
+Streaming exponentially weighted covariance and correlation of token returns
+
+Fed by the same price observations the bot records to the snapshot store
+(position ticks and discovery batches); every update is O(tokens^2) array
+work on running sums, so risk code reads a ready matrix instead of
+recomputing from history.
+"""
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BAR_SECONDS = 300
+DEFAULT_HALFLIFE_BARS = 48
+DEFAULT_MIN_PERIODS = 24
+DEFAULT_HISTORY_BARS = 288
+DEFAULT_MAX_TOKENS = 512
+
+# Token dict keys for the price, in preference order
+PRICE_ALIASES = ('price_usd', 'price')
+
+
+class StreamingCovariance:
+    """
+    Exponentially weighted covariance of log returns for many tokens
+
+    Observations are bucketed into bars of bar_seconds shared by all tokens;
+    within a bar the last price wins and the first observation of a later
+    bar commits it. A token without an observation in a committed bar
+    repeats its last price (a 0 return), as on the forward-filled grids the
+    rest of the bot uses; bars in which nothing was observed are skipped.
+
+    Each pair keeps weighted sums (weight, squared weight, sum of each
+    return, of its square and of the cross product) over the bars both
+    tokens had a return, all decayed by the same factor per bar. The
+    covariance of a pair therefore equals np.cov of the two return series
+    over their common bars with aweights decay**age and ddof=1.
+    """
+
+    def __init__(self, bar_seconds: int = DEFAULT_BAR_SECONDS, halflife_bars: float = DEFAULT_HALFLIFE_BARS,
+                 min_periods: int = DEFAULT_MIN_PERIODS, history_bars: int = DEFAULT_HISTORY_BARS,
+                 max_tokens: int = DEFAULT_MAX_TOKENS, capacity: int = 64):
+        """
+        Initialize the service
+
+        :param bar_seconds: Return interval
+        :param halflife_bars: Bars after which an observation's weight halves
+        :param min_periods: Common bars a pair needs before its covariance is reported
+        :param history_bars: Recent bar returns kept for return-series metrics
+        :param max_tokens: Tokens tracked at once (new ones are ignored until prune() frees slots)
+        :param capacity: Initial token slots (grows up to max_tokens)
+        """
+        self.bar_seconds = int(bar_seconds)
+        self.halflife_bars = float(halflife_bars)
+        self.decay = 0.5 ** (1.0 / self.halflife_bars)
+        self.min_periods = max(2, int(min_periods))
+        self.history_bars = max(1, int(history_bars))
+        self.max_tokens = max(1, int(max_tokens))
+        self.capacity = max(1, min(capacity, self.max_tokens))
+
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0  # high-water slot count; sums are only touched below it
+
+        cap = self.capacity
+        self.last_price = np.full(cap, np.nan)
+        self.last_bar = np.full(cap, -1, dtype=np.int64)
+        self.pending = np.full(cap, np.nan)
+        self.bar = -1
+        self._sums = {name: np.zeros((cap, cap)) for name in ('w', 'w2', 'sx', 'sxx', 'sxy')}
+        self.count = np.zeros((cap, cap), dtype=np.int64)
+
+        self.history = np.full((self.history_bars, cap), np.nan)
+        self.history_time = np.full(self.history_bars, np.nan)
+        self.bars_committed = 0
+
+        # Pairwise moments of all slots and the last PSD matrix, rebuilt lazily after a commit
+        self._derived = None
+        self._psd_cache: Tuple = (None, None)
+
+        self.stats = {
+            'updates': 0,
+            'observations': 0,
+            'bars_committed': 0,
+            'tokens_ignored': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+            'total_commit_ms': 0.0
+        }
+
+    # ------------------------------------------------------------ slots
+
+    def _grow(self, capacity: int):
+        def extend(values, fill, axes):
+            shape = tuple(capacity if axis in axes else size for axis, size in enumerate(values.shape))
+            grown = np.full(shape, fill, dtype=values.dtype)
+            grown[tuple(slice(0, size) for size in values.shape)] = values
+            return grown
+
+        self.last_price = extend(self.last_price, np.nan, (0,))
+        self.last_bar = extend(self.last_bar, -1, (0,))
+        self.pending = extend(self.pending, np.nan, (0,))
+        self._sums = {name: extend(values, 0.0, (0, 1)) for name, values in self._sums.items()}
+        self.count = extend(self.count, 0, (0, 1))
+        self.history = extend(self.history, np.nan, (1,))
+        self.capacity = capacity
+
+    def _slot(self, address: str) -> Optional[int]:
+        slot = self._slots.get(address)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            elif self._size < self.max_tokens:
+                slot = self._size
+                if slot >= self.capacity:
+                    self._grow(min(self.capacity * 2, self.max_tokens))
+                self._size += 1
+            else:
+                self.stats['tokens_ignored'] += 1
+                return None
+            self._slots[address] = slot
+        return slot
+
+    def remove(self, address: str) -> bool:
+        """
+        Drop a token's state
+
+        :param address: Token contract address
+        :return: True if the token was tracked
+        """
+        slot = self._slots.pop(address, None)
+        if slot is None:
+            return False
+        self.last_price[slot] = np.nan
+        self.last_bar[slot] = -1
+        self.pending[slot] = np.nan
+        for values in self._sums.values():
+            values[slot, :] = 0.0
+            values[:, slot] = 0.0
+        self.count[slot, :] = 0
+        self.count[:, slot] = 0
+        self.history[:, slot] = np.nan
+        self._free.append(slot)
+        self._invalidate()
+        return True
+
+    def prune(self, now: float, max_idle_seconds: float) -> int:
+        """
+        Drop tokens without an observation for max_idle_seconds
+
+        :param now: Epoch seconds
+        :param max_idle_seconds: Idle time after which a token's state is dropped
+        :return: Number of tokens removed
+        """
+        cutoff = int((now - max_idle_seconds) // self.bar_seconds)
+        idle = [address for address, slot in self._slots.items() if self.last_bar[slot] < cutoff]
+        for address in idle:
+            self.remove(address)
+        return len(idle)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    # ------------------------------------------------------------ updates
+
+    def update(self, prices: Dict[str, float], timestamp: Optional[float] = None) -> int:
+        """
+        Record one price observation per token
+
+        :param prices: {address: price}; missing or non-positive prices are skipped
+        :param timestamp: Epoch seconds (defaults to now); older than the current bar counts as current
+        :return: Observations recorded
+        """
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        bar = int(timestamp // self.bar_seconds)
+        if bar > self.bar:
+            if self.bar >= 0:
+                self._commit(self.bar * self.bar_seconds)
+            self.bar = bar
+
+        recorded = 0
+        for address, price in prices.items():
+            try:
+                price = float(price)
+            except (TypeError, ValueError):
+                continue
+            if not price > 0 or not np.isfinite(price):
+                continue
+            slot = self._slot(address)
+            if slot is None:
+                continue
+            self.pending[slot] = price
+            self.last_bar[slot] = self.bar
+            recorded += 1
+
+        self.stats['updates'] += 1
+        self.stats['observations'] += recorded
+        return recorded
+
+    def update_tokens(self, tokens: Iterable[Dict], timestamp: Optional[float] = None) -> int:
+        """
+        Record the prices of discovered token dicts
+
+        :param tokens: Token dicts (contract_address or address, price_usd or price)
+        :param timestamp: Epoch seconds (defaults to now)
+        :return: Observations recorded
+        """
+        prices = {}
+        for token in tokens:
+            address = token.get('contract_address') or token.get('address')
+            price = next((token[key] for key in PRICE_ALIASES if token.get(key) is not None), None)
+            if address and price is not None:
+                prices[address] = price
+        return self.update(prices, timestamp)
+
+    def update_prices(self, prices: Dict[str, float], timestamp: Optional[float] = None) -> int:
+        """Record a position price snapshot ({address: price})"""
+        return self.update(prices, timestamp)
+
+    def flush(self):
+        """Commit the current bar now (e.g. before reading at the end of a replay)"""
+        if self.bar >= 0 and not np.isnan(self.pending[:self._size]).all():
+            self._commit(self.bar * self.bar_seconds)
+
+    def _commit(self, bar_time: float):
+        """Fold the pending bar into the running sums"""
+        start = time.perf_counter()
+        n = self._size
+        pending = self.pending[:n]
+        observed = ~np.isnan(pending)
+        if not observed.any():
+            return
+
+        last = self.last_price[:n]
+        price = np.where(observed, pending, last)
+        returns = np.log(price / last)          # NaN for tokens without a previous price
+        self.last_price[:n] = price
+        self.pending[:n] = np.nan
+
+        active = ~np.isnan(returns)
+        r = np.where(active, returns, 0.0)
+        a = active.astype(float)
+        pair = np.outer(a, a)
+        s = {name: values[:n, :n] for name, values in self._sums.items()}
+        decay = self.decay
+        for name in ('w', 'sx', 'sxx', 'sxy'):
+            s[name] *= decay
+        s['w2'] *= decay * decay
+        s['w'] += pair
+        s['w2'] += pair
+        s['sx'] += (r * a)[:, None] * pair
+        s['sxx'] += (r * r)[:, None] * pair
+        s['sxy'] += np.outer(r, r)
+        self.count[:n, :n] += pair.astype(np.int64)
+
+        row = self.bars_committed % self.history_bars
+        self.history[row, :] = np.nan
+        self.history[row, :n] = returns
+        self.history_time[row] = bar_time
+        self.bars_committed += 1
+        self._invalidate()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats['bars_committed'] += 1
+        self.stats['last_commit_ms'] = elapsed_ms
+        self.stats['max_commit_ms'] = max(self.stats['max_commit_ms'], elapsed_ms)
+        self.stats['total_commit_ms'] += elapsed_ms
+
+    def load_history(self, store, start: Optional[float] = None, end: Optional[float] = None,
+                     addresses: Optional[Sequence[str]] = None) -> int:
+        """
+        Warm up from recorded snapshots (replayed bar by bar, oldest first)
+
+        :param store: SnapshotStore
+        :param start: Epoch seconds (defaults to halflife_bars * 10 bars ago)
+        :param end: Epoch seconds (defaults to now)
+        :param addresses: Only these tokens (defaults to all)
+        :return: Observations replayed
+        """
+        if start is None:
+            start = time.time() - self.halflife_bars * 10 * self.bar_seconds
+        data = store.query(start, end, addresses)
+        keep = np.isfinite(data['price']) & (data['price'] > 0)
+        timestamps = data['timestamp'][keep]
+        prices = data['price'][keep].astype(np.float64)
+        tokens = data['address'][keep]
+        if not len(timestamps):
+            return 0
+
+        bars = (timestamps // self.bar_seconds).astype(np.int64)
+        bounds = np.flatnonzero(np.diff(bars)) + 1
+        replayed = 0
+        for first, stop in zip(np.r_[0, bounds], np.r_[bounds, len(bars)]):
+            # Later observations of a token overwrite earlier ones within the bar
+            replayed += self.update(dict(zip(tokens[first:stop], prices[first:stop])), timestamps[stop - 1])
+        logger.info(f"Covariance warm start: {replayed} observations, {self.stats['bars_committed']} bars, "
+                    f"{len(self)} tokens")
+        return replayed
+
+    # ------------------------------------------------------------ reads
+
+    def _invalidate(self):
+        self._derived = None
+        self._psd_cache = (None, None)
+
+    def _index(self, addresses: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        slots = np.array([self._slots.get(address, -1) for address in addresses], dtype=np.int64)
+        return np.maximum(slots, 0), slots >= 0
+
+    def _moments(self) -> Dict[str, np.ndarray]:
+        """Covariance and correlation of every slot pair (NaN where not reportable)"""
+        if self._derived is None:
+            n = self._size
+            s = {name: values[:n, :n] for name, values in self._sums.items()}
+            w, sx = s['w'], s['sx']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                denom = w - s['w2'] / w
+                cov = (s['sxy'] - sx * sx.T / w) / denom
+                # Each token's variance over the bars it shared with the other one
+                var_x = (s['sxx'] - sx * sx / w) / denom
+                corr = np.clip(cov / np.sqrt(var_x * var_x.T), -1.0, 1.0)
+            valid = (self.count[:n, :n] >= self.min_periods) & (denom > 0)
+            cov = np.where(valid, cov, np.nan)
+            corr = np.where(valid & (var_x > 0) & (var_x.T > 0), corr, np.nan)
+            diagonal = np.diag_indices(n)
+            corr[diagonal] = np.where(np.isnan(corr[diagonal]), np.nan, 1.0)
+            self._derived = {'cov': cov, 'corr': corr}
+        return self._derived
+
+    def _block(self, name: str, addresses: Sequence[str]) -> np.ndarray:
+        slots, known = self._index(addresses)
+        block = self._moments()[name][np.ix_(slots, slots)] if self._size else np.zeros((len(slots),) * 2)
+        return np.where(known[:, None] & known[None, :], block, np.nan)
+
+    def covariance(self, addresses: Sequence[str], psd: bool = False) -> np.ndarray:
+        """
+        Covariance matrix of per-bar log returns
+
+        :param addresses: Tokens, in matrix order
+        :param psd: Clip negative eigenvalues (pairs observed over different spans are not
+                    guaranteed jointly positive semi-definite); needs every entry known
+        :return: (n, n) matrix, NaN for pairs with fewer than min_periods common bars
+        """
+        key = tuple(addresses)
+        if psd and self._psd_cache[0] == key:
+            return self._psd_cache[1].copy()
+        cov = self._block('cov', addresses)
+        if psd and len(cov) and np.isfinite(cov).all():
+            cov = (cov + cov.T) / 2
+            eigenvalues, vectors = np.linalg.eigh(cov)
+            if eigenvalues.min() < 0:
+                cov = (vectors * np.maximum(eigenvalues, 0.0)) @ vectors.T
+            self._psd_cache = (key, cov.copy())
+        return cov
+
+    def correlation(self, addresses: Sequence[str]) -> np.ndarray:
+        """
+        Correlation matrix of per-bar log returns (each pair over its common bars)
+
+        :param addresses: Tokens, in matrix order
+        :return: (n, n) matrix, 1 on the diagonal of known tokens, NaN where unknown or constant
+        """
+        return self._block('corr', addresses)
+
+    def mean(self, addresses: Sequence[str]) -> np.ndarray:
+        """
+        Exponentially weighted mean per-bar log return
+
+        :return: (n,) array, NaN for tokens with fewer than min_periods bars
+        """
+        slots, known = self._index(addresses)
+        w = self._sums['w'][slots, slots]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self._sums['sx'][slots, slots] / w
+        return np.where(known & (self.count[slots, slots] >= self.min_periods), mean, np.nan)
+
+    def returns_history(self, addresses: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Recent per-bar log returns, oldest first
+
+        :param addresses: Tokens, in column order
+        :return: (bar start times (m,), returns (m, n)); NaN before a token's first return
+        """
+        m = min(self.bars_committed, self.history_bars)
+        rows = (self.bars_committed - m + np.arange(m)) % self.history_bars
+        slots, known = self._index(addresses)
+        returns = self.history[rows][:, slots]
+        returns[:, ~known] = np.nan
+        return self.history_time[rows], returns
+
+    def get_stats(self) -> Dict:
+        """
+        Get covariance metrics
+
+        :return: Dictionary with tracked tokens, bars and commit latency
+        """
+        stats = dict(self.stats)
+        bars = stats['bars_committed']
+        stats['tokens'] = len(self)
+        stats['avg_commit_ms'] = stats['total_commit_ms'] / bars if bars else 0.0
+        return stats
+
+
+# One service for the whole process: the bot feeds it, risk code reads it
+_service: Optional[StreamingCovariance] = None
+
+
+def get_covariance_service(**kwargs) -> StreamingCovariance:
+    """Get or create the shared covariance service (kwargs apply on creation)"""
+    global _service
+    if _service is None:
+        _service = StreamingCovariance(**kwargs)
+    return _service
@@ -4,16 +4,17 @@ Twitter Sentiment Analysis for Solana Trading Bot
 Analyzes social sentiment to enhance entry signals
 """
 
-import tweepy
 import asyncio
 import numpy as np
-from datetime import datetime, timedelta
-from transformers import pipeline
+from datetime import datetime, timedelta, timezone
 import aiohttp
 import logging
 from collections import defaultdict
 from typing import Dict, List, Optional
 
+from core.analysis.sentiment_inference import DEFAULT_MODEL, SentimentInferenceService
+from core.analysis.twitter_query_planner import DEFAULT_MAX_QUERY_LENGTH, TwitterQueryPlanner, token_query
+
 logger = logging.getLogger(__name__)
 
 class TwitterSentimentAnalyzer:
@@ -23,14 +24,21 @@ class TwitterSentimentAnalyzer:
         self.config = config
         self.bearer_token = config.get('bearer_token')
         
-        # Initialize Twitter client
-        self.client = tweepy.Client(bearer_token=self.bearer_token)
+        # Twitter searches: consolidated queries over the shared HTTP session
+        # and the shared 'twitter' rate-limit budget
+        self.planner = TwitterQueryPlanner(
+            self.bearer_token,
+            max_query_length=config.get('max_query_length', DEFAULT_MAX_QUERY_LENGTH),
+            max_symbols_per_query=config.get('symbols_per_query', 4)
+        )
         
-        # Initialize sentiment model - using RoBERTa for better accuracy
-        self.sentiment_model = pipeline(
-            "sentiment-analysis", 
-            model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-            device=-1  # CPU, set to 0 for GPU
+        # Sentiment model - RoBERTa for better accuracy, batched on its own
+        # thread and loaded on first use
+        self.inference = SentimentInferenceService(
+            model_name=config.get('sentiment_model', DEFAULT_MODEL),
+            device=config.get('sentiment_device', -1),  # CPU, set to 0 for GPU
+            batch_size=config.get('sentiment_batch_size', 32),
+            cache_size=config.get('sentiment_cache_size', 50000)
         )
         
         # Cache for API rate limiting
@@ -57,30 +65,62 @@ class TwitterSentimentAnalyzer:
         Analyze Twitter sentiment for a specific token
         Returns sentiment score, volume, and signals
         """
+        results = await self.analyze_tokens_sentiment([token_symbol])
+        return results[token_symbol]
+    
+    async def analyze_tokens_sentiment(self, token_symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Analyze several tokens in one scan: their searches are combined into
+        as few API calls as possible and their tweets share inference batches
+
+        :param token_symbols: Token symbols
+        :return: {symbol: sentiment result}
+        """
+        results = {}
+        pending = []
         
         # Check cache first
-        cache_key = f"{token_symbol}_{datetime.now().hour}"
-        if cache_key in self.sentiment_cache:
-            cached_time, cached_data = self.sentiment_cache[cache_key]
-            if (datetime.now() - cached_time).seconds < self.cache_duration:
-                logger.debug(f"Using cached sentiment for {token_symbol}")
-                return cached_data
+        for token_symbol in dict.fromkeys(token_symbols):
+            cache_key = f"{token_symbol}_{datetime.now().hour}"
+            if cache_key in self.sentiment_cache:
+                cached_time, cached_data = self.sentiment_cache[cache_key]
+                if (datetime.now() - cached_time).seconds < self.cache_duration:
+                    logger.debug(f"Using cached sentiment for {token_symbol}")
+                    results[token_symbol] = cached_data
+                    continue
+            pending.append(token_symbol)
+        
+        if not pending:
+            return results
         
         try:
-            # Build search query
-            query = self._build_search_query(token_symbol)
-            
-            # Search recent tweets
-            tweets = await self._search_tweets(query)
-            
-            if not tweets:
+            # Token and influencer searches for every pending token at once
+            searches, influencer_tweets = await asyncio.gather(
+                self.planner.search_tokens(pending),
+                self.planner.search_influencers(self.tracked_accounts, pending)
+            )
+        except Exception as e:
+            logger.error(f"Error searching sentiment for {len(pending)} tokens: {e}")
+            searches, influencer_tweets = {}, {}
+        
+        analysed = await asyncio.gather(*(
+            self._analyze_symbol(s, searches.get(s), influencer_tweets.get(s, [])) for s in pending
+        ))
+        results.update(zip(pending, analysed))
+        return results
+    
+    async def _analyze_symbol(self, token_symbol: str, tweets, influencer_tweets: List) -> Dict:
+        """Sentiment for one token from its share of the scan's search results"""
+        
+        try:
+            if not tweets or not tweets.data:
                 return self._empty_sentiment_result()
             
             # Analyze sentiment
-            sentiment_data = await self._analyze_tweets(tweets, token_symbol)
-            
-            # Check influencer sentiment
-            influencer_sentiment = await self._check_influencer_sentiment(token_symbol)
+            sentiment_data, influencer_sentiment = await asyncio.gather(
+                self._analyze_tweets(tweets, token_symbol),
+                self._score_influencer_tweets(influencer_tweets)
+            )
             
             # Combine results
             final_sentiment = self._combine_sentiment_signals(
@@ -89,6 +129,7 @@ class TwitterSentimentAnalyzer:
             )
             
             # Cache result
+            cache_key = f"{token_symbol}_{datetime.now().hour}"
             self.sentiment_cache[cache_key] = (datetime.now(), final_sentiment)
             
             return final_sentiment
@@ -99,45 +140,15 @@ class TwitterSentimentAnalyzer:
     
     def _build_search_query(self, token_symbol: str) -> str:
         """Build optimized Twitter search query"""
-        
-        # Basic query with common patterns
-        base_query = f"(${token_symbol} OR #{token_symbol})"
-        
-        # Add sentiment keywords
-        sentiment_keywords = "(bullish OR moon OR pump OR gem OR buying OR accumulating)"
-        
-        # Exclude spam and retweets
-        exclusions = "-is:retweet -is:reply lang:en -giveaway -airdrop"
-        
-        # Combine query parts
-        query = f"{base_query} {sentiment_keywords} {exclusions}"
-        
-        return query
+        return token_query([token_symbol])
     
-    async def _search_tweets(self, query: str, max_results: int = 100) -> List:
+    async def _search_tweets(self, query: str, max_results: int = 100):
         """Search tweets with rate limiting protection"""
         
-        try:
-            tweets = self.client.search_recent_tweets(
-                query=query,
-                max_results=max_results,
-                tweet_fields=['created_at', 'public_metrics', 'author_id', 'context_annotations'],
-                user_fields=['username', 'public_metrics', 'verified'],
-                expansions=['author_id']
-            )
-            
-            if tweets.data:
-                return tweets
-            else:
-                return None
-                
-        except tweepy.TooManyRequests:
-            logger.warning("Twitter API rate limit reached")
-            await asyncio.sleep(60)  # Wait 1 minute
-            return None
-        except Exception as e:
-            logger.error(f"Twitter search error: {e}")
-            return None
+        tweets = await self.planner.search(query, max_results=max_results)
+        if tweets and tweets.data:
+            return tweets
+        return None
     
     async def _analyze_tweets(self, tweets_response, token_symbol: str) -> Dict:
         """Analyze sentiment from tweets"""
@@ -153,6 +164,9 @@ class TwitterSentimentAnalyzer:
         # Extract user data
         users = {u.id: u for u in tweets_response.includes.get('users', [])}
         
+        # Score every tweet in one request (cached tweets are not re-scored)
+        scored = await self.inference.score([(tweet.id, tweet.text) for tweet in tweets_response.data])
+        
         for tweet in tweets_response.data:
             # Get author info
             author = users.get(tweet.author_id)
@@ -175,7 +189,9 @@ class TwitterSentimentAnalyzer:
             
             # Analyze sentiment
             try:
-                result = self.sentiment_model(tweet.text)[0]
+                result = scored.get(self.inference.key(tweet.id, tweet.text))
+                if result is None:
+                    continue
                 score = self._convert_sentiment_to_score(result)
                 
                 sentiments.append(score)
@@ -220,38 +236,34 @@ class TwitterSentimentAnalyzer:
     async def _check_influencer_sentiment(self, token_symbol: str) -> Dict:
         """Check sentiment from tracked influencer accounts"""
         
+        tweets = await self.planner.search_influencers(self.tracked_accounts, [token_symbol])
+        return await self._score_influencer_tweets(tweets.get(token_symbol, []))
+    
+    async def _score_influencer_tweets(self, influencer_tweets: List) -> Dict:
+        """Weighted sentiment of (account, tweet) pairs"""
+        
         influencer_signals = []
         
-        for account in self.tracked_accounts:
-            query = f"from:{account} ${token_symbol} -is:retweet"
-            
-            try:
-                tweets = self.client.search_recent_tweets(
-                    query=query,
-                    max_results=10,
-                    tweet_fields=['created_at', 'public_metrics']
-                )
-                
-                if tweets.data:
-                    for tweet in tweets.data:
-                        # Analyze sentiment
-                        result = self.sentiment_model(tweet.text)[0]
-                        score = self._convert_sentiment_to_score(result)
-                        
-                        # Weight by recency
-                        hours_ago = (datetime.now() - tweet.created_at).total_seconds() / 3600
-                        recency_weight = np.exp(-hours_ago / 24)  # Decay over 24 hours
-                        
-                        influencer_signals.append({
-                            'account': account,
-                            'sentiment': score,
-                            'weight': recency_weight,
-                            'engagement': tweet.public_metrics['like_count']
-                        })
-                        
-            except Exception as e:
-                logger.debug(f"Error checking influencer {account}: {e}")
+        # Analyze sentiment for all accounts' tweets at once
+        scored = await self.inference.score([(tweet.id, tweet.text) for _, tweet in influencer_tweets])
+        
+        for account, tweet in influencer_tweets:
+            result = scored.get(self.inference.key(tweet.id, tweet.text))
+            if result is None:
                 continue
+            score = self._convert_sentiment_to_score(result)
+            
+            # Weight by recency
+            created_at = tweet.created_at or datetime.now(timezone.utc)
+            hours_ago = (datetime.now(timezone.utc) - created_at).total_seconds() / 3600
+            recency_weight = np.exp(-hours_ago / 24)  # Decay over 24 hours
+            
+            influencer_signals.append({
+                'account': account,
+                'sentiment': score,
+                'weight': recency_weight,
+                'engagement': tweet.public_metrics.get('like_count', 0)
+            })
         
         if not influencer_signals:
             return {'score': 0.5, 'signal_strength': 0}
@@ -379,3 +391,14 @@ class TwitterSentimentAnalyzer:
         trending = sorted(token_mentions.items(), key=lambda x: x[1], reverse=True)[:limit]
         
         return [{'symbol': symbol, 'weight': weight} for symbol, weight in trending]
+    
+    def get_stats(self) -> Dict:
+        """Search and sentiment inference metrics (API calls, throughput, cache hit rate, latency)"""
+        return {
+            'search': self.planner.get_stats(),
+            'inference': self.inference.get_stats()
+        }
+    
+    def close(self):
+        """Stop the inference thread"""
+        self.inference.close()
@@ -0,0 +1,225 @@
+# core/analysis/sentiment_inference.py
+"""
+Batched tweet sentiment inference
+
+Tweets from every token being analysed at the same time are coalesced into
+one request, sorted by length so each padded batch wastes little work, and
+classified on a dedicated thread so the trading loop never waits on a
+transformer forward pass. Results are cached by tweet ID, so a tweet that
+shows up again in the next scan is never scored twice.
+"""
+
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+
+
+class SentimentInferenceService:
+    """
+    Sentiment classifier shared by all token scans
+
+    score() is the async entry point: cache hits return immediately, misses
+    wait at most max_wait_ms for other scans to add theirs and then go to
+    the model together. The pipeline is built on the inference thread on
+    first use, so constructing the service costs nothing.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, device: int = -1, batch_size: int = 32,
+                 max_length: int = 128, max_wait_ms: float = 10.0, cache_size: int = 50000, model=None):
+        """
+        :param model_name: Hugging Face sentiment model
+        :param device: -1 for CPU, GPU index otherwise
+        :param batch_size: Tweets per padded forward pass
+        :param max_length: Token limit per tweet (longer ones are truncated)
+        :param max_wait_ms: How long a request waits for others to share its batch
+        :param cache_size: Tweet results kept (least recently used are evicted)
+        :param model: Already built text-classification pipeline (skips loading)
+        """
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self._model = model
+
+        # One thread: the pipeline is not thread-safe, and torch already
+        # spreads each forward pass over the cores (releasing the GIL)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sentiment')
+        self._cache: 'OrderedDict[Hashable, Dict]' = OrderedDict()
+        self._queue: Dict[Hashable, str] = {}
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._flush_handle = None
+        self._latencies = deque(maxlen=1000)
+
+        self.stats = {
+            'requests': 0,
+            'tweets_requested': 0,
+            'cache_hits': 0,
+            'tweets_scored': 0,
+            'batches': 0,
+            'failures': 0,
+            'load_ms': 0.0,
+            'total_infer_ms': 0.0,
+            'max_infer_ms': 0.0,
+            'last_batch_size': 0
+        }
+
+    @staticmethod
+    def key(tweet_id: Optional[Hashable], text: str) -> Hashable:
+        """Cache key: the tweet ID, or a hash of the text when there is none"""
+        if tweet_id is not None:
+            return str(tweet_id)
+        return hashlib.sha1(text.encode('utf-8', 'replace')).hexdigest()
+
+    def _load(self):
+        if self._model is None:
+            from transformers import pipeline
+
+            start = time.perf_counter()
+            self._model = pipeline("sentiment-analysis", model=self.model_name, device=self.device)
+            self.stats['load_ms'] = (time.perf_counter() - start) * 1000
+            logger.info(f"Loaded sentiment model {self.model_name} in {self.stats['load_ms']:.0f} ms")
+        return self._model
+
+    def classify(self, texts: Sequence[str]) -> List[Dict]:
+        """
+        Classify texts in padded batches (blocking; runs on the calling thread)
+
+        :param texts: Tweet texts
+        :return: One {'label', 'score'} dict per text, in input order
+        """
+        if not texts:
+            return []
+        model = self._load()
+
+        # Similar lengths share a batch, so little of each batch is padding
+        order = np.argsort([len(t) for t in texts], kind='stable')
+        start = time.perf_counter()
+        results = model([texts[i] for i in order], batch_size=self.batch_size,
+                        truncation=True, max_length=self.max_length)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.stats['batches'] += -(-len(texts) // self.batch_size)
+        self.stats['tweets_scored'] += len(texts)
+        self.stats['last_batch_size'] = len(texts)
+        self.stats['total_infer_ms'] += elapsed_ms
+        self.stats['max_infer_ms'] = max(self.stats['max_infer_ms'], elapsed_ms)
+
+        ordered = [None] * len(texts)
+        for position, result in zip(order, results):
+            ordered[position] = result[0] if isinstance(result, list) else result
+        return ordered
+
+    async def score(self, tweets: Sequence[Tuple[Optional[Hashable], str]]) -> Dict[Hashable, Dict]:
+        """
+        Sentiment for a batch of tweets
+
+        :param tweets: (tweet_id, text) pairs; tweet_id may be None
+        :return: {key(tweet_id, text): {'label', 'score'}} for every tweet that could be scored
+        """
+        start = time.perf_counter()
+        self.stats['requests'] += 1
+        self.stats['tweets_requested'] += len(tweets)
+
+        results, waiting = {}, {}
+        for tweet_id, text in tweets:
+            if not text:
+                continue
+            key = self.key(tweet_id, text)
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                results[key] = cached
+                self.stats['cache_hits'] += 1
+            elif key not in waiting:
+                waiting[key] = self._enqueue(key, text)
+
+        if waiting:
+            done = await asyncio.gather(*waiting.values(), return_exceptions=True)
+            for key, result in zip(waiting, done):
+                if isinstance(result, dict):
+                    results[key] = result
+
+        self._latencies.append((time.perf_counter() - start) * 1000)
+        return results
+
+    def _enqueue(self, key: Hashable, text: str) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is not None:
+            # Already queued or being scored for another token
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+        self._queue[key] = text
+
+        if len(self._queue) >= self.batch_size * 8:
+            self._dispatch()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._dispatch)
+        return future
+
+    def _dispatch(self):
+        """Send everything queued to the inference thread"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._queue:
+            return
+
+        keys, texts = list(self._queue), list(self._queue.values())
+        self._queue = {}
+        task = asyncio.get_running_loop().run_in_executor(self._executor, self.classify, texts)
+        task.add_done_callback(lambda f: self._resolve(keys, f))
+
+    def _resolve(self, keys: List[Hashable], task):
+        try:
+            results = task.result()
+        except Exception as e:
+            logger.error(f"Sentiment inference failed for {len(keys)} tweets: {e}")
+            self.stats['failures'] += 1
+            results = [None] * len(keys)
+
+        for key, result in zip(keys, results):
+            future = self._futures.pop(key, None)
+            if result is not None:
+                self._cache[key] = result
+            if future is not None and not future.done():
+                future.set_result(result)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get inference metrics
+
+        :return: Dictionary with throughput, cache hit rate and request latency
+        """
+        stats = dict(self.stats)
+        total_s = stats['total_infer_ms'] / 1000
+        stats['tweets_per_sec'] = stats['tweets_scored'] / total_s if total_s else 0.0
+        requested = stats['tweets_requested']
+        stats['cache_hit_rate'] = stats['cache_hits'] / requested if requested else 0.0
+        stats['avg_batch_size'] = stats['tweets_scored'] / stats['batches'] if stats['batches'] else 0.0
+        stats['cached_tweets'] = len(self._cache)
+        if self._latencies:
+            stats['p50_request_ms'] = float(np.percentile(self._latencies, 50))
+            stats['p95_request_ms'] = float(np.percentile(self._latencies, 95))
+        stats['model_loaded'] = self._model is not None
+        return stats
+
+    def close(self):
+        """Stop the inference thread"""
+        self._executor.shutdown(wait=True)
@@ -9,6 +9,9 @@ import asyncio
 from datetime import datetime, timezone
 from typing import Dict, List, Any, Optional, Tuple
 
+from core.storage.write_queue import get_write_queue
+from utils.response_cache import get_response_cache
+
 # Setup logging
 logger = logging.getLogger('trading_bot.token_analyzer')
 
@@ -36,9 +39,9 @@ class TokenAnalyzer:
             # It's a dictionary
             self.config = type('Config', (), config)
         
-        # Cache for token data
-        self.token_data_cache = {}
-        self.cache_expiry = 3600  # 1 hour
+        # Bounded LRU cache for token data, shared by every analyzer
+        self.token_data_cache = get_response_cache('token_data')
+        self.cache_expiry = self.token_data_cache.default_ttl
         
         logger.info("TokenAnalyzer initialized")
         
@@ -73,13 +76,39 @@ class TokenAnalyzer:
         :param contract_address: Token contract address
         :return: Dictionary of token data
         """
-        # Check cache first
-        current_time = time.time()
-        if contract_address in self.token_data_cache:
-            cache_time, cache_data = self.token_data_cache[contract_address]
-            if current_time - cache_time < self.cache_expiry:
-                return cache_data
-                
+        # Cached, or fetched once for every concurrent caller
+        token_data = await self.token_data_cache.get_or_fetch(
+            contract_address,
+            lambda: self._load_token_data(contract_address),
+            self.cache_expiry
+        )
+        if token_data:
+            return token_data
+            
+        # If all else fails, return minimal data
+        return {
+            'contract_address': contract_address,
+            'ticker': contract_address[:8],
+            'name': f"Unknown Token {contract_address[:8]}",
+            'price_usd': 0.0,
+            'volume_24h': 0.0,
+            'liquidity_usd': 0.0,
+            'market_cap': 0.0,
+            'holders': 0,
+            'price_change_1h': 0.0,
+            'price_change_6h': 0.0,
+            'price_change_24h': 0.0,
+            'is_simulation': False,
+            'last_updated': datetime.now(timezone.utc).isoformat()
+        }
+        
+    async def _load_token_data(self, contract_address: str) -> Optional[Dict[str, Any]]:
+        """
+        Load token data from simulation, API or database (uncached)
+        
+        :param contract_address: Token contract address
+        :return: Dictionary of token data, or None if no source has it
+        """
         # Determine if this is a simulation token
         is_sim = self.is_simulation_token(contract_address)
         
@@ -105,12 +134,9 @@ class TokenAnalyzer:
                 'last_updated': datetime.now(timezone.utc).isoformat()
             }
             
-            # Add to cache
-            self.token_data_cache[contract_address] = (current_time, token_data)
-            
-            # Save to database if available
+            # Queue the write-behind upsert (flushed off the event loop)
             if self.db:
-                self.db.store_token(token_data)
+                get_write_queue(self.db).enqueue_token(token_data)
                 
             return token_data
             
@@ -125,12 +151,9 @@ class TokenAnalyzer:
                     token_data['last_updated'] = datetime.now(timezone.utc).isoformat()
                     token_data['is_simulation'] = False
                     
-                    # Add to cache
-                    self.token_data_cache[contract_address] = (current_time, token_data)
-                    
-                    # Save to database if available
+                    # Queue the write-behind upsert (flushed off the event loop)
                     if self.db:
-                        self.db.store_token(token_data)
+                        get_write_queue(self.db).enqueue_token(token_data)
                         
                     return token_data
                 else:
@@ -142,26 +165,9 @@ class TokenAnalyzer:
         if self.db:
             db_token = self.db.get_token(contract_address)
             if db_token:
-                # Update cache
-                self.token_data_cache[contract_address] = (current_time, db_token)
                 return db_token
                 
-        # If all else fails, return minimal data
-        return {
-            'contract_address': contract_address,
-            'ticker': contract_address[:8],
-            'name': f"Unknown Token {contract_address[:8]}",
-            'price_usd': 0.0,
-            'volume_24h': 0.0,
-            'liquidity_usd': 0.0,
-            'market_cap': 0.0,
-            'holders': 0,
-            'price_change_1h': 0.0,
-            'price_change_6h': 0.0,
-            'price_change_24h': 0.0,
-            'is_simulation': False,
-            'last_updated': datetime.now(timezone.utc).isoformat()
-        }
+        return None
         
     async def get_safety_score(self, contract_address: str) -> float:
         """
@@ -0,0 +1,324 @@
+# core/analysis/twitter_query_planner.py
+"""
+Consolidated Twitter recent-search queries
+
+Sentiment scans used to send one search per token plus one per tracked
+influencer per token. The planner folds token symbols into OR-combined
+queries and influencer ``from:`` clauses into as few queries as the query
+length limit allows, runs them over the shared aiohttp session under the
+shared 'twitter' rate-limit budget, and fans the tweets back out per token.
+"""
+
+import re
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.http_client import get_http_session
+from utils.rate_limiter import PRIORITY_DISCOVERY, get_rate_limiter, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+SEARCH_URL = 'https://api.twitter.com/2/tweets/search/recent'
+SEARCH_ENDPOINT = '/2/tweets/search/recent'
+
+# 512 on the Basic tier, 1024 on Pro
+DEFAULT_MAX_QUERY_LENGTH = 512
+
+SENTIMENT_KEYWORDS = "(bullish OR moon OR pump OR gem OR buying OR accumulating)"
+TOKEN_EXCLUSIONS = "-is:retweet -is:reply lang:en -giveaway -airdrop"
+INFLUENCER_EXCLUSIONS = "-is:retweet"
+
+TWEET_FIELDS = 'created_at,public_metrics,author_id,context_annotations'
+USER_FIELDS = 'username,public_metrics,verified'
+
+
+@dataclass
+class Tweet:
+    """The tweet fields sentiment analysis reads"""
+    id: str
+    text: str
+    author_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    public_metrics: Dict = field(default_factory=dict)
+
+
+@dataclass
+class TwitterUser:
+    id: str
+    username: str
+    public_metrics: Dict = field(default_factory=dict)
+    verified: bool = False
+
+
+@dataclass
+class SearchResult:
+    """Tweets plus expansions, shaped like a tweepy Response (data, includes['users'])"""
+    data: List[Tweet]
+    includes: Dict[str, List] = field(default_factory=dict)
+
+
+@dataclass
+class PlannedQuery:
+    query: str
+    symbols: Tuple[str, ...]
+    accounts: Tuple[str, ...] = ()
+    max_results: int = 100
+
+
+def clean_symbol(symbol: str) -> str:
+    """Symbol as a cashtag body (letters, digits, underscore)"""
+    return re.sub(r'\W', '', symbol or '')
+
+
+def token_query(symbols: Sequence[str]) -> str:
+    """Search for tweets mentioning any of the symbols with bullish wording"""
+    terms = ' OR '.join(f"${s} OR #{s}" for s in symbols)
+    return f"({terms}) {SENTIMENT_KEYWORDS} {TOKEN_EXCLUSIONS}"
+
+
+def influencer_query(accounts: Sequence[str], symbols: Sequence[str]) -> str:
+    """Search for tweets by any of the accounts mentioning any of the symbols"""
+    authors = ' OR '.join(f"from:{a}" for a in accounts)
+    cashtags = ' OR '.join(f"${s}" for s in symbols)
+    return f"({authors}) ({cashtags}) {INFLUENCER_EXCLUSIONS}"
+
+
+def _pack(items: Sequence[str], fits: Callable[[List[str]], bool], max_items: Optional[int] = None) -> List[List[str]]:
+    """Greedily group items so that every group fits (a lone item always gets a group)"""
+    groups, current = [], []
+    for item in items:
+        candidate = current + [item]
+        if current and (not fits(candidate) or (max_items and len(candidate) > max_items)):
+            groups.append(current)
+            candidate = [item]
+        current = candidate
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+class TwitterQueryPlanner:
+    """
+    Plans and runs the searches for a sentiment scan
+
+    A scan of N tokens costs ceil(N / max_symbols_per_query) token searches
+    plus (for the default seven influencers) one influencer search per
+    group of symbols that fits beside their from: clauses, instead of
+    N * (1 + accounts) blocking calls. Tokens share a search's 100 results,
+    so max_symbols_per_query trades calls for per-token depth.
+    """
+
+    def __init__(self, bearer_token: Optional[str], max_query_length: int = DEFAULT_MAX_QUERY_LENGTH,
+                 max_symbols_per_query: int = 4, session=None, rate_limiter=None, url: str = SEARCH_URL):
+        """
+        :param bearer_token: Twitter API v2 app bearer token
+        :param max_query_length: Query length limit of the API tier
+        :param max_symbols_per_query: Tokens sharing one token search
+        :param session: aiohttp session (defaults to the shared pooled one)
+        :param rate_limiter: RateLimiter (defaults to the shared 'twitter' budget)
+        :param url: Recent search endpoint
+        """
+        self.bearer_token = bearer_token
+        self.max_query_length = max_query_length
+        self.max_symbols_per_query = max(1, max_symbols_per_query)
+        self.url = url
+        self._session = session
+        self.rate_limiter = rate_limiter or get_rate_limiter('twitter')
+
+        self.stats = {
+            'scans': 0,
+            'api_calls': 0,
+            'tweets_returned': 0,
+            'rate_limited': 0,
+            'errors': 0,
+            'skipped_no_token': 0
+        }
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def plan_token_queries(self, symbols: Sequence[str]) -> List[PlannedQuery]:
+        """
+        :param symbols: Token symbols
+        :return: Searches covering every symbol
+        """
+        symbols = list(dict.fromkeys(s for s in map(clean_symbol, symbols) if s))
+        groups = _pack(symbols, lambda g: len(token_query(g)) <= self.max_query_length, self.max_symbols_per_query)
+        return [PlannedQuery(token_query(g), tuple(g)) for g in groups]
+
+    def plan_influencer_queries(self, accounts: Sequence[str], symbols: Sequence[str],
+                                per_pair: int = 10) -> List[PlannedQuery]:
+        """
+        :param accounts: Influencer usernames
+        :param symbols: Token symbols
+        :param per_pair: Results wanted per account and token (the old per-account search size)
+        :return: Searches covering every account x symbol pair
+        """
+        accounts = list(dict.fromkeys(a.lstrip('@') for a in accounts if a))
+        symbols = list(dict.fromkeys(s for s in map(clean_symbol, symbols) if s))
+        if not accounts or not symbols:
+            return []
+
+        # Leave at least half the query for cashtags
+        half = self.max_query_length // 2
+        account_groups = _pack(accounts, lambda g: len(influencer_query(g, [])) <= half)
+        plans = []
+        for group in account_groups:
+            fits = lambda s: len(influencer_query(group, s)) <= self.max_query_length
+            for symbol_group in _pack(symbols, fits):
+                max_results = min(100, max(10, per_pair * len(group) * len(symbol_group)))
+                plans.append(PlannedQuery(influencer_query(group, symbol_group), tuple(symbol_group),
+                                          tuple(group), max_results))
+        return plans
+
+    @staticmethod
+    def mentioned(text: str, symbols: Sequence[str]) -> List[str]:
+        """Which of the symbols a tweet mentions as $cashtag or #hashtag"""
+        return [s for s in symbols if re.search(rf'(?<![\w$#])[$#]{re.escape(s)}\b', text, re.IGNORECASE)]
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    async def search(self, query: str, max_results: int = 100,
+                     priority: int = PRIORITY_DISCOVERY) -> Optional[SearchResult]:
+        """
+        One recent search (waits for the shared budget, never sleeps on a 429)
+
+        :param query: Search query
+        :param max_results: 10-100
+        :param priority: Rate limiter lane
+        :return: SearchResult (possibly empty), or None on failure
+        """
+        if not self.bearer_token:
+            self.stats['skipped_no_token'] += 1
+            return None
+
+        await self.rate_limiter.acquire(priority, SEARCH_ENDPOINT)
+        params = {
+            'query': query,
+            'max_results': max(10, min(100, max_results)),
+            'tweet.fields': TWEET_FIELDS,
+            'user.fields': USER_FIELDS,
+            'expansions': 'author_id'
+        }
+        headers = {'Authorization': f"Bearer {self.bearer_token}"}
+        self.stats['api_calls'] += 1
+
+        try:
+            session = get_http_session(self._session)
+            async with session.get(self.url, params=params, headers=headers) as response:
+                if response.status == 200:
+                    self.rate_limiter.on_success()
+                    return self._parse(await response.json())
+                if response.status == 429:
+                    # Pause the shared budget until the window resets instead of this scan
+                    self.stats['rate_limited'] += 1
+                    reset = response.headers.get('x-rate-limit-reset')
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    if retry_after is None and reset:
+                        retry_after = max(0.0, float(reset) - datetime.now(timezone.utc).timestamp())
+                    logger.warning("Twitter API rate limit reached")
+                    self.rate_limiter.on_rate_limited(retry_after)
+                else:
+                    self.stats['errors'] += 1
+                    logger.error(f"Twitter search error {response.status}: {await response.text()}")
+        except asyncio.TimeoutError:
+            self.stats['errors'] += 1
+            logger.error("Twitter search timeout")
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Twitter search error: {e}")
+        return None
+
+    def _parse(self, payload: Dict) -> SearchResult:
+        tweets = [Tweet(id=str(t['id']), text=t.get('text', ''), author_id=t.get('author_id'),
+                        created_at=_parse_time(t.get('created_at')), public_metrics=t.get('public_metrics') or {})
+                  for t in payload.get('data') or []]
+        users = [TwitterUser(id=u['id'], username=u.get('username', ''), public_metrics=u.get('public_metrics') or {},
+                             verified=bool(u.get('verified')))
+                 for u in (payload.get('includes') or {}).get('users', [])]
+        self.stats['tweets_returned'] += len(tweets)
+        return SearchResult(tweets, {'users': users})
+
+    async def search_tokens(self, symbols: Sequence[str]) -> Dict[str, SearchResult]:
+        """
+        Token sentiment searches for a scan
+
+        :param symbols: Token symbols
+        :return: {symbol: SearchResult} for symbols with at least one tweet
+        """
+        plans = self.plan_token_queries(symbols)
+        responses = await asyncio.gather(*(self.search(p.query, p.max_results) for p in plans))
+        self.stats['scans'] += 1
+
+        results: Dict[str, SearchResult] = {}
+        for plan, response in zip(plans, responses):
+            if not response:
+                continue
+            for tweet in response.data:
+                matched = self.mentioned(tweet.text, plan.symbols)
+                if not matched and len(plan.symbols) == 1:
+                    matched = list(plan.symbols)  # the search only asked about this token
+                for symbol in matched:
+                    results.setdefault(symbol, SearchResult([], response.includes)).data.append(tweet)
+        return {self._caller_symbol(symbols, s): r for s, r in results.items()}
+
+    async def search_influencers(self, accounts: Sequence[str], symbols: Sequence[str],
+                                 per_pair: int = 10) -> Dict[str, List[Tuple[str, Tweet]]]:
+        """
+        Tracked-account mentions of each token
+
+        :param accounts: Influencer usernames
+        :param symbols: Token symbols
+        :param per_pair: Results wanted per account and token
+        :return: {symbol: [(account, tweet), ...]}
+        """
+        plans = self.plan_influencer_queries(accounts, symbols, per_pair)
+        responses = await asyncio.gather(*(self.search(p.query, p.max_results) for p in plans))
+
+        results: Dict[str, List[Tuple[str, Tweet]]] = {}
+        for plan, response in zip(plans, responses):
+            if not response:
+                continue
+            by_id = {u.id: u.username for u in response.includes.get('users', [])}
+            accounts_lower = {a.lower(): a for a in plan.accounts}
+            for tweet in response.data:
+                account = accounts_lower.get(by_id.get(tweet.author_id, '').lower())
+                if account is None:
+                    continue
+                for symbol in self.mentioned(tweet.text, plan.symbols):
+                    results.setdefault(symbol, []).append((account, tweet))
+        return {self._caller_symbol(symbols, s): r for s, r in results.items()}
+
+    @staticmethod
+    def _caller_symbol(symbols: Sequence[str], cleaned: str) -> str:
+        """Map a cleaned symbol back to the spelling the caller used"""
+        for symbol in symbols:
+            if clean_symbol(symbol) == cleaned:
+                return symbol
+        return cleaned
+
+    def get_stats(self) -> Dict:
+        """
+        Get query metrics
+
+        :return: Dictionary with API calls, tweets returned and the shared budget
+        """
+        stats = dict(self.stats)
+        stats['calls_per_scan'] = stats['api_calls'] / stats['scans'] if stats['scans'] else 0.0
+        stats['rate_limiter'] = self.rate_limiter.get_stats()
+        return stats
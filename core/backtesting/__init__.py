@@ -0,0 +1,3 @@
+from .history import MarketHistory
+from .engine import VectorizedBacktester, BacktestResult, run_backtest
+from .sweep import ParameterSweep, SweepResult
@@ -0,0 +1,369 @@
+# core/backtesting/engine.py
+"""
+Vectorized backtester: replays the TradingBot entry rules and the
+trading_params.json exit rules over a MarketHistory
+"""
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.backtesting.history import MarketHistory
+from core.trading.exit_engine import exit_levels_from_params
+
+logger = logging.getLogger(__name__)
+
+# TradingBot.execute_trade_decision: with a TokenAnalyzer a buy needs its
+# recommendation (safety score >= 50 and +10% in 24h); without one the bot
+# buys on +5% in 24h and volume above min_volume_24h
+ENTRY_RULES = ('analyzer', 'simple')
+ANALYZER_MIN_SAFETY = 50.0
+ANALYZER_MIN_CHANGE_24H = 10.0
+SIMPLE_MIN_CHANGE_24H = 5.0
+
+EXIT_REASONS = ('stop_loss', 'trailing_stop', 'take_profit', 'partial_exit')
+
+# Bars of entry signals computed per block (bounds temporary memory)
+SIGNAL_BLOCK_BARS = 256
+
+
+def safety_scores(liquidity_usd: np.ndarray, holders: np.ndarray, volume_24h: np.ndarray) -> np.ndarray:
+    """
+    TokenAnalyzer.get_safety_score over whole arrays (missing values score 0)
+
+    :return: Safety scores 0-100, same shape as the inputs
+    """
+    def tiers(values, thresholds, points):
+        return np.select([values >= t for t in thresholds], points, 0.0)
+
+    return (tiers(liquidity_usd, (100000, 50000, 10000, 5000), (40, 30, 20, 10)) +
+            tiers(holders, (1000, 500, 100, 50), (30, 20, 10, 5)) +
+            tiers(volume_24h, (100000, 50000, 10000, 5000), (30, 20, 10, 5)))
+
+
+@dataclass
+class BacktestResult:
+    """Curves, trade ledger and summary of one backtest run"""
+    timestamps: np.ndarray
+    equity: np.ndarray
+    cash: np.ndarray
+    exposure: np.ndarray
+    open_positions: np.ndarray
+    drawdown: np.ndarray
+    trades: Dict[str, np.ndarray]
+    position_pnl: np.ndarray
+    starting_balance: float
+    params: Dict = field(default_factory=dict)
+    elapsed_s: float = 0.0
+
+    @property
+    def pnl(self) -> np.ndarray:
+        """Equity minus starting balance per bar"""
+        return self.equity - self.starting_balance
+
+    def summary(self) -> Dict:
+        """
+        Headline metrics
+
+        :return: Dictionary with P&L, win rate, drawdown, exposure and trade counts
+        """
+        final_equity = float(self.equity[-1]) if len(self.equity) else self.starting_balance
+        closed = len(self.position_pnl)
+        wins = int((self.position_pnl > 0).sum())
+        reasons = self.trades['reason']
+        return {
+            'final_equity_sol': final_equity,
+            'total_pnl_sol': final_equity - self.starting_balance,
+            'return_pct': (final_equity / self.starting_balance - 1) * 100 if self.starting_balance else 0.0,
+            'closed_positions': closed,
+            'open_positions': int(self.open_positions[-1]) if len(self.open_positions) else 0,
+            'win_rate_pct': wins / closed * 100 if closed else 0.0,
+            'avg_position_pnl_sol': float(self.position_pnl.mean()) if closed else 0.0,
+            'max_drawdown_pct': float(-self.drawdown.min() * 100) if len(self.drawdown) else 0.0,
+            'avg_exposure_pct': float(self.exposure.mean() * 100) if len(self.exposure) else 0.0,
+            'sells': len(reasons),
+            'exits_by_reason': {name: int((reasons == i).sum()) for i, name in enumerate(EXIT_REASONS)},
+            'elapsed_s': self.elapsed_s
+        }
+
+
+class VectorizedBacktester:
+    """
+    Replays a parameter set over a MarketHistory
+
+    Entry signals are computed for every token and bar in array blocks. The
+    bar loop then opens positions in token order while slots and balance
+    allow, and evaluates stop loss, trailing stop, take profit and partial
+    exit levels for all open positions at once, mirroring ExitBook (a
+    trailing stop stays armed once activated, stops win over take profits).
+    Fills are at the bar price less slippage.
+    """
+
+    def __init__(self, history: MarketHistory, params: Dict, starting_balance: float = 10.0,
+                 entry_rule: str = 'analyzer', rediscover_after: float = 900.0,
+                 slippage: float = 0.0, strict_filters: bool = False,
+                 start_bar: int = 0, stop_bar: Optional[int] = None):
+        """
+        Initialize the backtester
+
+        :param history: Market history to replay
+        :param params: Trading parameters (trading_params.json layout)
+        :param starting_balance: Starting balance in SOL
+        :param entry_rule: 'analyzer' or 'simple' (see ENTRY_RULES)
+        :param rediscover_after: Seconds before a closed token can be bought again
+        :param slippage: Fraction lost on every sell (0.01 = 1%)
+        :param strict_filters: Also require min_liquidity, min_market_cap and
+                               min_holders from params (the live bot does not)
+        :param start_bar: First bar to trade (earlier bars still feed the 24h change)
+        :param stop_bar: One past the last bar to trade (defaults to the end)
+        """
+        if entry_rule not in ENTRY_RULES:
+            raise ValueError(f"Unknown entry rule: {entry_rule}")
+        self.history = history
+        self.params = dict(params)
+        self.starting_balance = float(starting_balance)
+        self.entry_rule = entry_rule
+        self.rediscover_bars = history.bars_for(rediscover_after) if rediscover_after > 0 else 0
+        self.slippage = slippage
+        self.strict_filters = strict_filters
+        self.start_bar = max(0, start_bar)
+        self.stop_bar = history.n_bars if stop_bar is None else min(stop_bar, history.n_bars)
+
+    def _field(self, name: str, start: int, stop: int) -> np.ndarray:
+        values = self.history.field(name)
+        if values is None:
+            return np.zeros((stop - start, self.history.n_tokens), dtype=np.float32)
+        return values[start:stop]
+
+    def entry_signals(self, start: int, stop: int) -> np.ndarray:
+        """
+        Buy signals for a block of bars
+
+        :param start: First bar index
+        :param stop: One past the last bar index
+        :return: Boolean array (stop - start, n_tokens)
+        """
+        history = self.history
+        price = history.price[start:stop]
+
+        # 24h change against the bar one day earlier; unknown for the first day
+        lag = history.bars_for(86400)
+        previous = np.full(price.shape, np.nan, dtype=price.dtype)
+        first = max(start, lag)
+        if first < stop:
+            previous[first - start:] = history.price[first - lag:stop - lag]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_24h = (price / previous - 1) * 100
+
+        volume = self._field('volume_24h', start, stop)
+        if self.entry_rule == 'analyzer':
+            safety = safety_scores(self._field('liquidity_usd', start, stop),
+                                   self._field('holders', start, stop), volume)
+            signal = (safety >= ANALYZER_MIN_SAFETY) & (change_24h >= ANALYZER_MIN_CHANGE_24H)
+        else:
+            min_volume = self.params.get('min_volume_24h', 30000)
+            signal = (change_24h > SIMPLE_MIN_CHANGE_24H) & (volume > min_volume)
+
+        if self.strict_filters:
+            signal &= self._field('liquidity_usd', start, stop) >= self.params.get('min_liquidity', 0)
+            signal &= self._field('mcap', start, stop) >= self.params.get('min_market_cap', 0)
+            signal &= self._field('holders', start, stop) >= self.params.get('min_holders', 0)
+
+        return signal & (price > 0)
+
+    def run(self) -> BacktestResult:
+        """
+        Run the backtest
+
+        :return: BacktestResult
+        """
+        started = time.perf_counter()
+        history = self.history
+        params = self.params
+        first_bar, n_tokens = self.start_bar, history.n_tokens
+        n_bars = max(0, self.stop_bar - first_bar)
+
+        # Exit levels as multiples of the entry price
+        levels = exit_levels_from_params(1.0, params)
+        stop_mult = levels['stop_loss'] or 0.0
+        take_profit_mult = levels['take_profit']
+        trailing_mult = levels['trailing_activation']
+        trailing_distance = levels['trailing_distance_pct']
+        rung_mult = np.array([level for level, _ in levels['partial_levels']])
+        rung_fraction = np.array([fraction for _, fraction in levels['partial_levels']])
+
+        max_open = int(params.get('max_open_positions', 10))
+        size_pct = params.get('default_position_size_pct', 4.0) / 100.0
+        min_size = params.get('absolute_min_sol', 0.1)
+        max_size = params.get('absolute_max_sol', 2.0)
+        keep = 1.0 - self.slippage
+
+        # Per-token position state
+        entry_price = np.zeros(n_tokens)
+        cost = np.zeros(n_tokens)            # SOL cost basis still held
+        realized = np.zeros(n_tokens)        # realized P&L of the current position
+        highest = np.zeros(n_tokens)
+        last_price = np.zeros(n_tokens)
+        armed = np.zeros(n_tokens, dtype=bool)
+        rung = np.zeros(n_tokens, dtype=np.int64)
+        entry_bar = np.zeros(n_tokens, dtype=np.int64)
+        is_open = np.zeros(n_tokens, dtype=bool)
+        next_entry = np.zeros(n_tokens, dtype=np.int64)
+        open_idx = np.zeros(0, dtype=np.int64)
+
+        cash = self.starting_balance
+        equity_curve = np.empty(n_bars)
+        cash_curve = np.empty(n_bars)
+        exposure_curve = np.empty(n_bars)
+        open_curve = np.empty(n_bars, dtype=np.int64)
+
+        ledger: Dict[str, List[np.ndarray]] = {name: [] for name in
+                                               ('token', 'entry_bar', 'exit_bar', 'reason',
+                                                'amount_sol', 'entry_price', 'exit_price', 'pnl_sol')}
+        position_pnl: List[np.ndarray] = []
+
+        def sell(idx, fraction, bar, reason_codes, px):
+            """Sell a share of each position in idx at px; returns the SOL received"""
+            amount = cost[idx] * fraction
+            proceeds = amount * (px / entry_price[idx]) * keep
+            cost[idx] -= amount
+            realized[idx] += proceeds - amount
+            ledger['token'].append(idx)
+            ledger['entry_bar'].append(entry_bar[idx])
+            ledger['exit_bar'].append(np.full(len(idx), bar))
+            ledger['reason'].append(np.broadcast_to(reason_codes, idx.shape).astype(np.int8))
+            ledger['amount_sol'].append(amount)
+            ledger['entry_price'].append(entry_price[idx])
+            ledger['exit_price'].append(px.astype(np.float64))
+            ledger['pnl_sol'].append(proceeds - amount)
+            return float(proceeds.sum())
+
+        for block_start in range(first_bar, self.stop_bar, SIGNAL_BLOCK_BARS):
+            block_stop = min(block_start + SIGNAL_BLOCK_BARS, self.stop_bar)
+            signals = self.entry_signals(block_start, block_stop)
+
+            for bar in range(block_start, block_stop):
+                prices = history.price[bar]
+
+                # Exits, for every open position at once
+                if open_idx.size:
+                    px_all = prices[open_idx]
+                    priced = px_all > 0
+                    idx = open_idx[priced]
+                    px = px_all[priced].astype(np.float64)
+                    entry = entry_price[idx]
+                    last_price[idx] = px
+                    highest[idx] = np.maximum(highest[idx], px)
+
+                    stop_level = entry * stop_mult
+                    if trailing_mult:
+                        armed[idx] |= px >= entry * trailing_mult
+                        trail_level = np.where(armed[idx], highest[idx] * (1 - trailing_distance), 0.0)
+                    else:
+                        trail_level = np.zeros_like(px)
+                    full = px <= np.maximum(stop_level, trail_level)
+                    closing = [idx[full]]
+
+                    if full.any():
+                        codes = np.where(trail_level[full] >= stop_level[full],
+                                         EXIT_REASONS.index('trailing_stop'),
+                                         EXIT_REASONS.index('stop_loss'))
+                        cash += sell(idx[full], 1.0, bar, codes, px[full])
+
+                    alive = ~full
+                    if rung_mult.size:
+                        # Several rungs may be crossed in one bar; take them in order
+                        for r in range(rung_mult.size):
+                            hit = alive & (rung[idx] == r) & (px >= entry * rung_mult[r])
+                            if not hit.any():
+                                continue
+                            last_rung = r == rung_mult.size - 1
+                            code = EXIT_REASONS.index('take_profit' if last_rung else 'partial_exit')
+                            cash += sell(idx[hit], rung_fraction[r], bar, code, px[hit])
+                            rung[idx[hit]] += 1
+                            if last_rung or rung_fraction[r] >= 1.0:
+                                closing.append(idx[hit])
+                                alive &= ~hit
+                    elif take_profit_mult:
+                        hit = alive & (px >= entry * take_profit_mult)
+                        if hit.any():
+                            cash += sell(idx[hit], 1.0, bar, EXIT_REASONS.index('take_profit'), px[hit])
+                            closing.append(idx[hit])
+
+                    closed = np.concatenate(closing)
+                    if closed.size:
+                        position_pnl.append(realized[closed].copy())
+                        is_open[closed] = False
+                        cost[closed] = 0.0
+                        next_entry[closed] = bar + self.rediscover_bars
+                        open_idx = np.flatnonzero(is_open)
+
+                # Entries, in token order while slots and balance last
+                slots = max_open - open_idx.size
+                if slots > 0:
+                    candidates = np.flatnonzero(signals[bar - block_start] & ~is_open & (next_entry <= bar))
+                    opened = False
+                    for i in candidates[:slots]:
+                        size = min(max(cash * size_pct, min_size), max_size)
+                        if cash < size:
+                            break
+                        cash -= size
+                        px = float(prices[i])
+                        entry_price[i] = last_price[i] = highest[i] = px
+                        cost[i] = size
+                        realized[i] = 0.0
+                        armed[i] = False
+                        rung[i] = 0
+                        entry_bar[i] = bar
+                        is_open[i] = opened = True
+                    if opened:
+                        open_idx = np.flatnonzero(is_open)
+
+                # Mark to market at each position's last known price
+                if open_idx.size:
+                    market_value = float((cost[open_idx] * last_price[open_idx] / entry_price[open_idx]).sum())
+                else:
+                    market_value = 0.0
+                equity = cash + market_value
+                row = bar - first_bar
+                equity_curve[row] = equity
+                cash_curve[row] = cash
+                exposure_curve[row] = market_value / equity if equity > 0 else 0.0
+                open_curve[row] = open_idx.size
+
+        peak = np.maximum.accumulate(equity_curve) if n_bars else equity_curve
+        drawdown = np.divide(equity_curve, peak, out=np.ones_like(equity_curve), where=peak > 0) - 1
+
+        dtypes = {'token': np.int64, 'entry_bar': np.int64, 'exit_bar': np.int64, 'reason': np.int8}
+        trades = {name: (np.concatenate(parts) if parts else np.zeros(0, dtype=dtypes.get(name, np.float64)))
+                  for name, parts in ledger.items()}
+
+        result = BacktestResult(
+            timestamps=history.timestamps[first_bar:self.stop_bar],
+            equity=equity_curve,
+            cash=cash_curve,
+            exposure=exposure_curve,
+            open_positions=open_curve,
+            drawdown=drawdown,
+            trades=trades,
+            position_pnl=np.concatenate(position_pnl) if position_pnl else np.zeros(0),
+            starting_balance=self.starting_balance,
+            params=params,
+            elapsed_s=time.perf_counter() - started
+        )
+        logger.info(f"Backtest: {n_tokens} tokens x {n_bars} bars in {result.elapsed_s:.2f}s, "
+                    f"P&L {result.summary()['total_pnl_sol']:+.4f} SOL")
+        return result
+
+
+def run_backtest(history: MarketHistory, params: Dict, **kwargs) -> BacktestResult:
+    """
+    Convenience wrapper: VectorizedBacktester(history, params, **kwargs).run()
+
+    :param history: Market history to replay
+    :param params: Trading parameters
+    :return: BacktestResult
+    """
+    return VectorizedBacktester(history, params, **kwargs).run()
@@ -0,0 +1,246 @@
+# core/backtesting/history.py
+"""
+Columnar market history for backtesting: token observations resampled onto
+a common time grid as (bars x tokens) NumPy arrays
+"""
+import logging
+from typing import Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Observation fields carried on the grid besides price
+FIELDS = ('volume_24h', 'liquidity_usd', 'mcap', 'holders')
+
+DEFAULT_BAR_SECONDS = 600
+
+
+class MarketHistory:
+    """
+    Price/volume/liquidity/mcap/holders history on a regular time grid
+
+    Every field is a (n_bars, n_tokens) array, so one bar across the whole
+    universe is a contiguous row. Bars without an observation are forward
+    filled from the token's last observation; bars before a token's first
+    observation are NaN (the token did not exist yet for the bot).
+    """
+
+    def __init__(self, addresses: Sequence[str], timestamps: np.ndarray, price: np.ndarray,
+                 bar_seconds: int = DEFAULT_BAR_SECONDS, **fields: Optional[np.ndarray]):
+        """
+        Initialize the history
+
+        :param addresses: Token contract addresses, one per column
+        :param timestamps: Bar start times as epoch seconds, shape (n_bars,)
+        :param price: Prices, shape (n_bars, n_tokens)
+        :param bar_seconds: Bar width in seconds
+        :param fields: Optional volume_24h, liquidity_usd, mcap and holders arrays
+        """
+        self.addresses = list(addresses)
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.price = price
+        self.bar_seconds = int(bar_seconds)
+
+        if price.shape != (len(self.timestamps), len(self.addresses)):
+            raise ValueError(f"price shape {price.shape} does not match "
+                             f"{len(self.timestamps)} bars x {len(self.addresses)} tokens")
+        for name in fields:
+            if name not in FIELDS:
+                raise ValueError(f"Unknown history field: {name}")
+
+        self.volume_24h = fields.get('volume_24h')
+        self.liquidity_usd = fields.get('liquidity_usd')
+        self.mcap = fields.get('mcap')
+        self.holders = fields.get('holders')
+
+    @property
+    def n_bars(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.addresses)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the arrays"""
+        return sum(a.nbytes for a in (self.timestamps, self.price, self.volume_24h,
+                                        self.liquidity_usd, self.mcap, self.holders)
+                   if a is not None)
+
+    def bars_for(self, seconds: float) -> int:
+        """Number of bars spanning a duration (at least 1)"""
+        return max(1, int(round(seconds / self.bar_seconds)))
+
+    def field(self, name: str) -> Optional[np.ndarray]:
+        """Get a field array by name ('price' or one of FIELDS)"""
+        return getattr(self, name)
+
+    def slice_bars(self, start: int, stop: int) -> 'MarketHistory':
+        """
+        View over a range of bars (no copy), e.g. for walk-forward windows
+
+        :param start: First bar index
+        :param stop: One past the last bar index
+        :return: MarketHistory sharing this one's arrays
+        """
+        fields = {name: self.field(name)[start:stop] for name in FIELDS
+                  if self.field(name) is not None}
+        return MarketHistory(self.addresses, self.timestamps[start:stop], self.price[start:stop],
+                             self.bar_seconds, **fields)
+
+    @classmethod
+    def from_observations(cls, addresses: Sequence[str], timestamps: Sequence[float],
+                          price: Sequence[float], bar_seconds: int = DEFAULT_BAR_SECONDS,
+                          start: Optional[float] = None, end: Optional[float] = None,
+                          dtype=np.float32, **fields: Sequence[float]) -> 'MarketHistory':
+        """
+        Resample irregular observations onto the bar grid
+
+        The last observation inside a bar wins; empty bars are forward filled.
+
+        :param addresses: Token address per observation
+        :param timestamps: Epoch seconds per observation
+        :param price: Price per observation
+        :param bar_seconds: Bar width in seconds
+        :param start: Grid start (defaults to the first observation)
+        :param end: Grid end (defaults to the last observation)
+        :param dtype: Array dtype (float32 halves memory for large universes)
+        :param fields: Optional per-observation volume_24h, liquidity_usd, mcap, holders
+        :return: MarketHistory
+        """
+        import pandas as pd
+
+        ts = np.asarray(timestamps, dtype=np.float64)
+        # Hash-based factorize: several times faster than np.unique's string sort
+        token_idx, tokens = pd.factorize(np.asarray(addresses, dtype=object), sort=True)
+        if len(ts) == 0:
+            return cls([], np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=dtype), bar_seconds)
+
+        start = float(ts.min() if start is None else start)
+        end = float(ts.max() if end is None else end)
+        grid_start = int(start // bar_seconds * bar_seconds)
+        n_bars = int((end - grid_start) // bar_seconds) + 1
+        grid = grid_start + np.arange(n_bars, dtype=np.int64) * bar_seconds
+
+        keep = (ts >= grid_start) & (ts < grid_start + n_bars * bar_seconds)
+        bar_idx = ((ts[keep] - grid_start) // bar_seconds).astype(np.int64)
+        token_idx = token_idx[keep]
+
+        # Last observation per (bar, token) cell: sort by cell then time, keep each group's tail
+        cells = bar_idx * len(tokens) + token_idx
+        order = np.lexsort((ts[keep], cells))
+        sorted_cells = cells[order]
+        last = order[np.append(sorted_cells[1:] != sorted_cells[:-1], True)]
+
+        def resample(values: Sequence[float]) -> np.ndarray:
+            out = np.full((n_bars, len(tokens)), np.nan, dtype=dtype)
+            values = np.asarray(values, dtype=np.float64)[keep][last]
+            # Rows that don't carry this field (e.g. trade prices) leave the cell to forward fill
+            present = ~np.isnan(values)
+            out[bar_idx[last][present], token_idx[last][present]] = values[present]
+            return forward_fill(out)
+
+        return cls(
+            tokens.tolist(), grid, resample(price), bar_seconds,
+            **{name: resample(values) for name, values in fields.items() if values is not None}
+        )
+
+    @classmethod
+    def from_frame(cls, df, bar_seconds: int = DEFAULT_BAR_SECONDS, **kwargs) -> 'MarketHistory':
+        """
+        Build from a long-format DataFrame
+
+        :param df: Columns contract_address, timestamp (epoch seconds or datetimes),
+                   price_usd and optionally volume_24h, liquidity_usd, mcap, holders
+        :param bar_seconds: Bar width in seconds
+        :return: MarketHistory
+        """
+        import pandas as pd
+
+        timestamps = df['timestamp']
+        if not np.issubdtype(timestamps.dtype, np.number):
+            epoch = pd.Timestamp(0, tz='UTC')
+            timestamps = (pd.to_datetime(timestamps, utc=True, format='ISO8601') - epoch) // pd.Timedelta(seconds=1)
+        return cls.from_observations(
+            df['contract_address'].to_numpy(), timestamps.to_numpy(), df['price_usd'].to_numpy(),
+            bar_seconds=bar_seconds,
+            **{name: df[name].to_numpy() for name in FIELDS if name in df.columns},
+            **kwargs
+        )
+
+    @classmethod
+    def from_database(cls, db, bar_seconds: int = DEFAULT_BAR_SECONDS, **kwargs) -> 'MarketHistory':
+        """
+        Build from the observations the trading database keeps
+
+        The tokens table only holds each token's latest row, so this is the
+        trade prices plus one point per token; sparse, but enough to replay
+        the bot's own history.
+
+        :param db: Database instance
+        :param bar_seconds: Bar width in seconds
+        :return: MarketHistory
+        """
+        import pandas as pd
+
+        with db.pool.reader() as conn:
+            trades = pd.read_sql_query('''
+            SELECT contract_address, timestamp, price AS price_usd
+            FROM trades
+            WHERE contract_address IS NOT NULL AND price > 0
+            ''', conn)
+            tokens = pd.read_sql_query('''
+            SELECT contract_address, last_updated AS timestamp, price_usd,
+                   volume_24h, liquidity_usd, mcap, holders
+            FROM tokens
+            WHERE price_usd > 0 AND last_updated IS NOT NULL
+            ''', conn)
+
+        df = pd.concat([trades, tokens], ignore_index=True)
+        if df.empty:
+            logger.warning("No price observations in the database")
+        return cls.from_frame(df, bar_seconds=bar_seconds, **kwargs)
+
+    @classmethod
+    def from_snapshot_store(cls, store, start: Optional[float] = None, end: Optional[float] = None,
+                            addresses: Optional[Sequence[str]] = None,
+                            bar_seconds: int = DEFAULT_BAR_SECONDS, **kwargs) -> 'MarketHistory':
+        """
+        Build from the recorded market snapshots
+
+        :param store: SnapshotStore instance
+        :param start: Epoch seconds, inclusive (defaults to the first snapshot)
+        :param end: Epoch seconds, exclusive (defaults to the last snapshot)
+        :param addresses: Only these tokens (defaults to all)
+        :param bar_seconds: Bar width in seconds
+        :return: MarketHistory
+        """
+        data = store.query(start, end, addresses)
+        if len(data['timestamp']) == 0:
+            logger.warning("No snapshots in the requested range")
+        return cls.from_observations(
+            data['address'], data['timestamp'], data['price'], bar_seconds=bar_seconds,
+            start=start, end=None if end is None else end - 1,
+            **{name: data[name] for name in FIELDS}, **kwargs
+        )
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """
+    Forward fill NaNs down each column (in place)
+
+    :param values: (n_bars, n_tokens) array
+    :return: The same array
+    """
+    if values.size == 0:
+        return values
+    present = ~np.isnan(values)
+    rows = np.where(present, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[rows, np.arange(values.shape[1])]
+    # Bars before the first observation stay NaN
+    filled[~np.maximum.accumulate(present, axis=0)] = np.nan
+    values[...] = filled
+    return values
@@ -0,0 +1,474 @@
+# core/backtesting/sweep.py
+"""
+Parallel parameter sweep (grid, random or Bayesian) over the vectorized
+backtester, with walk-forward validation
+"""
+import os
+import time
+import logging
+import itertools
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.backtesting.engine import VectorizedBacktester
+from core.backtesting.history import FIELDS, MarketHistory
+
+logger = logging.getLogger(__name__)
+
+# name -> (kind, low, high) for 'float', 'log' and 'int'; (kind, values) for 'choice'
+DEFAULT_SPACE = {
+    'default_position_size_pct': ('float', 2.0, 10.0),
+    'take_profit_pct': ('float', 0.1, 2.0),
+    'stop_loss_pct': ('float', 0.02, 0.3),
+    'trailing_stop_enabled': ('choice', [False, True]),
+    'trailing_stop_activation_pct': ('float', 0.05, 1.0),
+    'trailing_stop_distance_pct': ('float', 0.02, 0.3),
+    'min_volume_24h': ('log', 1000.0, 1000000.0),
+    'min_liquidity': ('log', 1000.0, 500000.0),
+}
+
+OBJECTIVES: Dict[str, Callable[[Dict], float]] = {
+    'return': lambda s: s['return_pct'],
+    'risk_adjusted': lambda s: s['return_pct'] - s['max_drawdown_pct'],
+    'calmar': lambda s: s['return_pct'] / max(s['max_drawdown_pct'], 1.0),
+}
+
+
+class SharedHistory:
+    """
+    MarketHistory arrays placed in shared memory for worker processes
+
+    Workers attach by name instead of receiving a pickled copy. Arrays that
+    are broadcasts of a single row (static per-token fields) are shared as
+    that row and re-broadcast on attach.
+    """
+
+    def __init__(self, history: MarketHistory):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.spec = {
+            'addresses': history.addresses,
+            'bar_seconds': history.bar_seconds,
+            'arrays': {}
+        }
+        for name in ('timestamps', 'price') + FIELDS:
+            values = history.field(name) if name != 'timestamps' else history.timestamps
+            if values is None:
+                continue
+            broadcast = values.ndim == 2 and values.strides[0] == 0
+            data = np.ascontiguousarray(values[:1] if broadcast else values)
+            block = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+            np.ndarray(data.shape, dtype=data.dtype, buffer=block.buf)[...] = data
+            self._blocks.append(block)
+            self.spec['arrays'][name] = (block.name, data.shape, data.dtype.str,
+                                         values.shape if broadcast else None)
+
+    @staticmethod
+    def attach(spec: Dict) -> Tuple[MarketHistory, List[shared_memory.SharedMemory]]:
+        """
+        Rebuild the history in a worker (no copy)
+
+        :param spec: SharedHistory.spec
+        :return: (MarketHistory, shared memory handles to keep alive)
+        """
+        blocks, arrays = [], {}
+        for name, (block_name, shape, dtype, broadcast_shape) in spec['arrays'].items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            values = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            arrays[name] = np.broadcast_to(values, broadcast_shape) if broadcast_shape else values
+        timestamps = arrays.pop('timestamps')
+        price = arrays.pop('price')
+        history = MarketHistory(spec['addresses'], timestamps, price, spec['bar_seconds'], **arrays)
+        return history, blocks
+
+    def close(self):
+        """Release and unlink the shared blocks"""
+        for block in self._blocks:
+            try:
+                block.close()
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+
+# Worker-process state, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(spec: Dict, base_params: Dict, backtest_kwargs: Dict, objective: str):
+    # One summary line per backtest would flood the parent's console
+    logging.getLogger('core.backtesting.engine').setLevel(logging.WARNING)
+    history, blocks = SharedHistory.attach(spec)
+    _worker.update(history=history, blocks=blocks, base_params=base_params,
+                   backtest_kwargs=backtest_kwargs, objective=objective)
+
+
+def _evaluate(task: Tuple[int, Dict, int, int]) -> Tuple[int, int, Dict]:
+    """Backtest one candidate over one window (runs in a worker)"""
+    candidate_id, overrides, start, stop = task
+    params = dict(_worker['base_params'])
+    params.update(overrides)
+    result = VectorizedBacktester(_worker['history'], params, start_bar=start, stop_bar=stop,
+                                  **_worker['backtest_kwargs']).run()
+    summary = result.summary()
+    summary['score'] = OBJECTIVES[_worker['objective']](summary)
+    return candidate_id, start, summary
+
+
+def _encode(space: Dict, candidate: Dict) -> np.ndarray:
+    """Map a candidate into the unit cube (for the Bayesian proposals)"""
+    point = []
+    for name, spec in space.items():
+        kind, value = spec[0], candidate[name]
+        if kind == 'choice':
+            point.append(spec[1].index(value) / max(len(spec[1]) - 1, 1))
+        elif kind == 'log':
+            point.append(np.log(value / spec[1]) / np.log(spec[2] / spec[1]))
+        else:
+            point.append((value - spec[1]) / (spec[2] - spec[1]))
+    return np.array(point)
+
+
+def _decode(space: Dict, point: np.ndarray) -> Dict:
+    """Map a unit-cube point back to parameter values"""
+    candidate = {}
+    for (name, spec), u in zip(space.items(), np.clip(point, 0.0, 1.0)):
+        kind = spec[0]
+        if kind == 'choice':
+            candidate[name] = spec[1][int(round(u * (len(spec[1]) - 1)))]
+        elif kind == 'log':
+            candidate[name] = float(round(spec[1] * (spec[2] / spec[1]) ** u))
+        elif kind == 'int':
+            candidate[name] = int(round(spec[1] + u * (spec[2] - spec[1])))
+        else:
+            candidate[name] = round(float(spec[1] + u * (spec[2] - spec[1])), 4)
+    return candidate
+
+
+def grid_candidates(grid: Dict[str, Sequence]) -> List[Dict]:
+    """
+    Every combination of the given values
+
+    :param grid: Parameter name -> values to try
+    :return: List of candidate overrides
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def random_candidates(space: Dict, n: int, seed: int = 0) -> List[Dict]:
+    """
+    Uniform samples from a search space
+
+    :param space: Search space (see DEFAULT_SPACE)
+    :param n: Number of candidates
+    :param seed: Random seed
+    :return: List of candidate overrides
+    """
+    rng = np.random.default_rng(seed)
+    return [_decode(space, rng.random(len(space))) for _ in range(n)]
+
+
+class SweepResult:
+    """Ranked candidates plus walk-forward selection results"""
+
+    def __init__(self, table, base_params: Dict, walk_forward: List[Dict], elapsed_s: float):
+        """
+        :param table: pandas DataFrame, one row per candidate, best first
+        :param base_params: Parameters the overrides were applied to
+        :param walk_forward: Per-fold selection results (empty without folds)
+        :param elapsed_s: Wall time of the sweep
+        """
+        self.table = table
+        self.base_params = base_params
+        self.walk_forward = walk_forward
+        self.elapsed_s = elapsed_s
+
+    @property
+    def best_params(self) -> Dict:
+        """Full parameter set of the top-ranked candidate"""
+        params = dict(self.base_params)
+        if not self.table.empty:
+            params.update(self.table.iloc[0]['params'])
+        return params
+
+    def config_diff(self, current_params: Optional[Dict] = None) -> Dict:
+        """
+        Parameters the best candidate changes
+
+        :param current_params: Live trading_params.json (defaults to the sweep's base)
+        :return: {name: new value} for every changed parameter
+        """
+        current = self.base_params if current_params is None else current_params
+        return {name: value for name, value in self.best_params.items()
+                if current.get(name) != value}
+
+    def save(self, table_path: str, diff_path: str, current_params: Optional[Dict] = None):
+        """
+        Write the ranked table (CSV) and a diff for safe_update_config.py
+
+        :param table_path: CSV path for the ranked candidates
+        :param diff_path: JSON path for the config diff
+        :param current_params: Live trading_params.json to diff against
+        """
+        import json
+
+        for path in (table_path, diff_path):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self.table.drop(columns=['params', 'windows'], errors='ignore').to_csv(table_path, index=False)
+        best = self.table.iloc[0] if not self.table.empty else None
+        with open(diff_path, 'w') as f:
+            json.dump({
+                'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'score': None if best is None else float(best['score']),
+                'holdout_score': None if best is None or np.isnan(best['holdout_score'])
+                else float(best['holdout_score']),
+                'walk_forward': self.walk_forward,
+                'changes': self.config_diff(current_params)
+            }, f, indent=4, default=float)
+
+
+class ParameterSweep:
+    """
+    Evaluates trading_params.json candidates with the vectorized backtester
+
+    Candidates run in a process pool across all cores; the market history
+    is shared with the workers through shared memory. Used as a context
+    manager, the shared history and the pool are created once and reused by
+    every evaluate() call (e.g. each Bayesian round); otherwise each run
+    creates and releases its own.
+
+    With walk-forward folds the history is split into folds + 1 consecutive
+    windows and every candidate is backtested on each window. Candidates are
+    ranked on their mean score over every window but the last, which is
+    held out: its score (``holdout_score``) shows how the ranked candidates
+    do on data they were not chosen on. Each fold also records how the
+    candidate chosen on the windows before it did on the next one.
+    """
+
+    def __init__(self, history: MarketHistory, base_params: Dict, space: Optional[Dict] = None,
+                 objective: str = 'calmar', workers: Optional[int] = None,
+                 walk_forward_folds: int = 0, **backtest_kwargs):
+        """
+        Initialize the sweep
+
+        :param history: Market history to replay
+        :param base_params: Current trading parameters; candidates override them
+        :param space: Search space for random/Bayesian sweeps (see DEFAULT_SPACE)
+        :param objective: Key of OBJECTIVES used for ranking
+        :param workers: Worker processes (defaults to every core)
+        :param walk_forward_folds: Walk-forward folds (0 = single in-sample window)
+        :param backtest_kwargs: Passed to VectorizedBacktester
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective: {objective}")
+        self.history = history
+        self.base_params = dict(base_params)
+        self.space = dict(space or DEFAULT_SPACE)
+        self.objective = objective
+        self.workers = workers or os.cpu_count() or 1
+        self.walk_forward_folds = max(0, walk_forward_folds)
+        self.backtest_kwargs = backtest_kwargs
+
+        self._shared: Optional[SharedHistory] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def open(self):
+        """Share the history and start the worker pool (no-op if already open)"""
+        if self._pool is not None:
+            return
+        self._shared = SharedHistory(self.history)
+        try:
+            initargs = (self._shared.spec, self.base_params, self.backtest_kwargs, self.objective)
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=initargs)
+        except Exception:
+            self._shared.close()
+            self._shared = None
+            raise
+
+    def close(self):
+        """Stop the worker pool and release the shared history"""
+        pool, self._pool = self._pool, None
+        shared, self._shared = self._shared, None
+        try:
+            if pool is not None:
+                pool.shutdown()
+        finally:
+            if shared is not None:
+                shared.close()
+
+    def __enter__(self) -> 'ParameterSweep':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @contextmanager
+    def _session(self):
+        """Use the open pool, or open one for the duration of a single run"""
+        opened = self._pool is None
+        if opened:
+            self.open()
+        try:
+            yield self._pool
+        finally:
+            if opened:
+                self.close()
+
+    def windows(self) -> List[Tuple[int, int]]:
+        """Bar windows each candidate is evaluated on"""
+        if not self.walk_forward_folds:
+            return [(0, self.history.n_bars)]
+        edges = np.linspace(0, self.history.n_bars, self.walk_forward_folds + 2).astype(int)
+        return list(zip(edges[:-1], edges[1:]))
+
+    def evaluate(self, candidates: List[Dict]) -> List[Dict]:
+        """
+        Backtest candidates on every window
+
+        :param candidates: Parameter overrides
+        :return: One row per candidate with 'params', per-window summaries, the ranking
+            'score' (selection windows) and 'holdout_score' (final window; NaN without folds)
+        """
+        windows = self.windows()
+        tasks = [(i, overrides, start, stop) for i, overrides in enumerate(candidates)
+                 for start, stop in windows]
+        summaries: Dict[int, Dict[int, Dict]] = {i: {} for i in range(len(candidates))}
+
+        with self._session() as pool:
+            chunksize = max(1, len(tasks) // (self.workers * 4))
+            for candidate_id, start, summary in pool.map(_evaluate, tasks, chunksize=chunksize):
+                summaries[candidate_id][start] = summary
+
+        rows = []
+        for i, overrides in enumerate(candidates):
+            per_window = [summaries[i][start] for start, _ in windows]
+            scores = [s['score'] for s in per_window]
+            # The final window is held out of the ranking
+            scored = per_window[:-1] if len(per_window) > 1 else per_window
+            holdout = per_window[-1] if len(per_window) > 1 else None
+            rows.append({
+                'params': overrides,
+                'windows': per_window,
+                'window_scores': scores,
+                'score': float(np.mean([s['score'] for s in scored])),
+                'holdout_score': float(holdout['score']) if holdout else float('nan'),
+                'holdout_return_pct': float(holdout['return_pct']) if holdout else float('nan'),
+                'return_pct': float(np.mean([s['return_pct'] for s in scored])),
+                'max_drawdown_pct': float(max(s['max_drawdown_pct'] for s in scored)),
+                'win_rate_pct': float(np.mean([s['win_rate_pct'] for s in scored])),
+                'closed_positions': int(sum(s['closed_positions'] for s in scored)),
+                'avg_exposure_pct': float(np.mean([s['avg_exposure_pct'] for s in scored])),
+            })
+        return rows
+
+    def _result(self, rows: List[Dict], started: float) -> SweepResult:
+        import pandas as pd
+
+        table = pd.DataFrame(rows)
+        if not table.empty:
+            table = table.sort_values('score', ascending=False, ignore_index=True)
+            params = pd.DataFrame(list(table['params']))
+            table = pd.concat([table, params.add_prefix('param_')], axis=1)
+
+        walk_forward = []
+        for fold in range(1, len(self.windows())):
+            # Choose on every window before the fold, score on the fold's window
+            chosen = max(rows, key=lambda r: np.mean(r['window_scores'][:fold]))
+            best = max(rows, key=lambda r: r['window_scores'][fold])
+            walk_forward.append({
+                'fold': fold,
+                'in_sample_score': float(np.mean(chosen['window_scores'][:fold])),
+                'out_of_sample_score': chosen['window_scores'][fold],
+                'best_possible_score': best['window_scores'][fold],
+                'params': chosen['params']
+            })
+
+        result = SweepResult(table, self.base_params, walk_forward, time.perf_counter() - started)
+        logger.info(f"Sweep: {len(rows)} candidates x {len(self.windows())} windows "
+                    f"in {result.elapsed_s:.1f}s on {self.workers} workers")
+        return result
+
+    def run_grid(self, grid: Dict[str, Sequence]) -> SweepResult:
+        """
+        Evaluate every combination of the given values
+
+        :param grid: Parameter name -> values
+        :return: SweepResult
+        """
+        started = time.perf_counter()
+        return self._result(self.evaluate(grid_candidates(grid)), started)
+
+    def run_random(self, n: int, seed: int = 0) -> SweepResult:
+        """
+        Evaluate uniform random samples from the search space
+
+        :param n: Number of candidates
+        :param seed: Random seed
+        :return: SweepResult
+        """
+        started = time.perf_counter()
+        return self._result(self.evaluate(random_candidates(self.space, n, seed)), started)
+
+    def run_bayesian(self, n: int, initial: Optional[int] = None, batch: Optional[int] = None,
+                     gamma: float = 0.2, seed: int = 0) -> SweepResult:
+        """
+        Tree-structured-Parzen-style search
+
+        After an initial random batch, each round splits the evaluated
+        candidates into the best gamma fraction and the rest, samples around
+        the good ones and keeps the proposals with the highest good/bad
+        density ratio. Rounds are evaluated a batch at a time in parallel.
+
+        :param n: Total number of candidates
+        :param initial: Random candidates before modelling (default n // 4)
+        :param batch: Candidates per round (default: 2 per worker)
+        :param gamma: Share of candidates treated as good
+        :param seed: Random seed
+        :return: SweepResult
+        """
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        initial = min(n, initial or max(n // 4, 8))
+        batch = batch or self.workers * 2
+
+        with self._session():
+            rows = self._search(n, initial, batch, gamma, rng, seed)
+        return self._result(rows, started)
+
+    def _search(self, n: int, initial: int, batch: int, gamma: float,
+                rng: np.random.Generator, seed: int) -> List[Dict]:
+        """Bayesian rounds for run_bayesian (every round reuses the open pool)"""
+        rows = self.evaluate(random_candidates(self.space, initial, seed))
+        while len(rows) < n:
+            points = np.array([_encode(self.space, r['params']) for r in rows])
+            scores = np.array([r['score'] for r in rows])
+            order = np.argsort(-scores)
+            n_good = max(1, int(len(rows) * gamma))
+            good, bad = points[order[:n_good]], points[order[n_good:]]
+            bandwidth = max(0.05, 0.3 * len(rows) ** (-1 / (len(self.space) + 4)))
+
+            samples = good[rng.integers(0, len(good), 64 * batch)]
+            samples = np.clip(samples + rng.normal(0, bandwidth, samples.shape), 0.0, 1.0)
+
+            def density(at, centers):
+                if len(centers) == 0:
+                    return np.ones(len(at))
+                d2 = ((at[:, None, :] - centers[None, :, :]) ** 2).sum(-1)
+                return np.exp(-d2 / (2 * bandwidth ** 2)).mean(1) + 1e-12
+
+            ratio = density(samples, good) / density(samples, bad)
+            proposals = [_decode(self.space, samples[i])
+                         for i in np.argsort(-ratio)[:min(batch, n - len(rows))]]
+            rows.extend(self.evaluate(proposals))
+        return rows
@@ -9,6 +9,8 @@ import random
 from datetime import datetime, timezone
 import asyncio
 
+from core.storage.write_queue import get_write_queue
+
 # Set up logging
 logger = logging.getLogger('simplified_solana_trader')
 
@@ -202,8 +204,8 @@ class SolanaTrader:
             # Record the trade in the database
             if self.db is not None:
                 try:
-                    # Record the trade in the database as a simulation
-                    self.db.record_trade(
+                    # Record the trade as a simulation (committed on the DB thread)
+                    await get_write_queue(self.db).record_trade(
                         contract_address=contract_address,
                         action=action,
                         amount=amount,
@@ -233,8 +235,8 @@ class SolanaTrader:
                 # Record the trade in the database
                 if self.db is not None:
                     try:
-                        # Record the trade in the database as a real trade
-                        self.db.record_trade(
+                        # Record the trade as a real trade (committed on the DB thread)
+                        await get_write_queue(self.db).record_trade(
                             contract_address=contract_address,
                             action=action,
                             amount=amount,
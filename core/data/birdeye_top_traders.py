@@ -10,33 +10,62 @@ from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import asyncio
 
+from utils.rate_limiter import get_rate_limiter, parse_retry_after, PRIORITY_ANALYSIS, PRIORITY_DISCOVERY
+from utils.response_cache import get_response_cache, make_cache_key
+from utils.http_client import get_http_session
+
 logger = logging.getLogger(__name__)
 
 class BirdeyeTopTraders:
     """Birdeye API integration for whale tracking"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: Optional[aiohttp.ClientSession] = None):
         self.api_key = api_key
+        self.session = session  # None: use the shared pooled session
         self.base_url = "https://public-api.birdeye.so"
         self.headers = {
             "X-API-KEY": api_key,
             "Accept": "application/json"
         }
         
-        # Cache for API calls
-        self.cache = {}
+        # Same API key as BirdeyeAPI, so the same budget and response cache
+        self.rate_limiter = get_rate_limiter('birdeye')
+        self.cache = get_response_cache('birdeye')
         self.cache_duration = 300  # 5 minutes
         
+    async def _request(self, endpoint: str, params: Dict,
+                       priority: int = PRIORITY_ANALYSIS) -> Optional[Dict]:
+        """
+        GET a Birdeye endpoint through the shared cache and rate limiter
+        
+        :param endpoint: API path
+        :param params: Query parameters
+        :param priority: Rate limiter lane
+        :return: Response JSON or None
+        """
+        return await self.cache.get_or_fetch(
+            make_cache_key(endpoint, params),
+            lambda: self._fetch(endpoint, params, priority),
+            self.cache_duration
+        )
+        
+    async def _fetch(self, endpoint: str, params: Dict, priority: int) -> Optional[Dict]:
+        """Send one rate-limited request (uncached)"""
+        await self.rate_limiter.acquire(priority, endpoint)
+        session = get_http_session(self.session)
+        async with session.get(f"{self.base_url}{endpoint}", headers=self.headers, params=params) as response:
+            if response.status == 200:
+                self.rate_limiter.on_success()
+                return await response.json()
+            if response.status == 429:
+                self.rate_limiter.on_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
+            logger.error(f"Birdeye API error: {response.status}")
+            return None
+        
     async def get_top_traders_activity(self, token_address: str) -> Dict:
         """Get top traders' recent activity for a token"""
         
-        # Check cache
-        cache_key = f"traders_{token_address}"
-        if cache_key in self.cache:
-            cached_time, cached_data = self.cache[cache_key]
-            if (datetime.now() - cached_time).seconds < self.cache_duration:
-                return cached_data
-        
+        # The underlying responses are cached, so re-analysing is cheap
         try:
             # Get token holders
             holders_data = await self._get_token_holders(token_address)
@@ -45,12 +74,7 @@ class BirdeyeTopTraders:
             txn_data = await self._get_recent_transactions(token_address)
             
             # Analyze whale movements
-            analysis = self._analyze_whale_movements(holders_data, txn_data)
-            
-            # Cache result
-            self.cache[cache_key] = (datetime.now(), analysis)
-            
-            return analysis
+            return self._analyze_whale_movements(holders_data, txn_data)
             
         except Exception as e:
             logger.error(f"Error getting top traders activity: {e}")
@@ -59,26 +83,18 @@ class BirdeyeTopTraders:
     async def _get_token_holders(self, token_address: str) -> Dict:
         """Get top token holders"""
         
-        url = f"{self.base_url}/defi/token_holders"
         params = {
             "address": token_address,
             "limit": 50,
             "offset": 0
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get('data', {})
-                else:
-                    logger.error(f"Birdeye API error: {response.status}")
-                    return {}
+        data = await self._request("/defi/token_holders", params)
+        return data.get('data', {}) if data else {}
     
     async def _get_recent_transactions(self, token_address: str) -> List:
         """Get recent large transactions"""
         
-        url = f"{self.base_url}/defi/token_transaction"
         params = {
             "address": token_address,
             "limit": 100,
@@ -87,13 +103,8 @@ class BirdeyeTopTraders:
             "sort_by": "blockUnixTime"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data.get('data', {}).get('items', [])
-                else:
-                    return []
+        data = await self._request("/defi/token_transaction", params)
+        return data.get('data', {}).get('items', []) if data else []
     
     def _analyze_whale_movements(self, holders_data: Dict, transactions: List) -> Dict:
         """Analyze whale buy/sell patterns"""
@@ -181,7 +192,6 @@ class BirdeyeTopTraders:
     async def get_market_leaders(self, limit: int = 10) -> List[Dict]:
         """Get tokens with highest smart money activity"""
         
-        url = f"{self.base_url}/defi/token_trending"
         params = {
             "sort_by": "volume24hUSD",
             "sort_type": "desc",
@@ -189,32 +199,29 @@ class BirdeyeTopTraders:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=self.headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        leaders = []
-                        for token in data.get('data', {}).get('items', []):
-                            # Get whale activity for each
-                            whale_data = await self.get_top_traders_activity(
-                                token['address']
-                            )
-                            
-                            if whale_data['whale_accumulation']:
-                                leaders.append({
-                                    'symbol': token.get('symbol', 'UNKNOWN'),
-                                    'address': token['address'],
-                                    'whale_score': whale_data['whale_score'],
-                                    'volume_24h': token.get('volume24hUSD', 0),
-                                    'price_change_24h': token.get('priceChange24h', 0)
-                                })
-                        
-                        # Sort by whale score
-                        leaders.sort(key=lambda x: x['whale_score'], reverse=True)
-                        return leaders[:limit]
-                    else:
-                        return []
+            data = await self._request("/defi/token_trending", params, PRIORITY_DISCOVERY)
+            if not data:
+                return []
+                
+            leaders = []
+            for token in data.get('data', {}).get('items', []):
+                # Get whale activity for each
+                whale_data = await self.get_top_traders_activity(
+                    token['address']
+                )
+                
+                if whale_data['whale_accumulation']:
+                    leaders.append({
+                        'symbol': token.get('symbol', 'UNKNOWN'),
+                        'address': token['address'],
+                        'whale_score': whale_data['whale_score'],
+                        'volume_24h': token.get('volume24hUSD', 0),
+                        'price_change_24h': token.get('priceChange24h', 0)
+                    })
+            
+            # Sort by whale score
+            leaders.sort(key=lambda x: x['whale_score'], reverse=True)
+            return leaders[:limit]
                         
         except Exception as e:
             logger.error(f"Error getting market leaders: {e}")
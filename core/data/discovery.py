@@ -0,0 +1,460 @@
+# core/data/discovery.py
+"""
+Streaming token discovery: many sources, one deduplicated candidate stream
+"""
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict, namedtuple
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from utils.http_client import get_http_session
+
+logger = logging.getLogger(__name__)
+
+# discovered_at: wall-clock time the engine first saw the token
+# listed_at: listing time reported by the source, if any
+# queued_at: monotonic time the event entered the queue (queue wait)
+CandidateEvent = namedtuple('CandidateEvent',
+                            ['address', 'token', 'source', 'discovered_at', 'listed_at', 'queued_at'])
+
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_REDISCOVER_AFTER = 900.0   # seconds before a token seen again is re-emitted
+DEFAULT_MAX_EVENT_AGE = 300.0      # seconds before an unconsumed candidate is stale
+DEFAULT_MAX_SEEN = 20000
+
+
+class DiscoverySource:
+    """
+    A producer of token dicts
+
+    Polling sources override ``fetch`` and are called every ``interval``
+    seconds; streaming sources override ``stream`` as an async generator.
+    A bare source reports nothing.
+    """
+
+    def __init__(self, name: str, interval: float = 60.0):
+        self.name = name
+        self.interval = interval
+
+    async def fetch(self) -> List[Dict]:
+        """Return the tokens currently reported by this source"""
+        return []
+
+    async def stream(self):
+        """Yield token dicts as the source pushes them (one fetch unless overridden)"""
+        for token in await self.fetch():
+            yield token
+
+    @property
+    def is_streaming(self) -> bool:
+        return type(self).stream is not DiscoverySource.stream
+
+
+class PollingSource(DiscoverySource):
+    """Wraps a coroutine function such as BirdeyeAPI.get_top_gainers"""
+
+    def __init__(self, name: str, fetch: Callable[[], Awaitable[List[Dict]]], interval: float = 60.0):
+        super().__init__(name, interval)
+        self._fetch = fetch
+
+    async def fetch(self) -> List[Dict]:
+        return await self._fetch() or []
+
+
+class WebSocketSource(DiscoverySource):
+    """
+    Push source over a websocket on the shared HTTP session
+
+    ``parse`` turns one decoded JSON message into zero or more token dicts.
+    The connection is re-opened after ``interval`` seconds if it drops.
+    """
+
+    def __init__(self, name: str, url: str, parse: Callable[[Dict], Iterable[Dict]],
+                 subscribe: Optional[Dict] = None, headers: Optional[Dict] = None,
+                 protocols: Iterable[str] = (), reconnect_delay: float = 5.0):
+        super().__init__(name, reconnect_delay)
+        self.url = url
+        self.parse = parse
+        self.subscribe = subscribe
+        self.headers = headers or {}
+        self.protocols = tuple(protocols)
+
+    async def stream(self):
+        session = get_http_session()
+        async with session.ws_connect(self.url, headers=self.headers, protocols=self.protocols,
+                                      heartbeat=30) as ws:
+            if self.subscribe:
+                await ws.send_json(self.subscribe)
+            logger.info(f"Discovery websocket {self.name} connected")
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    try:
+                        payload = json.loads(message.data)
+                    except ValueError:
+                        continue
+                    for token in self.parse(payload) or []:
+                        yield token
+                elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+
+
+def birdeye_new_listing_source(api_key: str) -> WebSocketSource:
+    """
+    Birdeye's new-listing websocket (Business plans and above)
+
+    :param api_key: Birdeye API key
+    :return: WebSocketSource emitting freshly listed tokens
+    """
+    def parse(payload: Dict) -> List[Dict]:
+        if payload.get('type') != 'TOKEN_NEW_LISTING_DATA':
+            return []
+        data = payload.get('data') or {}
+        if not data.get('address'):
+            return []
+        listed_at = data.get('liquidityAddedAt')
+        return [{
+            'contract_address': data['address'],
+            'symbol': data.get('symbol', 'UNKNOWN'),
+            'name': data.get('name', data.get('symbol', 'Unknown')),
+            'liquidity': float(data.get('liquidity', 0) or 0),
+            'listed_at': float(listed_at) if listed_at else None,
+            'source': 'birdeye_ws'
+        }]
+
+    return WebSocketSource(
+        'birdeye_ws',
+        f"wss://public-api.birdeye.so/socket/solana?x-api-key={api_key}",
+        parse,
+        subscribe={'type': 'SUBSCRIBE_TOKEN_NEW_LISTING'},
+        headers={'Origin': 'ws://public-api.birdeye.so'},
+        protocols=('echo-protocol',)
+    )
+
+
+class DiscoveryEngine:
+    """
+    Merges discovery sources into one deduplicated, bounded candidate queue
+
+    Each source runs as its own task at its own cadence. A token is emitted
+    once and only re-emitted after ``rediscover_after`` seconds. When the
+    queue is full, producers wait (backpressure) rather than dropping
+    candidates; candidates older than ``max_event_age`` when dequeued are
+    discarded as stale.
+    """
+
+    def __init__(self, sources: Iterable[DiscoverySource] = (), queue_size: int = DEFAULT_QUEUE_SIZE,
+                 rediscover_after: float = DEFAULT_REDISCOVER_AFTER,
+                 max_event_age: float = DEFAULT_MAX_EVENT_AGE, max_seen: int = DEFAULT_MAX_SEEN):
+        """
+        Initialize the engine
+
+        :param sources: Discovery sources
+        :param queue_size: Candidates buffered before producers block
+        :param rediscover_after: Seconds before a token seen again is re-emitted
+        :param max_event_age: Seconds after which an unconsumed candidate is dropped
+        :param max_seen: Addresses remembered for deduplication
+        """
+        self.sources: List[DiscoverySource] = list(sources)
+        self.queue_size = max(1, queue_size)
+        self.rediscover_after = rediscover_after
+        self.max_event_age = max_event_age
+        self.max_seen = max_seen
+
+        self._seen: OrderedDict = OrderedDict()  # address -> last emitted (wall time)
+        self._queue: Optional[asyncio.Queue] = None
+        self._available: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.running = False
+
+        self.stats = {
+            'published': 0,
+            'duplicates': 0,
+            'stale': 0,
+            'consumed': 0,
+            'backpressure_waits': 0,
+            'sources': {},
+            'decisions': 0,
+            'total_queue_wait_ms': 0.0,
+            'last_discovery_to_decision_ms': 0.0,
+            'max_discovery_to_decision_ms': 0.0,
+            'total_discovery_to_decision_ms': 0.0,
+            'listing_decisions': 0,
+            'last_listing_to_decision_s': 0.0,
+            'max_listing_to_decision_s': 0.0,
+            'total_listing_to_decision_s': 0.0
+        }
+
+    def add_source(self, source: DiscoverySource):
+        """Register a source (started immediately if the engine is running)"""
+        self.sources.append(source)
+        if self.running:
+            self._tasks.append(asyncio.get_running_loop().create_task(self._run_source(source)))
+
+    def _source_stats(self, name: str) -> Dict:
+        return self.stats['sources'].setdefault(
+            name, {'fetches': 0, 'tokens': 0, 'published': 0, 'errors': 0, 'last_fetch_ms': 0.0})
+
+    async def start(self):
+        """Start every source"""
+        if self.running:
+            return
+        self.running = True
+        self._ensure_queue()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._run_source(source)) for source in self.sources]
+        logger.info(f"Discovery engine started with {len(self.sources)} sources: "
+                    f"{', '.join(s.name for s in self.sources)}")
+
+    async def stop(self):
+        """Stop every source"""
+        self.running = False
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error(f"Discovery source failed during shutdown: {e}")
+
+    async def _run_source(self, source: DiscoverySource):
+        """Drive one source at its own cadence until stopped"""
+        stats = self._source_stats(source.name)
+        while self.running:
+            started = time.monotonic()
+            try:
+                if source.is_streaming:
+                    async for token in source.stream():
+                        stats['tokens'] += 1
+                        if await self.publish(token, source.name):
+                            stats['published'] += 1
+                    logger.warning(f"Discovery stream {source.name} closed, reconnecting")
+                else:
+                    tokens = await source.fetch()
+                    stats['fetches'] += 1
+                    stats['last_fetch_ms'] = (time.monotonic() - started) * 1000
+                    stats['tokens'] += len(tokens)
+                    for token in tokens:
+                        if await self.publish(token, source.name):
+                            stats['published'] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats['errors'] += 1
+                logger.error(f"Discovery source {source.name} error: {e}")
+
+            await asyncio.sleep(max(0.0, source.interval - (time.monotonic() - started)))
+
+    async def publish(self, token: Dict, source: str = 'manual') -> bool:
+        """
+        Offer a token to the stream
+
+        :param token: Token data (needs contract_address or address)
+        :param source: Name of the producing source
+        :return: True if it was queued, False if it was a recent duplicate
+        """
+        address = token.get('contract_address') or token.get('address')
+        if not address:
+            return False
+
+        now = time.time()
+        last = self._seen.get(address)
+        if last is not None and now - last < self.rediscover_after:
+            self.stats['duplicates'] += 1
+            return False
+        self._seen[address] = now
+        self._seen.move_to_end(address)
+        while len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+
+        queue = self._ensure_queue()
+        event = CandidateEvent(address, token, source, now, token.get('listed_at'), time.monotonic())
+        if queue.full():
+            self.stats['backpressure_waits'] += 1
+        await queue.put(event)
+        self._available.set()
+        self.stats['published'] += 1
+        return True
+
+    def _ensure_queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._available = asyncio.Event()
+        return self._queue
+
+    def _accept(self, event: CandidateEvent) -> bool:
+        """Freshness check on dequeue; stale events may be rediscovered"""
+        if time.time() - event.discovered_at > self.max_event_age:
+            self.stats['stale'] += 1
+            self._seen.pop(event.address, None)
+            return False
+        self.stats['consumed'] += 1
+        self.stats['total_queue_wait_ms'] += (time.monotonic() - event.queued_at) * 1000
+        return True
+
+    def discard_stale(self) -> int:
+        """
+        Drop queued candidates that have aged past ``max_event_age``
+
+        Used while nothing consumes the queue (e.g. the book is full), so
+        producers are not held up by candidates that would be discarded
+        anyway. Dropped tokens may be rediscovered.
+
+        :return: Number of candidates dropped
+        """
+        queue = self._ensure_queue()
+        cutoff = time.time() - self.max_event_age
+        kept = []
+        dropped = 0
+        while not queue.empty():
+            event = queue.get_nowait()
+            if event.discovered_at < cutoff:
+                self._seen.pop(event.address, None)
+                dropped += 1
+            else:
+                kept.append(event)
+        for event in kept:
+            queue.put_nowait(event)
+        if not kept:
+            self._available.clear()
+        self.stats['stale'] += dropped
+        return dropped
+
+    def _take(self) -> Optional[CandidateEvent]:
+        """Dequeue the next fresh event without waiting"""
+        queue = self._ensure_queue()
+        while not queue.empty():
+            event = queue.get_nowait()
+            if self._accept(event):
+                return event
+        self._available.clear()
+        return None
+
+    async def wait_for_candidates(self, timeout: float) -> bool:
+        """
+        Sleep until a candidate is queued or ``timeout`` passes
+
+        Always yields to the event loop, even when candidates are already
+        waiting, so a caller looping on it cannot starve other tasks.
+
+        :param timeout: Longest wait in seconds
+        :return: True if candidates are waiting
+        """
+        queue = self._ensure_queue()
+        if queue.empty():
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(0)
+        return not queue.empty()
+
+    async def get_batch(self, max_items: int = 20, timeout: float = 0.0) -> List[CandidateEvent]:
+        """
+        Take up to ``max_items`` candidates
+
+        :param max_items: Largest batch returned
+        :param timeout: Seconds to wait for the first candidate (0 = don't wait)
+        :return: Candidates in discovery order (may be empty)
+        """
+        batch = []
+        deadline = time.monotonic() + timeout
+        event = self._take()
+        while event is None and time.monotonic() < deadline:
+            await self.wait_for_candidates(deadline - time.monotonic())
+            event = self._take()
+        while event is not None:
+            batch.append(event)
+            if len(batch) >= max_items:
+                break
+            event = self._take()
+        return batch
+
+    async def __aiter__(self):
+        """Iterate candidates as they arrive"""
+        while self.running:
+            for event in await self.get_batch(max_items=1, timeout=1.0):
+                yield event
+
+    def record_decision(self, event: CandidateEvent):
+        """
+        Record that the trading loop acted on a candidate
+
+        :param event: The candidate that was decided
+        """
+        now = time.time()
+        stats = self.stats
+        latency_ms = (now - event.discovered_at) * 1000
+        stats['decisions'] += 1
+        stats['last_discovery_to_decision_ms'] = latency_ms
+        stats['total_discovery_to_decision_ms'] += latency_ms
+        stats['max_discovery_to_decision_ms'] = max(stats['max_discovery_to_decision_ms'], latency_ms)
+
+        if event.listed_at:
+            listing_s = max(0.0, now - event.listed_at)
+            stats['listing_decisions'] += 1
+            stats['last_listing_to_decision_s'] = listing_s
+            stats['total_listing_to_decision_s'] += listing_s
+            stats['max_listing_to_decision_s'] = max(stats['max_listing_to_decision_s'], listing_s)
+
+    def get_stats(self) -> Dict:
+        """
+        Get discovery metrics
+
+        :return: Dictionary with per-source counts, queue depth and decision latency
+        """
+        stats = dict(self.stats)
+        stats['sources'] = {name: dict(values) for name, values in self.stats['sources'].items()}
+        stats['queue_depth'] = self._queue.qsize() if self._queue is not None else 0
+        consumed = stats['consumed']
+        decisions = stats['decisions']
+        listings = stats['listing_decisions']
+        stats['avg_queue_wait_ms'] = stats['total_queue_wait_ms'] / consumed if consumed else 0.0
+        stats['avg_discovery_to_decision_ms'] = (stats['total_discovery_to_decision_ms'] / decisions
+                                                 if decisions else 0.0)
+        stats['avg_listing_to_decision_s'] = (stats['total_listing_to_decision_s'] / listings
+                                              if listings else 0.0)
+        return stats
+
+
+def build_default_sources(birdeye_api=None, dexscreener=None, config: Optional[Dict] = None) -> List[DiscoverySource]:
+    """
+    Standard source set: Birdeye new listings, gainers and trending, plus DexScreener
+
+    Cadences come from config keys ``discovery_<source>_interval`` (seconds).
+    Setting ``use_birdeye_websocket`` adds the Birdeye new-listing websocket.
+
+    :param birdeye_api: BirdeyeAPI instance (optional)
+    :param dexscreener: DexScreenerAPI instance (optional)
+    :param config: Bot configuration dictionary
+    :return: List of sources
+    """
+    config = config or {}
+    sources = []
+
+    if birdeye_api is not None and birdeye_api.is_available:
+        sources.append(PollingSource('birdeye_new_listings',
+                                     lambda: birdeye_api.get_new_listings(limit=20),
+                                     config.get('discovery_new_listings_interval', 20)))
+        sources.append(PollingSource('birdeye_gainers',
+                                     lambda: birdeye_api.get_top_gainers(limit=20),
+                                     config.get('discovery_gainers_interval', 30)))
+        sources.append(PollingSource('birdeye_trending',
+                                     lambda: birdeye_api.get_trending_tokens(limit=20),
+                                     config.get('discovery_trending_interval', 60)))
+        if config.get('use_birdeye_websocket', False):
+            sources.append(birdeye_new_listing_source(birdeye_api.api_key))
+
+    if dexscreener is not None:
+        sources.append(PollingSource('dexscreener',
+                                     lambda: dexscreener.get_trending_tokens(limit=20),
+                                     config.get('discovery_dexscreener_interval', 60)))
+    return sources
@@ -8,12 +8,15 @@ import json
 import logging
 from typing import Dict, Optional
 
+from utils.http_client import get_http_session
+
 logger = logging.getLogger(__name__)
 
 class JupiterAggregator:
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
         self.quote_api = "https://quote-api.jup.ag/v6/quote"
         self.swap_api = "https://quote-api.jup.ag/v6/swap"
+        self.session = session  # None: use the shared pooled session
         
     async def get_best_route(self, input_mint: str, output_mint: str, amount: int) -> Optional[Dict]:
         """Get best swap route from Jupiter"""
@@ -28,20 +31,20 @@ class JupiterAggregator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.quote_api, params=params) as resp:
-                    if resp.status == 200:
-                        quote = await resp.json()
+            session = get_http_session(self.session)
+            async with session.get(self.quote_api, params=params) as resp:
+                if resp.status == 200:
+                    quote = await resp.json()
+                    
+                    if quote.get('data'):
+                        best_route = quote['data'][0]
                         
-                        if quote.get('data'):
-                            best_route = quote['data'][0]
-                            
-                            return {
-                                "route": best_route,
-                                "output_amount": int(best_route['outAmount']),
-                                "price_impact": float(best_route['priceImpactPct']),
-                                "route_plan": best_route.get('routePlan', [])
-                            }
+                        return {
+                            "route": best_route,
+                            "output_amount": int(best_route['outAmount']),
+                            "price_impact": float(best_route['priceImpactPct']),
+                            "route_plan": best_route.get('routePlan', [])
+                        }
         except Exception as e:
             logger.error(f"Jupiter quote error: {e}")
             
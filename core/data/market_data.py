@@ -8,8 +8,14 @@ import logging
 import time
 import json
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from config.bot_config import BotConfiguration
+from utils.rate_limiter import (
+    get_rate_limiter, parse_retry_after,
+    PRIORITY_EXIT, PRIORITY_ANALYSIS, PRIORITY_DISCOVERY
+)
+from utils.response_cache import get_response_cache, make_cache_key
+from utils.http_client import get_http_session
 
 logger = logging.getLogger(__name__)
 
@@ -18,21 +24,27 @@ class BirdeyeAPI:
     Fixed Birdeye API implementation for token discovery and analysis
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, session: Optional[aiohttp.ClientSession] = None):
+        """
+        Initialize the Birdeye client
+        
+        :param api_key: Birdeye API key (defaults to BotConfiguration)
+        :param session: aiohttp session to use instead of the shared pooled one
+        """
         self.api_key = api_key or BotConfiguration.API_KEYS.get('BIRDEYE_API_KEY', '')
         self.headers = {"X-API-KEY": self.api_key}
         self.base_url = "https://public-api.birdeye.so"
-        self.session = None
+        self._injected_session = session
+        self.session = session
         self.is_available = bool(self.api_key)
         
-        # Rate limiting for Starter package (100 req/min)
-        self.rate_limit = 100
-        self.request_times = []
-        self.min_interval = 0.6  # 600ms between requests
+        # Shared with BirdeyeTopTraders - the budget belongs to the API key
+        self.rate_limiter = get_rate_limiter('birdeye')
         
-        # Cache configuration
-        self.cache = {}
-        self.cache_ttl = 300  # 5 minutes
+        # Bounded LRU shared with BirdeyeTopTraders; TTLs are per endpoint
+        # (BotConfiguration.API_CACHE_SETTINGS)
+        self.cache = get_response_cache('birdeye')
+        self.multi_price_limit = 100  # addresses per /defi/multi_price call
         
         if not self.is_available:
             logger.warning("BirdeyeAPI key not found. Limited functionality available.")
@@ -40,43 +52,31 @@ class BirdeyeAPI:
             logger.info("BirdeyeAPI initialized successfully")
     
     async def __aenter__(self):
-        """Async context manager entry"""
-        if self.is_available and not self.session:
-            self.headers = {"X-API-KEY": self.api_key}
-        self.session = aiohttp.ClientSession()
+        """Async context manager entry (re-entrant; the session is shared)"""
+        await self._ensure_session()
         return self
         
-    async def get_token_info(self, address: str) -> Dict[str, Any]:
+    async def get_token_info(self, address: str, priority: int = PRIORITY_ANALYSIS) -> Dict[str, Any]:
         """Get detailed token information"""
         try:
-            # Use the existing token data from get_token_list
-            # For now, return basic info from the token list
-            url = f"{self.base_url}/defi/price"
-            params = {
-                'address': address,
-                'x-api-key': self.api_key
-            }
-            
-            async with self.session.get(url, params=params, headers=self.headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data.get('success') and data.get('data'):
-                        token_data = data['data']
-                        return {
-                            'address': address,
-                            'contract_address': address,  # Database expects this field
-                            'symbol': token_data.get('symbol', 'Unknown'),
-                            'name': token_data.get('name', 'Unknown Token'),
-                            'price': token_data.get('value', 0),
-                            'price_usd': token_data.get('value', 0),
-                            'liquidity_usd': token_data.get('liquidity', 0),
-                            'volume_24h': token_data.get('v24hUSD', 0),
-                            'price_change_24h': token_data.get('v24hChangePercent', 0),
-                            'market_cap': token_data.get('mc', 0),
-                            'holders': 0,  # Not available in this endpoint
-                            'total_supply': 0,
-                            'circulating_supply': 0
-                        }
+            # Goes through _make_request so it shares the cache and rate limiter
+            token_data = await self.get_token_price(address, priority=priority)
+            if token_data:
+                return {
+                    'address': address,
+                    'contract_address': address,  # Database expects this field
+                    'symbol': token_data.get('symbol', 'Unknown'),
+                    'name': token_data.get('name', 'Unknown Token'),
+                    'price': token_data.get('value', 0),
+                    'price_usd': token_data.get('value', 0),
+                    'liquidity_usd': token_data.get('liquidity', 0),
+                    'volume_24h': token_data.get('v24hUSD', 0),
+                    'price_change_24h': token_data.get('v24hChangePercent', 0),
+                    'market_cap': token_data.get('mc', 0),
+                    'holders': 0,  # Not available in this endpoint
+                    'total_supply': 0,
+                    'circulating_supply': 0
+                }
             
             # Fallback - return basic data
             return {
@@ -97,52 +97,44 @@ class BirdeyeAPI:
             return None
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit"""
-        if self.session:
-            await self.session.close()
-            self.session = None
-            
+        """Async context manager exit - the pooled session outlives this client"""
+        
     async def _ensure_session(self):
-        """Ensure aiohttp session exists"""
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        """Use the injected session, or the shared pooled one"""
+        self.session = get_http_session(self._injected_session)
             
-    async def _rate_limit_check(self):
-        """Check and enforce rate limits"""
-        current_time = time.time()
-        
-        # Clean old requests
-        self.request_times = [t for t in self.request_times if current_time - t < 60]
-        
-        # Check rate limit
-        if len(self.request_times) >= self.rate_limit:
-            wait_time = 60 - (current_time - self.request_times[0])
-            if wait_time > 0:
-                logger.warning(f"Rate limit reached. Waiting {wait_time:.1f}s")
-                await asyncio.sleep(wait_time)
-        
-        # Minimum interval between requests
-        if self.request_times:
-            time_since_last = current_time - self.request_times[-1]
-            if time_since_last < self.min_interval:
-                await asyncio.sleep(self.min_interval - time_since_last)
-                
-        self.request_times.append(current_time)
+    async def _rate_limit_check(self, priority: int = PRIORITY_ANALYSIS, endpoint: Optional[str] = None):
+        """Wait for budget in the request's priority lane"""
+        await self.rate_limiter.acquire(priority, endpoint)
+        
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None,
+                            cache_ttl: Optional[float] = None,
+                            priority: int = PRIORITY_ANALYSIS) -> Optional[Dict]:
+        """
+        Make API request with error handling
         
-    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
-        """Make API request with error handling"""
+        :param endpoint: API path
+        :param params: Query parameters
+        :param cache_ttl: Cache lifetime in seconds (defaults to the endpoint's TTL)
+        :param priority: Rate limiter lane - exits, then analysis, then discovery
+        :return: Response JSON or None
+        """
         if not self.is_available:
             return None
             
-        await self._rate_limit_check()
-        
-        # Check cache
-        cache_key = f"{endpoint}:{json.dumps(params or {})}"
-        if cache_key in self.cache:
-            data, timestamp = self.cache[cache_key]
-            if time.time() - timestamp < self.cache_ttl:
-                return data
-                
+        # Cache is checked before the rate limiter - hits cost no API budget,
+        # and identical concurrent requests share one call
+        ttl = self.cache.ttl_for(endpoint) if cache_ttl is None else cache_ttl
+        return await self.cache.get_or_fetch(
+            make_cache_key(endpoint, params),
+            lambda: self._fetch(endpoint, params, priority),
+            ttl
+        )
+        
+    async def _fetch(self, endpoint: str, params: Optional[Dict], priority: int) -> Optional[Dict]:
+        """Send one rate-limited request (uncached)"""
+        await self._rate_limit_check(priority, endpoint)
+        
         url = f"{self.base_url}{endpoint}"
         headers = {
             "X-API-KEY": self.api_key,
@@ -154,12 +146,13 @@ class BirdeyeAPI:
             
             async with self.session.get(url, headers=headers, params=params, timeout=30) as response:
                 if response.status == 200:
-                    data = await response.json()
-                    self.cache[cache_key] = (data, time.time())
-                    return data
+                    self.rate_limiter.on_success()
+                    return await response.json()
                 elif response.status == 429:
-                    logger.error("Rate limit exceeded")
-                    await asyncio.sleep(60)
+                    # Pause the shared limiter instead of this caller, so queued
+                    # exit checks go first once the API accepts requests again
+                    logger.error(f"Rate limit exceeded on {endpoint}")
+                    self.rate_limiter.on_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
                 elif response.status == 401:
                     logger.error("Invalid API key")
                     self.is_available = False
@@ -176,7 +169,8 @@ class BirdeyeAPI:
         
     async def get_token_list(self, offset: int = 0, limit: int = 50, 
                            sort_by: str = "v24hChangePercent", 
-                           sort_type: str = "desc") -> List[Dict]:
+                           sort_type: str = "desc",
+                           priority: int = PRIORITY_DISCOVERY) -> List[Dict]:
         """
         Get list of tokens sorted by various criteria
         """
@@ -188,7 +182,7 @@ class BirdeyeAPI:
             "limit": min(limit, 50)  # Starter limit
         }
         
-        response = await self._make_request(endpoint, params)
+        response = await self._make_request(endpoint, params, priority=priority)
         if response and "data" in response:
             tokens = response["data"].get("tokens", [])
             logger.info(f"Found {len(tokens)} tokens from Birdeye")
@@ -240,10 +234,43 @@ class BirdeyeAPI:
         return self._format_tokens(filtered_tokens)
         
     async def get_new_listings(self, limit: int = 20) -> List[Dict]:
-        """Get newly listed tokens by volume"""
+        """
+        Get newly listed tokens, newest first
+        
+        Uses /defi/v2/tokens/new_listing and keeps its liquidity-added time as
+        ``listed_at``; plans without that endpoint fall back to top volume.
+        """
         if not self.is_available:
             return []
             
+        response = await self._make_request(
+            "/defi/v2/tokens/new_listing",
+            {"limit": min(limit, 20)},
+            priority=PRIORITY_DISCOVERY
+        )
+        items = (response or {}).get("data", {}) or {}
+        items = items.get("items", []) if isinstance(items, dict) else []
+        if items:
+            listings = []
+            for item in items:
+                address = item.get("address", "")
+                if not address:
+                    continue
+                listings.append({
+                    "contract_address": address,
+                    "symbol": item.get("symbol", "UNKNOWN"),
+                    "name": item.get("name", item.get("symbol", "Unknown")),
+                    "price": 0,
+                    "price_change_24h": 0,
+                    "volume_24h": 0,
+                    "liquidity": float(item.get("liquidity", 0) or 0),
+                    "market_cap": 0,
+                    "holders": 0,
+                    "listed_at": self._parse_listing_time(item.get("liquidityAddedAt")),
+                    "source": "birdeye_new_listing"
+                })
+            return listings
+            
         tokens = await self.get_token_list(
             limit=limit,
             sort_by="v24hUSD",
@@ -251,6 +278,23 @@ class BirdeyeAPI:
         )
         return self._format_tokens(tokens)
         
+    @staticmethod
+    def _parse_listing_time(value) -> Optional[float]:
+        """Convert a Birdeye listing time (unix seconds or ISO string, UTC) to a timestamp"""
+        if not value:
+            return None
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.timestamp()
+        except ValueError:
+            return None
+        
     def _is_realistic_gain(self, token: Dict) -> bool:
         """Filter out tokens with unrealistic percentage gains"""
         change = token.get("v24hChangePercent", 0)
@@ -303,7 +347,7 @@ class BirdeyeAPI:
                 
         return formatted
         
-    async def get_token_price(self, address: str) -> Optional[Dict]:
+    async def get_token_price(self, address: str, priority: int = PRIORITY_ANALYSIS) -> Optional[Dict]:
         """Get token price information"""
         if not self.is_available:
             return None
@@ -311,11 +355,35 @@ class BirdeyeAPI:
         endpoint = "/defi/price"
         params = {"address": address}
         
-        response = await self._make_request(endpoint, params)
-        if response and "data" in response:
+        response = await self._make_request(endpoint, params, priority=priority)
+        if response and response.get("data"):
             return response["data"]
         return None
         
+    async def get_multi_price(self, addresses: List[str], priority: int = PRIORITY_EXIT) -> Dict[str, Dict]:
+        """
+        Get prices for many tokens with one request per 100 addresses
+        
+        :param addresses: Token contract addresses
+        :param priority: Rate limiter lane (position monitoring by default)
+        :return: Price data keyed by address (tokens without a price are omitted)
+        """
+        if not self.is_available or not addresses:
+            return {}
+            
+        endpoint = "/defi/multi_price"
+        prices = {}
+        for i in range(0, len(addresses), self.multi_price_limit):
+            chunk = addresses[i:i + self.multi_price_limit]
+            params = {"list_address": ",".join(chunk)}
+            
+            response = await self._make_request(endpoint, params, priority=priority)
+            if response and response.get("data"):
+                for address, data in response["data"].items():
+                    if data and data.get("value") is not None:
+                        prices[address] = data
+        return prices
+        
     async def get_token_overview(self, address: str) -> Optional[Dict]:
         """Get detailed token information"""
         if not self.is_available:
@@ -379,7 +447,8 @@ class BirdeyeAPI:
         for token in result:
             if token["price"] == 0 and token.get("contract_address"):
                 try:
-                    price_data = await self.get_token_price(token["contract_address"])
+                    price_data = await self.get_token_price(token["contract_address"],
+                                                            priority=PRIORITY_DISCOVERY)
                     if price_data and price_data.get("value"):
                         token["price"] = float(price_data["value"])
                 except Exception as e:
@@ -392,28 +461,36 @@ class BirdeyeAPI:
 class DexScreenerAPI:
     """Fallback API for token discovery when Birdeye is unavailable"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
         self.base_url = "https://api.dexscreener.com/latest/dex"
-        self.session = None
+        self._injected_session = session
+        self.session = session
+        self.rate_limiter = get_rate_limiter('dexscreener')
         
     async def __aenter__(self):
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        self._ensure_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        """The pooled session outlives this client"""
+        
+    def _ensure_session(self):
+        """Use the injected session, or the shared pooled one"""
+        self.session = get_http_session(self._injected_session)
             
     async def get_trending_tokens(self, limit: int = 20) -> List[Dict]:
         """Get trending tokens from DexScreener"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
+            self._ensure_session()
                 
             url = f"{self.base_url}/search?q=trending"
+            await self.rate_limiter.acquire(PRIORITY_DISCOVERY, "/latest/dex/search")
             async with self.session.get(url, timeout=10) as response:
+                if response.status == 429:
+                    self.rate_limiter.on_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
+                    return []
                 if response.status == 200:
+                    self.rate_limiter.on_success()
                     data = await response.json()
                     pairs = data.get("pairs", [])
                     
@@ -460,9 +537,9 @@ class DexScreenerAPI:
 class MarketDataAggregator:
     """Aggregates data from multiple sources"""
     
-    def __init__(self, birdeye_api_key: Optional[str] = None):
-        self.birdeye = BirdeyeAPI(birdeye_api_key)
-        self.dexscreener = DexScreenerAPI()
+    def __init__(self, birdeye_api_key: Optional[str] = None, session: Optional[aiohttp.ClientSession] = None):
+        self.birdeye = BirdeyeAPI(birdeye_api_key, session=session)
+        self.dexscreener = DexScreenerAPI(session=session)
         
     async def discover_tokens(self, max_tokens: int = 50) -> List[Dict]:
         """Discover tokens from all available sources"""
@@ -496,28 +573,36 @@ class MarketDataAggregator:
 class DexScreenerAPI:
     """Fallback API for token discovery when Birdeye is unavailable"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
         self.base_url = "https://api.dexscreener.com/latest/dex"
-        self.session = None
+        self._injected_session = session
+        self.session = session
+        self.rate_limiter = get_rate_limiter('dexscreener')
         
     async def __aenter__(self):
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        self._ensure_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        """The pooled session outlives this client"""
+        
+    def _ensure_session(self):
+        """Use the injected session, or the shared pooled one"""
+        self.session = get_http_session(self._injected_session)
             
     async def get_trending_tokens(self, limit: int = 20) -> List[Dict]:
         """Get trending tokens from DexScreener"""
         try:
-            if not self.session:
-                self.session = aiohttp.ClientSession()
+            self._ensure_session()
                 
             url = f"{self.base_url}/search?q=trending"
+            await self.rate_limiter.acquire(PRIORITY_DISCOVERY, "/latest/dex/search")
             async with self.session.get(url, timeout=10) as response:
+                if response.status == 429:
+                    self.rate_limiter.on_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
+                    return []
                 if response.status == 200:
+                    self.rate_limiter.on_success()
                     data = await response.json()
                     pairs = data.get("pairs", [])
                     
@@ -564,9 +649,9 @@ class DexScreenerAPI:
 class MarketDataAggregator:
     """Aggregates data from multiple sources"""
     
-    def __init__(self, birdeye_api_key: Optional[str] = None):
-        self.birdeye = BirdeyeAPI(birdeye_api_key)
-        self.dexscreener = DexScreenerAPI()
+    def __init__(self, birdeye_api_key: Optional[str] = None, session: Optional[aiohttp.ClientSession] = None):
+        self.birdeye = BirdeyeAPI(birdeye_api_key, session=session)
+        self.dexscreener = DexScreenerAPI(session=session)
         
     async def discover_tokens(self, max_tokens: int = 50) -> List[Dict]:
         """Discover tokens from all available sources"""
@@ -0,0 +1,166 @@
+# core/data/price_snapshot.py
+"""
+Batched price snapshots for open-position monitoring
+"""
+import time
+import asyncio
+import logging
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+
+from utils.rate_limiter import PRIORITY_EXIT
+
+logger = logging.getLogger(__name__)
+
+# timestamp: wall-clock time the whole batch was priced (one value for every token)
+# started_at: perf_counter() when the snapshot was requested, for reaction timing
+PriceSnapshot = namedtuple('PriceSnapshot', ['timestamp', 'started_at', 'prices', 'missing', 'fetch_ms'])
+
+
+class PriceSnapshotService:
+    """
+    Prices a set of tokens in one concurrent batch
+
+    Uses Birdeye's multi-address price endpoint when the plan allows it and
+    falls back to concurrent single-token requests otherwise. Concurrent
+    callers asking for the same token share one in-flight request.
+    """
+
+    def __init__(self, birdeye_api, use_multi_price: bool = True, max_multi_failures: int = 3):
+        """
+        Initialize the snapshot service
+
+        :param birdeye_api: BirdeyeAPI instance
+        :param use_multi_price: Try /defi/multi_price before single requests
+        :param max_multi_failures: Consecutive empty multi-price replies before giving up on it
+        """
+        self.birdeye_api = birdeye_api
+        self.use_multi_price = use_multi_price
+        self.max_multi_failures = max_multi_failures
+        self._multi_failures = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.stats = {
+            'snapshots': 0,
+            'tokens_requested': 0,
+            'deduplicated': 0,
+            'multi_price_calls': 0,
+            'single_price_calls': 0,
+            'missing_prices': 0,
+            'last_fetch_ms': 0.0,
+            'max_fetch_ms': 0.0,
+            'total_fetch_ms': 0.0
+        }
+
+    async def get_snapshot(self, addresses: Iterable[str]) -> PriceSnapshot:
+        """
+        Price every address in one batch
+
+        :param addresses: Token contract addresses
+        :return: PriceSnapshot with prices keyed by address
+        """
+        started_at = time.perf_counter()
+        unique = list(dict.fromkeys(a for a in addresses if a))
+        loop = asyncio.get_running_loop()
+
+        # Join requests already in flight, claim the rest
+        waiting = {}
+        to_fetch = []
+        for address in unique:
+            future = self._inflight.get(address)
+            if future is not None:
+                self.stats['deduplicated'] += 1
+            else:
+                future = loop.create_future()
+                self._inflight[address] = future
+                to_fetch.append(address)
+            waiting[address] = future
+
+        fetched = {}
+        try:
+            if to_fetch:
+                fetched = await self._fetch_prices(to_fetch)
+        except Exception as e:
+            logger.error(f"Error fetching price snapshot: {e}")
+        finally:
+            # Always resolve our claims so joined callers never hang
+            for address in to_fetch:
+                future = self._inflight.pop(address, None)
+                if future is not None and not future.done():
+                    future.set_result(fetched.get(address))
+
+        results = await asyncio.gather(*waiting.values())
+        prices = {address: price for address, price in zip(waiting, results) if price}
+        missing = [address for address in unique if address not in prices]
+
+        fetch_ms = (time.perf_counter() - started_at) * 1000
+        self.stats['snapshots'] += 1
+        self.stats['tokens_requested'] += len(unique)
+        self.stats['missing_prices'] += len(missing)
+        self.stats['last_fetch_ms'] = fetch_ms
+        self.stats['max_fetch_ms'] = max(self.stats['max_fetch_ms'], fetch_ms)
+        self.stats['total_fetch_ms'] += fetch_ms
+
+        if missing:
+            logger.warning(f"No price for {len(missing)} of {len(unique)} tokens in snapshot")
+
+        return PriceSnapshot(time.time(), started_at, prices, missing, fetch_ms)
+
+    async def _fetch_prices(self, addresses: List[str]) -> Dict[str, float]:
+        """Fetch prices, multi-address endpoint first"""
+        prices = {}
+
+        if self.use_multi_price:
+            self.stats['multi_price_calls'] += 1
+            data = await self.birdeye_api.get_multi_price(addresses, priority=PRIORITY_EXIT)
+            for address, item in data.items():
+                price = self._to_price(item)
+                if price:
+                    prices[address] = price
+
+            if data:
+                self._multi_failures = 0
+                # The endpoint answered; tokens it has no price for stay missing
+                return prices
+
+            self._multi_failures += 1
+            if self._multi_failures >= self.max_multi_failures:
+                logger.warning("Multi-price endpoint unavailable, using single-token requests")
+                self.use_multi_price = False
+
+        self.stats['single_price_calls'] += len(addresses)
+        results = await asyncio.gather(
+            *(self.birdeye_api.get_token_price(address, priority=PRIORITY_EXIT) for address in addresses),
+            return_exceptions=True
+        )
+        for address, item in zip(addresses, results):
+            if isinstance(item, Exception):
+                logger.debug(f"Price request failed for {address}: {item}")
+                continue
+            price = self._to_price(item)
+            if price:
+                prices[address] = price
+        return prices
+
+    @staticmethod
+    def _to_price(item: Optional[Dict]) -> Optional[float]:
+        """Extract a positive price from a Birdeye price record"""
+        if not item:
+            return None
+        try:
+            price = float(item.get('value') or 0)
+        except (TypeError, ValueError):
+            return None
+        return price if price > 0 else None
+
+    def get_stats(self) -> Dict:
+        """
+        Get snapshot metrics
+
+        :return: Dictionary of counters and fetch latency
+        """
+        stats = dict(self.stats)
+        snapshots = stats['snapshots']
+        stats['avg_fetch_ms'] = stats['total_fetch_ms'] / snapshots if snapshots else 0.0
+        stats['use_multi_price'] = self.use_multi_price
+        return stats
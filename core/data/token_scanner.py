@@ -8,7 +8,10 @@ import time
 from typing import Dict, List, Optional, Set
 from datetime import datetime, timedelta
 from core.data.market_data import BirdeyeAPI, MarketDataAggregator
+from core.data.discovery import DiscoveryEngine, build_default_sources
 from core.analysis.token_analyzer import TokenAnalyzer
+from core.storage.write_queue import get_write_queue
+from core.storage.snapshot_store import DEFAULT_ROOT, get_snapshot_store
 from utils.helpers import fetch_with_retries
 
 logger = logging.getLogger(__name__)
@@ -20,51 +23,44 @@ class TokenScanner:
     """
     
     async def start_scanning(self):
-        """Start the token scanning loop"""
-        logger.info("Token scanner started - scanning every %d seconds", self.scan_interval)
+        """
+        Run discovery standalone: analyze streamed candidates and store promising ones
         
-        while True:
-            try:
-                # Discover new tokens
-                logger.info("Scanning for new tokens...")
-                
-                # Get top gainers
-                if hasattr(self, 'birdeye_api') and self.birdeye_api:
-                    try:
-                        tokens = await self.birdeye_api.get_token_list(limit=10)
-                        if tokens:
-                            logger.info(f"Found {len(tokens)} tokens from Birdeye")
-                            
-                            # Analyze each token
-                            for token in tokens:
-                                try:
-                                    # Skip if already processing
-                                    address = token.get('address', '')
-                                    if not address:
-                                        continue
-                                    
-                                    # Analyze token
-                                    if self.token_analyzer:
-                                        analysis = await self.token_analyzer.analyze(token)
-                                        
-                                        # Store in database if good
-                                        if analysis.get('score', 0) > 0.5:
-                                            if self.db:
-                                                self.db.store_token(token)
-                                            logger.info(f"Found promising token: {token.get('symbol')} (score: {analysis.get('score', 0):.2f})")
-                                    
-                                except Exception as e:
-                                    logger.error(f"Error analyzing token: {e}")
-                                    
-                    except Exception as e:
-                        logger.error(f"Error getting tokens: {e}")
-                
-                # Wait before next scan
-                await asyncio.sleep(self.scan_interval)
-                
-            except Exception as e:
-                logger.error(f"Scanner error: {e}")
-                await asyncio.sleep(10)  # Wait 10 seconds on error
+        The trading bot consumes ``self.discovery`` directly instead; run only
+        one consumer per engine.
+        """
+        discovery = self.discovery
+        snapshots = (get_snapshot_store(self.config.get('snapshot_dir', DEFAULT_ROOT))
+                     if self.config.get('record_snapshots', False) else None)
+        await discovery.start()
+        logger.info("Token scanner started on the discovery stream")
+        
+        try:
+            async for event in discovery:
+                try:
+                    token = event.token
+                    if snapshots:
+                        snapshots.record_token(token)
+                    
+                    # Analyze token
+                    if self.token_analyzer:
+                        analysis = await self.token_analyzer.analyze(token)
+                        
+                        # Store in database if good
+                        if analysis.get('score', 0) > 0.5:
+                            db = getattr(self, 'db', None)
+                            if db:
+                                get_write_queue(db).enqueue_token(token)
+                            logger.info(f"Found promising token: {token.get('symbol')} (score: {analysis.get('score', 0):.2f})")
+                    
+                    discovery.record_decision(event)
+                    
+                except Exception as e:
+                    logger.error(f"Error analyzing token: {e}")
+        finally:
+            await discovery.stop()
+            if snapshots:
+                snapshots.flush()
 
     def __init__(self, config: Dict, token_analyzer: TokenAnalyzer, birdeye_api_key: Optional[str] = None):
         """
@@ -84,6 +80,10 @@ class TokenScanner:
         self.last_scan_time = 0
         self.scan_interval = config.get('scan_interval', 60)  # seconds
         
+        # Built once; its clients borrow the shared pooled HTTP session
+        self.aggregator = MarketDataAggregator(self.birdeye_api_key)
+        self._discovery = None
+        
         # Initialize Birdeye API if key provided
         if self.birdeye_api_key:
             self.birdeye_api = BirdeyeAPI(self.birdeye_api_key)
@@ -91,14 +91,25 @@ class TokenScanner:
         else:
             logger.warning("TokenScanner initialized without Birdeye API key")
             
+    @property
+    def discovery(self) -> DiscoveryEngine:
+        """Streaming discovery over Birdeye and DexScreener (created on first use)"""
+        if self._discovery is None:
+            self._discovery = DiscoveryEngine(
+                build_default_sources(self.birdeye_api, self.aggregator.dexscreener, self.config),
+                queue_size=self.config.get('discovery_queue_size', 100),
+                rediscover_after=self.config.get('discovery_rediscover_after', 900),
+                max_event_age=self.config.get('discovery_max_event_age', 300)
+            )
+        return self._discovery
+        
     async def scan_for_tokens(self) -> List[Dict]:
         """Scan for potential tokens using Birdeye v3 API and fallbacks"""
         logger.info("Scanning for tokens...")
         
         try:
             # Use MarketDataAggregator for better reliability
-            aggregator = MarketDataAggregator(self.birdeye_api_key)
-            discovered_tokens = await aggregator.discover_tokens(max_tokens=50)
+            discovered_tokens = await self.aggregator.discover_tokens(max_tokens=50)
             
             if not discovered_tokens:
                 logger.warning("No tokens found from primary sources")
@@ -0,0 +1,230 @@
+"""
+Persistent SQLite connection manager shared by the bot, scanner and monitors
+"""
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every connection. WAL lets readers run while the single
+# writer commits, and NORMAL synchronous is durable across application crashes
+# (only an OS crash can roll back the last transactions).
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,       # 16 MB page cache per connection
+    'temp_store': 'MEMORY',
+    'mmap_size': 134217728,     # 128 MB memory-mapped reads
+    'foreign_keys': 'OFF',
+}
+
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_READER_POOL_SIZE = 4
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+
+
+def connect(db_path: str, read_only: bool = False,
+            busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+            cached_statements: int = DEFAULT_STATEMENT_CACHE_SIZE) -> sqlite3.Connection:
+    """
+    Open a single tuned connection to the database
+
+    Used directly by the standalone monitors and dashboards, which open and
+    close their own connections but still need WAL and a busy timeout so they
+    never fail with "database is locked" while the bot is writing.
+
+    :param db_path: Path to SQLite database file
+    :param read_only: Open the connection in query-only mode
+    :param busy_timeout_ms: How long to wait on a locked database
+    :param cached_statements: Size of the per-connection prepared statement cache
+    :return: Configured sqlite3 connection
+    """
+    conn = sqlite3.connect(
+        db_path,
+        timeout=busy_timeout_ms / 1000.0,
+        check_same_thread=False,
+        cached_statements=cached_statements
+    )
+    _apply_pragmas(conn, busy_timeout_ms, read_only)
+    return conn
+
+
+def _apply_pragmas(conn: sqlite3.Connection, busy_timeout_ms: int, read_only: bool):
+    """Apply the standard pragmas to a freshly opened connection"""
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    for name, value in DEFAULT_PRAGMAS.items():
+        if read_only and name == 'journal_mode':
+            # journal_mode is persistent in the file; readers just inherit it
+            continue
+        try:
+            cursor.execute(f"PRAGMA {name} = {value}")
+        except sqlite3.DatabaseError as e:
+            logger.debug(f"Could not apply PRAGMA {name}: {e}")
+    if read_only:
+        cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+
+
+class SQLiteConnectionManager:
+    """
+    Thread-safe owner of one writer connection and a small pool of readers
+
+    SQLite allows a single writer at a time, so all writes are serialized on
+    one long-lived connection behind a lock. Reads are served from a pool of
+    query-only connections which, thanks to WAL, never block on the writer.
+    Keeping connections open means the schema is parsed once and sqlite3's
+    per-connection statement cache is actually reused between calls.
+    """
+
+    def __init__(self, db_path: str, reader_pool_size: int = DEFAULT_READER_POOL_SIZE,
+                 busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS):
+        """
+        Initialize the connection manager
+
+        :param db_path: Path to SQLite database file
+        :param reader_pool_size: Maximum number of pooled reader connections
+        :param busy_timeout_ms: How long to wait on a locked database
+        """
+        self.db_path = db_path
+        self.reader_pool_size = max(1, reader_pool_size)
+        self.busy_timeout_ms = busy_timeout_ms
+
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._write_lock = threading.RLock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_depth = 0
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._closed = False
+
+    def _get_writer(self) -> sqlite3.Connection:
+        """Open the writer connection on first use"""
+        if self._writer is None:
+            self._writer = connect(self.db_path, busy_timeout_ms=self.busy_timeout_ms)
+            logger.debug(f"Opened writer connection to {self.db_path}")
+        return self._writer
+
+    @contextmanager
+    def writer(self):
+        """
+        Borrow the writer connection inside a transaction
+
+        Commits when the block exits normally and rolls back on error.
+        Nested use from the same thread joins the outer transaction.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection manager is closed")
+
+        with self._write_lock:
+            conn = self._get_writer()
+            self._write_depth += 1
+            try:
+                yield conn
+                if self._write_depth == 1:
+                    conn.commit()
+            except Exception:
+                if self._write_depth == 1:
+                    conn.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+
+    @contextmanager
+    def reader(self):
+        """Borrow a pooled query-only connection"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection manager is closed")
+
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        """Take an idle reader, opening a new one while under the pool limit"""
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._reader_lock:
+            if self._reader_count < self.reader_pool_size:
+                self._reader_count += 1
+                return connect(self.db_path, read_only=True, busy_timeout_ms=self.busy_timeout_ms)
+
+        # Pool exhausted - wait for another thread to return a reader
+        return self._readers.get(timeout=self.busy_timeout_ms / 1000.0)
+
+    def _release_reader(self, conn: sqlite3.Connection):
+        """Return a reader to the pool, ending any implicit read transaction"""
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._readers.put(conn)
+
+    def checkpoint(self, mode: str = 'PASSIVE'):
+        """
+        Fold the WAL file back into the main database
+
+        :param mode: PASSIVE, FULL, RESTART or TRUNCATE
+        """
+        with self._write_lock:
+            self._get_writer().execute(f"PRAGMA wal_checkpoint({mode})")
+
+    def close(self):
+        """Close the writer and every pooled reader"""
+        self._closed = True
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self._writer.execute("PRAGMA optimize")
+                except sqlite3.DatabaseError:
+                    pass
+                self._writer.close()
+                self._writer = None
+
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self._reader_count = 0
+        logger.debug(f"Closed connections to {self.db_path}")
+
+
+# One manager per database file for the whole process
+_managers: Dict[str, SQLiteConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str, **kwargs) -> SQLiteConnectionManager:
+    """Get or create the shared connection manager for a database file"""
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None or manager._closed:
+            manager = SQLiteConnectionManager(db_path, **kwargs)
+            _managers[key] = manager
+        return manager
+
+
+def close_all_connections():
+    """Close every shared connection manager (call on shutdown)"""
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.close()
+        _managers.clear()
@@ -1,8 +1,16 @@
 import os
+import json
 import sqlite3
 import logging
-import pandas as pd
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+
+from core.storage.connection_pool import get_connection_manager
+from core.storage.migrations import migrate
+from core.storage.query_audit import audit_queries
+from utils.lazy import lazy_import
+
+# Only the DataFrame helpers need pandas; import it when one first runs
+pd = lazy_import('pandas')
 
 # Set up timezone
 UTC = timezone.utc
@@ -15,106 +23,170 @@ class Database:
     Database class for storing token information and trades
     """
     
-    def __init__(self, db_path='data/sol_bot.db'):
+    def __init__(self, db_path='data/sol_bot.db', reader_pool_size=4):
         """
         Initialize database connection
         
         :param db_path: Path to SQLite database file
+        :param reader_pool_size: Number of pooled read-only connections
         """
         self.db_path = db_path
+        
+        # Long-lived writer + reader pool shared with every other Database
+        # instance pointing at the same file
+        self.pool = get_connection_manager(db_path, reader_pool_size=reader_pool_size)
+        self._token_columns = None
         self._initialize_db()
         
     def _initialize_db(self):
         """
-        Initialize database tables
+        Initialize database tables by applying any pending schema migrations
         """
         # Create data directory if it doesn't exist
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        # Check if the database exists
-        db_exists = os.path.exists(self.db_path)
-        
-        # Create database connection
-        conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
             
-            # If database exists, check if we need to upgrade the schema
-            if db_exists:
-                # Check if we need to add new columns to trades table
-                cursor.execute("PRAGMA table_info(trades)")
-                columns = [info[1] for info in cursor.fetchall()]
-                
-                if 'gain_loss_sol' not in columns:
-                    logger.info("Upgrading database schema: Adding gain_loss_sol column to trades table")
-                    cursor.execute("ALTER TABLE trades ADD COLUMN gain_loss_sol REAL DEFAULT 0.0")
-                
-                if 'percentage_change' not in columns:
-                    logger.info("Upgrading database schema: Adding percentage_change column to trades table")
-                    cursor.execute("ALTER TABLE trades ADD COLUMN percentage_change REAL DEFAULT 0.0")
-                
-                if 'price_multiple' not in columns:
-                    logger.info("Upgrading database schema: Adding price_multiple column to trades table")
-                    cursor.execute("ALTER TABLE trades ADD COLUMN price_multiple REAL DEFAULT 1.0")
-                    
-                conn.commit()
-            
-            # Create tokens table if it doesn't exist
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tokens (
-                contract_address TEXT PRIMARY KEY,
-                ticker TEXT,
-                name TEXT,
-                launch_date TEXT,
-                safety_score REAL,
-                volume_24h REAL,
-                price_usd REAL,
-                liquidity_usd REAL,
-                mcap REAL,
-                holders INTEGER,
-                liquidity_locked BOOLEAN,
-                last_updated TEXT
-            )
-            ''')
-            
-            # Create trades table with new columns for gain/loss tracking
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                contract_address TEXT,
-                action TEXT,
-                amount REAL,
-                price REAL,
-                timestamp TEXT,
-                tx_hash TEXT,
-                gain_loss_sol REAL DEFAULT 0.0,
-                percentage_change REAL DEFAULT 0.0,
-                price_multiple REAL DEFAULT 1.0
-            )
-            ''')
-            
-            # Create social_mentions table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS social_mentions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                contract_address TEXT,
-                platform TEXT,
-                post_id TEXT,
-                author TEXT,
-                content TEXT,
-                timestamp TEXT,
-                engagement_score REAL
-            )
-            ''')
-            
-            conn.commit()
-            logger.info("Database tables initialized")
+                # Bring the schema up to date (tables, added columns, indexes)
+                applied = migrate(conn)
+                if applied:
+                    logger.info(f"Database schema migrated to version {applied[-1]}")
+
+                # Backfill the ledger the first time it is created on an existing database
+                ledger_empty = cursor.execute("SELECT 1 FROM position_ledger LIMIT 1").fetchone() is None
+                has_trades = cursor.execute("SELECT 1 FROM trades LIMIT 1").fetchone() is not None
+                if ledger_empty and has_trades:
+                    logger.info("Building position ledger from trade history")
+                    self._write_position_ledger(cursor, self._compute_position_ledger(cursor))
+
+                logger.info("Database tables initialized")
         
         except Exception as e:
             logger.error(f"Database initialization error: {e}")
+
+    def _get_token_columns(self, conn):
+        """
+        Get the column names of the tokens table (cached after first lookup)
         
-        finally:
-            conn.close()
+        :param conn: Open database connection
+        :return: Set of column names
+        """
+        if self._token_columns is None:
+            cursor = conn.execute("PRAGMA table_info(tokens)")
+            self._token_columns = {info[1] for info in cursor.fetchall()}
+        return self._token_columns
+
+    def _apply_trade_to_ledger(self, cursor, trade_id, contract_address, action, amount, price, timestamp, gain_loss_sol):
+        """
+        Fold a single trade into the position ledger
+
+        :param cursor: Cursor on the writer connection (inside the trade's transaction)
+        :param trade_id: Row id of the trade just inserted
+        :param contract_address: Token contract address
+        :param action: Trade action (BUY/SELL), already upper-cased
+        :param amount: Trade amount in SOL
+        :param price: Token price
+        :param timestamp: Trade timestamp
+        :param gain_loss_sol: Realized profit/loss for SELL trades
+        """
+        is_buy = action == 'BUY'
+        is_sell = action == 'SELL'
+        bought = amount if is_buy else 0.0
+        sold = amount if is_sell else 0.0
+        buy_cost = amount * price if is_buy else 0.0
+        realized = (gain_loss_sol or 0.0) if is_sell else 0.0
+
+        cursor.execute('''
+        INSERT INTO position_ledger (
+            contract_address, total_bought, total_sold, buy_cost, net_amount,
+            avg_entry_price, first_entry_time, realized_pnl_sol, trade_count,
+            last_trade_id, last_updated
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+        ON CONFLICT(contract_address) DO UPDATE SET
+            total_bought = total_bought + excluded.total_bought,
+            total_sold = total_sold + excluded.total_sold,
+            buy_cost = buy_cost + excluded.buy_cost,
+            net_amount = (total_bought + excluded.total_bought) - (total_sold + excluded.total_sold),
+            avg_entry_price = CASE
+                WHEN total_bought + excluded.total_bought > 0
+                THEN (buy_cost + excluded.buy_cost) / (total_bought + excluded.total_bought)
+                ELSE 0.0 END,
+            first_entry_time = COALESCE(first_entry_time, excluded.first_entry_time),
+            realized_pnl_sol = realized_pnl_sol + excluded.realized_pnl_sol,
+            trade_count = trade_count + 1,
+            last_trade_id = excluded.last_trade_id,
+            last_updated = excluded.last_updated
+        ''', (
+            contract_address, bought, sold, buy_cost, bought - sold,
+            price if is_buy else 0.0, timestamp if is_buy else None, realized,
+            trade_id, timestamp
+        ))
+
+    def _compute_position_ledger(self, cursor):
+        """
+        Recompute the position ledger from the full trades table
+
+        :param cursor: Open database cursor
+        :return: Dictionary of ledger rows keyed by contract address
+        """
+        cursor.execute('''
+        SELECT
+            contract_address,
+            SUM(CASE WHEN action = 'BUY' THEN amount ELSE 0.0 END),
+            SUM(CASE WHEN action = 'SELL' THEN amount ELSE 0.0 END),
+            SUM(CASE WHEN action = 'BUY' THEN amount * price ELSE 0.0 END),
+            MIN(CASE WHEN action = 'BUY' THEN timestamp END),
+            SUM(CASE WHEN action = 'SELL' THEN COALESCE(gain_loss_sol, 0.0) ELSE 0.0 END),
+            COUNT(*),
+            MAX(id),
+            MAX(timestamp)
+        FROM trades
+        WHERE contract_address IS NOT NULL
+        GROUP BY contract_address
+        ''')
+
+        ledger = {}
+        for (contract, bought, sold, buy_cost, first_entry, realized,
+             trade_count, last_id, last_ts) in cursor.fetchall():
+            bought = bought or 0.0
+            sold = sold or 0.0
+            buy_cost = buy_cost or 0.0
+            ledger[contract] = {
+                'contract_address': contract,
+                'total_bought': bought,
+                'total_sold': sold,
+                'buy_cost': buy_cost,
+                'net_amount': bought - sold,
+                'avg_entry_price': buy_cost / bought if bought > 0 else 0.0,
+                'first_entry_time': first_entry,
+                'realized_pnl_sol': realized or 0.0,
+                'trade_count': trade_count,
+                'last_trade_id': last_id,
+                'last_updated': last_ts
+            }
+        return ledger
+
+    def _write_position_ledger(self, cursor, ledger):
+        """
+        Replace the contents of the position ledger
+
+        :param cursor: Cursor on the writer connection
+        :param ledger: Dictionary of ledger rows keyed by contract address
+        """
+        cursor.execute("DELETE FROM position_ledger")
+        cursor.executemany('''
+        INSERT INTO position_ledger (
+            contract_address, total_bought, total_sold, buy_cost, net_amount,
+            avg_entry_price, first_entry_time, realized_pnl_sol, trade_count,
+            last_trade_id, last_updated
+        ) VALUES (
+            :contract_address, :total_bought, :total_sold, :buy_cost, :net_amount,
+            :avg_entry_price, :first_entry_time, :realized_pnl_sol, :trade_count,
+            :last_trade_id, :last_updated
+        )
+        ''', list(ledger.values()))
 
     def record_trade(self, contract_address, action, amount, price, tx_hash=None, gain_loss_sol=0.0, percentage_change=0.0, price_multiple=1.0):
         """
@@ -130,57 +202,58 @@ class Database:
         :param price_multiple: Price multiple for SELL trades (current_price / buy_price)
         :return: True if operation successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
-            
-            timestamp = datetime.now(UTC).isoformat()
-            
-            # For SELL trades, calculate gain/loss metrics if not provided
-            if action.upper() == 'SELL' and (gain_loss_sol == 0.0 or percentage_change == 0.0 or price_multiple == 1.0):
-                # Find the corresponding BUY trade
-                cursor.execute('''
-                SELECT amount, price FROM trades 
-                WHERE contract_address = ? AND action = 'BUY' 
-                ORDER BY timestamp ASC LIMIT 1
-                ''', (contract_address,))
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+            
+                timestamp = datetime.now(UTC).isoformat()
+            
+                # For SELL trades, calculate gain/loss metrics if not provided
+                if action.upper() == 'SELL' and (gain_loss_sol == 0.0 or percentage_change == 0.0 or price_multiple == 1.0):
+                    # Find the corresponding BUY trade
+                    cursor.execute('''
+                    SELECT amount, price FROM trades 
+                    WHERE contract_address = ? AND action = 'BUY' 
+                    ORDER BY timestamp ASC LIMIT 1
+                    ''', (contract_address,))
                 
-                buy_trade = cursor.fetchone()
+                    buy_trade = cursor.fetchone()
                 
-                if buy_trade:
-                    buy_amount, buy_price = buy_trade
+                    if buy_trade:
+                        buy_amount, buy_price = buy_trade
                     
-                    # Calculate metrics
-                    if buy_price > 0:
-                        price_multiple = price / buy_price
-                        percentage_change = (price_multiple - 1) * 100
+                        # Calculate metrics
+                        if buy_price > 0:
+                            price_multiple = price / buy_price
+                            percentage_change = (price_multiple - 1) * 100
                     
-                    # Calculate gain/loss in SOL
-                    buy_value = buy_amount * buy_price
-                    sell_value = amount * price
-                    gain_loss_sol = sell_value - buy_value
-            
-            cursor.execute('''
-            INSERT INTO trades (
-                contract_address, action, amount, price, timestamp, tx_hash,
-                gain_loss_sol, percentage_change, price_multiple
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                contract_address, action.upper(), amount, price, timestamp, tx_hash,
-                gain_loss_sol, percentage_change, price_multiple
-            ))
-            
-            conn.commit()
-            
-            return True
+                        # Calculate gain/loss in SOL
+                        buy_value = buy_amount * buy_price
+                        sell_value = amount * price
+                        gain_loss_sol = sell_value - buy_value
+            
+                cursor.execute('''
+                INSERT INTO trades (
+                    contract_address, action, amount, price, timestamp, tx_hash,
+                    gain_loss_sol, percentage_change, price_multiple
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    contract_address, action.upper(), amount, price, timestamp, tx_hash,
+                    gain_loss_sol, percentage_change, price_multiple
+                ))
+
+                # Update the position ledger in the same transaction
+                self._apply_trade_to_ledger(
+                    cursor, cursor.lastrowid, contract_address, action.upper(),
+                    amount, price, timestamp, gain_loss_sol
+                )
+
+                return True
         
         except Exception as e:
             logger.error(f"Error recording trade for {contract_address}: {e}")
             return False
-        
-        finally:
-            conn.close()
-            
+
     def store_token(self, token_data=None, **kwargs):
         """
         Store token information in the database
@@ -189,56 +262,100 @@ class Database:
         :param kwargs: Individual token attributes as keyword arguments
         :return: True if operation successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
-            
-            # Handle both dictionary and keyword arguments
-            if token_data is None:
-                token_data = kwargs
-            elif kwargs:
-                # If both are provided, merge them with kwargs taking precedence
-                merged_data = token_data.copy()
-                merged_data.update(kwargs)
-                token_data = merged_data
-            
-            # Check if contract_address is present
-            if 'contract_address' not in token_data:
-                logger.error("Missing required field: contract_address")
-                return False
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+            
+                # Handle both dictionary and keyword arguments
+                if token_data is None:
+                    token_data = kwargs
+                elif kwargs:
+                    # If both are provided, merge them with kwargs taking precedence
+                    merged_data = token_data.copy()
+                    merged_data.update(kwargs)
+                    token_data = merged_data
+            
+                # Check if contract_address is present
+                if 'contract_address' not in token_data:
+                    logger.error("Missing required field: contract_address")
+                    return False
                 
-            # Set last_updated timestamp if not provided
-            if 'last_updated' not in token_data:
-                token_data['last_updated'] = datetime.now(UTC).isoformat()
-            
-            # Get column names from tokens table
-            cursor.execute("PRAGMA table_info(tokens)")
-            columns = [info[1] for info in cursor.fetchall()]
+                # Set last_updated timestamp if not provided
+                if 'last_updated' not in token_data:
+                    token_data['last_updated'] = datetime.now(UTC).isoformat()
             
-            # Filter token_data to include only valid columns
-            filtered_data = {k: v for k, v in token_data.items() if k in columns}
+                # Filter token_data to include only valid columns
+                columns = self._get_token_columns(conn)
+                filtered_data = {k: v for k, v in token_data.items() if k in columns}
             
-            # Prepare SQL command
-            placeholders = ', '.join(['?'] * len(filtered_data))
-            columns_str = ', '.join(filtered_data.keys())
-            values = list(filtered_data.values())
+                # Prepare SQL command
+                placeholders = ', '.join(['?'] * len(filtered_data))
+                columns_str = ', '.join(filtered_data.keys())
+                values = list(filtered_data.values())
             
-            # Use INSERT OR REPLACE to handle both insert and update
-            cursor.execute(f'''
-            INSERT OR REPLACE INTO tokens ({columns_str})
-            VALUES ({placeholders})
-            ''', values)
+                # Use INSERT OR REPLACE to handle both insert and update
+                cursor.execute(f'''
+                INSERT OR REPLACE INTO tokens ({columns_str})
+                VALUES ({placeholders})
+                ''', values)
             
-            conn.commit()
-            return True
+                return True
             
         except Exception as e:
             logger.error(f"Error storing token data for {token_data.get('contract_address', 'unknown')}: {e}")
             return False
-            
-        finally:
-            conn.close()
-    
+
+    def store_tokens(self, tokens):
+        """
+        Store many tokens in a single transaction
+
+        Rows are grouped by their column set so each group is one executemany.
+        A group that fails to bind is retried row by row so one bad token
+        cannot drop the rest of the batch.
+
+        :param tokens: Iterable of token data dictionaries
+        :return: Number of tokens written
+        """
+        written = 0
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                columns = self._get_token_columns(conn)
+                timestamp = datetime.now(UTC).isoformat()
+
+                groups = {}
+                for token_data in tokens:
+                    if 'contract_address' not in token_data:
+                        logger.error("Missing required field: contract_address")
+                        continue
+                    filtered_data = {k: v for k, v in token_data.items() if k in columns}
+                    filtered_data.setdefault('last_updated', timestamp)
+                    groups.setdefault(tuple(filtered_data), []).append(tuple(filtered_data.values()))
+
+                for group_columns, rows in groups.items():
+                    sql = f'''
+                    INSERT OR REPLACE INTO tokens ({', '.join(group_columns)})
+                    VALUES ({', '.join(['?'] * len(group_columns))})
+                    '''
+                    try:
+                        cursor.executemany(sql, rows)
+                        written += len(rows)
+                    except sqlite3.Error:
+                        # Rows before the bad one were applied; REPLACE makes the retry idempotent
+                        address_index = group_columns.index('contract_address')
+                        for row in rows:
+                            try:
+                                cursor.execute(sql, row)
+                                written += 1
+                            except sqlite3.Error as e:
+                                logger.error(f"Error storing token data for {row[address_index]}: {e}")
+
+                return written
+
+        except Exception as e:
+            logger.error(f"Error storing token batch: {e}")
+            return 0
+
     def get_token(self, contract_address):
         """
         Get token information from the database
@@ -246,31 +363,27 @@ class Database:
         :param contract_address: Token contract address
         :return: Token data as dictionary, or None if not found
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
             
-            cursor.execute("SELECT * FROM tokens WHERE contract_address = ?", (contract_address,))
-            row = cursor.fetchone()
+                cursor.execute("SELECT * FROM tokens WHERE contract_address = ?", (contract_address,))
+                row = cursor.fetchone()
             
-            if row:
-                # Get column names
-                cursor.execute("PRAGMA table_info(tokens)")
-                columns = [info[1] for info in cursor.fetchall()]
+                if row:
+                    # Column names come from the cursor, no schema round-trip
+                    columns = [col[0] for col in cursor.description]
                 
-                # Create dictionary from row data
-                token_data = {columns[i]: row[i] for i in range(len(columns))}
-                return token_data
-            else:
-                return None
+                    # Create dictionary from row data
+                    token_data = {columns[i]: row[i] for i in range(len(columns))}
+                    return token_data
+                else:
+                    return None
                 
         except Exception as e:
             logger.error(f"Error fetching token data for {contract_address}: {e}")
             return None
-            
-        finally:
-            conn.close()
-    
+
     def get_trade_history(self, contract_address=None, limit=None):
         """
         Get trade history from the database
@@ -279,109 +392,155 @@ class Database:
         :param limit: Maximum number of trades to return (optional)
         :return: List of trade records as dictionaries
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
             
-            query = "SELECT * FROM trades"
-            params = []
+                query = "SELECT * FROM trades"
+                params = []
             
-            if contract_address:
-                query += " WHERE contract_address = ?"
-                params.append(contract_address)
+                if contract_address:
+                    query += " WHERE contract_address = ?"
+                    params.append(contract_address)
                 
-            query += " ORDER BY timestamp DESC"
+                query += " ORDER BY timestamp DESC"
             
-            if limit and isinstance(limit, int) and limit > 0:
-                query += " LIMIT ?"
-                params.append(limit)
+                if limit and isinstance(limit, int) and limit > 0:
+                    query += " LIMIT ?"
+                    params.append(limit)
                 
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            # Get column names
-            cursor.execute("PRAGMA table_info(trades)")
-            columns = [info[1] for info in cursor.fetchall()]
-            
-            # Create list of dictionaries
-            trades = []
-            for row in rows:
-                trade_data = {columns[i]: row[i] for i in range(len(columns))}
-                trades.append(trade_data)
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+            
+                # Get column names
+                columns = [col[0] for col in cursor.description]
+            
+                # Create list of dictionaries
+                trades = []
+                for row in rows:
+                    trade_data = {columns[i]: row[i] for i in range(len(columns))}
+                    trades.append(trade_data)
                 
-            return trades
+                return trades
                 
         except Exception as e:
             logger.error(f"Error fetching trade history: {e}")
             return []
-            
-        finally:
-            conn.close()
 
     def get_active_orders(self):
         """
         Get active orders (open positions) as a DataFrame
         
+        Served from the position ledger, so the cost is an indexed lookup over
+        open positions rather than a scan of the whole trade history.
+        
         :return: Pandas DataFrame containing active positions
         """
         try:
-            # Get all trades
-            trades = self.get_trade_history()
-            if not trades:
-                return pd.DataFrame()  # Return empty DataFrame if no trades
+            with self.pool.reader() as conn:
+                # Older token tables may not carry the ticker/name columns
+                token_columns = self._get_token_columns(conn)
+                ticker_expr = "COALESCE(t.ticker, 'UNKNOWN')" if 'ticker' in token_columns else "'UNKNOWN'"
+                name_expr = "COALESCE(t.name, 'UNKNOWN')" if 'name' in token_columns else "'UNKNOWN'"
                 
-            # Convert to pandas DataFrame for easier manipulation
-            df = pd.DataFrame(trades)
+                df = pd.read_sql_query(f'''
+                SELECT
+                    l.contract_address,
+                    {ticker_expr} AS ticker,
+                    {name_expr} AS name,
+                    l.net_amount AS amount,
+                    l.avg_entry_price AS buy_price,
+                    l.first_entry_time AS entry_time
+                FROM position_ledger l
+                LEFT JOIN tokens t ON t.contract_address = l.contract_address
+                WHERE l.net_amount > 0
+                ORDER BY l.contract_address
+                ''', conn)
+            
+            if df.empty:
+                # Return empty DataFrame if no active positions
+                return pd.DataFrame()
+            return df
             
-            # Process only if we have data
-            if not df.empty:
-                # Create dictionary to track positions by contract address
-                positions = {}
+        except Exception as e:
+            logger.error(f"Error getting active orders: {e}")
+            return pd.DataFrame()  # Return empty DataFrame on error
+
+    def rebuild_position_ledger(self, verify_only=False, tolerance=1e-9):
+        """
+        Recompute the position ledger from the trades table and report drift
+        
+        :param verify_only: Only compare, leave the stored ledger untouched
+        :param tolerance: Relative tolerance for comparing amounts and prices
+        :return: Dictionary with drift details and whether the ledger was rebuilt
+        """
+        numeric_fields = ['total_bought', 'total_sold', 'buy_cost', 'net_amount',
+                          'avg_entry_price', 'realized_pnl_sol', 'trade_count']
+        report = {
+            'positions_checked': 0,
+            'missing': [],
+            'unexpected': [],
+            'drift': [],
+            'rebuilt': False
+        }
+        
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                expected = self._compute_position_ledger(cursor)
                 
-                # Group by contract address
-                for contract, group in df.groupby('contract_address'):
-                    buys = group[group['action'] == 'BUY']
-                    sells = group[group['action'] == 'SELL']
-                    
-                    # Calculate total buy and sell amounts
-                    total_bought = buys['amount'].sum()
-                    total_sold = sells['amount'].sum()
-                    
-                    # Only include positions where we still have tokens (bought > sold)
-                    if total_bought > total_sold:
-                        # Calculate the remaining position
-                        remaining = total_bought - total_sold
-                        
-                        # Calculate average buy price
-                        weighted_prices = (buys['amount'] * buys['price']).sum()
-                        avg_buy_price = weighted_prices / total_bought if total_bought > 0 else 0
-                        
-                        # Get the token name and ticker
-                        token_info = self.get_token(contract)
-                        ticker = token_info.get('ticker', 'UNKNOWN') if token_info else 'UNKNOWN'
-                        name = token_info.get('name', 'UNKNOWN') if token_info else 'UNKNOWN'
-                        
-                        # Store in positions dictionary
-                        positions[contract] = {
+                cursor.execute("SELECT * FROM position_ledger")
+                columns = [col[0] for col in cursor.description]
+                stored = {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+                
+                report['positions_checked'] = len(expected)
+                report['missing'] = sorted(set(expected) - set(stored))
+                report['unexpected'] = sorted(set(stored) - set(expected))
+                
+                for contract in set(expected) & set(stored):
+                    for field in numeric_fields:
+                        want = expected[contract][field] or 0.0
+                        have = stored[contract][field] or 0.0
+                        if abs(want - have) > tolerance * max(1.0, abs(want)):
+                            report['drift'].append({
+                                'contract_address': contract,
+                                'field': field,
+                                'ledger': have,
+                                'expected': want
+                            })
+                    if expected[contract]['first_entry_time'] != stored[contract]['first_entry_time']:
+                        report['drift'].append({
                             'contract_address': contract,
-                            'ticker': ticker,
-                            'name': name,
-                            'amount': remaining,
-                            'buy_price': avg_buy_price,
-                            'entry_time': buys['timestamp'].min()
-                        }
+                            'field': 'first_entry_time',
+                            'ledger': stored[contract]['first_entry_time'],
+                            'expected': expected[contract]['first_entry_time']
+                        })
                 
-                # Convert positions to DataFrame
-                if positions:
-                    positions_df = pd.DataFrame(list(positions.values()))
-                    return positions_df
-                    
-            # Return empty DataFrame if no active positions
-            return pd.DataFrame()
+                has_drift = report['missing'] or report['unexpected'] or report['drift']
+                if has_drift:
+                    logger.warning(f"Position ledger drift: {len(report['drift'])} field mismatches, "
+                                   f"{len(report['missing'])} missing, {len(report['unexpected'])} unexpected")
+                
+                if not verify_only:
+                    self._write_position_ledger(cursor, expected)
+                    report['rebuilt'] = True
+            
+            return report
             
         except Exception as e:
-            logger.error(f"Error getting active orders: {e}")
-            return pd.DataFrame()  # Return empty DataFrame on error
+            logger.error(f"Error rebuilding position ledger: {e}")
+            report['error'] = str(e)
+            return report
+
+    def audit_query_plans(self, names=None):
+        """
+        Check the registered queries for full table scans
+        
+        :param names: Only audit these query names (optional)
+        :return: List of audit results (see core.storage.query_audit)
+        """
+        with self.pool.reader() as conn:
+            return audit_queries(conn, names)
 
     def get_tokens(self, limit=None, min_safety_score=None):
         """
@@ -391,34 +550,31 @@ class Database:
         :param min_safety_score: Minimum safety score filter (optional)
         :return: DataFrame of tokens
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            query = "SELECT * FROM tokens"
-            params = []
-            
-            # Add safety score filter if provided
-            if min_safety_score is not None:
-                query += " WHERE safety_score >= ?"
-                params.append(min_safety_score)
+            with self.pool.reader() as conn:
+                query = "SELECT * FROM tokens"
+                params = []
+            
+                # Add safety score filter if provided
+                if min_safety_score is not None:
+                    query += " WHERE safety_score >= ?"
+                    params.append(min_safety_score)
                 
-            # Add ordering by last updated
-            query += " ORDER BY last_updated DESC"
+                # Add ordering by last updated
+                query += " ORDER BY last_updated DESC"
             
-            # Add limit if provided
-            if limit and isinstance(limit, int) and limit > 0:
-                query += " LIMIT ?"
-                params.append(limit)
+                # Add limit if provided
+                if limit and isinstance(limit, int) and limit > 0:
+                    query += " LIMIT ?"
+                    params.append(limit)
                 
-            # Execute query
-            df = pd.read_sql_query(query, conn, params=params)
-            return df
+                # Execute query
+                df = pd.read_sql_query(query, conn, params=params)
+                return df
                 
         except Exception as e:
             logger.error(f"Error fetching tokens: {e}")
             return pd.DataFrame()  # Return empty DataFrame on error
-            
-        finally:
-            conn.close()
 
     def get_trading_history(self, limit=None):
         """
@@ -427,23 +583,21 @@ class Database:
         :param limit: Maximum number of trades to return (optional)
         :return: Pandas DataFrame of trade history
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            query = "SELECT * FROM trades ORDER BY timestamp DESC"
+            with self.pool.reader() as conn:
+                query = "SELECT * FROM trades ORDER BY timestamp DESC"
             
-            if limit and isinstance(limit, int) and limit > 0:
-                query += f" LIMIT {limit}"
+                if limit and isinstance(limit, int) and limit > 0:
+                    query += f" LIMIT {limit}"
                 
-            # Execute query
-            df = pd.read_sql_query(query, conn)
-            return df
+                # Execute query
+                df = pd.read_sql_query(query, conn)
+                return df
                 
         except Exception as e:
             logger.error(f"Error fetching trading history: {e}")
             return pd.DataFrame()  # Return empty DataFrame on error
-            
-        finally:
-            conn.close()
+
     def get_token_info(self, contract_address):
         """
         Get token information from the database (alias for get_token)
@@ -471,53 +625,48 @@ class Database:
         :param metrics: Dictionary containing performance metrics
         :return: True if operation successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
-            
-            # Create performance_metrics table if it doesn't exist
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS performance_metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                total_trades INTEGER,
-                winning_trades INTEGER,
-                losing_trades INTEGER,
-                total_pnl_sol REAL,
-                win_rate REAL,
-                current_balance_sol REAL,
-                metrics_json TEXT
-            )
-            ''')
-            
-            timestamp = datetime.now(UTC).isoformat()
-            
-            cursor.execute('''
-            INSERT INTO performance_metrics (
-                timestamp, total_trades, winning_trades, losing_trades,
-                total_pnl_sol, win_rate, current_balance_sol, metrics_json
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                timestamp,
-                metrics.get('total_trades', 0),
-                metrics.get('winning_trades', 0),
-                metrics.get('losing_trades', 0),
-                metrics.get('total_pnl_sol', 0.0),
-                metrics.get('win_rate', 0.0),
-                metrics.get('current_balance_sol', 0.0),
-                json.dumps(metrics)
-            ))
-            
-            conn.commit()
-            return True
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+            
+                # Create performance_metrics table if it doesn't exist
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS performance_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                    total_trades INTEGER,
+                    winning_trades INTEGER,
+                    losing_trades INTEGER,
+                    total_pnl_sol REAL,
+                    win_rate REAL,
+                    current_balance_sol REAL,
+                    metrics_json TEXT
+                )
+                ''')
+            
+                timestamp = datetime.now(UTC).isoformat()
+            
+                cursor.execute('''
+                INSERT INTO performance_metrics (
+                    timestamp, total_trades, winning_trades, losing_trades,
+                    total_pnl_sol, win_rate, current_balance_sol, metrics_json
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    timestamp,
+                    metrics.get('total_trades', 0),
+                    metrics.get('winning_trades', 0),
+                    metrics.get('losing_trades', 0),
+                    metrics.get('total_pnl_sol', 0.0),
+                    metrics.get('win_rate', 0.0),
+                    metrics.get('current_balance_sol', 0.0),
+                    json.dumps(metrics)
+                ))
+            
+                return True
             
         except Exception as e:
             logger.error(f"Error saving performance metrics: {e}")
             return False
-            
-        finally:
-            conn.close()
-
 
     def save_token_analysis(self, analysis_data):
         """
@@ -526,50 +675,222 @@ class Database:
         :param analysis_data: Dictionary containing analysis results
         :return: True if operation successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
-            
-            # Create token_analysis table if it doesn't exist
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS token_analysis (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                contract_address TEXT,
-                timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                safety_score REAL,
-                buy_recommendation INTEGER,
-                risk_level TEXT,
-                analysis_json TEXT,
-                FOREIGN KEY (contract_address) REFERENCES tokens(contract_address)
-            )
-            ''')
-            
-            timestamp = datetime.now(UTC).isoformat()
-            
-            cursor.execute('''
-            INSERT INTO token_analysis (
-                contract_address, timestamp, safety_score, 
-                buy_recommendation, risk_level, analysis_json
-            ) VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                analysis_data.get('contract_address'),
-                timestamp,
-                analysis_data.get('safety_score', 0.0),
-                1 if analysis_data.get('buy_recommendation', False) else 0,
-                analysis_data.get('risk_level', 'Unknown'),
-                json.dumps(analysis_data)
-            ))
-            
-            conn.commit()
-            return True
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+            
+                # Create token_analysis table if it doesn't exist
+                cursor.execute('''
+                CREATE TABLE IF NOT EXISTS token_analysis (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    contract_address TEXT,
+                    timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                    safety_score REAL,
+                    buy_recommendation INTEGER,
+                    risk_level TEXT,
+                    analysis_json TEXT,
+                    FOREIGN KEY (contract_address) REFERENCES tokens(contract_address)
+                )
+                ''')
+            
+                timestamp = datetime.now(UTC).isoformat()
+            
+                cursor.execute('''
+                INSERT INTO token_analysis (
+                    contract_address, timestamp, safety_score, 
+                    buy_recommendation, risk_level, analysis_json
+                ) VALUES (?, ?, ?, ?, ?, ?)
+                ''', (
+                    analysis_data.get('contract_address'),
+                    timestamp,
+                    analysis_data.get('safety_score', 0.0),
+                    1 if analysis_data.get('buy_recommendation', False) else 0,
+                    analysis_data.get('risk_level', 'Unknown'),
+                    json.dumps(analysis_data)
+                ))
+            
+                return True
             
         except Exception as e:
             logger.error(f"Error saving token analysis: {e}")
             return False
-            
-        finally:
-            conn.close()
 
+    def _upsert_partial_exit_state(self, cursor, state, timestamp):
+        """
+        Write one position's partial-exit state
+
+        :param cursor: Cursor on the writer connection
+        :param state: State row (see PartialExitState.to_row)
+        :param timestamp: Update time
+        """
+        cursor.execute('''
+        INSERT INTO partial_exit_state (
+            contract_address, buy_timestamp, symbol, entry_price, initial_amount,
+            remaining_amount, executed_levels, trailing_activated, highest_price,
+            stop_price, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(contract_address, buy_timestamp) DO UPDATE SET
+            symbol = excluded.symbol,
+            entry_price = excluded.entry_price,
+            initial_amount = excluded.initial_amount,
+            remaining_amount = excluded.remaining_amount,
+            executed_levels = excluded.executed_levels,
+            trailing_activated = excluded.trailing_activated,
+            highest_price = excluded.highest_price,
+            stop_price = excluded.stop_price,
+            updated_at = excluded.updated_at
+        ''', (
+            state['contract_address'], str(state['buy_timestamp']), state.get('symbol'),
+            state.get('entry_price', 0.0), state.get('initial_amount', 0.0),
+            state.get('remaining_amount', 0.0), json.dumps(state.get('executed_levels', [])),
+            int(bool(state.get('trailing_activated', False))), state.get('highest_price', 0.0),
+            state.get('stop_price', 0.0), timestamp
+        ))
+
+    def record_partial_exit(self, exit_data, state):
+        """
+        Record a partial sell together with the position state it leaves behind
+
+        Both rows are written in one transaction, so the persisted remaining
+        size always matches the partial_exits history.
+
+        :param exit_data: Dictionary with contract_address, symbol, buy_timestamp,
+                          amount, price, profit_sol and reason
+        :param state: Position state after the sell (see PartialExitState.to_row)
+        :return: True if operation successful, False otherwise
+        """
+        try:
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
+                timestamp = datetime.now(UTC).isoformat()
+
+                cursor.execute('''
+                INSERT INTO partial_exits (
+                    contract_address, symbol, buy_timestamp,
+                    amount, price, profit_sol, reason, timestamp
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    exit_data['contract_address'],
+                    exit_data.get('symbol'),
+                    str(exit_data['buy_timestamp']),
+                    exit_data['amount'],
+                    exit_data['price'],
+                    exit_data.get('profit_sol', 0.0),
+                    exit_data.get('reason'),
+                    timestamp
+                ))
+                self._upsert_partial_exit_state(cursor, state, timestamp)
+
+                return True
+
+        except Exception as e:
+            logger.error(f"Error recording partial exit for {exit_data.get('contract_address')}: {e}")
+            return False
+
+    def save_partial_exit_state(self, state):
+        """
+        Persist a position's partial-exit state without an exit (e.g. trailing stop activation)
+
+        :param state: State row (see PartialExitState.to_row)
+        :return: True if operation successful, False otherwise
+        """
+        try:
+            with self.pool.writer() as conn:
+                self._upsert_partial_exit_state(conn.cursor(), state, datetime.now(UTC).isoformat())
+                return True
+
+        except Exception as e:
+            logger.error(f"Error saving partial exit state for {state.get('contract_address')}: {e}")
+            return False
+
+    def get_partial_exit_states(self, open_only=True):
+        """
+        Load persisted partial-exit state (used to rehydrate PartialExitManager)
+
+        :param open_only: Skip positions with nothing left to sell
+        :return: List of state rows as dictionaries
+        """
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                query = "SELECT * FROM partial_exit_state"
+                if open_only:
+                    query += " WHERE remaining_amount > 0"
+                cursor.execute(query)
+                columns = [col[0] for col in cursor.description]
+
+                states = []
+                for row in cursor.fetchall():
+                    state = dict(zip(columns, row))
+                    state['executed_levels'] = json.loads(state['executed_levels'] or '[]')
+                    state['trailing_activated'] = bool(state['trailing_activated'])
+                    states.append(state)
+                return states
+
+        except Exception as e:
+            logger.error(f"Error loading partial exit state: {e}")
+            return []
+
+    def get_partial_exit_summary(self, days=7):
+        """
+        Summarize recent partial exits
+
+        :param days: Look-back window in days
+        :return: Dictionary with total_exits, total_profit, avg_profit and unique_tokens
+        """
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                since = (datetime.now(UTC) - timedelta(days=days)).isoformat()
+                cursor.execute('''
+                SELECT
+                    COUNT(*),
+                    SUM(profit_sol),
+                    AVG(profit_sol),
+                    COUNT(DISTINCT contract_address)
+                FROM partial_exits
+                WHERE timestamp > ?
+                ''', (since,))
+                total_exits, total_profit, avg_profit, unique_tokens = cursor.fetchone()
+                return {
+                    'total_exits': total_exits or 0,
+                    'total_profit': total_profit or 0.0,
+                    'avg_profit': avg_profit or 0.0,
+                    'unique_tokens': unique_tokens or 0
+                }
+
+        except Exception as e:
+            logger.error(f"Error summarizing partial exits: {e}")
+            return {'total_exits': 0, 'total_profit': 0.0, 'avg_profit': 0.0, 'unique_tokens': 0}
+
+    def get_partial_exit_performance(self, days=30):
+        """
+        Partial-exit results grouped by exit reason
+
+        :param days: Look-back window in days
+        :return: List of dictionaries with reason, avg_profit, exit_count and total_profit
+        """
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+                since = (datetime.now(UTC) - timedelta(days=days)).isoformat()
+                cursor.execute('''
+                SELECT
+                    reason,
+                    AVG(profit_sol) AS avg_profit,
+                    COUNT(*) AS exit_count,
+                    SUM(profit_sol) AS total_profit
+                FROM partial_exits
+                WHERE timestamp > ?
+                GROUP BY reason
+                ORDER BY avg_profit DESC
+                ''', (since,))
+                columns = [col[0] for col in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+        except Exception as e:
+            logger.error(f"Error analyzing partial exits: {e}")
+            return []
 
     def reset_database(self):
         """
@@ -577,25 +898,33 @@ class Database:
         
         :return: True if successful, False otherwise
         """
-        conn = sqlite3.connect(self.db_path)
         try:
-            cursor = conn.cursor()
+            with self.pool.writer() as conn:
+                cursor = conn.cursor()
             
-            # Drop all tables
-            cursor.execute("DROP TABLE IF EXISTS tokens")
-            cursor.execute("DROP TABLE IF EXISTS trades")
-            cursor.execute("DROP TABLE IF EXISTS social_mentions")
-            conn.commit()
+                # Drop all tables
+                cursor.execute("DROP TABLE IF EXISTS tokens")
+                cursor.execute("DROP TABLE IF EXISTS trades")
+                cursor.execute("DROP TABLE IF EXISTS social_mentions")
+                cursor.execute("DROP TABLE IF EXISTS position_ledger")
+                cursor.execute("DROP TABLE IF EXISTS partial_exits")
+                cursor.execute("DROP TABLE IF EXISTS partial_exit_state")
+                cursor.execute("PRAGMA user_version = 0")
+                self._token_columns = None
             
-            # Reinitialize the database
-            self._initialize_db()
+                # Reinitialize the database
+                self._initialize_db()
             
-            logger.info("Database reset successfully")
-            return True
+                logger.info("Database reset successfully")
+                return True
             
         except Exception as e:
             logger.error(f"Error resetting database: {e}")
             return False
             
-        finally:
-            conn.close()
\ No newline at end of file
+
+    def close(self):
+        """
+        Close the pooled connections to the database file
+        """
+        self.pool.close()
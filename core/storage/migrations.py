@@ -0,0 +1,227 @@
+"""
+Versioned schema migrations for the trading database
+
+The applied schema version is stored in SQLite's ``PRAGMA user_version``.
+Every migration is written to be safe on databases created by older builds
+(which all report version 0), so an existing file is simply brought forward
+from whatever state it is actually in.
+"""
+import logging
+from collections import namedtuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+Migration = namedtuple('Migration', ['version', 'description', 'apply'])
+
+
+def _table_columns(cursor, table):
+    """Return the column names of a table (empty if the table does not exist)"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [info[1] for info in cursor.fetchall()]
+
+
+def _add_column(cursor, table, column, definition):
+    """Add a column unless the table already has it"""
+    if column not in _table_columns(cursor, table):
+        logger.info(f"Upgrading database schema: Adding {column} column to {table} table")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _create_base_schema(cursor):
+    """Create the tokens, trades and social_mentions tables"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS tokens (
+        contract_address TEXT PRIMARY KEY,
+        ticker TEXT,
+        name TEXT,
+        launch_date TEXT,
+        safety_score REAL,
+        volume_24h REAL,
+        price_usd REAL,
+        liquidity_usd REAL,
+        mcap REAL,
+        holders INTEGER,
+        liquidity_locked BOOLEAN,
+        last_updated TEXT
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contract_address TEXT,
+        action TEXT,
+        amount REAL,
+        price REAL,
+        timestamp TEXT,
+        tx_hash TEXT
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS social_mentions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contract_address TEXT,
+        platform TEXT,
+        post_id TEXT,
+        author TEXT,
+        content TEXT,
+        timestamp TEXT,
+        engagement_score REAL
+    )
+    ''')
+
+
+def _add_trade_pnl_columns(cursor):
+    """Add the gain/loss tracking columns to trades"""
+    _add_column(cursor, 'trades', 'gain_loss_sol', 'REAL DEFAULT 0.0')
+    _add_column(cursor, 'trades', 'percentage_change', 'REAL DEFAULT 0.0')
+    _add_column(cursor, 'trades', 'price_multiple', 'REAL DEFAULT 1.0')
+
+
+def _create_position_ledger(cursor):
+    """Create the per-token running totals maintained by record_trade"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS position_ledger (
+        contract_address TEXT PRIMARY KEY,
+        total_bought REAL DEFAULT 0.0,
+        total_sold REAL DEFAULT 0.0,
+        buy_cost REAL DEFAULT 0.0,
+        net_amount REAL DEFAULT 0.0,
+        avg_entry_price REAL DEFAULT 0.0,
+        first_entry_time TEXT,
+        realized_pnl_sol REAL DEFAULT 0.0,
+        trade_count INTEGER DEFAULT 0,
+        last_trade_id INTEGER,
+        last_updated TEXT
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_position_ledger_open
+    ON position_ledger(net_amount) WHERE net_amount > 0
+    ''')
+
+
+def _create_access_indexes(cursor):
+    """Indexes for the bot's and the dashboards' hot queries"""
+    # Per-token history and the first-BUY lookup in record_trade. The trailing
+    # columns make the GROUP BY contract_address rollups index-only.
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_trades_contract_cover
+    ON trades(contract_address, action, timestamp, amount, price, gain_loss_sol)
+    ''')
+    # Recent-activity windows and "latest N" feeds; covers the 24h P&L rollups
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_trades_time_action_pnl
+    ON trades(timestamp, action, gain_loss_sol)
+    ''')
+    # BUY/SELL counts and per-action time windows
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_trades_action_time
+    ON trades(action, timestamp)
+    ''')
+    # Token listings ordered by freshness and filtered by safety
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_tokens_updated
+    ON tokens(last_updated)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_tokens_safety_updated
+    ON tokens(safety_score, last_updated)
+    ''')
+
+
+def _create_partial_exit_tables(cursor):
+    """Partial-exit history plus the per-position state PartialExitManager keeps in memory"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS partial_exits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contract_address TEXT,
+        symbol TEXT,
+        buy_timestamp TIMESTAMP,
+        amount REAL,
+        price REAL,
+        profit_sol REAL,
+        reason TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_partial_exits_position
+    ON partial_exits(contract_address, buy_timestamp)
+    ''')
+    # Weekly/monthly exit statistics
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_partial_exits_time
+    ON partial_exits(timestamp, reason, profit_sol)
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS partial_exit_state (
+        contract_address TEXT NOT NULL,
+        buy_timestamp TEXT NOT NULL,
+        symbol TEXT,
+        entry_price REAL,
+        initial_amount REAL,
+        remaining_amount REAL,
+        executed_levels TEXT,
+        trailing_activated INTEGER DEFAULT 0,
+        highest_price REAL DEFAULT 0.0,
+        stop_price REAL DEFAULT 0.0,
+        updated_at TEXT,
+        PRIMARY KEY (contract_address, buy_timestamp)
+    )
+    ''')
+
+
+# Ordered list of every schema change. Append new entries, never edit old ones.
+MIGRATIONS = [
+    Migration(1, 'Base tokens, trades and social_mentions tables', _create_base_schema),
+    Migration(2, 'Gain/loss columns on trades', _add_trade_pnl_columns),
+    Migration(3, 'Position ledger', _create_position_ledger),
+    Migration(4, 'Indexes for trade and token access patterns', _create_access_indexes),
+    Migration(5, 'Partial exit history and position state', _create_partial_exit_tables),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def get_schema_version(conn):
+    """
+    Get the schema version recorded in the database file
+
+    :param conn: Open database connection
+    :return: Applied migration version (0 for unversioned databases)
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target_version=None):
+    """
+    Apply every pending migration in a single transaction
+
+    The caller owns the transaction boundary (normally the pooled writer),
+    so a failing migration rolls back together with everything before it.
+
+    :param conn: Writer connection
+    :param target_version: Stop after this version (defaults to the latest)
+    :return: List of applied migration versions
+    """
+    target_version = LATEST_VERSION if target_version is None else target_version
+    current = get_schema_version(conn)
+    pending = [m for m in MIGRATIONS if current < m.version <= target_version]
+    if not pending:
+        return []
+
+    # Python's sqlite3 only opens transactions implicitly for DML, so start
+    # one explicitly to keep the DDL below atomic
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+
+    cursor = conn.cursor()
+    for migration in pending:
+        logger.info(f"Applying schema migration {migration.version}: {migration.description}")
+        migration.apply(cursor)
+        cursor.execute(f"PRAGMA user_version = {int(migration.version)}")
+
+    return [m.version for m in pending]
@@ -0,0 +1,252 @@
+"""
+EXPLAIN QUERY PLAN audit for the queries the bot and dashboards run
+
+Queries are registered by name with representative parameters. The audit
+asks SQLite for each plan and flags any that read a whole table row by row
+("SCAN trades" with no index), which is what silently turns a 1ms dashboard
+refresh into a multi-second one once the trades table grows.
+"""
+import re
+import logging
+from collections import OrderedDict, namedtuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+AuditedQuery = namedtuple('AuditedQuery', ['name', 'sql', 'params', 'allow_scan', 'source'])
+
+_SCAN_RE = re.compile(r'^SCAN (\w+)(.*)$')
+
+_registry = OrderedDict()
+
+
+def register_query(name, sql, params=(), allow_scan=False, source=None):
+    """
+    Register a query for the plan audit
+
+    :param name: Unique query name
+    :param sql: SQL text
+    :param params: Representative bind parameters
+    :param allow_scan: Accept a full table scan (e.g. rowid order with a small LIMIT)
+    :param source: Where the query lives, for the report
+    """
+    _registry[name] = AuditedQuery(name, sql, tuple(params), allow_scan, source)
+
+
+def registered_queries():
+    """Return the registered queries in registration order"""
+    return list(_registry.values())
+
+
+def explain(conn, sql, params=()):
+    """
+    Get the query plan for a statement
+
+    :param conn: Open database connection
+    :param sql: SQL text
+    :param params: Bind parameters
+    :return: List of plan detail strings
+    """
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def _full_table_scans(plan):
+    """Names of tables (or aliases) the plan reads without any index"""
+    # CTEs and subqueries are planned as MATERIALIZE/CO-ROUTINE steps and then
+    # scanned like tables; those scans are over intermediate results
+    intermediates = {detail.split(' ', 1)[1] for detail in plan
+                     if detail.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+    scans = []
+    for detail in plan:
+        match = _SCAN_RE.match(detail)
+        if not match:
+            continue
+        name, rest = match.groups()
+        # "SCAN t USING [COVERING] INDEX ..." walks an index, not the table
+        if 'USING' in rest or name in intermediates:
+            continue
+        scans.append(name)
+    return scans
+
+
+def audit_queries(conn, names=None):
+    """
+    Run EXPLAIN QUERY PLAN for registered queries
+
+    :param conn: Open database connection
+    :param names: Only audit these query names (optional)
+    :return: List of result dictionaries, one per query
+    """
+    results = []
+    for query in registered_queries():
+        if names is not None and query.name not in names:
+            continue
+        result = {
+            'name': query.name,
+            'source': query.source,
+            'plan': [],
+            'full_scans': [],
+            'flagged': False
+        }
+        try:
+            result['plan'] = explain(conn, query.sql, query.params)
+            result['full_scans'] = _full_table_scans(result['plan'])
+            result['flagged'] = bool(result['full_scans']) and not query.allow_scan
+        except Exception as e:
+            # Missing tables/columns are reported, not fatal
+            result['error'] = str(e)
+        if result['flagged']:
+            logger.warning(f"Query '{query.name}' does a full table scan: {'; '.join(result['plan'])}")
+        results.append(result)
+    return results
+
+
+def format_report(results):
+    """
+    Render audit results as text
+
+    :param results: Output of audit_queries
+    :return: Multi-line report string
+    """
+    lines = []
+    for result in results:
+        if 'error' in result:
+            status = 'ERROR'
+        elif result['flagged']:
+            status = 'SCAN'
+        else:
+            status = 'ok'
+        source = f" ({result['source']})" if result['source'] else ''
+        lines.append(f"[{status:>5}] {result['name']}{source}")
+        if 'error' in result:
+            lines.append(f"        {result['error']}")
+        for detail in result['plan']:
+            lines.append(f"        {detail}")
+    flagged = sum(1 for r in results if r['flagged'])
+    lines.append(f"{len(results)} queries audited, {flagged} full table scan(s)")
+    return '\n'.join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Registered queries. Parameters are placeholders; only the plan shape matters.
+# ---------------------------------------------------------------------------
+
+_DB = 'core/storage/database.py'
+_MONITOR = 'monitoring/ultra_monitor_mode_aware.py'
+_DASHBOARD = 'dashboard/enhanced_ml_dashboard_v12.py'
+_ADVANCED = 'advanced_performance_dashboard.py'
+
+register_query('trade_history_by_token',
+               "SELECT * FROM trades WHERE contract_address = ? ORDER BY timestamp DESC LIMIT ?",
+               ('token', 50), source=_DB)
+register_query('trade_history_recent',
+               "SELECT * FROM trades ORDER BY timestamp DESC LIMIT ?",
+               (50,), source=_DB)
+register_query('first_buy_for_token', '''
+    SELECT amount, price FROM trades
+    WHERE contract_address = ? AND action = 'BUY'
+    ORDER BY timestamp ASC LIMIT 1
+    ''', ('token',), source=_DB)
+register_query('active_orders', '''
+    SELECT l.contract_address, t.ticker, t.name, l.net_amount, l.avg_entry_price, l.first_entry_time
+    FROM position_ledger l
+    LEFT JOIN tokens t ON t.contract_address = l.contract_address
+    WHERE l.net_amount > 0
+    ORDER BY l.contract_address
+    ''', source=_DB)
+register_query('partial_exit_states',
+               "SELECT * FROM partial_exit_state WHERE remaining_amount > 0",
+               allow_scan=True, source=_DB)
+register_query('partial_exit_summary', '''
+    SELECT COUNT(*), SUM(profit_sol), AVG(profit_sol), COUNT(DISTINCT contract_address)
+    FROM partial_exits
+    WHERE timestamp > ?
+    ''', ('2025-01-01',), source=_DB)
+register_query('partial_exit_performance', '''
+    SELECT reason, AVG(profit_sol) AS avg_profit, COUNT(*) AS exit_count, SUM(profit_sol) AS total_profit
+    FROM partial_exits
+    WHERE timestamp > ?
+    GROUP BY reason
+    ORDER BY avg_profit DESC
+    ''', ('2025-01-01',), source=_DB)
+register_query('tokens_recent',
+               "SELECT * FROM tokens ORDER BY last_updated DESC LIMIT ?",
+               (100,), source=_DB)
+register_query('tokens_by_safety',
+               "SELECT * FROM tokens WHERE safety_score >= ? ORDER BY last_updated DESC LIMIT ?",
+               (70, 100), source=_DB)
+
+register_query('monitor_net_flow', '''
+    SELECT COALESCE(SUM(CASE WHEN action = 'SELL' THEN amount
+                             WHEN action = 'BUY' THEN -amount END), 0)
+    FROM trades
+    ''', source=_MONITOR)
+register_query('monitor_open_positions', '''
+    SELECT contract_address,
+        SUM(CASE WHEN action = 'BUY' THEN amount ELSE -amount END) AS net_amount,
+        AVG(CASE WHEN action = 'BUY' THEN price END)
+    FROM trades
+    GROUP BY contract_address
+    HAVING net_amount > 0.001
+    ''', source=_MONITOR)
+register_query('monitor_trade_counts',
+               "SELECT COUNT(*) FROM trades WHERE action = 'BUY'",
+               source=_MONITOR)
+register_query('monitor_window_24h', '''
+    SELECT COUNT(*), SUM(CASE WHEN action = 'SELL' THEN gain_loss_sol ELSE 0 END)
+    FROM trades
+    WHERE timestamp > datetime('now', '-24 hours')
+    ''', source=_MONITOR)
+register_query('monitor_buys_24h', '''
+    SELECT COUNT(*) FROM trades
+    WHERE action = 'BUY' AND timestamp > datetime('now', '-24 hours')
+    ''', source=_MONITOR)
+register_query('monitor_leaderboard', '''
+    SELECT contract_address,
+        COUNT(*) AS trade_count,
+        SUM(CASE WHEN action = 'SELL' THEN gain_loss_sol ELSE 0 END) AS total_pnl,
+        MAX(CASE WHEN action = 'SELL' THEN percentage_change END)
+    FROM trades
+    GROUP BY contract_address
+    HAVING trade_count >= 2
+    ORDER BY total_pnl DESC
+    LIMIT 10
+    ''', source=_MONITOR)
+register_query('token_rollup', '''
+    SELECT contract_address,
+        SUM(CASE WHEN action = 'BUY' THEN amount ELSE -amount END) AS net_amount,
+        AVG(CASE WHEN action = 'BUY' THEN price END)
+    FROM trades
+    GROUP BY contract_address
+    ''', source='monitoring/enhanced_monitor.py')
+
+register_query('dashboard_recent_sells', '''
+    SELECT gain_loss_sol FROM trades
+    WHERE action = 'SELL' AND gain_loss_sol IS NOT NULL
+    ORDER BY timestamp DESC
+    LIMIT 100
+    ''', source=_ADVANCED)
+register_query('dashboard_latest_trades',
+               "SELECT * FROM trades ORDER BY id DESC LIMIT 20",
+               allow_scan=True, source=_DASHBOARD)
+register_query('dashboard_ml_performance', '''
+    SELECT t.*,
+           CASE
+               WHEN t.action = 'SELL' AND t.price >
+                    (SELECT price FROM trades WHERE contract_address = t.contract_address
+                     AND action = 'BUY' AND timestamp < t.timestamp LIMIT 1)
+               THEN 1
+               ELSE 0
+           END as profitable
+    FROM trades t
+    WHERE EXISTS (
+        SELECT 1 FROM trades t2
+        WHERE t2.contract_address = t.contract_address
+        AND t2.action != t.action
+    )
+    ORDER BY timestamp DESC
+    LIMIT 100
+    ''', source=_DASHBOARD)
+register_query('dashboard_token_lookup',
+               "SELECT ticker, name FROM tokens WHERE contract_address = ?",
+               ('token',), source=_DASHBOARD)
@@ -0,0 +1,483 @@
+"""
+Append-only market snapshot store: every price/volume/liquidity/mcap/holders
+observation, in day-partitioned columnar NumPy segments
+"""
+import os
+import json
+import time
+import shutil
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = 'data/snapshots'
+DEFAULT_MAX_BUFFER_ROWS = 5000
+DEFAULT_FLUSH_INTERVAL = 60.0
+
+# Observation columns (besides timestamp and token); price keeps float64
+# because memecoin prices span many orders of magnitude
+SNAPSHOT_FIELDS = ('price', 'volume_24h', 'liquidity_usd', 'mcap', 'holders')
+FIELD_DTYPES = {'price': np.float64, 'volume_24h': np.float32, 'liquidity_usd': np.float32,
+                'mcap': np.float32, 'holders': np.float32}
+
+# Token dict keys per field, in preference order (sources name them differently)
+FIELD_ALIASES = {
+    'price': ('price_usd', 'price'),
+    'volume_24h': ('volume_24h', 'v24hUSD'),
+    'liquidity_usd': ('liquidity_usd', 'liquidity'),
+    'mcap': ('mcap', 'market_cap'),
+    'holders': ('holders', 'holder'),
+}
+
+_SEGMENT_CACHE_SIZE = 256
+
+
+class SnapshotStore:
+    """
+    Columnar, append-only store of market observations
+
+    Layout: <root>/<YYYY-MM-DD>/<segment>/ holds one .npy file per column
+    (timestamp float64, token int32 and the SNAPSHOT_FIELDS) plus
+    tokens.json mapping the segment's token ids to addresses. Segments are
+    written once, sorted by timestamp, and renamed into place, so readers
+    never see a partial segment and can memory-map every column. Missing
+    values (the source didn't report the field) are NaN.
+
+    Observations are buffered in memory and written as a new segment when
+    the buffer reaches max_buffer_rows or every flush_interval seconds (off
+    the event loop when one is running). compact() merges a day's segments.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, max_buffer_rows: int = DEFAULT_MAX_BUFFER_ROWS,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        Initialize the store
+
+        :param root: Directory holding the day partitions
+        :param max_buffer_rows: Buffered observations that trigger a flush
+        :param flush_interval: Maximum seconds an observation stays buffered
+        """
+        self.root = root
+        self.max_buffer_rows = max(1, max_buffer_rows)
+        self.flush_interval = flush_interval
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._buffer: List[tuple] = []
+        self._last_flush = time.monotonic()
+        self._flush_pending = False
+        self._segment_seq = 0
+        self._segments: 'OrderedDict[str, Dict]' = OrderedDict()
+
+        self.stats = {
+            'rows_recorded': 0,
+            'rows_flushed': 0,
+            'segments_written': 0,
+            'flushes': 0,
+            'flush_errors': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'queries': 0,
+            'rows_returned': 0,
+            'last_query_ms': 0.0,
+            'total_query_ms': 0.0
+        }
+
+    # ------------------------------------------------------------------ writes
+
+    def record(self, address: str, price: Optional[float], timestamp: Optional[float] = None,
+               volume_24h: Optional[float] = None, liquidity_usd: Optional[float] = None,
+               mcap: Optional[float] = None, holders: Optional[float] = None) -> bool:
+        """
+        Record one observation
+
+        :param address: Token contract address
+        :param price: Price in USD (None if not observed)
+        :param timestamp: Epoch seconds of the observation (defaults to now)
+        :return: True if the observation was buffered
+        """
+        if not address:
+            return False
+        row = (time.time() if timestamp is None else float(timestamp), address,
+               _value(price), _value(volume_24h), _value(liquidity_usd), _value(mcap), _value(holders))
+        if all(np.isnan(v) for v in row[2:]):
+            return False
+        with self._lock:
+            self._buffer.append(row)
+            self.stats['rows_recorded'] += 1
+        self._maybe_flush()
+        return True
+
+    def record_token(self, token: Dict, timestamp: Optional[float] = None) -> bool:
+        """
+        Record a token dict as fetched by the scanner or market data clients
+
+        :param token: Token data (price_usd/price, liquidity_usd/liquidity, mcap/market_cap, ...)
+        :param timestamp: Epoch seconds of the observation (defaults to now)
+        :return: True if the observation was buffered
+        """
+        values = {field: next((token[key] for key in keys if token.get(key) is not None), None)
+                  for field, keys in FIELD_ALIASES.items()}
+        return self.record(token.get('contract_address') or token.get('address'),
+                           timestamp=timestamp, **values)
+
+    def record_tokens(self, tokens: Iterable[Dict], timestamp: Optional[float] = None) -> int:
+        """
+        Record a batch of token dicts observed together
+
+        :return: Number of observations buffered
+        """
+        return sum(1 for token in tokens if self.record_token(token, timestamp))
+
+    def record_prices(self, prices: Dict[str, float], timestamp: Optional[float] = None) -> int:
+        """
+        Record a price snapshot (address -> price)
+
+        :return: Number of observations buffered
+        """
+        return sum(1 for address, price in prices.items() if self.record(address, price, timestamp))
+
+    def _maybe_flush(self):
+        """Flush when the buffer is full or old, off the event loop if there is one"""
+        if self._flush_pending:
+            return
+        if (len(self._buffer) < self.max_buffer_rows
+                and time.monotonic() - self._last_flush < self.flush_interval):
+            return
+        self._flush_pending = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        loop.run_in_executor(None, self.flush)
+
+    def flush(self) -> int:
+        """
+        Write buffered observations as new segments (one per UTC day)
+
+        :return: Number of rows written
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            self._flush_pending = False
+        if not rows:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            timestamps = np.array([r[0] for r in rows], dtype=np.float64)
+            addresses = np.array([r[1] for r in rows], dtype=object)
+            values = np.array([r[2:] for r in rows], dtype=np.float64)
+            days = (timestamps // 86400).astype(np.int64)
+            with self._write_lock:
+                for day in np.unique(days):
+                    mask = days == day
+                    self._write_segment(_day_name(day), timestamps[mask], addresses[mask],
+                                        {f: values[mask, i] for i, f in enumerate(SNAPSHOT_FIELDS)})
+        except Exception as e:
+            self.stats['flush_errors'] += 1
+            logger.error(f"Error flushing {len(rows)} snapshots: {e}")
+            return 0
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats['flushes'] += 1
+        self.stats['rows_flushed'] += len(rows)
+        self.stats['last_flush_ms'] = elapsed_ms
+        self.stats['total_flush_ms'] += elapsed_ms
+        self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed_ms)
+        logger.debug(f"Flushed {len(rows)} snapshots in {elapsed_ms:.1f}ms")
+        return len(rows)
+
+    def _write_segment(self, day: str, timestamps: np.ndarray, addresses: np.ndarray,
+                       columns: Dict[str, np.ndarray]) -> str:
+        """Write one immutable segment, sorted by time (caller holds _write_lock)"""
+        order = np.argsort(timestamps, kind='stable')
+        tokens, token_ids = np.unique(addresses[order].astype(str), return_inverse=True)
+
+        self._segment_seq += 1
+        name = f"{int(timestamps.min() * 1000):013d}-{os.getpid()}-{self._segment_seq:06d}"
+        day_dir = os.path.join(self.root, day)
+        tmp_dir = os.path.join(day_dir, f".tmp-{name}")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        np.save(os.path.join(tmp_dir, 'timestamp.npy'), timestamps[order])
+        np.save(os.path.join(tmp_dir, 'token.npy'), token_ids.astype(np.int32))
+        for field in SNAPSHOT_FIELDS:
+            np.save(os.path.join(tmp_dir, f'{field}.npy'), columns[field][order].astype(FIELD_DTYPES[field]))
+        with open(os.path.join(tmp_dir, 'tokens.json'), 'w') as f:
+            json.dump(tokens.tolist(), f)
+
+        path = os.path.join(day_dir, name)
+        os.rename(tmp_dir, path)
+        self.stats['segments_written'] += 1
+        return path
+
+    def compact(self, day: str) -> bool:
+        """
+        Merge a day's segments into one (run for closed days)
+
+        :param day: Partition name (YYYY-MM-DD)
+        :return: True if segments were merged
+        """
+        with self._write_lock:
+            paths = self._segment_paths(day)
+            if len(paths) < 2:
+                return False
+            try:
+                parts = [self._read_segment(path, 0, np.inf, None) for path in paths]
+                merged = {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+                self._write_segment(day, merged['timestamp'], merged['address'],
+                                    {f: merged[f] for f in SNAPSHOT_FIELDS})
+                for path in paths:
+                    self._segments.pop(path, None)
+                    shutil.rmtree(path)
+            except Exception as e:
+                logger.error(f"Error compacting snapshots for {day}: {e}")
+                return False
+        logger.info(f"Compacted {len(paths)} snapshot segments for {day}")
+        return True
+
+    def prune(self, keep_days: int) -> int:
+        """
+        Delete partitions older than keep_days
+
+        :return: Number of partitions removed
+        """
+        cutoff = _day_name(int(time.time() // 86400) - keep_days)
+        removed = 0
+        for day in self.days():
+            if day < cutoff:
+                shutil.rmtree(os.path.join(self.root, day), ignore_errors=True)
+                removed += 1
+        self._segments.clear()
+        return removed
+
+    # ------------------------------------------------------------------- reads
+
+    def days(self) -> List[str]:
+        """Day partitions present on disk, oldest first"""
+        return sorted(d for d in os.listdir(self.root)
+                      if len(d) == 10 and os.path.isdir(os.path.join(self.root, d)))
+
+    def _segment_paths(self, day: str) -> List[str]:
+        day_dir = os.path.join(self.root, day)
+        if not os.path.isdir(day_dir):
+            return []
+        return [os.path.join(day_dir, name) for name in sorted(os.listdir(day_dir))
+                if not name.startswith('.')]
+
+    def _open_segment(self, path: str) -> Dict:
+        """Memory-map a segment's columns (segments are immutable, so cache them)"""
+        segment = self._segments.get(path)
+        if segment is not None:
+            self._segments.move_to_end(path)
+            return segment
+        with open(os.path.join(path, 'tokens.json')) as f:
+            tokens = json.load(f)
+        segment = {
+            'tokens': np.array(tokens, dtype=object),
+            'token_index': {address: i for i, address in enumerate(tokens)},
+            'columns': {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+                        for name in ('timestamp', 'token') + SNAPSHOT_FIELDS}
+        }
+        self._segments[path] = segment
+        if len(self._segments) > _SEGMENT_CACHE_SIZE:
+            self._segments.popitem(last=False)
+        return segment
+
+    def _read_segment(self, path: str, start: float, end: float,
+                      addresses: Optional[Sequence[str]]) -> Optional[Dict[str, np.ndarray]]:
+        """Rows of one segment in [start, end), optionally for some tokens only"""
+        segment = self._open_segment(path)
+        columns = segment['columns']
+        ts = columns['timestamp']
+        lo, hi = np.searchsorted(ts, [start, end], side='left')
+        if lo >= hi:
+            return None
+
+        token = np.asarray(columns['token'][lo:hi])
+        if addresses is not None:
+            ids = [segment['token_index'][a] for a in addresses if a in segment['token_index']]
+            if not ids:
+                return None
+            rows = lo + np.flatnonzero(np.isin(token, ids))
+            if len(rows) == 0:
+                return None
+            token = token[rows - lo]
+        else:
+            rows = slice(lo, hi)
+
+        out = {'timestamp': np.asarray(ts[rows]), 'address': segment['tokens'][token]}
+        for field in SNAPSHOT_FIELDS:
+            out[field] = np.asarray(columns[field][rows])
+        return out
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              addresses: Optional[Sequence[str]] = None,
+              include_buffer: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Observations in a time range, sorted by time
+
+        :param start: Epoch seconds, inclusive (defaults to the first partition)
+        :param end: Epoch seconds, exclusive (defaults to now)
+        :param addresses: Only these tokens (defaults to all)
+        :param include_buffer: Include observations not yet flushed
+        :return: Column arrays: timestamp, address and each of SNAPSHOT_FIELDS
+        """
+        query_start = time.perf_counter()
+        start = 0.0 if start is None else float(start)
+        end = np.inf if end is None else float(end)
+        wanted = None if addresses is None else list(dict.fromkeys(addresses))
+
+        first_day = _day_name(int(start // 86400)) if start > 0 else ''
+        last_day = _day_name(int(end // 86400)) if np.isfinite(end) else '9999-99-99'
+        parts = []
+        for day in self.days():
+            if first_day <= day <= last_day:
+                for path in self._segment_paths(day):
+                    part = self._read_segment(path, start, end, wanted)
+                    if part is not None:
+                        parts.append(part)
+
+        if include_buffer:
+            part = self._buffered(start, end, wanted)
+            if part is not None:
+                parts.append(part)
+
+        if parts:
+            result = {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+            order = np.argsort(result['timestamp'], kind='stable')
+            result = {key: values[order] for key, values in result.items()}
+        else:
+            result = {'timestamp': np.zeros(0), 'address': np.zeros(0, dtype=object)}
+            result.update({f: np.zeros(0, dtype=FIELD_DTYPES[f]) for f in SNAPSHOT_FIELDS})
+
+        elapsed_ms = (time.perf_counter() - query_start) * 1000
+        self.stats['queries'] += 1
+        self.stats['rows_returned'] += len(result['timestamp'])
+        self.stats['last_query_ms'] = elapsed_ms
+        self.stats['total_query_ms'] += elapsed_ms
+        return result
+
+    def _buffered(self, start: float, end: float,
+                  addresses: Optional[Sequence[str]]) -> Optional[Dict[str, np.ndarray]]:
+        with self._lock:
+            rows = [r for r in self._buffer if start <= r[0] < end]
+        if addresses is not None:
+            wanted = set(addresses)
+            rows = [r for r in rows if r[1] in wanted]
+        if not rows:
+            return None
+        values = np.array([r[2:] for r in rows], dtype=np.float64)
+        out = {'timestamp': np.array([r[0] for r in rows], dtype=np.float64),
+               'address': np.array([r[1] for r in rows], dtype=object)}
+        for i, field in enumerate(SNAPSHOT_FIELDS):
+            out[field] = values[:, i].astype(FIELD_DTYPES[field])
+        return out
+
+    def query_frame(self, start: Optional[float] = None, end: Optional[float] = None,
+                    addresses: Optional[Sequence[str]] = None):
+        """
+        Observations as a long-format DataFrame (MarketHistory.from_frame layout)
+
+        :return: DataFrame with contract_address, timestamp, price_usd, volume_24h,
+                 liquidity_usd, mcap, holders
+        """
+        import pandas as pd
+
+        data = self.query(start, end, addresses)
+        df = pd.DataFrame({'contract_address': data['address'], 'timestamp': data['timestamp']})
+        df['price_usd'] = data['price']
+        for field in SNAPSHOT_FIELDS[1:]:
+            df[field] = data[field]
+        return df
+
+    def token_series(self, address: str, start: Optional[float] = None, end: Optional[float] = None,
+                     bar_seconds: int = 600):
+        """
+        One token's observations on a regular grid, in the layout
+        EnhancedMLTrainer.create_features expects
+
+        :param address: Token contract address
+        :param bar_seconds: Bar width (create_features assumes 10 minutes)
+        :return: DataFrame indexed by UTC bar time with price, volume, liquidity,
+                 market_cap and holders (forward filled)
+        """
+        import pandas as pd
+
+        data = self.query(start, end, [address])
+        df = pd.DataFrame({
+            'price': data['price'], 'volume': data['volume_24h'], 'liquidity': data['liquidity_usd'],
+            'market_cap': data['mcap'], 'holders': data['holders']
+        }, index=pd.to_datetime(data['timestamp'], unit='s', utc=True))
+        if df.empty:
+            return df
+        return df.resample(f'{bar_seconds}s').last().ffill()
+
+    def get_stats(self) -> Dict:
+        """
+        Get store metrics
+
+        :return: Dictionary with buffered rows, flush and query latency
+        """
+        stats = dict(self.stats)
+        flushes = stats['flushes']
+        queries = stats['queries']
+        stats['buffered_rows'] = len(self._buffer)
+        stats['avg_flush_ms'] = stats['total_flush_ms'] / flushes if flushes else 0.0
+        stats['avg_query_ms'] = stats['total_query_ms'] / queries if queries else 0.0
+        return stats
+
+    def close(self):
+        """Flush everything still buffered"""
+        self.flush()
+        self._segments.clear()
+
+
+def _value(value: Any) -> float:
+    """Observation value as float; missing, invalid or non-positive values become NaN"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if value > 0 else np.nan
+
+
+def _day_name(day: int) -> str:
+    return datetime.fromtimestamp(int(day) * 86400, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+# One store per root directory for the whole process
+_stores: Dict[str, SnapshotStore] = {}
+
+
+def get_snapshot_store(root: str = DEFAULT_ROOT, **kwargs) -> SnapshotStore:
+    """Get or create the shared snapshot store for a directory"""
+    key = os.path.abspath(root)
+    store = _stores.get(key)
+    if store is None:
+        store = SnapshotStore(root, **kwargs)
+        _stores[key] = store
+    return store
+
+
+def close_all_snapshot_stores():
+    """Flush every shared snapshot store (call on shutdown)"""
+    stores = list(_stores.values())
+    _stores.clear()
+    for store in stores:
+        try:
+            store.close()
+        except Exception as e:
+            logger.error(f"Error closing snapshot store: {e}")
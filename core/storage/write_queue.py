@@ -0,0 +1,261 @@
+"""
+Async write-behind queue that keeps SQLite writes off the event loop
+"""
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+
+class AsyncWriteQueue:
+    """
+    Write-behind buffer in front of a Database
+
+    Token upserts are coalesced by contract_address (INSERT OR REPLACE means
+    only the last write for a token survives anyway) and flushed as one
+    batched transaction once the buffer reaches max_batch_size or every
+    flush_interval seconds. Trades are not buffered: record_trade runs on the
+    same single database thread and only returns once the row is committed.
+    """
+
+    def __init__(self, db: Any, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        """
+        Initialize the write queue
+
+        :param db: Database (or adapter) to write through
+        :param max_batch_size: Pending token count that triggers an immediate flush
+        :param flush_interval: Seconds between background flushes
+        """
+        self.db = db
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval = flush_interval
+
+        # One thread: SQLite has a single writer, and it keeps trades and
+        # token batches in submission order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        self._pending: Dict[str, Dict] = {}
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+
+        self.stats = {
+            'tokens_enqueued': 0,
+            'tokens_coalesced': 0,
+            'max_queue_depth': 0,
+            'flushes': 0,
+            'rows_flushed': 0,
+            'last_flush_rows': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'flush_errors': 0,
+            'trades_written': 0,
+            'trade_errors': 0,
+            'total_trade_ms': 0.0,
+            'max_trade_ms': 0.0
+        }
+
+    def _ensure_started(self) -> bool:
+        """Start the background flusher on the running loop, if there is one"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+        if self._loop is not loop:
+            # First use, or the previous loop has gone away
+            self._loop = loop
+            self._flush_lock = asyncio.Lock()
+            self._flush_task = None
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_loop())
+        return True
+
+    async def _flush_loop(self):
+        """Flush pending tokens on the time threshold"""
+        while not self._closed:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                await self.flush()
+
+    def enqueue_token(self, token_data: Dict) -> bool:
+        """
+        Queue a token upsert without blocking
+
+        Falls back to a direct write when called outside an event loop.
+
+        :param token_data: Dictionary containing token data
+        :return: True if the token was queued or stored
+        """
+        address = token_data.get('contract_address') if token_data else None
+        if not address:
+            logger.error("Missing required field: contract_address")
+            return False
+
+        # Copy now so later mutation by the caller cannot leak into the write,
+        # and stamp the time the data was observed rather than flushed
+        row = dict(token_data)
+        row.setdefault('last_updated', datetime.now(timezone.utc).isoformat())
+
+        if self._closed or not self._ensure_started():
+            return bool(self.db.store_token(row))
+
+        if address in self._pending:
+            self.stats['tokens_coalesced'] += 1
+        self._pending[address] = row
+        self.stats['tokens_enqueued'] += 1
+        self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], len(self._pending))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._loop.create_task(self.flush())
+        return True
+
+    async def store_token(self, token_data: Dict = None, **kwargs) -> bool:
+        """
+        Async counterpart of Database.store_token (write-behind)
+
+        :param token_data: Dictionary containing token data (optional)
+        :param kwargs: Individual token attributes as keyword arguments
+        :return: True if the token was queued
+        """
+        if token_data is None:
+            token_data = kwargs
+        elif kwargs:
+            token_data = {**token_data, **kwargs}
+        return self.enqueue_token(token_data)
+
+    async def record_trade(self, **kwargs) -> bool:
+        """
+        Record a trade on the database thread and wait until it is committed
+
+        :param kwargs: Arguments for Database.record_trade
+        :return: Result of Database.record_trade
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            result = await loop.run_in_executor(self._executor, partial(self.db.record_trade, **kwargs))
+        except Exception as e:
+            self.stats['trade_errors'] += 1
+            logger.error(f"Error recording trade for {kwargs.get('contract_address')}: {e}")
+            return False
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats['trades_written'] += 1
+        self.stats['total_trade_ms'] += elapsed_ms
+        self.stats['max_trade_ms'] = max(self.stats['max_trade_ms'], elapsed_ms)
+        if not result:
+            self.stats['trade_errors'] += 1
+        return result
+
+    def _write_tokens(self, rows: List[Dict]) -> int:
+        """Write a batch of tokens (runs on the database thread)"""
+        if hasattr(self.db, 'store_tokens'):
+            return self.db.store_tokens(rows)
+        # Adapters without a batch method still get the off-loop write
+        return sum(1 for row in rows if self.db.store_token(row))
+
+    async def flush(self) -> int:
+        """
+        Write every pending token in one batch
+
+        :return: Number of rows written
+        """
+        if not self._pending:
+            return 0
+        if not self._ensure_started():
+            rows = list(self._pending.values())
+            self._pending.clear()
+            return self._write_tokens(rows)
+
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            rows = list(self._pending.values())
+            self._pending.clear()
+
+            start = time.perf_counter()
+            try:
+                written = await self._loop.run_in_executor(self._executor, self._write_tokens, rows)
+            except Exception as e:
+                self.stats['flush_errors'] += 1
+                logger.error(f"Error flushing {len(rows)} queued tokens: {e}")
+                return 0
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stats['flushes'] += 1
+            self.stats['rows_flushed'] += written
+            self.stats['last_flush_rows'] = written
+            self.stats['last_flush_ms'] = elapsed_ms
+            self.stats['total_flush_ms'] += elapsed_ms
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed_ms)
+            logger.debug(f"Flushed {written} tokens in {elapsed_ms:.1f}ms")
+            return written
+
+    def get_stats(self) -> Dict:
+        """
+        Get queue metrics
+
+        :return: Dictionary with queue depth, flush latency and rows per flush
+        """
+        stats = dict(self.stats)
+        flushes = stats['flushes']
+        trades = stats['trades_written']
+        stats['queue_depth'] = len(self._pending)
+        stats['avg_flush_ms'] = stats['total_flush_ms'] / flushes if flushes else 0.0
+        stats['avg_rows_per_flush'] = stats['rows_flushed'] / flushes if flushes else 0.0
+        stats['avg_trade_ms'] = stats['total_trade_ms'] / trades if trades else 0.0
+        return stats
+
+    async def close(self):
+        """Flush everything still pending and stop the background flusher"""
+        if self._closed:
+            return
+        await self.flush()
+        self._closed = True
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
+        stats = self.get_stats()
+        logger.info(f"Write queue closed: {stats['rows_flushed']} tokens in {stats['flushes']} flushes "
+                    f"(avg {stats['avg_rows_per_flush']:.1f} rows, {stats['avg_flush_ms']:.1f}ms), "
+                    f"{stats['trades_written']} trades")
+
+
+# One queue per database object for the whole process
+_queues: Dict[int, AsyncWriteQueue] = {}
+
+
+def get_write_queue(db: Any, **kwargs) -> AsyncWriteQueue:
+    """Get or create the shared write queue for a database instance"""
+    queue = _queues.get(id(db))
+    if queue is None or queue._closed or queue.db is not db:
+        queue = AsyncWriteQueue(db, **kwargs)
+        _queues[id(db)] = queue
+    return queue
+
+
+async def close_all_write_queues():
+    """Flush and close every shared write queue (call on shutdown)"""
+    queues = list(_queues.values())
+    _queues.clear()
+    for queue in queues:
+        try:
+            await queue.close()
+        except Exception as e:
+            logger.error(f"Error closing write queue: {e}")
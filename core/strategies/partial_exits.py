@@ -5,27 +5,89 @@ Implements multi-level profit taking with moonbag retention
 """
 
 import logging
-from typing import Dict, List, Optional
-from datetime import datetime
-import asyncio
+from typing import Callable, Dict, List, Optional
+from dataclasses import dataclass, field, asdict
+
+from core.trading.exit_engine import ExitEngine, ExitSignal
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class PartialExitState:
+    """Exit progress for one position, kept in memory and mirrored to partial_exit_state"""
+    contract_address: str
+    buy_timestamp: str
+    symbol: str
+    entry_price: float
+    initial_amount: float
+    remaining_amount: float
+    executed_levels: List[str] = field(default_factory=list)
+    trailing_activated: bool = False
+    highest_price: float = 0.0
+    stop_price: float = 0.0
+    
+    @property
+    def remaining_pct(self) -> float:
+        """Percentage of the original position still held"""
+        if self.initial_amount <= 0:
+            return 0.0
+        return (self.remaining_amount / self.initial_amount) * 100
+    
+    def to_row(self) -> Dict:
+        """Convert to dictionary for storage"""
+        return asdict(self)
+    
+    @classmethod
+    def from_row(cls, row: Dict) -> 'PartialExitState':
+        """Create state from a partial_exit_state row"""
+        return cls(
+            contract_address=row['contract_address'],
+            buy_timestamp=str(row['buy_timestamp']),
+            symbol=row.get('symbol') or 'UNKNOWN',
+            entry_price=float(row.get('entry_price') or 0.0),
+            initial_amount=float(row.get('initial_amount') or 0.0),
+            remaining_amount=float(row.get('remaining_amount') or 0.0),
+            executed_levels=list(row.get('executed_levels') or []),
+            trailing_activated=bool(row.get('trailing_activated')),
+            highest_price=float(row.get('highest_price') or 0.0),
+            stop_price=float(row.get('stop_price') or 0.0)
+        )
+
 class PartialExitManager:
-    """Manages partial exits at multiple profit levels"""
+    """
+    Manages partial exits at multiple profit levels
+    
+    Each position's ladder rungs and trailing stop are registered in an
+    ExitEngine when it opens (register_position); on_prices feeds ticks and
+    crossed levels sell immediately through execute_exit. ``on_exit`` is
+    called after every successful sell so the position owner can follow.
     
-    def __init__(self, config: Dict, db, solana_trader):
+    Remaining size, executed levels and the trailing high-water mark live in
+    memory, so a price check costs no database round-trips. State is written
+    in the same transaction as each partial sell (and when a trailing stop
+    arms) and reloaded from the database on startup. The high-water mark is
+    only persisted with those writes, so after a restart the trailing stop
+    resumes from the last persisted peak.
+    """
+    
+    def __init__(self, config: Dict, db, solana_trader,
+                 on_exit: Optional[Callable[[ExitSignal, PartialExitState], None]] = None):
         self.config = config['partial_exits']
         self.db = db
         self.solana_trader = solana_trader
+        self.on_exit = on_exit
         
         # Exit levels from config
         self.exit_levels = self.config['levels']
         self.trailing_stop = self.config['trailing_stop']
         
-        # Track executed exits per position
-        self.executed_exits = {}  # {position_id: [executed_levels]}
-        self.trailing_stops = {}  # {position_id: {'activated': bool, 'highest_price': float}}
+        # Per-position exit state: {position_id: PartialExitState}
+        self.positions: Dict[str, PartialExitState] = {}
+        # Untriggered ladder rungs: {position_id: {trigger_price: (level_id, level)}}
+        self._rungs: Dict[str, Dict[float, tuple]] = {}
+        
+        # Levels are evaluated per price tick; crossed ones call execute_exit
+        self.exit_engine = ExitEngine(self.execute_exit, gap_tolerance=self.config.get('gap_tolerance', 0.05))
         
         # Performance tracking
         self.exit_performance = {
@@ -34,109 +96,181 @@ class PartialExitManager:
             'moonbags_active': 0
         }
         
-    async def check_and_execute_exits(self, position: Dict, current_price: float) -> Dict:
-        """
-        Check if position qualifies for partial exits
-        Returns dict with exit details
+        self._load_state()
+    
+    @staticmethod
+    def _position_id(contract_address: str, buy_timestamp) -> str:
+        return f"{contract_address}_{buy_timestamp}"
+    
+    def _load_state(self):
+        """Rehydrate open positions' exit state from the database"""
+        try:
+            for row in self.db.get_partial_exit_states():
+                state = PartialExitState.from_row(row)
+                self.positions[self._position_id(state.contract_address, state.buy_timestamp)] = state
+                self.register_position({'contract_address': state.contract_address,
+                                        'buy_timestamp': state.buy_timestamp})
+            
+            logger.info(f"Loaded partial exit state for {len(self.positions)} positions")
+        except Exception as e:
+            logger.error(f"Error loading partial exit state: {e}")
+    
+    def _get_state(self, position: Dict) -> PartialExitState:
+        """Get (or start tracking) the exit state for a position"""
+        position_id = self._position_id(position['contract_address'], position['buy_timestamp'])
+        state = self.positions.get(position_id)
+        if state is None:
+            state = PartialExitState(
+                contract_address=position['contract_address'],
+                buy_timestamp=str(position['buy_timestamp']),
+                symbol=position.get('symbol', 'UNKNOWN'),
+                entry_price=position['price'],
+                initial_amount=position['amount'],
+                remaining_amount=position['amount'],
+                highest_price=position['price']
+            )
+            self.positions[position_id] = state
+        return state
+    
+    def register_position(self, position: Dict, stop_loss: Optional[float] = None) -> str:
         """
+        Index a position's exit levels in the exit engine
         
-        position_id = f"{position['contract_address']}_{position['buy_timestamp']}"
-        
-        # Initialize tracking if needed
-        if position_id not in self.executed_exits:
-            self.executed_exits[position_id] = []
-            self.trailing_stops[position_id] = {
-                'activated': False,
-                'highest_price': current_price,
-                'stop_price': 0
-            }
-        
-        # Calculate current profit percentage
-        entry_price = position['price']
-        profit_pct = ((current_price - entry_price) / entry_price) * 100
+        Levels already executed are skipped and an armed trailing stop
+        resumes from its persisted peak, so this is also how rehydrated
+        positions are re-registered after a restart.
         
-        logger.debug(f"Position {position['symbol']} at {profit_pct:.1f}% profit")
-        
-        # Check each exit level
-        exits_executed = []
+        :param position: Position with contract_address, buy_timestamp, symbol, price and amount
+        :param stop_loss: Optional stop loss price, evaluated in the same book
+        :return: Position key used for price ticks
+        """
+        state = self._get_state(position)
+        position_id = self._position_id(state.contract_address, state.buy_timestamp)
         
+        rungs = {}
         for i, level in enumerate(self.exit_levels):
             level_id = f"level_{i}_{level['profit_pct']}"
-            
-            # Skip if already executed
-            if level_id in self.executed_exits[position_id]:
-                continue
-            
-            # Check if profit target hit
-            if profit_pct >= level['profit_pct'] * 100:
-                logger.info(f"🎯 Profit target {level['profit_pct']*100}% hit for {position['symbol']}")
-                
-                # Calculate exit amount
-                remaining_amount = await self._get_remaining_position(position)
-                exit_amount = remaining_amount * level['exit_pct']
-                
-                # Execute partial exit
-                exit_result = await self._execute_partial_sell(
-                    position,
-                    exit_amount,
-                    current_price,
-                    f"Partial exit at {level['profit_pct']*100}% profit"
-                )
-                
-                if exit_result['success']:
-                    self.executed_exits[position_id].append(level_id)
-                    exits_executed.append({
-                        'level': level['profit_pct'],
-                        'amount': exit_amount,
-                        'price': current_price,
-                        'profit_sol': exit_result['profit_sol']
-                    })
-                    
-                    # Update performance metrics
-                    self.exit_performance['partial_exits_executed'] += 1
-                    self.exit_performance['total_profit_captured'] += exit_result['profit_sol']
+            if level_id not in state.executed_levels:
+                rungs[state.entry_price * (1 + level['profit_pct'])] = (level_id, level)
+        self._rungs[position_id] = rungs
+        
+        trailing = self.trailing_stop if self.trailing_stop['enabled'] else None
+        self.exit_engine.register(
+            position_id,
+            state.entry_price,
+            stop_loss=stop_loss,
+            partial_levels=tuple((price, level['exit_pct']) for price, (_, level) in rungs.items()),
+            trailing_activation=state.entry_price * (1 + trailing['activation']) if trailing else None,
+            trailing_distance_pct=trailing['distance'] if trailing else 0.0,
+            trailing_peak=state.highest_price if trailing and state.trailing_activated else None
+        )
+        return position_id
+    
+    def on_prices(self, prices: Dict[str, float], tick_time: Optional[float] = None) -> List[ExitSignal]:
+        """
+        Feed price ticks for registered positions; crossed levels sell right away
         
-        # Check trailing stop activation
+        :param prices: Price by position key (see register_position)
+        :param tick_time: perf_counter() when the prices were observed
+        :return: Fired ExitSignals
+        """
+        signals = self.exit_engine.on_prices(prices, tick_time)
         if self.trailing_stop['enabled']:
-            await self._manage_trailing_stop(position, position_id, current_price, profit_pct)
-        
-        # Check if position is now a moonbag
-        remaining_pct = await self._calculate_remaining_percentage(position)
-        is_moonbag = remaining_pct <= 0.3  # 30% or less remaining
+            for position_id, price in prices.items():
+                self._sync_trailing_stop(position_id, price)
+        return signals
+    
+    def _sync_trailing_stop(self, position_id: str, current_price: float):
+        """Mirror the exit book's trailing stop into the position state"""
+        state = self.positions.get(position_id)
+        trailing = self.exit_engine.book.trailing_stop(position_id)
+        if state is None or trailing is None:
+            return
+        
+        stop_price, peak = trailing
+        state.highest_price = peak
+        if not state.trailing_activated:
+            state.trailing_activated = True
+            state.stop_price = stop_price
+            
+            profit_pct = ((current_price - state.entry_price) / state.entry_price) * 100
+            logger.info(f"🔒 Trailing stop activated for {state.symbol} at {profit_pct:.1f}% profit")
+            logger.info(f"   Stop price: ${state.stop_price:.6f}")
+            
+            self.db.save_partial_exit_state(state.to_row())
+        elif stop_price > state.stop_price:
+            state.stop_price = stop_price
+            logger.debug(f"Trailing stop updated for {state.symbol}: ${state.stop_price:.6f}")
+    
+    async def execute_exit(self, signal: ExitSignal) -> bool:
+        """
+        Sell for a fired exit level (the exit engine's sell callback)
         
-        return {
-            'exits_executed': exits_executed,
-            'remaining_percentage': remaining_pct,
-            'is_moonbag': is_moonbag,
-            'profit_pct': profit_pct,
-            'trailing_stop_active': self.trailing_stops[position_id]['activated']
-        }
+        :param signal: Fired exit
+        :return: True once sold
+        """
+        state = self.positions.get(signal.key)
+        if state is None or state.remaining_amount <= 0:
+            return False
+        
+        profit_pct = ((signal.price - state.entry_price) / state.entry_price) * 100
+        if signal.reason == 'trailing_stop':
+            logger.warning(f"⚠️ Trailing stop hit for {state.symbol} at ${signal.price:.6f}")
+            level_ids = ['trailing_stop']
+            reason = f"Trailing stop hit at {profit_pct:.1f}% profit"
+        elif signal.reason == 'stop_loss':
+            level_ids = ['stop_loss']
+            reason = f"Stop loss hit at {profit_pct:.1f}% profit"
+        else:
+            # Several rungs crossed in one tick are sold together
+            rungs = self._rungs.get(signal.key, {})
+            crossed = [rungs[level[0]] for level in signal.levels if level[0] in rungs]
+            level_ids = [level_id for level_id, _ in crossed]
+            top = crossed[-1][1]['profit_pct'] if crossed else profit_pct / 100
+            logger.info(f"🎯 Profit target {top*100}% hit for {state.symbol}")
+            reason = f"Partial exit at {top*100}% profit"
+        
+        amount = state.remaining_amount if signal.fraction >= 1.0 else state.remaining_amount * signal.fraction
+        exit_result = await self._execute_partial_sell(state, amount, signal.price, reason, level_ids)
+        if not exit_result['success']:
+            return False
+        
+        if signal.reason not in ('trailing_stop', 'stop_loss'):
+            self.exit_performance['partial_exits_executed'] += 1
+            self.exit_performance['total_profit_captured'] += exit_result['profit_sol']
+        
+        if self.on_exit is not None:
+            self.on_exit(signal, state)
+        if state.remaining_amount <= 0:
+            self.forget_position(state.contract_address, state.buy_timestamp)
+        return True
     
-    async def _execute_partial_sell(self, position: Dict, amount: float, 
-                                   current_price: float, reason: str) -> Dict:
-        """Execute a partial sell order"""
+    async def _execute_partial_sell(self, state: PartialExitState, amount: float,
+                                   current_price: float, reason: str, level_ids: List[str]) -> Dict:
+        """Execute a partial sell order and record it with the updated position state"""
         
         try:
-            logger.info(f"Executing partial sell: {amount:.4f} {position['symbol']} at ${current_price:.6f}")
+            logger.info(f"Executing partial sell: {amount:.4f} {state.symbol} at ${current_price:.6f}")
             
             # Execute sell through Solana trader
             result = await self.solana_trader.sell_token(
-                contract_address=position['contract_address'],
+                contract_address=state.contract_address,
                 amount=amount,
                 min_sol_output=amount * current_price * 0.95  # 5% slippage tolerance
             )
             
             if result['success']:
                 # Calculate profit
-                entry_value = amount * position['price']
+                entry_value = amount * state.entry_price
                 exit_value = result['sol_received']
                 profit_sol = exit_value - entry_value
                 
-                # Record partial exit in database
-                await self._record_partial_exit(
-                    position, amount, current_price, 
-                    profit_sol, reason
-                )
+                # The sell happened on chain, so memory follows it even if the write fails
+                state.remaining_amount = max(state.remaining_amount - amount, 0.0)
+                state.executed_levels.extend(level_ids)
+                
+                # Record partial exit and the state it leaves in one transaction
+                self._record_partial_exit(state, amount, current_price, profit_sol, reason)
                 
                 logger.info(f"✅ Partial exit successful: {profit_sol:.4f} SOL profit")
                 
@@ -155,143 +289,56 @@ class PartialExitManager:
             logger.error(f"Error executing partial sell: {e}")
             return {'success': False, 'error': str(e)}
     
-    async def _manage_trailing_stop(self, position: Dict, position_id: str, 
-                                   current_price: float, profit_pct: float):
-        """Manage trailing stop for moonbag positions"""
-        
-        trailing_data = self.trailing_stops[position_id]
-        
-        # Check if trailing stop should be activated
-        if not trailing_data['activated'] and profit_pct >= self.trailing_stop['activation'] * 100:
-            trailing_data['activated'] = True
-            trailing_data['highest_price'] = current_price
-            trailing_data['stop_price'] = current_price * (1 - self.trailing_stop['distance'])
-            
-            logger.info(f"🔒 Trailing stop activated for {position['symbol']} at {profit_pct:.1f}% profit")
-            logger.info(f"   Stop price: ${trailing_data['stop_price']:.6f}")
-        
-        # Update trailing stop if active
-        elif trailing_data['activated']:
-            # Update highest price and stop if price increased
-            if current_price > trailing_data['highest_price']:
-                trailing_data['highest_price'] = current_price
-                trailing_data['stop_price'] = current_price * (1 - self.trailing_stop['distance'])
-                
-                logger.debug(f"Trailing stop updated for {position['symbol']}: ${trailing_data['stop_price']:.6f}")
-            
-            # Check if stop hit
-            elif current_price <= trailing_data['stop_price']:
-                logger.warning(f"⚠️ Trailing stop hit for {position['symbol']} at ${current_price:.6f}")
-                
-                # Execute remaining position sell
-                remaining_amount = await self._get_remaining_position(position)
-                
-                exit_result = await self._execute_partial_sell(
-                    position,
-                    remaining_amount,
-                    current_price,
-                    f"Trailing stop hit at {profit_pct:.1f}% profit"
-                )
-                
-                if exit_result['success']:
-                    # Mark position as fully exited
-                    self.executed_exits[position_id].append('trailing_stop')
-    
-    async def _get_remaining_position(self, position: Dict) -> float:
-        """Get remaining position amount after partial exits"""
-        
-        # Query database for partial exits
-        query = """
-        SELECT SUM(amount) as sold_amount
-        FROM partial_exits
-        WHERE contract_address = ? AND buy_timestamp = ?
-        """
-        
-        result = self.db.execute_query(
-            query, 
-            (position['contract_address'], position['buy_timestamp'])
-        )
-        
-        sold_amount = result[0]['sold_amount'] or 0
-        remaining = position['amount'] - sold_amount
-        
-        return max(remaining, 0)
-    
-    async def _calculate_remaining_percentage(self, position: Dict) -> float:
-        """Calculate percentage of position remaining"""
-        
-        remaining = await self._get_remaining_position(position)
-        return (remaining / position['amount']) * 100
-    
-    async def _record_partial_exit(self, position: Dict, amount: float, 
-                                  price: float, profit_sol: float, reason: str):
+    def _record_partial_exit(self, state: PartialExitState, amount: float,
+                            price: float, profit_sol: float, reason: str):
         """Record partial exit in database"""
         
-        query = """
-        INSERT INTO partial_exits (
-            contract_address, symbol, buy_timestamp, 
-            amount, price, profit_sol, reason, timestamp
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
+        exit_data = {
+            'contract_address': state.contract_address,
+            'symbol': state.symbol,
+            'buy_timestamp': state.buy_timestamp,
+            'amount': amount,
+            'price': price,
+            'profit_sol': profit_sol,
+            'reason': reason
+        }
         
-        self.db.execute_query(query, (
-            position['contract_address'],
-            position['symbol'],
-            position['buy_timestamp'],
-            amount,
-            price,
-            profit_sol,
-            reason,
-            datetime.now()
-        ))
+        if not self.db.record_partial_exit(exit_data, state.to_row()):
+            logger.error(f"Partial exit for {state.symbol} not persisted; "
+                         f"in-memory state kept ({state.remaining_amount:.4f} remaining)")
+    
+    def forget_position(self, contract_address: str, buy_timestamp):
+        """Stop tracking a closed position (its persisted state is kept)"""
+        position_id = self._position_id(contract_address, buy_timestamp)
+        self.positions.pop(position_id, None)
+        self._rungs.pop(position_id, None)
+        self.exit_engine.remove(position_id)
     
     def get_exit_statistics(self) -> Dict:
         """Get partial exit performance statistics"""
         
-        # Query database for comprehensive stats
-        stats_query = """
-        SELECT 
-            COUNT(*) as total_exits,
-            SUM(profit_sol) as total_profit,
-            AVG(profit_sol) as avg_profit,
-            COUNT(DISTINCT contract_address) as unique_tokens
-        FROM partial_exits
-        WHERE timestamp > datetime('now', '-7 days')
-        """
-        
-        stats = self.db.execute_query(stats_query)[0]
+        stats = self.db.get_partial_exit_summary(days=7)
         
         return {
             'weekly_stats': {
-                'total_exits': stats['total_exits'] or 0,
-                'total_profit': stats['total_profit'] or 0,
-                'avg_profit_per_exit': stats['avg_profit'] or 0,
-                'unique_tokens': stats['unique_tokens'] or 0
+                'total_exits': stats['total_exits'],
+                'total_profit': stats['total_profit'],
+                'avg_profit_per_exit': stats['avg_profit'],
+                'unique_tokens': stats['unique_tokens']
             },
             'session_stats': self.exit_performance,
+            'exit_engine': self.exit_engine.get_stats(),
             'active_moonbags': len([
-                p for p in self.trailing_stops.values() 
-                if p['activated']
+                p for p in self.positions.values() 
+                if p.trailing_activated
             ])
         }
     
     async def optimize_exit_levels(self) -> Dict:
         """Analyze and optimize exit levels based on historical performance"""
         
-        # Query historical exit performance
-        analysis_query = """
-        SELECT 
-            reason,
-            AVG(profit_sol) as avg_profit,
-            COUNT(*) as exit_count,
-            SUM(profit_sol) as total_profit
-        FROM partial_exits
-        WHERE timestamp > datetime('now', '-30 days')
-        GROUP BY reason
-        ORDER BY avg_profit DESC
-        """
-        
-        results = self.db.execute_query(analysis_query)
+        # Historical exit performance
+        results = self.db.get_partial_exit_performance(days=30)
         
         # Analyze which exit levels perform best
         recommendations = []
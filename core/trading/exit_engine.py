@@ -0,0 +1,394 @@
+# core/trading/exit_engine.py
+"""
+Event-driven exit engine: price-triggered stop loss, take profit, trailing
+stop and partial exits for open positions
+"""
+import time
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Full exits win over take-profit ones when several positions trigger on one tick
+EXIT_PRIORITY = {'stop_loss': 0, 'trailing_stop': 1, 'take_profit': 2, 'partial_exit': 3}
+
+# key: position key the levels were registered under
+# reason: 'stop_loss', 'trailing_stop', 'take_profit' or 'partial_exit'
+# price: tick price that fired the trigger; level: trigger price it crossed
+# fraction: share of the *remaining* position to sell (1.0 closes it)
+# levels: upper levels consumed once the sell succeeds
+# tick_time: perf_counter() when the tick was observed, for tick-to-sell timing
+ExitSignal = namedtuple('ExitSignal', ['key', 'reason', 'price', 'level', 'fraction',
+                                       'levels', 'tick_time'])
+
+
+class _Triggers:
+    """Sorted trigger levels for one position"""
+
+    __slots__ = ('entry_price', 'upper', 'lower', 'trailing_distance', 'trailing_armed',
+                 'highest', 'seq')
+
+    def __init__(self, entry_price: float):
+        self.entry_price = entry_price
+        # (price, seq, reason, fraction), ascending. Upper levels fire when the
+        # price rises to them, lower levels when it falls to them.
+        self.upper: List[Tuple] = []
+        self.lower: List[Tuple] = []
+        self.trailing_distance = 0.0
+        self.trailing_armed = False
+        self.highest = entry_price
+        self.seq = 0
+
+    def add(self, side: List[Tuple], price: float, reason: str, fraction: float):
+        self.seq += 1
+        insort(side, (price, self.seq, reason, fraction))
+
+
+class ExitBook:
+    """
+    Price-trigger index for open positions
+
+    Each position keeps its stop levels and its take-profit/partial levels in
+    two sorted lists, so a tick costs one dict lookup and a bisect over that
+    position's handful of levels, however many positions are open. The book
+    only decides; callers execute the sell and then consume() or remove().
+    """
+
+    def __init__(self):
+        self._positions: Dict[Hashable, _Triggers] = {}
+
+    def add(self, key: Hashable, entry_price: float,
+            stop_loss: Optional[float] = None,
+            take_profit: Optional[float] = None,
+            trailing_activation: Optional[float] = None,
+            trailing_distance_pct: float = 0.0,
+            partial_levels: Sequence[Tuple[float, float]] = (),
+            trailing_peak: Optional[float] = None):
+        """
+        Register (or replace) a position's exit levels
+
+        :param key: Position key (token address or position id)
+        :param entry_price: Entry price
+        :param stop_loss: Price at or below which the position is closed
+        :param take_profit: Price at or above which the position is closed
+        :param trailing_activation: Price that arms the trailing stop
+        :param trailing_distance_pct: Trailing stop distance below the peak (0.15 = 15%)
+        :param partial_levels: (price, fraction of remaining position) rungs
+        :param trailing_peak: Peak of an already armed trailing stop (e.g. restored after a restart)
+        """
+        triggers = _Triggers(entry_price)
+        if stop_loss and stop_loss > 0:
+            triggers.add(triggers.lower, stop_loss, 'stop_loss', 1.0)
+        if take_profit and take_profit > 0:
+            triggers.add(triggers.upper, take_profit, 'take_profit', 1.0)
+        for price, fraction in partial_levels:
+            if price > 0 and fraction > 0:
+                triggers.add(triggers.upper, price, 'partial_exit', min(fraction, 1.0))
+        if trailing_distance_pct > 0:
+            triggers.trailing_distance = trailing_distance_pct
+            if trailing_peak:
+                triggers.trailing_armed = True
+                triggers.highest = max(entry_price, trailing_peak)
+                triggers.add(triggers.lower, triggers.highest * (1 - trailing_distance_pct),
+                             'trailing_stop', 1.0)
+            elif trailing_activation:
+                triggers.add(triggers.upper, trailing_activation, 'trailing_activation', 0.0)
+        self._positions[key] = triggers
+
+    def remove(self, key: Hashable):
+        """Forget a closed position"""
+        self._positions.pop(key, None)
+
+    def set_stop(self, key: Hashable, price: float, reason: str = 'stop_loss'):
+        """
+        Move a stop level (e.g. a trailing stop maintained elsewhere)
+
+        :param key: Position key
+        :param price: New stop price
+        :param reason: Which stop to move
+        """
+        triggers = self._positions.get(key)
+        if triggers is None:
+            return
+        triggers.lower[:] = [level for level in triggers.lower if level[2] != reason]
+        triggers.add(triggers.lower, price, reason, 1.0)
+
+    def trailing_stop(self, key: Hashable) -> Optional[Tuple[float, float]]:
+        """
+        Current trailing stop of a position
+
+        :param key: Position key
+        :return: (stop price, peak price), or None if the trailing stop is not armed
+        """
+        triggers = self._positions.get(key)
+        if triggers is None or not triggers.trailing_armed:
+            return None
+        stop = next((level[0] for level in triggers.lower if level[2] == 'trailing_stop'), None)
+        return (stop, triggers.highest) if stop is not None else None
+
+    def consume(self, signal: ExitSignal):
+        """Drop the upper levels a successful partial sell used up"""
+        triggers = self._positions.get(signal.key)
+        if triggers is None:
+            return
+        for level in signal.levels:
+            i = bisect_left(triggers.upper, level)
+            if i < len(triggers.upper) and triggers.upper[i] == level:
+                del triggers.upper[i]
+
+    def evaluate(self, key: Hashable, price: float,
+                 tick_time: Optional[float] = None) -> Optional[ExitSignal]:
+        """
+        Apply a price tick to one position
+
+        Arms and ratchets the trailing stop as a side effect. Stop levels win
+        over take-profit levels; if the price fell through several stops the
+        highest one (the first crossed) is reported.
+
+        :param key: Position key
+        :param price: Current price
+        :param tick_time: perf_counter() when the price was observed
+        :return: ExitSignal, or None if no level was crossed
+        """
+        triggers = self._positions.get(key)
+        if triggers is None or not price or price <= 0:
+            return None
+        tick_time = time.perf_counter() if tick_time is None else tick_time
+
+        # Levels at or below the price have been reached on the way up
+        crossed = bisect_right(triggers.upper, (price, float('inf')))
+        sells = []
+        for level in triggers.upper[:crossed]:
+            if level[2] == 'trailing_activation':
+                triggers.trailing_armed = True
+                triggers.upper.remove(level)
+            else:
+                sells.append(level)
+
+        if price > triggers.highest:
+            triggers.highest = price
+        if triggers.trailing_armed:
+            trailing_price = triggers.highest * (1 - triggers.trailing_distance)
+            current = next((level for level in triggers.lower if level[2] == 'trailing_stop'), None)
+            if current is None or trailing_price > current[0]:
+                self.set_stop(key, trailing_price, 'trailing_stop')
+
+        # Levels at or above the price have been reached on the way down
+        if triggers.lower and triggers.lower[-1][0] >= price:
+            level = triggers.lower[-1]
+            return ExitSignal(key, level[2], price, level[0], 1.0, (), tick_time)
+
+        if sells:
+            # Several rungs crossed in one tick sell their combined share
+            kept = 1.0
+            for level in sells:
+                kept *= 1.0 - level[3]
+            fraction = 1.0 - kept
+            reason = 'take_profit' if fraction >= 1.0 - 1e-9 else 'partial_exit'
+            return ExitSignal(key, reason, price, sells[-1][0], min(fraction, 1.0),
+                              tuple(sells), tick_time)
+        return None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+def exit_levels_from_params(entry_price: float, params: Dict) -> Dict:
+    """
+    Translate trading_params.json exit settings into ExitBook.add() levels
+
+    With use_partial_exits the partial_exit_levels/partial_exit_percents ladder
+    replaces the single take profit; its last rung sells whatever is left.
+
+    :param entry_price: Entry price
+    :param params: Trading parameters
+    :return: Keyword arguments for ExitBook.add()
+    """
+    levels = {
+        'stop_loss': entry_price * (1 - params.get('stop_loss_pct', 0.05)),
+        'take_profit': entry_price * (1 + params.get('take_profit_pct', 0.5)),
+        'trailing_activation': None,
+        'trailing_distance_pct': 0.0,
+        'partial_levels': ()
+    }
+
+    if params.get('trailing_stop_enabled', True):
+        levels['trailing_activation'] = entry_price * (1 + params.get('trailing_stop_activation_pct', 0.3))
+        levels['trailing_distance_pct'] = params.get('trailing_stop_distance_pct', 0.15)
+
+    profits = params.get('partial_exit_levels') or []
+    percents = params.get('partial_exit_percents') or []
+    if params.get('use_partial_exits', False) and profits and len(profits) == len(percents):
+        # Percents are shares of the original position; the book wants shares of what is left
+        rungs = []
+        remaining = 1.0
+        for profit_pct, exit_pct in sorted(zip(profits, percents)):
+            fraction = min(exit_pct / remaining, 1.0) if remaining > 0 else 1.0
+            rungs.append((entry_price * (1 + profit_pct), fraction))
+            remaining = max(remaining - exit_pct, 0.0)
+        rungs[-1] = (rungs[-1][0], 1.0)
+        levels['partial_levels'] = tuple(rungs)
+        levels['take_profit'] = None
+
+    return levels
+
+
+class ExitEngine:
+    """
+    Evaluates price ticks against an ExitBook and fires sells immediately
+
+    A triggered exit is started as its own task the moment the tick arrives,
+    so sells never wait for the trading loop. While a position's sell is in
+    flight further ticks for it are ignored; a failed sell leaves its levels
+    in place so the next tick fires it again.
+    """
+
+    def __init__(self, sell: Callable[[ExitSignal], Awaitable[bool]],
+                 gap_tolerance: float = 0.05):
+        """
+        Initialize the engine
+
+        :param sell: Coroutine function executing an exit; returns True once sold
+        :param gap_tolerance: Overshoot past a level (0.05 = 5%) counted as a missed trigger
+        """
+        self.sell = sell
+        self.gap_tolerance = gap_tolerance
+        self.book = ExitBook()
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+
+        self.stats = {
+            'ticks': 0,
+            'triggers': 0,
+            'sells': 0,
+            'failed_sells': 0,
+            'missed_triggers': 0,
+            'max_overshoot_pct': 0.0,
+            'latency': {}
+        }
+
+    def register(self, key: Hashable, entry_price: float, **levels):
+        """Register a position's exit levels (see ExitBook.add)"""
+        self.book.add(key, entry_price, **levels)
+
+    def remove(self, key: Hashable):
+        """Forget a closed position"""
+        self.book.remove(key)
+
+    def on_price(self, key: Hashable, price: float,
+                 tick_time: Optional[float] = None) -> Optional[ExitSignal]:
+        """
+        Feed one price tick; a triggered exit starts selling right away
+
+        :param key: Position key
+        :param price: Current price
+        :param tick_time: perf_counter() when the price was observed
+        :return: The fired ExitSignal, if any
+        """
+        self.stats['ticks'] += 1
+        if key in self._pending:
+            return None
+        signal = self.book.evaluate(key, price, tick_time)
+        if signal is not None:
+            self._fire(signal)
+        return signal
+
+    def on_prices(self, prices: Dict[Hashable, float],
+                  tick_time: Optional[float] = None) -> List[ExitSignal]:
+        """
+        Feed a batch of prices observed together
+
+        Stop losses are started first so they reach the sell path ahead of
+        take-profit exits from the same batch.
+
+        :param prices: Price by position key
+        :param tick_time: perf_counter() when the batch was requested
+        :return: Fired ExitSignals
+        """
+        tick_time = time.perf_counter() if tick_time is None else tick_time
+        signals = []
+        for key, price in prices.items():
+            self.stats['ticks'] += 1
+            if key in self._pending:
+                continue
+            signal = self.book.evaluate(key, price, tick_time)
+            if signal is not None:
+                signals.append(signal)
+        # Sort is stable, so ties keep their order
+        signals.sort(key=lambda s: EXIT_PRIORITY.get(s.reason, len(EXIT_PRIORITY)))
+        for signal in signals:
+            self._fire(signal)
+        return signals
+
+    def _fire(self, signal: ExitSignal):
+        """Start the sell for a triggered exit"""
+        self.stats['triggers'] += 1
+        overshoot = abs(signal.price - signal.level) / signal.level if signal.level else 0.0
+        self.stats['max_overshoot_pct'] = max(self.stats['max_overshoot_pct'], overshoot * 100)
+        if overshoot > self.gap_tolerance:
+            # The level was crossed between ticks and the price kept going
+            self.stats['missed_triggers'] += 1
+            logger.warning(f"Exit level for {str(signal.key)[:8]}... gapped: {signal.reason} at "
+                           f"{signal.level:.8f}, first seen at {signal.price:.8f} "
+                           f"({overshoot * 100:.1f}% past)")
+        self._pending[signal.key] = asyncio.get_running_loop().create_task(self._execute(signal))
+
+    async def _execute(self, signal: ExitSignal):
+        """Run one sell and settle the book"""
+        try:
+            sold = await self.sell(signal)
+        except Exception as e:
+            logger.error(f"Error executing {signal.reason} for {str(signal.key)[:8]}...: {e}")
+            sold = False
+        finally:
+            self._pending.pop(signal.key, None)
+
+        if not sold:
+            self.stats['failed_sells'] += 1
+            return
+
+        self.stats['sells'] += 1
+        if signal.fraction >= 1.0:
+            self.book.remove(signal.key)
+        else:
+            self.book.consume(signal)
+        self._record_latency(signal.reason, signal.tick_time)
+
+    def _record_latency(self, reason: str, tick_time: float):
+        """Track time from the price tick to a completed sell"""
+        latency_ms = (time.perf_counter() - tick_time) * 1000
+        stats = self.stats['latency'].setdefault(
+            reason, {'count': 0, 'last_ms': 0.0, 'max_ms': 0.0, 'total_ms': 0.0})
+        stats['count'] += 1
+        stats['last_ms'] = latency_ms
+        stats['max_ms'] = max(stats['max_ms'], latency_ms)
+        stats['total_ms'] += latency_ms
+        stats['avg_ms'] = stats['total_ms'] / stats['count']
+        logger.info(f"   {reason.replace('_', ' ').title()} tick-to-sell: {latency_ms:.0f}ms")
+
+    async def drain(self, timeout: float = 30.0):
+        """
+        Wait for in-flight sells (call on shutdown)
+
+        :param timeout: Seconds to wait before giving up
+        """
+        tasks = list(self._pending.values())
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def get_stats(self) -> Dict:
+        """
+        Get exit metrics
+
+        :return: Dictionary with trigger, sell, missed-trigger and per-reason latency counters
+        """
+        stats = dict(self.stats)
+        stats['latency'] = {reason: dict(values) for reason, values in self.stats['latency'].items()}
+        stats['positions'] = len(self.book)
+        stats['pending_sells'] = len(self._pending)
+        return stats
@@ -6,6 +6,8 @@ from datetime import datetime, timezone
 from dataclasses import dataclass, asdict
 import json
 
+from core.trading.exit_engine import ExitBook
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -57,11 +59,25 @@ class Position:
 class PositionManager:
     """Manages all trading positions with accurate tracking"""
     
-    def __init__(self, db, risk_manager):
+    def __init__(self, db, risk_manager, partial_exits=None):
+        """
+        Initialize the manager
+
+        :param db: Database instance
+        :param risk_manager: RiskManager instance
+        :param partial_exits: Optional PartialExitManager. When given, each position's stop
+            loss, partial-exit ladder and trailing stop are registered in its exit engine and
+            fire from there; this manager only follows the resulting sells.
+        """
         self.db = db
         self.risk_manager = risk_manager
         self.positions: Dict[str, Position] = {}
         self.closed_positions: List[Position] = []
+        self.exit_book = ExitBook()
+        self.partial_exits = partial_exits
+        self._exit_keys: Dict[str, str] = {}  # position_id -> partial-exit position key
+        if partial_exits is not None:
+            partial_exits.on_exit = self._on_partial_exit
         self._load_positions()
     
     def _load_positions(self):
@@ -72,6 +88,7 @@ class PositionManager:
             for pos_data in open_positions:
                 position = self._position_from_db(pos_data)
                 self.positions[position.position_id] = position
+                self._register_exit_levels(position)
             
             logger.info(f"Loaded {len(self.positions)} open positions")
         except Exception as e:
@@ -136,6 +153,7 @@ class PositionManager:
             
             # Store position
             self.positions[position_id] = position
+            self._register_exit_levels(position)
             self._save_position_to_db(position)
             
             logger.info(f"Opened position {position_id}: {amount_sol} SOL @ ${entry_price} "
@@ -148,8 +166,14 @@ class PositionManager:
             return None
     
     def update_positions(self, market_data: Dict[str, Dict]):
-        """Update all positions with current market data"""
+        """
+        Update all positions with current market data
+
+        With a partial-exit manager the prices are fed to its exit engine, so
+        this must be called from the event loop.
+        """
         
+        ticks = {}
         for position_id, position in list(self.positions.items()):
             if position.contract_address in market_data:
                 token_data = market_data[position.contract_address]
@@ -159,6 +183,13 @@ class PositionManager:
                     # Update position
                     position.update_current_price(current_price)
                     
+                    if position_id in self._exit_keys:
+                        # Stop, trailing stop and partial exits fire from the exit engine
+                        ticks[self._exit_keys[position_id]] = current_price
+                        if self._hold_time_exceeded(position):
+                            self.close_position(position_id, current_price, "max_hold_time")
+                        continue
+                    
                     # Check for trailing stop update
                     if self.risk_manager.params.trailing_stop_enabled:
                         new_stop = self.risk_manager.update_trailing_stop(
@@ -167,30 +198,66 @@ class PositionManager:
                         if new_stop and new_stop > position.stop_loss:
                             position.stop_loss = new_stop
                             position.trailing_stop_active = True
+                            self.exit_book.set_stop(position_id, new_stop)
                     
                     # Check exit conditions
                     exit_reason = self._check_exit_conditions(position)
                     if exit_reason:
                         self.close_position(position_id, current_price, exit_reason)
+        
+        if ticks:
+            self.partial_exits.on_prices(ticks)
+    
+    def _register_exit_levels(self, position: Position):
+        """Index a position's exit levels in the exit book (or the partial-exit engine)"""
+        if self.partial_exits is not None:
+            self._exit_keys[position.position_id] = self.partial_exits.register_position({
+                'contract_address': position.contract_address,
+                'buy_timestamp': position.entry_time.isoformat(),
+                'symbol': position.symbol,
+                'price': position.entry_price,
+                'amount': position.entry_amount_tokens
+            }, stop_loss=position.stop_loss)
+            return
+        
+        self.exit_book.add(
+            position.position_id,
+            position.entry_price,
+            stop_loss=position.stop_loss,
+            take_profit=position.take_profit
+        )
     
     def _check_exit_conditions(self, position: Position) -> Optional[str]:
         """Check if position should be closed"""
         
-        # Stop loss
-        if position.current_price <= position.stop_loss:
-            return "stop_loss"
-        
-        # Take profit
-        if position.current_price >= position.take_profit:
-            return "take_profit"
+        # Stop loss / take profit
+        signal = self.exit_book.evaluate(position.position_id, position.current_price)
+        if signal:
+            return signal.reason
         
         # Time-based exit
-        hold_time = (datetime.now(timezone.utc) - position.entry_time).total_seconds() / 3600
-        if hold_time > self.risk_manager.params.max_hold_time_hours:
+        if self._hold_time_exceeded(position):
             return "max_hold_time"
         
         return None
     
+    def _hold_time_exceeded(self, position: Position) -> bool:
+        hold_time = (datetime.now(timezone.utc) - position.entry_time).total_seconds() / 3600
+        return hold_time > self.risk_manager.params.max_hold_time_hours
+    
+    def _on_partial_exit(self, signal, state):
+        """Follow a sell made by the partial-exit engine"""
+        position_id = next((pid for pid, key in self._exit_keys.items() if key == signal.key), None)
+        position = self.positions.get(position_id)
+        if position is None:
+            return
+        
+        if state.remaining_amount <= 0:
+            self.close_position(position_id, signal.price, signal.reason)
+        else:
+            position.status = "partially_closed"
+            self._update_position_in_db(position)
+    
     def close_position(self, 
                       position_id: str, 
                       exit_price: float,
@@ -213,6 +280,10 @@ class PositionManager:
         # Move to closed positions
         self.closed_positions.append(position)
         del self.positions[position_id]
+        self.exit_book.remove(position_id)
+        if position_id in self._exit_keys:
+            del self._exit_keys[position_id]
+            self.partial_exits.forget_position(position.contract_address, position.entry_time.isoformat())
         
         # Update database
         self._update_position_in_db(position)
@@ -195,9 +195,11 @@ class TechnicalAnalyzer:
         if len(prices) < period + 1:
             return 50.0  # Neutral
             
-        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        gains = [d if d > 0 else 0 for d in deltas[-period:]]
-        losses = [-d if d < 0 else 0 for d in deltas[-period:]]
+        # Only the last period deltas matter; don't walk the whole history
+        recent = prices[-(period + 1):]
+        deltas = [recent[i] - recent[i-1] for i in range(1, len(recent))]
+        gains = [d if d > 0 else 0 for d in deltas]
+        losses = [-d if d < 0 else 0 for d in deltas]
         
         avg_gain = sum(gains) / period
         avg_loss = sum(losses) / period
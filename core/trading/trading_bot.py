@@ -1,7 +1,9 @@
 # trading_bot.py - WITH SAFETY FEATURES
+import os
 import asyncio
 import logging
 import json
+import time
 import random
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
@@ -9,6 +11,16 @@ from typing import Dict, List, Optional, Any
 # Import safety and alert managers
 from core.safety import SafetyManager
 from core.alerts import AlertManager, AlertLevel
+from core.storage.write_queue import close_all_write_queues
+from core.storage.snapshot_store import DEFAULT_ROOT, close_all_snapshot_stores, get_snapshot_store
+from core.data.price_snapshot import PriceSnapshotService
+from core.analysis.covariance import get_covariance_service
+from core.trading.exit_engine import ExitEngine, ExitSignal, exit_levels_from_params
+from utils.http_client import close_http_sessions
+from ml.features import OnlineFeatureEngine
+from ml.models.ml_predictor import MLPredictor
+from ml.models.registry import DEFAULT_ROOT as REGISTRY_ROOT, get_model_registry
+from ml.training.retraining import RetrainingService
 
 logger = logging.getLogger('trading_bot')
 
@@ -25,6 +37,43 @@ class TradingBot:
         self.positions = {}
         self.running = False
         
+        # Analysis fan-out per cycle. Birdeye Starter allows 100 req/min, so a
+        # handful in flight overlaps latency without bursting past the budget.
+        self.analysis_concurrency = max(1, int(config.get('analysis_concurrency', 5)))
+        self.max_candidates_per_cycle = max(1, int(config.get('max_candidates_per_cycle', 40)))
+        self.cycle_stats = {
+            'cycles': 0,
+            'tokens_analyzed': 0,
+            'total_cycle_time': 0.0,
+            'last_cycle_time': 0.0,
+            'last_analysis_time': 0.0,
+            'last_token_count': 0,
+            'last_tokens_per_sec': 0.0,
+            'avg_tokens_per_sec': 0.0
+        }
+        
+        # Batched position pricing feeding the event-driven exit engine, which
+        # runs on its own task so exits never wait for a discovery pass
+        self._price_snapshots = None
+        self.exit_tick_interval = max(1.0, float(config.get('exit_tick_interval', 5)))
+        self.exit_engine = ExitEngine(self._execute_exit,
+                                      gap_tolerance=config.get('exit_gap_tolerance', 0.05))
+        self._exit_monitor: Optional[asyncio.Task] = None
+        
+        # With 'record_snapshots' on, every observation the scanner and
+        # position monitor fetch is kept under snapshot_dir for replay
+        # (backtests) and ML features
+        self.snapshot_store = (get_snapshot_store(config.get('snapshot_dir', DEFAULT_ROOT))
+                               if config.get('record_snapshots', False) else None)
+        
+        # Opt-in ('covariance_tracking'): rolling return covariance of held
+        # and candidate tokens for the risk manager
+        self.covariance = (get_covariance_service(bar_seconds=config.get('covariance_bar_seconds', 300),
+                                                  halflife_bars=config.get('covariance_halflife_bars', 48),
+                                                  max_tokens=config.get('covariance_max_tokens', 512))
+                           if config.get('covariance_tracking', False) else None)
+        self.covariance_idle_seconds = config.get('covariance_idle_seconds', 3600)
+        
         # Initialize safety and alerts
         self.safety_manager = SafetyManager(config, db)
         self.alert_manager = AlertManager(config)
@@ -32,6 +81,40 @@ class TradingBot:
         # Load trading parameters
         self.trading_params = self.load_trading_params()
         
+        # Entry model scoring discovery batches from the online features: the
+        # registry's active version (loaded on first use, hot-swapped when a
+        # new one is activated), else a flat model directory
+        self.ml_predictor = None
+        if self.trading_params.get('use_ml_predictions'):
+            registry = get_model_registry(config.get('ml_registry_dir', REGISTRY_ROOT))
+            model_dir = config.get('ml_model_dir', 'data/models/enhanced')
+            if registry.current_version('entry') is not None:
+                self.ml_predictor = MLPredictor(threshold=self.trading_params.get('ml_confidence_threshold', 0.5))
+                self.ml_predictor.use_registry(registry, 'entry', config.get('ml_reload_interval', 60.0))
+            elif os.path.isdir(model_dir):
+                self.ml_predictor = MLPredictor(threshold=self.trading_params.get('ml_confidence_threshold', 0.5))
+                self.ml_predictor.load_models(model_dir)
+        
+        # Closed positions feed the background retraining process, which
+        # publishes new versions to the registry the predictor reloads from.
+        # Opt-in: 'ml_retraining': true starts the process, and
+        # 'ml_retraining_settings' overrides its RetrainingService config
+        self.retraining = None
+        if config.get('ml_retraining', False):
+            self.retraining = RetrainingService({
+                'registry_root': config.get('ml_registry_dir', REGISTRY_ROOT),
+                **config.get('ml_retraining_settings', {})
+            })
+        
+        # Live ML feature vectors, updated from the same observations; only
+        # kept when the predictor or retraining reads them ('online_features'
+        # forces them on regardless)
+        self.feature_engine = (OnlineFeatureEngine()
+                               if self.ml_predictor is not None or self.retraining is not None
+                               or config.get('online_features', False)
+                               else None)
+        self.feature_idle_seconds = config.get('feature_idle_seconds', 86400)
+        
         # Send startup alert
         mode = 'SIMULATION' if self.simulation_mode else 'REAL'
         self.alert_manager.startup_alert(mode, self.balance)
@@ -109,8 +192,14 @@ class TradingBot:
         # Load safety state
         self.safety_manager.load_state()
         
-        # Start token scanner in background
-        asyncio.create_task(self.token_scanner.start_scanning())
+        # Start streaming discovery; the trading loop consumes its queue
+        await self.token_scanner.discovery.start()
+        
+        if self.retraining:
+            self.retraining.start()
+        
+        # Price open positions on their own cadence
+        self._exit_monitor = asyncio.create_task(self.exit_monitor_loop())
         
         # Start main trading loop
         await self.trading_loop()
@@ -145,20 +234,24 @@ class TradingBot:
                 
                 # Check if we can open more positions
                 max_positions = self.trading_params.get('max_open_positions', 10)
-                if len(self.positions) >= max_positions:
+                book_full = len(self.positions) >= max_positions
+                if book_full:
                     logger.info(f"Max positions reached ({max_positions}), monitoring only")
+                    # Nothing consumes the queue meanwhile, so age out candidates that went stale
+                    self.token_scanner.discovery.discard_stale()
                 else:
                     # Find and trade tokens
                     await self.find_and_trade_tokens()
                 
-                # Monitor existing positions
-                await self.monitor_positions()
-                
                 # Save safety state
                 self.safety_manager.save_state()
                 
-                # Wait before next iteration
-                await asyncio.sleep(scan_interval)
+                # Exits are handled by the exit monitor. With a full book queued candidates
+                # can't be taken, so waiting on them would return at once.
+                if book_full:
+                    await asyncio.sleep(scan_interval)
+                else:
+                    await self.token_scanner.discovery.wait_for_candidates(scan_interval)
                 
             except Exception as e:
                 logger.error(f"Error in trading loop: {e}")
@@ -190,10 +283,16 @@ class TradingBot:
                 # Track position
                 self.positions[address] = {
                     'amount': amount,
+                    'cost_basis': amount,
+                    'realized_sol': 0.0,
                     'entry_time': datetime.now(timezone.utc),
                     'entry_price': current_price,
-                    'highest_price': current_price
+                    'highest_price': current_price,
+                    # Training row for the retraining service once the position closes
+                    'entry_features': self.feature_engine.features(address) if self.feature_engine else None
                 }
+                self.exit_engine.register(address, current_price,
+                                          **exit_levels_from_params(current_price, self.trading_params))
                 
                 logger.info(f"✅ Successfully bought {amount:.4f} SOL of {address[:8]}...")
                 logger.info(f"   TX: {tx_hash}")
@@ -206,8 +305,15 @@ class TradingBot:
             logger.error(f"Error buying token: {e}")
             self.alert_manager.error_alert(str(e), f"buying {address[:8]}...")
     
-    async def sell_token(self, address: str, amount: float, current_price: float = None):
-        """Sell a token with alerts"""
+    async def sell_token(self, address: str, amount: float, current_price: float = None) -> bool:
+        """
+        Sell a token with alerts
+        
+        :param address: Token contract address
+        :param amount: SOL cost basis to sell; less than the position's amount is a partial exit
+        :param current_price: Exit price used for PnL
+        :return: True if the sell went through
+        """
         try:
             tx_hash = await self.trader.sell_token(address, amount)
             
@@ -227,6 +333,9 @@ class TradingBot:
                     
                     # Record trade result
                     self.safety_manager.record_trade_result(profit_sol)
+                    if address in self.positions:
+                        self.positions[address]['realized_sol'] = (
+                            self.positions[address].get('realized_sol', 0.0) + profit_sol)
                     
                     logger.info(f"✅ Successfully sold {amount:.4f} SOL of {address[:8]}...")
                     logger.info(f"   Return: {sol_return:.4f} SOL (Profit: {profit_sol:+.4f} SOL)")
@@ -239,62 +348,186 @@ class TradingBot:
                     # Fallback if no price data
                     self.balance += amount
                 
-                # Remove position
+                # Shrink or remove position
                 if address in self.positions:
-                    del self.positions[address]
+                    remaining = self.positions[address].get('amount', 0) - amount
+                    if remaining > 1e-9:
+                        self.positions[address]['amount'] = remaining
+                    else:
+                        closed = self.positions.pop(address)
+                        self.exit_engine.remove(address)
+                        if self.retraining and closed.get('entry_features'):
+                            cost = closed.get('cost_basis') or amount
+                            self.retraining.record_closed_position(
+                                address, closed['entry_features'], closed.get('realized_sol', 0.0) / cost * 100,
+                                closed.get('entry_time'))
+                
+                return True
                 
         except Exception as e:
             logger.error(f"Error selling token: {e}")
             self.alert_manager.error_alert(str(e), f"selling {address[:8]}...")
+        
+        return False
     
 
     async def find_and_trade_tokens(self):
-        """Find and trade real tokens"""
+        """
+        Find and trade real tokens
+        
+        Candidates come from the discovery stream (already merged across
+        sources and deduplicated) and are analyzed concurrently (bounded by
+        analysis_concurrency), but buy decisions run one at a time in
+        discovery order so position sizing and balance checks never race.
+        """
         try:
-            # Get top gainers and trending tokens
-            top_gainers = await self.token_scanner.get_top_gainers()
-            trending = await self.token_scanner.get_trending_tokens()
-            
-            # Combine and deduplicate
-            all_tokens = []
-            seen = set()
+            cycle_start = time.perf_counter()
+            discovery = self.token_scanner.discovery
             
-            for token in top_gainers + trending:
-                address = token.get('contract_address', token.get('address', ''))
-                
-                # Skip if already seen or if it's a simulation token
-                if address in seen or address.startswith('Sim'):
-                    continue
-                    
-                seen.add(address)
-                all_tokens.append(token)
+            events = [
+                event for event in await discovery.get_batch(self.max_candidates_per_cycle)
+                if not event.address.startswith('Sim')
+            ]
+            all_tokens = [event.token for event in events]
+            if self.snapshot_store:
+                self.snapshot_store.record_tokens(all_tokens)
+            if self.feature_engine and all_tokens:
+                self.feature_engine.update_tokens(all_tokens)
+                self.feature_engine.prune(time.time(), self.feature_idle_seconds)
+            if self.covariance and all_tokens:
+                self.covariance.update_tokens(all_tokens)
+                self.covariance.prune(time.time(), self.covariance_idle_seconds)
+            if self.retraining:
+                for record in self.retraining.poll():
+                    delta = (record.get('delta') or {}).get('log_loss')
+                    logger.info(f"Entry model {record['kind']} retrain ({record['reason']}) in "
+                                f"{record.get('train_ms', 0):.0f} ms"
+                                + (f", validation log loss {delta:+.4f}" if delta is not None else "")
+                                + (f", published v{record['published']}" if record.get('published') else ", not published"))
             
             logger.info(f"Found {len(all_tokens)} unique real tokens to analyze")
             
-            # Analyze each token
-            for token in all_tokens:
-                await self.analyze_and_trade_token(token)
+            # Analyze in parallel, bounded by the API budget
+            semaphore = asyncio.Semaphore(self.analysis_concurrency)
+            
+            async def analyze(token):
+                async with semaphore:
+                    return await self.analyze_token_candidate(token)
+            
+            analyses = await asyncio.gather(*(analyze(token) for token in all_tokens),
+                                            return_exceptions=True)
+            await self._score_candidates(events, analyses)
+            analysis_time = time.perf_counter() - cycle_start
+            
+            # Decide sequentially, in discovery order
+            for event, analysis in zip(events, analyses):
+                if isinstance(analysis, Exception):
+                    logger.error(f"Error analyzing token: {analysis}")
+                    continue
+                await self.execute_trade_decision(event.token, analysis)
+                discovery.record_decision(event)
+            
+            self._record_cycle_stats(len(all_tokens), analysis_time, time.perf_counter() - cycle_start)
+            if events:
+                stats = discovery.get_stats()
+                logger.info(f"⏱️  Discovery→decision avg {stats['avg_discovery_to_decision_ms']:.0f}ms "
+                            f"(max {stats['max_discovery_to_decision_ms']:.0f}ms), "
+                            f"listing→decision avg {stats['avg_listing_to_decision_s']:.0f}s, "
+                            f"queue depth {stats['queue_depth']}")
                 
         except Exception as e:
             logger.error(f"Error finding tokens: {e}")
     
+    async def _score_candidates(self, events: List, analyses: List):
+        """
+        Add ML entry confidence to analyses that lack one (one model pass per cycle)
+        
+        :param events: Discovery events of this cycle
+        :param analyses: Their analyses, updated in place
+        """
+        if not self.ml_predictor or not self.ml_predictor.is_loaded:
+            return
+        pending = [(event, analysis) for event, analysis in zip(events, analyses)
+                   if isinstance(analysis, dict) and analysis.get('ml_confidence') is None]
+        if not pending:
+            return
+        try:
+            rows = [self.feature_engine.features(event.address) or {} for event, _ in pending]
+            predictions = await self.ml_predictor.predict_batch_async(rows)
+            for (_, analysis), prediction in zip(pending, predictions):
+                analysis['ml_confidence'] = prediction['confidence']
+        except Exception as e:
+            logger.error(f"Error scoring candidates: {e}")
+    
+    def _record_cycle_stats(self, token_count: int, analysis_time: float, cycle_time: float):
+        """Track per-cycle wall time and analysis throughput"""
+        tokens_per_sec = token_count / cycle_time if cycle_time > 0 else 0.0
+        stats = self.cycle_stats
+        stats['cycles'] += 1
+        stats['tokens_analyzed'] += token_count
+        stats['total_cycle_time'] += cycle_time
+        stats['last_cycle_time'] = cycle_time
+        stats['last_analysis_time'] = analysis_time
+        stats['last_token_count'] = token_count
+        stats['last_tokens_per_sec'] = tokens_per_sec
+        stats['avg_tokens_per_sec'] = (stats['tokens_analyzed'] / stats['total_cycle_time']
+                                       if stats['total_cycle_time'] > 0 else 0.0)
+        
+        logger.info(f"⏱️  Cycle: {token_count} tokens in {cycle_time:.2f}s "
+                    f"(analysis {analysis_time:.2f}s, {tokens_per_sec:.1f} tokens/sec, "
+                    f"concurrency {self.analysis_concurrency})")
+    
     async def analyze_and_trade_token(self, token: Dict):
         """Analyze a token and decide whether to trade"""
+        try:
+            analysis = await self.analyze_token_candidate(token)
+            await self.execute_trade_decision(token, analysis)
+        except Exception as e:
+            logger.error(f"Error analyzing token: {e}")
+    
+    async def analyze_token_candidate(self, token: Dict) -> Optional[Dict]:
+        """
+        Analyze a token without touching balance or positions (safe to run concurrently)
+        
+        :param token: Discovered token data
+        :return: Analysis result, or None if the token should be skipped
+        """
+        address = token.get('contract_address', token.get('address', ''))
+        
+        # Skip if we already have a position
+        if address in self.positions:
+            return None
+        
+        if self.token_scanner.token_analyzer:
+            return await self.token_scanner.token_analyzer.analyze_token(address)
+        
+        # If no analyzer, the simple criteria are applied at decision time
+        return {}
+    
+    async def execute_trade_decision(self, token: Dict, analysis: Optional[Dict]):
+        """
+        Turn an analysis into a buy (must run sequentially)
+        
+        :param token: Discovered token data
+        :param analysis: Result of analyze_token_candidate
+        """
         try:
             address = token.get('contract_address', token.get('address', ''))
             ticker = token.get('ticker', token.get('symbol', 'UNKNOWN'))
             
-            # Skip if we already have a position
-            if address in self.positions:
+            # Skip if we already have a position (re-checked after analysis)
+            if analysis is None or address in self.positions:
+                return
+            
+            # Earlier buys in this cycle may have filled the book
+            if len(self.positions) >= self.trading_params.get('max_open_positions', 10):
                 return
             
             # Get ML confidence if available
             ml_confidence = None
             
-            # Analyze token
+            # Use the analyzer's verdict
             if self.token_scanner.token_analyzer:
-                analysis = await self.token_scanner.token_analyzer.analyze_token(address)
-                
                 if analysis.get('buy_recommendation', False):
                     logger.info(f"✅ Buy signal for {ticker} ({address[:8]}...)")
                     logger.info(f"   Reasons: {', '.join(analysis.get('reasons', []))}")
@@ -332,59 +565,90 @@ class TradingBot:
         except Exception as e:
             logger.error(f"Error analyzing token: {e}")
     
+    @property
+    def price_snapshots(self) -> Optional[PriceSnapshotService]:
+        """Batched price service for position monitoring (created on first use)"""
+        birdeye_api = self.token_scanner.birdeye_api
+        if not birdeye_api:
+            return None
+        if self._price_snapshots is None or self._price_snapshots.birdeye_api is not birdeye_api:
+            self._price_snapshots = PriceSnapshotService(birdeye_api)
+        return self._price_snapshots
+    
+    async def exit_monitor_loop(self):
+        """Price open positions every exit_tick_interval and feed the exit engine"""
+        while self.running:
+            await self.monitor_positions()
+            await asyncio.sleep(self.exit_tick_interval)
+    
     async def monitor_positions(self):
-        """Monitor existing positions for exit signals"""
+        """
+        Price all open positions in one batch and feed the ticks to the exit engine
+        
+        The engine checks each price against the position's sorted trigger
+        levels and starts the sell as soon as one is crossed; stop losses are
+        started first.
+        """
         try:
-            if not self.positions:
+            if not self.positions or not self.price_snapshots:
                 return
             
+            snapshot = await self.price_snapshots.get_snapshot(list(self.positions))
+            
+            prices = {}
             for address, position in list(self.positions.items()):
-                # Get current token data
-                if self.token_scanner.birdeye_api:
-                    token_info = await self.token_scanner.birdeye_api.get_token_info(address)
-                    
-                    if token_info:
-                        current_price = token_info.get('price_usd', 0)
-                        entry_price = position.get('entry_price', 0.0001)
-                        
-                        if entry_price > 0 and current_price > 0:
-                            pnl_pct = ((current_price / entry_price) - 1) * 100
-                            
-                            # Update highest price for trailing stop
-                            if current_price > position.get('highest_price', 0):
-                                position['highest_price'] = current_price
-                            
-                            # Get exit parameters from trading_params.json
-                            take_profit_pct = self.trading_params.get('take_profit_pct', 0.5) * 100  # Convert to percentage
-                            stop_loss_pct = self.trading_params.get('stop_loss_pct', 0.05) * 100
-                            
-                            # Check trailing stop if enabled
-                            if self.trading_params.get('trailing_stop_enabled', True):
-                                activation_pct = self.trading_params.get('trailing_stop_activation_pct', 0.3) * 100
-                                distance_pct = self.trading_params.get('trailing_stop_distance_pct', 0.15) * 100
-                                
-                                if pnl_pct >= activation_pct:
-                                    # Trailing stop activated
-                                    highest_price = position['highest_price']
-                                    trailing_stop_price = highest_price * (1 - distance_pct / 100)
-                                    
-                                    if current_price <= trailing_stop_price:
-                                        logger.info(f"📉 Trailing stop hit for {address[:8]}... "
-                                                   f"(Peak: +{((highest_price/entry_price)-1)*100:.1f}%, "
-                                                   f"Exit: +{pnl_pct:.1f}%)")
-                                        await self.sell_token(address, position['amount'], current_price)
-                                        continue
-                            
-                            # Check regular take profit and stop loss
-                            if pnl_pct >= take_profit_pct:
-                                logger.info(f"🎯 Take profit hit for {address[:8]}... (+{pnl_pct:.1f}%)")
-                                await self.sell_token(address, position['amount'], current_price)
-                            elif pnl_pct <= -stop_loss_pct:
-                                logger.info(f"🛑 Stop loss hit for {address[:8]}... ({pnl_pct:.1f}%)")
-                                await self.sell_token(address, position['amount'], current_price)
+                current_price = snapshot.prices.get(address)
+                
+                # No price this tick - never exit on a fallback value
+                if not current_price:
+                    continue
+                
+                position['last_price'] = current_price
+                position['last_price_time'] = snapshot.timestamp
+                if current_price > position.get('highest_price', 0):
+                    position['highest_price'] = current_price
+                prices[address] = current_price
+            
+            self.exit_engine.on_prices(prices, snapshot.started_at)
+            if self.snapshot_store:
+                self.snapshot_store.record_prices(prices, snapshot.timestamp)
+            if self.feature_engine:
+                self.feature_engine.update_prices(prices, snapshot.timestamp)
+            if self.covariance:
+                self.covariance.update_prices(prices, snapshot.timestamp)
                                 
         except Exception as e:
             logger.error(f"Error monitoring positions: {e}")
+    
+    async def _execute_exit(self, signal: ExitSignal) -> bool:
+        """
+        Sell for a triggered exit (called by the exit engine)
+        
+        :param signal: Triggered exit
+        :return: True if the sell went through
+        """
+        address = signal.key
+        position = self.positions.get(address)
+        if not position:
+            # Sold elsewhere since the levels were registered
+            self.exit_engine.remove(address)
+            return False
+        
+        entry_price = position.get('entry_price', 0.0001)
+        pnl_pct = ((signal.price / entry_price) - 1) * 100 if entry_price > 0 else 0.0
+        if signal.reason == 'trailing_stop':
+            peak_pct = ((position.get('highest_price', signal.price) / entry_price) - 1) * 100
+            logger.info(f"📉 Trailing stop hit for {address[:8]}... "
+                       f"(Peak: +{peak_pct:.1f}%, Exit: {pnl_pct:+.1f}%)")
+        elif signal.reason == 'stop_loss':
+            logger.info(f"🛑 Stop loss hit for {address[:8]}... ({pnl_pct:.1f}%)")
+        elif signal.reason == 'partial_exit':
+            logger.info(f"🎯 Partial exit for {address[:8]}... (+{pnl_pct:.1f}%, "
+                       f"selling {signal.fraction * 100:.0f}% of remaining)")
+        else:
+            logger.info(f"🎯 Take profit hit for {address[:8]}... (+{pnl_pct:.1f}%)")
+        
+        return await self.sell_token(address, position['amount'] * signal.fraction, signal.price)
 
     async def stop(self):
         """Stop the trading bot"""
@@ -396,5 +660,26 @@ class TradingBot:
         
         # Save final state
         self.safety_manager.save_state()
+        
+        # Stop discovery sources
+        await self.token_scanner.discovery.stop()
+        
+        # Stop pricing positions and let triggered sells finish
+        if self._exit_monitor is not None:
+            self._exit_monitor.cancel()
+            self._exit_monitor = None
+        await self.exit_engine.drain()
+        
+        # Flush queued token writes before the process exits
+        await close_all_write_queues()
+        close_all_snapshot_stores()
+        if self.ml_predictor:
+            self.ml_predictor.close()
+        if self.retraining:
+            await asyncio.get_running_loop().run_in_executor(None, self.retraining.stop)
+        
+        # Let the shutdown alert go out, then release pooled connections
+        await self.alert_manager.flush()
+        await close_http_sessions()
     
     # ... (rest of the existing methods remain the same) ...
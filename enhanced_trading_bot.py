@@ -53,6 +53,31 @@ class EnhancedTradingBot(TradingBot):
             'reasons': citadel_analysis.get('reasons', [])
         }
     
+    async def _score_candidates(self, events: List, analyses: List):
+        """
+        Score the cycle's candidates with the Citadel factor model in one vectorized pass
+        
+        Runs after the ML pass so its confidence feeds the ML alpha. Each
+        analysis gets 'citadel_signals' (analyze_token() shape) and 'citadel_rank'.
+        
+        :param events: Discovery events of this cycle
+        :param analyses: Their analyses, updated in place
+        """
+        await super()._score_candidates(events, analyses)
+        scored = [(event, analysis) for event, analysis in zip(events, analyses) if isinstance(analysis, dict)]
+        if not scored:
+            return
+        try:
+            tokens = [dict(event.token, ml_confidence=analysis.get('ml_confidence')) for event, analysis in scored]
+            frame = self.citadel_strategy.score_universe(tokens)
+            for i, (_, analysis) in enumerate(scored):
+                analysis['citadel_rank'] = int(frame.rank[i])
+                analysis['citadel_signals'] = self.citadel_strategy.candidate_signals(frame, i)
+            best = [scored[i][0].token.get('symbol', scored[i][0].address[:8]) for i in frame.top(3)]
+            logger.info(f"📊 Citadel ranked {len(frame)} candidates, top: {', '.join(best)}")
+        except Exception as e:
+            logger.error(f"Error computing Citadel factors: {e}")
+    
     async def execute_buy(self, token_data: Dict, analysis: Dict) -> Dict:
         """Execute buy with Citadel position sizing"""
         
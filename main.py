@@ -10,6 +10,11 @@ from datetime import datetime
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Profile the imports below in a fresh interpreter instead of running them
+if __name__ == "__main__" and '--profile-startup' in sys.argv:
+    from utils.startup_profiler import profile_entry_point
+    sys.exit(profile_entry_point('main'))
+
 from config.bot_config import BotConfiguration
 from core.trading.trading_bot import TradingBot
 from core.trading.position_manager import PositionManager
@@ -124,6 +129,11 @@ if __name__ == "__main__":
         default='config/bot_control.json',
         help='Path to configuration file'
     )
+    parser.add_argument(
+        '--profile-startup',
+        action='store_true',
+        help='Print an import-time breakdown of startup and exit'
+    )
     
     args = parser.parse_args()
     
@@ -0,0 +1,2 @@
+from .cross_validation import (EvaluationDataset, FeatureCache, PurgedWalkForward, WalkForwardEvaluator,
+                               CVResult, closed_trades, epoch_seconds, rows_dataset, snapshot_dataset)
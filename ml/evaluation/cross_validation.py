@@ -0,0 +1,544 @@
+# ml/evaluation/cross_validation.py
+"""
+Walk-forward evaluation of entry models: purged, embargoed time-series folds
+run in parallel over a cached, memory-mapped feature matrix
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ml.training.retraining import classification_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'data/ml/feature_cache'
+DATASET_ARRAYS = ('X', 'y', 'pnl', 'times', 'label_end')
+
+# Bump when a dataset builder changes what it produces
+BUILDER_VERSION = 1
+
+
+@dataclass
+class EvaluationDataset:
+    """
+    Time-ordered training rows
+
+    X holds one feature row per closed trade, y its 0/1 outcome and pnl its
+    return in percent; times is when the features were observed (entry) and
+    label_end when the outcome was known (exit), both epoch seconds.
+    """
+    X: np.ndarray
+    y: np.ndarray
+    pnl: np.ndarray
+    times: np.ndarray
+    label_end: np.ndarray
+    feature_names: Tuple[str, ...]
+    path: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def sorted(self) -> 'EvaluationDataset':
+        """The rows in time order"""
+        order = np.argsort(self.times, kind='stable')
+        if np.all(order == np.arange(len(order))):
+            return self
+        return EvaluationDataset(self.X[order], self.y[order], self.pnl[order], self.times[order],
+                                 self.label_end[order], self.feature_names)
+
+    @classmethod
+    def from_frame(cls, X, y, pnl=None, times=None, label_end=None) -> 'EvaluationDataset':
+        """
+        Build from a feature DataFrame
+
+        :param X: Feature DataFrame (a DatetimeIndex is used as times when none are given)
+        :param y: Labels
+        :param pnl: Trade returns in percent (defaults to +1/-1 by label)
+        :param times: Feature timestamps, epoch seconds
+        :param label_end: Outcome timestamps, epoch seconds (defaults to times)
+        :return: EvaluationDataset in time order
+        """
+        import pandas as pd
+
+        y = np.asarray(y, dtype=np.int8)
+        if times is None:
+            if isinstance(X.index, pd.DatetimeIndex):
+                index = X.index if X.index.tz is not None else X.index.tz_localize('UTC')
+                times = ((index - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy()
+            else:
+                times = np.arange(len(y), dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64)
+        pnl = np.where(y == 1, 1.0, -1.0) if pnl is None else np.asarray(pnl, dtype=np.float64)
+        label_end = times if label_end is None else np.asarray(label_end, dtype=np.float64)
+        return cls(np.ascontiguousarray(X.to_numpy(dtype=np.float64)), y, pnl, times, label_end,
+                   tuple(str(c) for c in X.columns)).sorted()
+
+    def save(self, directory: str) -> str:
+        """
+        Write the arrays as .npy files (renamed into place)
+
+        :param directory: Target directory (replaced if it exists)
+        :return: The directory
+        """
+        tmp = f"{directory}.tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in DATASET_ARRAYS:
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'feature_names': list(self.feature_names), 'rows': len(self),
+                       'builder_version': BUILDER_VERSION}, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+        return directory
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'EvaluationDataset':
+        """
+        Read a saved dataset
+
+        :param directory: Directory written by save()
+        :param mmap: Memory-map the arrays (shared by every fold worker, nothing copied)
+        :return: EvaluationDataset
+        """
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                  for name in DATASET_ARRAYS}
+        return cls(feature_names=tuple(meta['feature_names']), path=directory, **arrays)
+
+
+def source_fingerprint(*paths: str) -> List:
+    """(path, size, mtime) of every file under the given paths, for cache keys"""
+    entries = []
+    for path in paths:
+        if path is None or not os.path.exists(path):
+            entries.append([path, None])
+            continue
+        if os.path.isfile(path):
+            st = os.stat(path)
+            entries.append([path, st.st_size, st.st_mtime_ns])
+            continue
+        for root, _, files in sorted(os.walk(path)):
+            for name in sorted(files):
+                st = os.stat(os.path.join(root, name))
+                entries.append([os.path.join(root, name), st.st_size, st.st_mtime_ns])
+    return entries
+
+
+class FeatureCache:
+    """
+    Engineered feature matrices on disk, keyed by their inputs
+
+    A key covers the data sources (sizes and mtimes), the builder and its
+    settings, so a changed database or snapshot store misses the cache and
+    rebuilds; unchanged inputs load in milliseconds, memory-mapped.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR):
+        """
+        :param root: Cache directory
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self.stats = {'hits': 0, 'misses': 0, 'build_ms': 0.0, 'load_ms': 0.0}
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Stable key for JSON-serializable parts"""
+        blob = json.dumps([BUILDER_VERSION, *parts], sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+    def get(self, key: str) -> Optional[EvaluationDataset]:
+        directory = os.path.join(self.root, key)
+        if not os.path.exists(os.path.join(directory, 'meta.json')):
+            return None
+        start = time.perf_counter()
+        dataset = EvaluationDataset.load(directory)
+        self.stats['load_ms'] += (time.perf_counter() - start) * 1000
+        os.utime(directory)  # recency for prune()
+        return dataset
+
+    def put(self, key: str, dataset: EvaluationDataset) -> EvaluationDataset:
+        return EvaluationDataset.load(dataset.save(os.path.join(self.root, key)))
+
+    def get_or_build(self, key_parts: Sequence, builder: Callable[[], EvaluationDataset]) -> EvaluationDataset:
+        """
+        Cached dataset for the key, building (and caching) it on a miss
+
+        :param key_parts: Everything the dataset depends on
+        :param builder: Builds the dataset
+        :return: Memory-mapped EvaluationDataset
+        """
+        key = self.key(*key_parts)
+        dataset = self.get(key)
+        if dataset is not None:
+            self.stats['hits'] += 1
+            return dataset
+        self.stats['misses'] += 1
+        start = time.perf_counter()
+        dataset = builder()
+        self.stats['build_ms'] += (time.perf_counter() - start) * 1000
+        return self.put(key, dataset)
+
+    def prune(self, keep: int = 10) -> int:
+        """Delete all but the most recently used entries"""
+        entries = sorted((os.path.getmtime(os.path.join(self.root, e)), e) for e in os.listdir(self.root)
+                         if os.path.isdir(os.path.join(self.root, e)))
+        removed = 0
+        for _, entry in entries[:-keep] if keep > 0 else entries:
+            shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+            removed += 1
+        return removed
+
+
+# ----------------------------------------------------------------------
+# Dataset builders
+# ----------------------------------------------------------------------
+
+def epoch_seconds(values) -> np.ndarray:
+    """Timestamps (ISO strings, datetimes or None) as float epoch seconds, NaN when missing"""
+    import pandas as pd
+
+    stamps = pd.to_datetime(pd.Series(values), utc=True, errors='coerce', format='mixed')
+    return ((stamps - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64)
+
+
+def rows_dataset(path: str, schema=None) -> EvaluationDataset:
+    """
+    Dataset from the retraining service's closed-position rows
+
+    :param path: training_rows.jsonl written by RetrainingWorker
+    :param schema: FeatureSchema (defaults to the enhanced layout)
+    :return: EvaluationDataset
+    """
+    from ml.features.schema import ENHANCED_SCHEMA
+
+    schema = schema or ENHANCED_SCHEMA
+    rows = []
+    with open(path) as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+    X = schema.vectorize([r['features'] for r in rows])
+    y = np.array([int(r['label']) for r in rows], dtype=np.int8)
+    pnl = np.array([float(r.get('pnl_pct', 1.0 if r['label'] else -1.0)) for r in rows])
+    label_end = epoch_seconds([r.get('exit_time') for r in rows])
+    times = epoch_seconds([r.get('entry_time') or r.get('exit_time') for r in rows])
+    times = np.where(np.isnan(times), label_end, times)
+    timed = ~np.isnan(times)
+    if not timed.all():
+        logger.warning(f"Dropping {int((~timed).sum())} rows without entry/exit time from {path}")
+    label_end = np.where(np.isnan(label_end), times, label_end)
+    return EvaluationDataset(X[timed], y[timed], pnl[timed], times[timed], label_end[timed],
+                             schema.names).sorted()
+
+
+def closed_trades(db) -> 'pd.DataFrame':
+    """
+    Round trips from the trades table: each SELL paired with the latest BUY before it
+
+    :param db: Database instance
+    :return: DataFrame with contract_address, entry_time, exit_time (epoch seconds) and pnl_pct
+    """
+    import pandas as pd
+
+    with db.pool.reader() as conn:
+        trades = pd.read_sql_query('''
+        SELECT contract_address, action, price, timestamp
+        FROM trades
+        WHERE contract_address IS NOT NULL AND price > 0 AND action IN ('BUY', 'SELL')
+        ''', conn)
+    if trades.empty:
+        return pd.DataFrame(columns=['contract_address', 'entry_time', 'exit_time', 'pnl_pct'])
+
+    trades['time'] = epoch_seconds(trades['timestamp'])
+    trades = trades.dropna(subset=['time']).sort_values('time', kind='stable')
+    buys = trades[trades['action'] == 'BUY'][['contract_address', 'time', 'price']]
+    sells = trades[trades['action'] == 'SELL'][['contract_address', 'time', 'price']]
+    pairs = pd.merge_asof(sells, buys.rename(columns={'time': 'entry_time', 'price': 'entry_price'}),
+                          left_on='time', right_on='entry_time', by='contract_address',
+                          direction='backward', allow_exact_matches=False)
+    pairs = pairs.dropna(subset=['entry_time'])
+    return pd.DataFrame({
+        'contract_address': pairs['contract_address'].to_numpy(),
+        'entry_time': pairs['entry_time'].to_numpy(),
+        'exit_time': pairs['time'].to_numpy(),
+        'pnl_pct': (pairs['price'] / pairs['entry_price'] - 1).to_numpy() * 100
+    })
+
+
+def snapshot_dataset(trades, store, bar_seconds: int = 600) -> EvaluationDataset:
+    """
+    EnhancedMLTrainer features at each trade's entry, from recorded snapshots
+
+    Features come from the last bar that closed before the entry, so nothing
+    observed after the decision leaks in. Each token's series is engineered
+    once for all of its trades.
+
+    :param trades: closed_trades() frame
+    :param store: SnapshotStore
+    :param bar_seconds: Bar width
+    :return: EvaluationDataset (trades without snapshot history are dropped)
+    """
+    import pandas as pd
+    from ml.features import FEATURE_NAMES
+    from ml.training.ml_enhancement_strategy import EnhancedMLTrainer
+
+    trainer = EnhancedMLTrainer()
+    X, keep = [], []
+    for address, group in trades.groupby('contract_address', sort=False):
+        series = store.token_series(address, end=float(group['entry_time'].max()), bar_seconds=bar_seconds)
+        if series.empty:
+            continue
+        features = trainer.create_features(series)[list(FEATURE_NAMES)]
+        bar_starts = ((features.index - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy()
+        # Last bar whose end is at or before the entry
+        pos = np.searchsorted(bar_starts + bar_seconds, group['entry_time'].to_numpy(), side='right') - 1
+        values = features.to_numpy(dtype=np.float64)
+        for row, p in zip(group.index, pos):
+            if p >= 0:
+                X.append(values[p])
+                keep.append(row)
+
+    kept = trades.loc[keep]
+    pnl = kept['pnl_pct'].to_numpy(dtype=np.float64)
+    X = np.array(X, dtype=np.float64).reshape(len(keep), len(FEATURE_NAMES))
+    return EvaluationDataset(X, (pnl > 0).astype(np.int8), pnl, kept['entry_time'].to_numpy(dtype=np.float64),
+                             kept['exit_time'].to_numpy(dtype=np.float64), tuple(FEATURE_NAMES)).sorted()
+
+
+# ----------------------------------------------------------------------
+# Folds
+# ----------------------------------------------------------------------
+
+class PurgedWalkForward:
+    """
+    Walk-forward splits for overlapping trade outcomes
+
+    The time-ordered rows are cut into n_splits + 1 blocks; fold k tests on
+    block k + 1 and trains on rows before it. Training rows whose outcome
+    was only known after the test block began minus the embargo are purged,
+    so no fold trains on a label that overlaps its test period (a position
+    opened before the cut but closed inside it would otherwise leak).
+    """
+
+    def __init__(self, n_splits: int = 5, embargo_seconds: float = 0.0,
+                 max_train_size: Optional[int] = None, min_train_size: int = 20):
+        """
+        :param n_splits: Test folds
+        :param embargo_seconds: Extra gap between the last training outcome and the test block
+        :param max_train_size: Rolling window of most recent training rows (None = expanding)
+        :param min_train_size: Folds with fewer training rows are skipped
+        """
+        self.n_splits = n_splits
+        self.embargo_seconds = embargo_seconds
+        self.max_train_size = max_train_size
+        self.min_train_size = min_train_size
+
+    def split(self, times: np.ndarray, label_end: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        :param times: Feature timestamps, ascending
+        :param label_end: Outcome timestamps (defaults to times)
+        :return: (train indices, test indices) per fold
+        """
+        n = len(times)
+        ends = times if label_end is None else label_end
+        edges = np.linspace(0, n, self.n_splits + 2).astype(int)
+        folds = []
+        for k in range(1, self.n_splits + 1):
+            test = np.arange(edges[k], edges[k + 1])
+            if len(test) == 0:
+                continue
+            cutoff = times[test[0]] - self.embargo_seconds
+            train = np.flatnonzero(ends[:edges[k]] < cutoff)
+            if self.max_train_size:
+                train = train[-self.max_train_size:]
+            if len(train) < self.min_train_size:
+                continue
+            folds.append((train, test))
+        return folds
+
+
+def default_estimator():
+    """Scaler + RandomForest, the shape of the bot's entry models"""
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.ensemble import RandomForestClassifier
+
+    return make_pipeline(StandardScaler(), RandomForestClassifier(
+        n_estimators=200, max_depth=10, min_samples_leaf=5, random_state=42, n_jobs=1))
+
+
+def trading_pnl(proba: np.ndarray, pnl: np.ndarray, threshold: float, fee_pct: float) -> Dict:
+    """
+    Simulated P&L of taking the trades the model scores at or above threshold
+
+    Every trade is one equal-sized position; fee_pct is the round-trip cost.
+
+    :return: Trades taken, total and average return, hit rate, and the same
+             for taking every trade (the baseline)
+    """
+    taken = proba >= threshold
+    net = pnl - fee_pct
+    return {
+        'trades': int(taken.sum()),
+        'pnl_pct': float(net[taken].sum()),
+        'avg_pnl_pct': float(net[taken].mean()) if taken.any() else 0.0,
+        'hit_rate': float((pnl[taken] > 0).mean()) if taken.any() else 0.0,
+        'baseline_trades': int(len(pnl)),
+        'baseline_pnl_pct': float(net.sum()),
+    }
+
+
+# Worker-process state, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(path: str, estimator, threshold: float, fee_pct: float):
+    _worker.update(data=EvaluationDataset.load(path), estimator=estimator, threshold=threshold, fee_pct=fee_pct)
+
+
+def _run_fold(task: Tuple[int, np.ndarray, np.ndarray]) -> Dict:
+    """Fit on the training rows, score the test block (runs in a worker)"""
+    from sklearn.base import clone
+    from sklearn.metrics import precision_score, recall_score
+
+    fold, train, test = task
+    data = _worker['data']
+    y_train, y_test = np.asarray(data.y[train]), np.asarray(data.y[test])
+    row = {'fold': fold, 'train_rows': int(len(train)), 'test_rows': int(len(test)),
+           'train_start': float(data.times[train[0]]), 'test_start': float(data.times[test[0]]),
+           'test_end': float(data.times[test[-1]])}
+    if len(np.unique(y_train)) < 2:
+        row['skipped'] = 'training rows have a single class'
+        return row
+
+    start = time.perf_counter()
+    model = clone(_worker['estimator']).fit(np.asarray(data.X[train]), y_train)
+    row['fit_ms'] = (time.perf_counter() - start) * 1000
+    classes = list(model.classes_)
+    proba = model.predict_proba(np.asarray(data.X[test]))[:, classes.index(1)]
+    predicted = (proba >= _worker['threshold']).astype(int)
+
+    row.update(classification_metrics(y_test, proba))
+    row['precision'] = float(precision_score(y_test, predicted, zero_division=0))
+    row['recall'] = float(recall_score(y_test, predicted, zero_division=0))
+    row.update(trading_pnl(proba, np.asarray(data.pnl[test]), _worker['threshold'], _worker['fee_pct']))
+    return row
+
+
+class CVResult:
+    """Per-fold metrics of a walk-forward evaluation"""
+
+    def __init__(self, folds: List[Dict], elapsed_s: float, dataset_rows: int):
+        import pandas as pd
+
+        self.folds = folds
+        self.elapsed_s = elapsed_s
+        self.dataset_rows = dataset_rows
+        self.table = pd.DataFrame(folds)
+
+    def summary(self) -> Dict:
+        """Mean metrics across scored folds, summed P&L"""
+        scored = [f for f in self.folds if 'skipped' not in f]
+        summary = {'folds': len(scored), 'skipped_folds': len(self.folds) - len(scored),
+                   'rows': self.dataset_rows, 'elapsed_s': self.elapsed_s}
+        if not scored:
+            return summary
+        for key in ('precision', 'recall', 'auc', 'accuracy', 'log_loss', 'brier'):
+            values = [f[key] for f in scored if f.get(key) is not None]
+            summary[key] = float(np.mean(values)) if values else None
+        summary['auc_std'] = float(np.std([f['auc'] for f in scored if f.get('auc') is not None] or [0.0]))
+        for key in ('trades', 'pnl_pct', 'baseline_trades', 'baseline_pnl_pct'):
+            summary[key] = float(sum(f[key] for f in scored))
+        return summary
+
+    def save(self, path: str):
+        """Write the fold table (CSV) and the summary (JSON next to it)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.table.to_csv(path, index=False)
+        with open(os.path.splitext(path)[0] + '_summary.json', 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+class WalkForwardEvaluator:
+    """
+    Runs PurgedWalkForward folds in a process pool
+
+    The dataset is memory-mapped from its cache directory by every worker
+    (datasets that aren't cached yet are written to a temporary one first),
+    so folds share one copy of the feature matrix and start without
+    pickling it.
+    """
+
+    def __init__(self, estimator=None, n_splits: int = 5, embargo_seconds: float = 3600.0,
+                 max_train_size: Optional[int] = None, threshold: float = 0.5, fee_pct: float = 1.0,
+                 workers: Optional[int] = None):
+        """
+        :param estimator: Unfitted scikit-learn classifier or pipeline (default_estimator() if None)
+        :param n_splits: Walk-forward folds
+        :param embargo_seconds: Gap between the last training outcome and each test block
+        :param max_train_size: Rolling training window in rows (None = expanding)
+        :param threshold: Entry probability for the precision/recall and P&L simulation
+        :param fee_pct: Round-trip cost per simulated trade, percent
+        :param workers: Worker processes (defaults to every core, capped at the fold count)
+        """
+        self.estimator = estimator if estimator is not None else default_estimator()
+        self.splitter = PurgedWalkForward(n_splits, embargo_seconds, max_train_size)
+        self.threshold = threshold
+        self.fee_pct = fee_pct
+        self.workers = workers or os.cpu_count() or 1
+
+    def evaluate(self, dataset: EvaluationDataset) -> CVResult:
+        """
+        Fit and score every fold
+
+        :param dataset: EvaluationDataset (time-ordered)
+        :return: CVResult
+        """
+        started = time.perf_counter()
+        folds = self.splitter.split(np.asarray(dataset.times), np.asarray(dataset.label_end))
+        if not folds:
+            logger.warning(f"No walk-forward folds with enough training rows in {len(dataset)} rows")
+            return CVResult([], time.perf_counter() - started, len(dataset))
+
+        tmp = None
+        path = dataset.path
+        if path is None:
+            tmp = tempfile.mkdtemp(prefix='wf_')
+            path = dataset.save(os.path.join(tmp, 'data'))
+        try:
+            tasks = [(k, train, test) for k, (train, test) in enumerate(folds)]
+            workers = min(self.workers, len(tasks))
+            initargs = (path, self.estimator, self.threshold, self.fee_pct)
+            if workers <= 1:
+                _init_worker(*initargs)
+                rows = [_run_fold(task) for task in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=initargs) as pool:
+                    rows = list(pool.map(_run_fold, tasks))
+        finally:
+            _worker.clear()
+            if tmp:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        result = CVResult(rows, time.perf_counter() - started, len(dataset))
+        summary = result.summary()
+        if summary['folds']:
+            logger.info(f"Walk-forward: {summary['folds']} folds in {result.elapsed_s:.1f}s, "
+                        f"AUC {summary['auc'] or 0:.3f}, precision {summary['precision']:.3f}, "
+                        f"P&L {summary['pnl_pct']:+.1f}% vs {summary['baseline_pnl_pct']:+.1f}% taking all")
+        return result
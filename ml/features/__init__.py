@@ -0,0 +1,2 @@
+from .online import FEATURE_NAMES, OnlineFeatureEngine
+from .schema import ENHANCED_SCHEMA, FeatureSchema, resolve_schema
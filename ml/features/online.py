@@ -0,0 +1,584 @@
+# ml/features/online.py
+"""
+Online computation of the EnhancedMLTrainer feature vector
+
+Keeps O(1)-update rolling state per token (ring buffers, sliding Welford
+mean/variance, incremental EMAs) instead of recomputing every window over
+the full pandas history.
+"""
+import time
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Column order of EnhancedMLTrainer.create_features
+FEATURE_NAMES = (
+    'price_change_1h', 'price_change_6h', 'price_change_24h',
+    'volatility_1h', 'volatility_24h',
+    'volume_ratio', 'volume_trend',
+    'liquidity_ratio', 'liquidity_stability',
+    'mcap_growth', 'mcap_to_volume',
+    'rsi', 'macd_signal', 'bb_position',
+    'holder_growth', 'holder_concentration',
+    'hour_of_day', 'day_of_week',
+    'price_volume_interaction', 'volatility_liquidity_ratio',
+)
+
+INPUT_FIELDS = ('price', 'volume', 'liquidity', 'market_cap', 'holders')
+
+# Token dict keys per input, in preference order
+INPUT_ALIASES = {
+    'price': ('price_usd', 'price'),
+    'volume': ('volume_24h', 'volume'),
+    'liquidity': ('liquidity_usd', 'liquidity'),
+    'market_cap': ('mcap', 'market_cap'),
+    'holders': ('holders',),
+}
+
+DEFAULT_BAR_SECONDS = 600
+
+# Bars without an observation repeat the last values (create_features runs on
+# a forward-filled grid); past this many the windows and EMAs have converged
+MAX_GAP_BARS = 600
+
+# Sliding sums drift by rounding; rebuild them from the ring this often
+RESYNC_BARS = 1024
+
+
+class _Ring:
+    """
+    Last `length` committed values per token slot
+
+    Also tracks how many of the latest values are identical, so windows can
+    tell exactly when they are constant.
+    """
+
+    def __init__(self, length: int, capacity: int):
+        self.length = length
+        self.values = np.full((capacity, length), np.nan)
+        self.run = np.zeros(capacity, dtype=np.int64)
+
+    def grow(self, capacity: int):
+        values = np.full((capacity, self.length), np.nan)
+        values[:len(self.values)] = self.values
+        self.values = values
+        run = np.zeros(capacity, dtype=np.int64)
+        run[:len(self.run)] = self.run
+        self.run = run
+
+    def reset(self, slots: np.ndarray):
+        self.values[slots] = np.nan
+        self.run[slots] = 0
+
+    def ago(self, slots: np.ndarray, n: np.ndarray, k: int) -> np.ndarray:
+        """Committed value k bars before the pending one (NaN if there is none)"""
+        values = self.values[slots, (n - k) % self.length]
+        return np.where(n >= k, values, np.nan)
+
+    def run_after(self, slots: np.ndarray, n: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """Length of the run of identical values ending with x"""
+        return np.where(x == self.ago(slots, n, 1), self.run[slots] + 1, 1)
+
+    def push(self, slots: np.ndarray, n: np.ndarray, x: np.ndarray):
+        self.run[slots] = self.run_after(slots, n, x)
+        self.values[slots, n % self.length] = x
+
+
+class _Window:
+    """
+    Sliding mean/variance over the last `size` values of a ring
+
+    Welford updates: add while the window fills, replace the outgoing value
+    once it is full. NaNs are counted and enter the sums as 0; the stats are
+    NaN while any NaN is inside the window (pandas min_periods=window).
+    """
+
+    def __init__(self, ring: _Ring, size: int, capacity: int):
+        if ring.length < size:
+            raise ValueError(f"Ring of {ring.length} cannot hold a window of {size}")
+        self.ring = ring
+        self.size = size
+        self.mean = np.zeros(capacity)
+        self.m2 = np.zeros(capacity)
+        self.nans = np.zeros(capacity, dtype=np.int64)
+
+    def grow(self, capacity: int):
+        for name in ('mean', 'm2', 'nans'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def reset(self, slots: np.ndarray):
+        self.mean[slots] = 0.0
+        self.m2[slots] = 0.0
+        self.nans[slots] = 0
+
+    def step(self, slots: np.ndarray, n: np.ndarray, x: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """State after appending x to n committed values (nothing is written)"""
+        w = self.size
+        mean, m2 = self.mean[slots], self.m2[slots]
+        full = n >= w
+        old = self.ring.values[slots, (n - w) % self.ring.length]
+        old_nan = full & np.isnan(old)
+        old = np.where(full, np.nan_to_num(old), 0.0)
+        new_nan = np.isnan(x)
+        x = np.nan_to_num(x)
+
+        # Growing window: k = n + 1 values; full window: x replaces old
+        k = np.where(full, w, n + 1)
+        delta = np.where(full, x - old, x - mean)
+        new_mean = mean + delta / k
+        new_m2 = np.where(full, m2 + delta * (x - new_mean + old - mean), m2 + delta * (x - new_mean))
+        return new_mean, new_m2, self.nans[slots] + new_nan - old_nan
+
+    def commit(self, slots: np.ndarray, n: np.ndarray, x: np.ndarray):
+        self.mean[slots], self.m2[slots], self.nans[slots] = self.step(slots, n, x)
+
+    def resync(self, slots: np.ndarray, n: np.ndarray):
+        """Rebuild the sums of full windows from the ring (n = committed count)"""
+        w = self.size
+        idx = (n[:, None] - w + np.arange(w)) % self.ring.length
+        values = self.ring.values[slots[:, None], idx]
+        self.nans[slots] = np.isnan(values).sum(axis=1)
+        values = np.nan_to_num(values)
+        self.mean[slots] = values.mean(axis=1)
+        self.m2[slots] = ((values - self.mean[slots][:, None]) ** 2).sum(axis=1)
+
+    def stats(self, state: Tuple[np.ndarray, ...], count: np.ndarray, x: np.ndarray,
+              run: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rolling mean and sample std (NaN until the window holds `size` valid values)
+
+        :param state: Window state from step()
+        :param count: Values seen including x
+        :param x: The value step() appended
+        :param run: Identical values ending with x (from the ring's run_after)
+        """
+        mean, m2, nans = state
+        valid = (count >= self.size) & (nans == 0)
+        # pandas gives a constant window exactly its value and 0 spread; sliding
+        # sums leave rounding residue that would flip 0/0 checks downstream
+        constant = run >= self.size
+        var = np.where(constant, 0.0, np.maximum(m2 / (self.size - 1), 0.0))
+        mean = np.where(constant, x, mean)
+        return np.where(valid, mean, np.nan), np.where(valid, np.sqrt(var), np.nan)
+
+
+class _Ema:
+    """EMA with adjust=False semantics, starting at the first valid value"""
+
+    def __init__(self, span: int, capacity: int):
+        self.alpha = 2.0 / (span + 1)
+        self.value = np.full(capacity, np.nan)
+
+    def grow(self, capacity: int):
+        value = np.full(capacity, np.nan)
+        value[:len(self.value)] = self.value
+        self.value = value
+
+    def reset(self, slots: np.ndarray):
+        self.value[slots] = np.nan
+
+    def step(self, slots: np.ndarray, x: np.ndarray) -> np.ndarray:
+        prev = self.value[slots]
+        return np.where(np.isnan(prev), x, (1 - self.alpha) * prev + self.alpha * x)
+
+    def commit(self, slots: np.ndarray, x: np.ndarray):
+        self.value[slots] = self.step(slots, x)
+
+
+class OnlineFeatureEngine:
+    """
+    Live EnhancedMLTrainer feature vectors for many tokens at once
+
+    Snapshots are bucketed into bars of bar_seconds, like the resampled
+    series create_features is trained on: updates inside the current bar
+    revise it (last value wins, missing fields keep their previous value),
+    and the first update of a later bar commits it into the rolling state.
+    Each update returns the features as of the (provisional) current bar,
+    computed without touching the committed state, so the vector after the
+    last update of a bar equals create_features' row for that bar.
+
+    All state lives in per-field NumPy arrays indexed by token slot, so a
+    snapshot of thousands of tokens is one vectorized update.
+    """
+
+    def __init__(self, bar_seconds: int = DEFAULT_BAR_SECONDS, capacity: int = 1024):
+        """
+        Initialize the engine
+
+        :param bar_seconds: Bar width (create_features assumes 10 minutes)
+        :param capacity: Initial token slots (grows as needed)
+        """
+        self.bar_seconds = int(bar_seconds)
+        self.capacity = max(1, capacity)
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+
+        cap = self.capacity
+        self.rings = {
+            'price': _Ring(145, cap),        # pct_change 144, rolling 144
+            'volume': _Ring(48, cap),        # rolling 12/24/48
+            'liquidity': _Ring(24, cap),     # rolling 24
+            'market_cap': _Ring(25, cap),    # pct_change 24
+            'holders': _Ring(25, cap),       # pct_change 24
+            'gain': _Ring(14, cap),          # RSI 14
+            'loss': _Ring(14, cap),
+        }
+        r = self.rings
+        self.windows = {
+            'price_6': _Window(r['price'], 6, cap),
+            'price_20': _Window(r['price'], 20, cap),
+            'price_144': _Window(r['price'], 144, cap),
+            'volume_12': _Window(r['volume'], 12, cap),
+            'volume_24': _Window(r['volume'], 24, cap),
+            'volume_48': _Window(r['volume'], 48, cap),
+            'liquidity_24': _Window(r['liquidity'], 24, cap),
+            'gain_14': _Window(r['gain'], 14, cap),
+            'loss_14': _Window(r['loss'], 14, cap),
+        }
+        self.emas = {'ema_12': _Ema(12, cap), 'ema_26': _Ema(26, cap), 'signal_9': _Ema(9, cap)}
+
+        # Committed bar count, current bar index and its pending (possibly revised) values
+        self.count = np.zeros(cap, dtype=np.int64)
+        self.bar = np.full(cap, -1, dtype=np.int64)
+        self.pending = {field: np.full(cap, np.nan) for field in INPUT_FIELDS}
+        self.latest = np.zeros((cap, len(FEATURE_NAMES)))
+
+        self.stats = {
+            'updates': 0,
+            'batches': 0,
+            'bars_committed': 0,
+            'gap_bars_filled': 0,
+            'total_update_ms': 0.0,
+            'last_batch_size': 0,
+            'last_update_ms': 0.0
+        }
+
+    # ------------------------------------------------------------ slots
+
+    def _grow(self, capacity: int):
+        for ring in self.rings.values():
+            ring.grow(capacity)
+        for window in self.windows.values():
+            window.grow(capacity)
+        for ema in self.emas.values():
+            ema.grow(capacity)
+
+        def extend(values, fill):
+            grown = np.full((capacity,) + values.shape[1:], fill, dtype=values.dtype)
+            grown[:len(values)] = values
+            return grown
+
+        self.count = extend(self.count, 0)
+        self.bar = extend(self.bar, -1)
+        self.pending = {field: extend(values, np.nan) for field, values in self.pending.items()}
+        self.latest = extend(self.latest, 0.0)
+        self.capacity = capacity
+
+    def _slot_ids(self, addresses: Sequence[str]) -> np.ndarray:
+        slots = np.empty(len(addresses), dtype=np.int64)
+        for i, address in enumerate(addresses):
+            slot = self._slots.get(address)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    slot = len(self._slots)
+                    if slot >= self.capacity:
+                        self._grow(self.capacity * 2)
+                self._slots[address] = slot
+            slots[i] = slot
+        return slots
+
+    def remove(self, address: str) -> bool:
+        """
+        Drop a token's state (e.g. once it is no longer tracked)
+
+        :param address: Token contract address
+        :return: True if the token was tracked
+        """
+        slot = self._slots.pop(address, None)
+        if slot is None:
+            return False
+        slots = np.array([slot])
+        for part in (*self.rings.values(), *self.windows.values(), *self.emas.values()):
+            part.reset(slots)
+        self.count[slot] = 0
+        self.bar[slot] = -1
+        for values in self.pending.values():
+            values[slot] = np.nan
+        self.latest[slot] = 0.0
+        self._free.append(slot)
+        return True
+
+    def prune(self, now: float, max_idle_seconds: float) -> int:
+        """
+        Drop tokens without an update for max_idle_seconds
+
+        :param now: Epoch seconds
+        :param max_idle_seconds: Idle time after which a token's state is dropped
+        :return: Number of tokens removed
+        """
+        cutoff = int((now - max_idle_seconds) // self.bar_seconds)
+        idle = [address for address, slot in self._slots.items() if self.bar[slot] < cutoff]
+        for address in idle:
+            self.remove(address)
+        return len(idle)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    # ------------------------------------------------------------ state
+
+    def _gain_loss(self, slots: np.ndarray, n: np.ndarray, price: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """RSI inputs; the first delta is NaN and counts as 0, as in create_features"""
+        delta = price - self.rings['price'].ago(slots, n, 1)
+        return np.where(delta > 0, delta, 0.0), np.where(delta < 0, -delta, 0.0)
+
+    def _commit(self, slots: np.ndarray):
+        """Append each slot's pending bar to the rolling state"""
+        n = self.count[slots]
+        price = self.pending['price'][slots]
+        gain, loss = self._gain_loss(slots, n, price)
+        inputs = {field: self.pending[field][slots] for field in INPUT_FIELDS}
+        inputs.update(gain=gain, loss=loss)
+
+        macd = self.emas['ema_12'].step(slots, price) - self.emas['ema_26'].step(slots, price)
+        self.emas['ema_12'].commit(slots, price)
+        self.emas['ema_26'].commit(slots, price)
+        self.emas['signal_9'].commit(slots, macd)
+
+        # Windows read the outgoing value from the ring, so they go first
+        for name, window in self.windows.items():
+            window.commit(slots, n, inputs[name.rsplit('_', 1)[0]])
+        for name, ring in self.rings.items():
+            ring.push(slots, n, inputs[name])
+
+        n = n + 1
+        self.count[slots] = n
+        due = (n % RESYNC_BARS) == 0
+        if due.any():
+            for window in self.windows.values():
+                window.resync(slots[due], n[due])
+        self.stats['bars_committed'] += len(slots)
+
+    def _evaluate(self, slots: np.ndarray) -> np.ndarray:
+        """Features for the pending bar of each slot (committed state is not modified)"""
+        n = self.count[slots]
+        count = n + 1
+        p = self.pending['price'][slots]
+        v = self.pending['volume'][slots]
+        liq = self.pending['liquidity'][slots]
+        mcap = self.pending['market_cap'][slots]
+        holders = self.pending['holders'][slots]
+        gain, loss = self._gain_loss(slots, n, p)
+        inputs = {'price': p, 'volume': v, 'liquidity': liq, 'gain': gain, 'loss': loss}
+
+        stats = {}
+        for name, window in self.windows.items():
+            x = inputs[name.rsplit('_', 1)[0]]
+            run = window.ring.run_after(slots, n, x)
+            stats[name] = window.stats(window.step(slots, n, x), count, x, run)
+
+        ema_12 = self.emas['ema_12'].step(slots, p)
+        ema_26 = self.emas['ema_26'].step(slots, p)
+        macd = ema_12 - ema_26
+        signal = self.emas['signal_9'].step(slots, macd)
+
+        prices = self.rings['price']
+        t = self.bar[slots] * self.bar_seconds
+        out = np.empty((len(slots), len(FEATURE_NAMES)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_6, std_6 = stats['price_6']
+            mean_20, std_20 = stats['price_20']
+            mean_144, std_144 = stats['price_144']
+            liq_mean, liq_std = stats['liquidity_24']
+            gain_mean, _ = stats['gain_14']
+            loss_mean, _ = stats['loss_14']
+
+            change_24h = p / prices.ago(slots, n, 144) - 1
+            volatility_24h = std_144 / mean_144
+            volume_ratio = v / stats['volume_24'][0]
+            liquidity_ratio = liq / liq_mean
+
+            rsi = 100 - 100 / (1 + gain_mean / loss_mean)
+            bb_position = (p - (mean_20 - 2 * std_20)) / (4 * std_20)
+
+            out[:, 0] = p / prices.ago(slots, n, 6) - 1
+            out[:, 1] = p / prices.ago(slots, n, 36) - 1
+            out[:, 2] = change_24h
+            out[:, 3] = std_6 / mean_6
+            out[:, 4] = volatility_24h
+            out[:, 5] = volume_ratio
+            out[:, 6] = stats['volume_12'][0] / stats['volume_48'][0]
+            out[:, 7] = liquidity_ratio
+            out[:, 8] = 1 / (liq_std / liq_mean + 1)
+            out[:, 9] = mcap / self.rings['market_cap'].ago(slots, n, 24) - 1
+            out[:, 10] = mcap / (v + 1)
+            out[:, 11] = np.where(np.isnan(rsi), 50.0, rsi)
+            out[:, 12] = macd - signal
+            out[:, 13] = np.where(np.isnan(bb_position), 0.5, bb_position)
+            out[:, 14] = holders / self.rings['holders'].ago(slots, n, 24) - 1
+            out[:, 15] = holders / (mcap / 1000000 + 1)
+            out[:, 16] = (t // 3600) % 24
+            out[:, 17] = (t // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+            out[:, 18] = change_24h * volume_ratio
+            out[:, 19] = volatility_24h / (liquidity_ratio + 0.1)
+
+        # create_features ends with fillna(0); infinities are kept
+        out[np.isnan(out)] = 0.0
+        return out
+
+    # ------------------------------------------------------------ updates
+
+    def update(self, addresses: Sequence[str], timestamp, price: Sequence[float],
+               volume: Optional[Sequence[float]] = None, liquidity: Optional[Sequence[float]] = None,
+               market_cap: Optional[Sequence[float]] = None,
+               holders: Optional[Sequence[float]] = None) -> np.ndarray:
+        """
+        Apply one snapshot and return the tokens' current feature vectors
+
+        :param addresses: Token contract addresses (unique)
+        :param timestamp: Epoch seconds, one value or one per token
+        :param price: Prices (NaN = not observed)
+        :param volume: 24h volumes (optional)
+        :param liquidity: Liquidity in USD (optional)
+        :param market_cap: Market caps (optional)
+        :param holders: Holder counts (optional)
+        :return: (len(addresses), len(FEATURE_NAMES)) array
+        """
+        start = time.perf_counter()
+        size = len(addresses)
+        slots = self._slot_ids(addresses)
+        bars = (np.broadcast_to(np.asarray(timestamp, dtype=np.float64), (size,))
+                // self.bar_seconds).astype(np.int64)
+
+        # Commit bars that this snapshot closes, repeating them over empty bars
+        current = self.bar[slots]
+        advance = (current >= 0) & (bars > current)
+        if advance.any():
+            moving = slots[advance]
+            gaps = np.minimum(bars[advance] - current[advance] - 1, MAX_GAP_BARS)
+            self._commit(moving)
+            for repeat in range(1, int(gaps.max()) + 1):
+                self._commit(moving[gaps >= repeat])
+            self.stats['gap_bars_filled'] += int(gaps.sum())
+
+        values = {'price': price, 'volume': volume, 'liquidity': liquidity,
+                  'market_cap': market_cap, 'holders': holders}
+        for field, given in values.items():
+            if given is None:
+                continue
+            x = np.asarray(given, dtype=np.float64)
+            previous = self.pending[field][slots]
+            self.pending[field][slots] = np.where(np.isnan(x), previous, x)
+        # Late snapshots revise the current bar rather than reopen an old one
+        self.bar[slots] = np.maximum(current, bars)
+
+        features = self._evaluate(slots)
+        self.latest[slots] = features
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats['updates'] += size
+        self.stats['batches'] += 1
+        self.stats['last_batch_size'] = size
+        self.stats['last_update_ms'] = elapsed_ms
+        self.stats['total_update_ms'] += elapsed_ms
+        return features
+
+    def update_tokens(self, tokens: Iterable[Dict], timestamp: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        Apply token dicts as fetched by the scanner or market data clients
+
+        :param tokens: Token data (price_usd/price, volume_24h, liquidity_usd/liquidity, ...)
+        :param timestamp: Epoch seconds of the observation (defaults to now)
+        :return: Feature vector per address
+        """
+        latest: Dict[str, Dict] = {}
+        for token in tokens:
+            address = token.get('contract_address') or token.get('address')
+            if address:
+                latest[address] = token
+        if not latest:
+            return {}
+
+        addresses = list(latest)
+        columns = {}
+        for field, keys in INPUT_ALIASES.items():
+            column = np.full(len(addresses), np.nan)
+            for i, address in enumerate(addresses):
+                token = latest[address]
+                value = next((token[key] for key in keys if token.get(key) is not None), None)
+                column[i] = _positive(value)
+            columns[field] = column
+
+        features = self.update(addresses, time.time() if timestamp is None else timestamp, **columns)
+        return dict(zip(addresses, features))
+
+    def update_prices(self, prices: Dict[str, float], timestamp: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        Apply a price snapshot (address -> price); other inputs carry forward
+
+        :return: Feature vector per address
+        """
+        if not prices:
+            return {}
+        addresses = list(prices)
+        price = np.array([_positive(prices[a]) for a in addresses])
+        features = self.update(addresses, time.time() if timestamp is None else timestamp, price)
+        return dict(zip(addresses, features))
+
+    def features(self, address: str) -> Optional[Dict[str, float]]:
+        """
+        Latest feature vector of a token, by name
+
+        :param address: Token contract address
+        :return: Feature dict, or None if the token is not tracked
+        """
+        slot = self._slots.get(address)
+        if slot is None:
+            return None
+        return dict(zip(FEATURE_NAMES, self.latest[slot].tolist()))
+
+    def feature_matrix(self, addresses: Sequence[str]) -> np.ndarray:
+        """
+        Latest feature vectors for several tokens (zeros for untracked ones)
+
+        :return: (len(addresses), len(FEATURE_NAMES)) array
+        """
+        out = np.zeros((len(addresses), len(FEATURE_NAMES)))
+        for i, address in enumerate(addresses):
+            slot = self._slots.get(address)
+            if slot is not None:
+                out[i] = self.latest[slot]
+        return out
+
+    def get_stats(self) -> Dict:
+        """
+        Get engine metrics
+
+        :return: Dictionary with tracked tokens and update throughput
+        """
+        stats = dict(self.stats)
+        stats['tokens'] = len(self._slots)
+        stats['capacity'] = self.capacity
+        total_s = stats['total_update_ms'] / 1000
+        stats['updates_per_sec'] = stats['updates'] / total_s if total_s else 0.0
+        return stats
+
+
+def _positive(value) -> float:
+    """Input value as float; missing, invalid or non-positive values become NaN"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if value > 0 else np.nan
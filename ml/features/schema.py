@@ -0,0 +1,137 @@
+# ml/features/schema.py
+"""
+Versioned feature schema: the fixed column order a model was trained on
+"""
+import os
+import json
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ml.features.online import FEATURE_NAMES
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_FILENAME = 'feature_schema.json'
+
+
+@dataclass(frozen=True)
+class FeatureSchema:
+    """
+    Ordered feature names plus a version, saved next to the model
+
+    Feature dicts are mapped through the schema by name, so their insertion
+    order never matters; missing features take fill_value (create_features
+    fills gaps with 0).
+    """
+    names: Tuple[str, ...]
+    version: int = 1
+    fill_value: float = 0.0
+    _index: Dict[str, int] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'names', tuple(self.names))
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Feature schema has duplicate names")
+        object.__setattr__(self, '_index', {name: i for i, name in enumerate(self.names)})
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the ordered names (changes whenever the layout does)"""
+        return hashlib.sha1('\n'.join(self.names).encode()).hexdigest()[:12]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def vectorize(self, rows: Sequence[Mapping[str, float]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Fill a (len(rows), len(schema)) array from feature dicts
+
+        :param rows: Feature dicts (extra keys are ignored)
+        :param out: Preallocated array to fill (allocated if None)
+        :return: The filled array
+        """
+        if out is None:
+            out = np.empty((len(rows), len(self.names)))
+        out.fill(self.fill_value)
+        index = self._index
+        for i, row in enumerate(rows):
+            target = out[i]
+            for name, value in row.items():
+                j = index.get(name)
+                if j is not None and value is not None:
+                    target[j] = value
+        return out
+
+    def missing(self, row: Mapping[str, float]) -> Tuple[str, ...]:
+        """Schema features absent from a feature dict"""
+        return tuple(name for name in self.names if name not in row)
+
+    def to_dict(self) -> Dict:
+        return {'version': self.version, 'fingerprint': self.fingerprint,
+                'fill_value': self.fill_value, 'features': list(self.names)}
+
+    def save(self, directory: str) -> str:
+        """
+        Write the schema next to a model
+
+        :param directory: Model directory
+        :return: Path written
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, SCHEMA_FILENAME)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['FeatureSchema']:
+        """
+        Read the schema saved with a model
+
+        :param directory: Model directory
+        :return: FeatureSchema, or None if the model has none
+        """
+        path = os.path.join(directory, SCHEMA_FILENAME)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        schema = cls(tuple(data['features']), version=int(data.get('version', 1)),
+                     fill_value=float(data.get('fill_value', 0.0)))
+        if data.get('fingerprint') and data['fingerprint'] != schema.fingerprint:
+            raise ValueError(f"Feature schema {path} does not match its fingerprint")
+        return schema
+
+
+# Layout of EnhancedMLTrainer.create_features / OnlineFeatureEngine
+ENHANCED_SCHEMA = FeatureSchema(FEATURE_NAMES, version=1)
+
+
+def resolve_schema(model_dir: str, model, scaler=None) -> FeatureSchema:
+    """
+    Schema saved with a model, else what the scaler remembers, else the enhanced layout
+
+    :param model_dir: Model directory
+    :param model: Fitted estimator
+    :param scaler: Fitted scaler (optional)
+    :return: FeatureSchema matching the model's input width
+    """
+    expected = getattr(scaler, 'n_features_in_', getattr(model, 'n_features_in_', None))
+    schema = FeatureSchema.load(model_dir)
+    if schema is None:
+        names = getattr(scaler, 'feature_names_in_', getattr(model, 'feature_names_in_', None))
+        if names is not None:
+            schema = FeatureSchema(tuple(names), version=0)
+        elif expected == len(ENHANCED_SCHEMA):
+            schema = ENHANCED_SCHEMA
+        else:
+            raise ValueError(f"No feature schema in {model_dir} and the model expects {expected} features")
+        logger.warning(f"No feature schema saved with {model_dir}; using "
+                       f"{'the stored feature names' if schema.version == 0 else 'the enhanced feature layout'}")
+    if expected is not None and expected != len(schema):
+        raise ValueError(f"Feature schema has {len(schema)} features but the model expects {expected}")
+    return schema
@@ -1,38 +1,219 @@
 # ml/models/ml_predictor.py
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Mapping, Sequence
+
 import joblib
 import numpy as np
-from typing import Dict, Optional
+
+from ml.features.schema import FeatureSchema, resolve_schema
+
+logger = logging.getLogger(__name__)
+
 
 class MLPredictor:
-    """Wrapper for ML predictions"""
-    
-    def __init__(self):
+    """
+    Wrapper for ML predictions
+
+    Candidates are scored in batches: feature dicts are mapped through the
+    model's versioned FeatureSchema into a preallocated array, scaled in
+    place and passed through one predict_proba call. predict_batch_async
+    runs that on a dedicated thread so a forest pass never blocks the loop.
+
+    Models come either from a flat directory (load_models) or from a
+    ModelRegistry (use_registry), in which case the model is loaded on the
+    first batch and a newly activated version is swapped in between batches.
+    """
+
+    def __init__(self, threshold: float = 0.5):
+        """
+        :param threshold: Entry probability at or above which should_enter is True
+        """
         self.models = {}
         self.scalers = {}
+        self.schemas: Dict[str, FeatureSchema] = {}
         self.is_loaded = False
-    
+        self.threshold = threshold
+
+        # One thread: scikit-learn estimators are not guaranteed thread-safe,
+        # and batches are what buys throughput
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ml-predict')
+        self._buffer = np.empty((0, 0))
+        self._lock = threading.Lock()
+        self._positive_index = 1
+
+        self._registry = None
+        self._model_name = 'entry'
+        self._loaded = None
+        self.reload_interval = 60.0
+        self._last_reload_check = 0.0
+
+        self.stats = {
+            'batches': 0,
+            'rows': 0,
+            'last_batch_size': 0,
+            'last_batch_ms': 0.0,
+            'max_batch_ms': 0.0,
+            'total_batch_ms': 0.0
+        }
+
     def load_models(self, model_dir: str):
-        """Load trained models"""
+        """Load trained models and the feature schema they were trained on"""
         try:
-            self.models['entry'] = joblib.load(f'{model_dir}/entry_classifier.pkl')
-            self.scalers['entry'] = joblib.load(f'{model_dir}/entry_scaler.pkl')
-            self.is_loaded = True
-        except:
+            model = joblib.load(f'{model_dir}/entry_classifier.pkl')
+            scaler = joblib.load(f'{model_dir}/entry_scaler.pkl')
+            self._bind(model, scaler, resolve_schema(model_dir, model, scaler))
+            logger.info(f"Entry model loaded with feature schema v{self.schemas['entry'].version} "
+                        f"({len(self.schemas['entry'])} features, {self.schemas['entry'].fingerprint})")
+        except Exception as e:
+            logger.error(f"Error loading ML models from {model_dir}: {e}")
             self.is_loaded = False
-    
-    def predict_entry(self, features: Dict) -> Dict:
-        """Predict entry signal"""
+
+    def use_registry(self, registry, name: str = 'entry', reload_interval: float = 60.0) -> bool:
+        """
+        Serve a model from a ModelRegistry
+
+        Nothing is loaded here: the active version is loaded by the first
+        batch, and every reload_interval seconds a batch first checks for a
+        newly activated version (on the inference thread when called through
+        predict_batch_async).
+
+        :param registry: ModelRegistry
+        :param name: Model name in the registry
+        :param reload_interval: Seconds between checks for a new version
+        :return: True if the registry has an active version of the model
+        """
+        self._registry = registry
+        self._model_name = name
+        self.reload_interval = reload_interval
+        self._loaded = None
+        self.is_loaded = registry.current_version(name) is not None
+        if not self.is_loaded:
+            logger.warning(f"Model registry {registry.root} has no active '{name}' model")
+        return self.is_loaded
+
+    def _bind(self, model, scaler, schema: FeatureSchema):
+        """Make a model the one predictions go through"""
+        classes = list(getattr(model, 'classes_', [0, 1]))
+        with self._lock:
+            self.models['entry'] = model
+            self.scalers['entry'] = scaler
+            self.schemas['entry'] = schema
+            self._positive_index = classes.index(1) if 1 in classes else len(classes) - 1
+        self.is_loaded = True
+
+    def _sync_registry(self):
+        """Load the registry model on first use and pick up newly activated versions"""
+        now = time.monotonic()
+        if self._loaded is not None and now - self._last_reload_check >= self.reload_interval:
+            self._last_reload_check = now
+            self._registry.refresh(self._model_name)
+        loaded = self._registry.get(self._model_name)
+        if loaded is not None and loaded is not self._loaded:
+            self._bind(loaded.model, loaded.scaler, loaded.schema)
+            self.stats['model_version'] = loaded.version
+            self._loaded = loaded
+            self._last_reload_check = now
+
+    def _scaled(self, rows: Sequence[Mapping[str, float]]) -> np.ndarray:
+        """Vectorize and scale rows into the reusable buffer"""
+        schema = self.schemas['entry']
+        if self._buffer.shape[0] < len(rows) or self._buffer.shape[1] != len(schema):
+            self._buffer = np.empty((max(len(rows), 2 * self._buffer.shape[0]), len(schema)))
+        X = schema.vectorize(rows, self._buffer[:len(rows)])
+
+        scaler = self.scalers['entry']
+        if scaler is None:
+            return X
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        if scale is not None and hasattr(scaler, 'with_mean'):
+            # StandardScaler, in place
+            if mean is not None and scaler.with_mean:
+                np.subtract(X, mean, out=X)
+            if scaler.with_std:
+                np.divide(X, scale, out=X)
+            return X
+        return scaler.transform(X)
+
+    def predict_proba_batch(self, rows: Sequence[Mapping[str, float]]) -> np.ndarray:
+        """
+        Entry probability for a batch of candidates (one model pass)
+
+        :param rows: Feature dicts keyed by name
+        :return: Probabilities, one per row
+        """
+        if self._registry is not None and rows:
+            self._sync_registry()
+        if not self.is_loaded or not rows or 'entry' not in self.models:
+            return np.zeros(len(rows))
+
+        start = time.perf_counter()
+        # The buffer is shared between the loop thread and the inference thread
+        with self._lock:
+            X = self._scaled(rows)
+            proba = self.models['entry'].predict_proba(X)[:, self._positive_index].copy()
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats['batches'] += 1
+        self.stats['rows'] += len(rows)
+        self.stats['last_batch_size'] = len(rows)
+        self.stats['last_batch_ms'] = elapsed_ms
+        self.stats['total_batch_ms'] += elapsed_ms
+        self.stats['max_batch_ms'] = max(self.stats['max_batch_ms'], elapsed_ms)
+        return proba
+
+    def predict_batch(self, rows: Sequence[Mapping[str, float]]) -> List[Dict]:
+        """
+        Predict entry signals for a batch of candidates
+
+        :param rows: Feature dicts keyed by name
+        :return: One {'should_enter', 'confidence'} dict per row
+        """
         if not self.is_loaded:
-            return {'should_enter': False, 'confidence': 0.0}
-        
-        # Convert features to array
-        feature_array = np.array([list(features.values())])
-        scaled_features = self.scalers['entry'].transform(feature_array)
-        
-        prediction = self.models['entry'].predict(scaled_features)[0]
-        confidence = self.models['entry'].predict_proba(scaled_features)[0, 1]
-        
-        return {
-            'should_enter': bool(prediction),
-            'confidence': float(confidence)
-        }
\ No newline at end of file
+            return [{'should_enter': False, 'confidence': 0.0} for _ in rows]
+
+        return [{'should_enter': bool(p >= self.threshold), 'confidence': float(p)}
+                for p in self.predict_proba_batch(rows)]
+
+    async def predict_batch_async(self, rows: Sequence[Mapping[str, float]]) -> List[Dict]:
+        """
+        predict_batch on the inference thread (keeps the event loop free)
+
+        :param rows: Feature dicts keyed by name
+        :return: One {'should_enter', 'confidence'} dict per row
+        """
+        if not self.is_loaded or not rows:
+            return self.predict_batch(rows)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.predict_batch, list(rows))
+
+    def predict_entry(self, features: Dict) -> Dict:
+        """Predict entry signal for one token"""
+        return self.predict_batch([features])[0]
+
+    def get_stats(self) -> Dict:
+        """
+        Get inference metrics
+
+        :return: Dictionary with batch sizes, latency and rows per second
+        """
+        stats = dict(self.stats)
+        batches = stats['batches']
+        stats['avg_batch_ms'] = stats['total_batch_ms'] / batches if batches else 0.0
+        stats['avg_batch_size'] = stats['rows'] / batches if batches else 0.0
+        total_s = stats['total_batch_ms'] / 1000
+        stats['rows_per_sec'] = stats['rows'] / total_s if total_s else 0.0
+        if self._loaded is not None:
+            stats['model'] = self._loaded.info()
+        if 'entry' in self.schemas:
+            stats['schema_version'] = self.schemas['entry'].version
+            stats['schema_fingerprint'] = self.schemas['entry'].fingerprint
+        return stats
+
+    def close(self):
+        """Stop the inference thread"""
+        self._executor.shutdown(wait=True)
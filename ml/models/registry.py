@@ -0,0 +1,459 @@
+# ml/models/registry.py
+"""
+Model registry: versioned models with their feature schema and training
+metrics, loaded lazily and hot-swapped when a new version is activated
+"""
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from ml.features.schema import FeatureSchema, resolve_schema
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = 'data/models/registry'
+# Uncompressed model files at least this large are memory-mapped on load
+DEFAULT_MMAP_THRESHOLD_MB = 32
+
+MODEL_FILE = 'model.joblib'
+SCALER_FILE = 'scaler.joblib'
+METADATA_FILE = 'metadata.json'
+CURRENT_FILE = 'CURRENT'
+
+_VERSION_RE = re.compile(r'^v(\d+)$')
+
+
+@dataclass
+class LoadedModel:
+    """A model version in memory"""
+    name: str
+    version: int
+    model: Any
+    scaler: Any
+    schema: FeatureSchema
+    metadata: Dict = field(default_factory=dict)
+    load_ms: float = 0.0
+    resident_bytes: int = 0
+    mapped_bytes: int = 0
+    file_bytes: int = 0
+    mmap: bool = False
+    loaded_at: float = 0.0
+
+    def info(self) -> Dict:
+        """Load time, memory footprint and training metrics of this version"""
+        return {
+            'version': self.version,
+            'model_type': self.metadata.get('model_type', type(self.model).__name__),
+            'schema_version': self.schema.version,
+            'schema_fingerprint': self.schema.fingerprint,
+            'metrics': self.metadata.get('metrics', {}),
+            'load_ms': self.load_ms,
+            'resident_mb': self.resident_bytes / 1e6,
+            'mapped_mb': self.mapped_bytes / 1e6,
+            'file_mb': self.file_bytes / 1e6,
+            'mmap': self.mmap,
+            'loaded_at': self.loaded_at
+        }
+
+
+def _footprint(obj, seen=None) -> tuple:
+    """
+    (resident, memory-mapped) bytes of the arrays reachable from an estimator
+
+    Walks attributes, containers and Cython objects that pickle their state
+    (sklearn trees), which is where nearly all of a model's memory lives.
+    """
+    if seen is None:
+        seen = {}
+    if id(obj) in seen or obj is None or isinstance(obj, (str, bytes, int, float, bool)):
+        return 0, 0
+    # Keep a reference: __getstate__ builds temporaries whose ids would be reused
+    seen[id(obj)] = obj
+
+    if isinstance(obj, np.ndarray):
+        base = obj
+        while isinstance(base, np.ndarray) and not isinstance(base, np.memmap) and base.base is not None:
+            base = base.base
+        if isinstance(base, np.memmap):
+            return 0, obj.nbytes
+        return obj.nbytes, 0
+
+    if isinstance(obj, dict):
+        children = obj.values()
+    elif isinstance(obj, (list, tuple, set)):
+        children = obj
+    elif hasattr(obj, '__dict__'):
+        children = vars(obj).values()
+    elif hasattr(obj, '__getstate__'):
+        try:
+            state = obj.__getstate__()
+        except Exception:
+            return 0, 0
+        children = state.values() if isinstance(state, dict) else ()
+    else:
+        return 0, 0
+
+    resident = mapped = 0
+    for child in children:
+        r, m = _footprint(child, seen)
+        resident += r
+        mapped += m
+    return resident, mapped
+
+
+class ModelRegistry:
+    """
+    Directory of versioned models
+
+    Layout: <root>/<name>/v0001/ holds model.joblib, scaler.joblib,
+    feature_schema.json and metadata.json (training metrics, parameters,
+    file sizes); <root>/<name>/CURRENT names the active version. Versions are
+    written to a temporary directory and renamed into place, and CURRENT is
+    replaced atomically, so a reader never sees a half-written model.
+
+    get() loads the active version on first use. refresh() re-reads CURRENT
+    and swaps in a newly activated version; if the load fails the previous
+    version keeps serving. Models are stored uncompressed so large ensembles
+    can be memory-mapped (their arrays are paged in from the file instead of
+    being read and copied).
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, mmap_threshold_mb: float = DEFAULT_MMAP_THRESHOLD_MB):
+        """
+        Initialize the registry
+
+        :param root: Directory holding one subdirectory per model name
+        :param mmap_threshold_mb: Memory-map uncompressed model files at least this large (None disables)
+        """
+        self.root = root
+        self.mmap_threshold_mb = mmap_threshold_mb
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._loaded: Dict[str, LoadedModel] = {}
+        # CURRENT file (mtime_ns, size) per name when it was last read
+        self._pointers: Dict[str, tuple] = {}
+
+        self.stats = {
+            'published': 0,
+            'loads': 0,
+            'reloads': 0,
+            'load_failures': 0,
+            'total_load_ms': 0.0
+        }
+
+    # ------------------------------------------------------------------
+    # Layout
+    # ------------------------------------------------------------------
+
+    def _model_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _version_dir(self, name: str, version: int) -> str:
+        return os.path.join(self.root, name, f"v{version:04d}")
+
+    def names(self) -> List[str]:
+        """Model names with at least one version"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(n for n in os.listdir(self.root) if self.versions(n))
+
+    def versions(self, name: str) -> List[int]:
+        """Published versions of a model, oldest first"""
+        directory = self._model_dir(name)
+        if not os.path.isdir(directory):
+            return []
+        versions = []
+        for entry in os.listdir(directory):
+            match = _VERSION_RE.match(entry)
+            if match:
+                versions.append(int(match.group(1)))
+        return sorted(versions)
+
+    def current_version(self, name: str) -> Optional[int]:
+        """Active version of a model (None if it has none)"""
+        try:
+            with open(os.path.join(self._model_dir(name), CURRENT_FILE)) as f:
+                match = _VERSION_RE.match(f.read().strip())
+        except FileNotFoundError:
+            return None
+        return int(match.group(1)) if match else None
+
+    def metadata(self, name: str, version: Optional[int] = None) -> Dict:
+        """Metadata saved with a version (the active one by default)"""
+        version = self.current_version(name) if version is None else version
+        if version is None:
+            return {}
+        try:
+            with open(os.path.join(self._version_dir(name, version), METADATA_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading metadata of {name} v{version}: {e}")
+            return {}
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    def publish(self, name: str, model, scaler=None, schema: Optional[FeatureSchema] = None,
+                metrics: Optional[Dict] = None, params: Optional[Dict] = None,
+                activate: bool = True, compress: int = 0) -> int:
+        """
+        Save a new version of a model
+
+        :param name: Model name (e.g. 'entry')
+        :param model: Fitted estimator
+        :param scaler: Fitted scaler applied before the model (optional)
+        :param schema: Feature schema the model was trained on (resolved from the scaler if None)
+        :param metrics: Training/validation metrics to keep with the version
+        :param params: Training parameters to keep with the version
+        :param activate: Make this the active version
+        :param compress: joblib compression level (0 keeps the file memory-mappable)
+        :return: The new version number
+        """
+        with self._lock:
+            directory = self._model_dir(name)
+            os.makedirs(directory, exist_ok=True)
+            versions = self.versions(name)
+            version = (versions[-1] if versions else 0) + 1
+            final_dir = self._version_dir(name, version)
+            tmp_dir = os.path.join(directory, f".v{version:04d}.tmp")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+
+            try:
+                joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE), compress=compress)
+                if scaler is not None:
+                    joblib.dump(scaler, os.path.join(tmp_dir, SCALER_FILE), compress=compress)
+                if schema is None:
+                    schema = resolve_schema(final_dir, model, scaler)
+                schema.save(tmp_dir)
+
+                metadata = {
+                    'name': name,
+                    'version': version,
+                    'created_at': datetime.now(timezone.utc).isoformat(),
+                    'model_type': type(model).__name__,
+                    'n_features': len(schema),
+                    'schema_version': schema.version,
+                    'schema_fingerprint': schema.fingerprint,
+                    'compress': compress,
+                    'file_bytes': sum(os.path.getsize(os.path.join(tmp_dir, f)) for f in os.listdir(tmp_dir)),
+                    'metrics': metrics or {},
+                    'params': params or {}
+                }
+                with open(os.path.join(tmp_dir, METADATA_FILE), 'w') as f:
+                    json.dump(metadata, f, indent=2, default=str)
+                os.replace(tmp_dir, final_dir)
+            except Exception:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+
+            self.stats['published'] += 1
+            logger.info(f"Published {name} v{version} ({metadata['file_bytes'] / 1e6:.1f} MB, "
+                        f"schema {schema.fingerprint})")
+            if activate:
+                self.activate(name, version)
+            return version
+
+    def activate(self, name: str, version: int) -> bool:
+        """
+        Make a version the active one (also used to roll back)
+
+        Loaded copies pick it up on the next refresh().
+
+        :param name: Model name
+        :param version: Published version
+        :return: True if the pointer was updated
+        """
+        if not os.path.isdir(self._version_dir(name, version)):
+            logger.error(f"Cannot activate {name} v{version}: no such version")
+            return False
+        path = os.path.join(self._model_dir(name), CURRENT_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(f"v{version:04d}\n")
+        os.replace(tmp, path)
+        logger.info(f"Activated {name} v{version}")
+        return True
+
+    def import_directory(self, name: str, directory: str, model_file: str = 'entry_classifier.pkl',
+                         scaler_file: Optional[str] = 'entry_scaler.pkl', activate: bool = True) -> Optional[int]:
+        """
+        Publish a model saved in the flat EnhancedMLTrainer layout
+
+        :param name: Model name to publish under
+        :param directory: Directory with the pickled model (and scaler)
+        :param model_file: Model filename in the directory
+        :param scaler_file: Scaler filename in the directory (None for no scaler)
+        :param activate: Make the imported version the active one
+        :return: The new version, or None on failure
+        """
+        try:
+            model = joblib.load(os.path.join(directory, model_file))
+            scaler = None
+            if scaler_file and os.path.exists(os.path.join(directory, scaler_file)):
+                scaler = joblib.load(os.path.join(directory, scaler_file))
+            schema = resolve_schema(directory, model, scaler)
+            return self.publish(name, model, scaler, schema, params={'imported_from': directory},
+                                activate=activate)
+        except Exception as e:
+            logger.error(f"Error importing {name} from {directory}: {e}")
+            return None
+
+    def prune(self, name: str, keep: int = 5) -> int:
+        """
+        Delete old versions, keeping the newest ones and the active one
+
+        :param name: Model name
+        :param keep: Newest versions to keep
+        :return: Number of versions deleted
+        """
+        current = self.current_version(name)
+        versions = self.versions(name)
+        removed = 0
+        for version in versions[:-keep] if keep > 0 else versions:
+            if version == current:
+                continue
+            shutil.rmtree(self._version_dir(name, version), ignore_errors=True)
+            removed += 1
+        return removed
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _pointer(self, name: str) -> Optional[tuple]:
+        try:
+            st = os.stat(os.path.join(self._model_dir(name), CURRENT_FILE))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, name: str, version: int) -> LoadedModel:
+        directory = self._version_dir(name, version)
+        model_path = os.path.join(directory, MODEL_FILE)
+        scaler_path = os.path.join(directory, SCALER_FILE)
+        metadata = self.metadata(name, version)
+
+        file_bytes = os.path.getsize(model_path)
+        use_mmap = (self.mmap_threshold_mb is not None and not metadata.get('compress')
+                    and file_bytes >= self.mmap_threshold_mb * 1e6)
+
+        start = time.perf_counter()
+        model = joblib.load(model_path, mmap_mode='r' if use_mmap else None)
+        scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+        schema = resolve_schema(directory, model, scaler)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        resident, mapped = _footprint((model, scaler))
+        return LoadedModel(name=name, version=version, model=model, scaler=scaler, schema=schema,
+                           metadata=metadata, load_ms=load_ms, resident_bytes=resident,
+                           mapped_bytes=mapped, file_bytes=file_bytes, mmap=use_mmap,
+                           loaded_at=time.time())
+
+    def get(self, name: str) -> Optional[LoadedModel]:
+        """
+        Active version of a model, loaded on first use
+
+        :param name: Model name
+        :return: LoadedModel, or None if the model has no loadable version
+        """
+        loaded = self._loaded.get(name)
+        if loaded is not None:
+            return loaded
+        with self._lock:
+            # A version that failed to load is retried once CURRENT changes
+            if name not in self._loaded and (name not in self._pointers
+                                             or self._pointers[name] != self._pointer(name)):
+                self._refresh_one(name)
+            return self._loaded.get(name)
+
+    def refresh(self, name: Optional[str] = None) -> List[str]:
+        """
+        Swap in newly activated versions of loaded models
+
+        Cheap when nothing changed (one stat per model). On a failed load the
+        previous version keeps serving.
+
+        :param name: Only check this model (all loaded models if None)
+        :return: Names whose version changed
+        """
+        names = [name] if name else list(self._pointers)
+        swapped = []
+        for model_name in names:
+            if model_name in self._pointers and self._pointers[model_name] == self._pointer(model_name):
+                continue
+            with self._lock:
+                if self._refresh_one(model_name):
+                    swapped.append(model_name)
+        return swapped
+
+    def _refresh_one(self, name: str) -> bool:
+        pointer = self._pointer(name)
+        version = self.current_version(name)
+        self._pointers[name] = pointer
+        previous = self._loaded.get(name)
+        if version is None or (previous is not None and previous.version == version):
+            return False
+
+        try:
+            loaded = self._load(name, version)
+        except Exception as e:
+            self.stats['load_failures'] += 1
+            logger.error(f"Error loading {name} v{version}: {e}"
+                         + (f"; keeping v{previous.version}" if previous else ""))
+            return False
+
+        # Readers hold a reference to the old LoadedModel until their batch ends
+        self._loaded[name] = loaded
+        self.stats['loads'] += 1
+        self.stats['total_load_ms'] += loaded.load_ms
+        if previous is not None:
+            self.stats['reloads'] += 1
+        logger.info(f"Loaded {name} v{version} in {loaded.load_ms:.0f} ms "
+                    f"({loaded.resident_bytes / 1e6:.1f} MB resident, {loaded.mapped_bytes / 1e6:.1f} MB mapped)"
+                    + (f", replacing v{previous.version}" if previous else ""))
+        return True
+
+    def unload(self, name: str):
+        """Drop a loaded model (the next get() loads it again)"""
+        with self._lock:
+            self._loaded.pop(name, None)
+            self._pointers.pop(name, None)
+
+    def get_stats(self) -> Dict:
+        """
+        Get registry metrics
+
+        :return: Dictionary with load counters and per-model load time and memory
+        """
+        stats = dict(self.stats)
+        stats['models'] = {name: loaded.info() for name, loaded in self._loaded.items()}
+        stats['resident_mb'] = sum(m['resident_mb'] for m in stats['models'].values())
+        stats['mapped_mb'] = sum(m['mapped_mb'] for m in stats['models'].values())
+        return stats
+
+
+# Shared registries, keyed by absolute root
+_registries: Dict[str, ModelRegistry] = {}
+
+
+def get_model_registry(root: str = DEFAULT_ROOT, **kwargs) -> ModelRegistry:
+    """Get or create the shared model registry for a directory"""
+    key = os.path.abspath(root)
+    registry = _registries.get(key)
+    if registry is None:
+        registry = ModelRegistry(root, **kwargs)
+        _registries[key] = registry
+    return registry
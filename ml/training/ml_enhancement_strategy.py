@@ -2,14 +2,14 @@
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import TimeSeriesSplit
-from sklearn.metrics import accuracy_score, precision_score, recall_score
 import joblib
 from typing import Dict, List, Tuple
 import logging
 
+from ml.features.schema import FeatureSchema
+
 logger = logging.getLogger(__name__)
 
 class EnhancedMLTrainer:
@@ -23,6 +23,8 @@ class EnhancedMLTrainer:
         }
         self.scalers = {}
         self.feature_importance = {}
+        self.feature_names = {}
+        self.metrics = {}
         
     def create_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Create comprehensive feature set for ML training"""
@@ -129,16 +131,17 @@ class EnhancedMLTrainer:
         
         return features, df['profitable']
     
-    def train_entry_classifier(self, X: pd.DataFrame, y: pd.Series):
+    def train_entry_classifier(self, X: pd.DataFrame, y: pd.Series, workers: int = None):
         """Train model to predict good entry points"""
-        
-        # Split data
-        tscv = TimeSeriesSplit(n_splits=5)
+        from sklearn.base import clone
+        from sklearn.pipeline import make_pipeline
+        from ml.evaluation import EvaluationDataset, WalkForwardEvaluator
         
         # Scale features
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(X)
         self.scalers['entry'] = scaler
+        self.feature_names['entry'] = list(X.columns)
         
         # Train model
         model = GradientBoostingClassifier(
@@ -150,20 +153,15 @@ class EnhancedMLTrainer:
             random_state=42
         )
         
-        # Cross-validation
-        scores = []
-        for train_idx, val_idx in tscv.split(X_scaled):
-            X_train, X_val = X_scaled[train_idx], X_scaled[val_idx]
-            y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
-            
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_val)
-            
-            scores.append({
-                'accuracy': accuracy_score(y_val, y_pred),
-                'precision': precision_score(y_val, y_pred),
-                'recall': recall_score(y_val, y_pred)
-            })
+        # Walk-forward validation, folds in parallel; the scaler is refit
+        # inside each fold so test rows never inform it
+        evaluator = WalkForwardEvaluator(make_pipeline(StandardScaler(), clone(model)), n_splits=5,
+                                         embargo_seconds=3600.0, workers=workers)
+        cv = evaluator.evaluate(EvaluationDataset.from_frame(X, y))
+        scores = [
+            {key: fold[key] for key in ('accuracy', 'precision', 'recall', 'auc')}
+            for fold in cv.folds if 'skipped' not in fold
+        ]
         
         # Final training on all data
         model.fit(X_scaled, y)
@@ -175,7 +173,13 @@ class EnhancedMLTrainer:
             model.feature_importances_
         ))
         
-        logger.info(f"Entry classifier trained - Avg accuracy: {np.mean([s['accuracy'] for s in scores]):.3f}")
+        self.metrics['entry'] = {
+            key: float(np.mean([s[key] for s in scores if s[key] is not None] or [0.0]))
+            for key in ('accuracy', 'precision', 'recall', 'auc')
+        }
+        self.metrics['entry']['samples'] = int(len(X))
+        
+        logger.info(f"Entry classifier trained - Avg accuracy: {self.metrics['entry']['accuracy']:.3f}")
         
         return scores
     
@@ -264,11 +268,50 @@ class EnhancedMLTrainer:
         for name, scaler in self.scalers.items():
             joblib.dump(scaler, f"{directory}/{name}_scaler.pkl")
         
+        # Save the entry model's column order for MLPredictor
+        if 'entry' in self.feature_names:
+            FeatureSchema(tuple(self.feature_names['entry'])).save(directory)
+        
         # Save feature importance
         import json
         with open(f"{directory}/feature_importance.json", 'w') as f:
             json.dump(self.feature_importance, f, indent=2)
     
+    def publish_models(self, registry) -> Dict[str, int]:
+        """
+        Publish trained models to a ModelRegistry as new active versions
+
+        :param registry: ModelRegistry
+        :return: Version published per registry name
+        """
+        published = {}
+        if self.models['entry_classifier'] is not None:
+            schema = FeatureSchema(tuple(self.feature_names['entry'])) if 'entry' in self.feature_names else None
+            published['entry'] = registry.publish(
+                'entry', self.models['entry_classifier'], self.scalers.get('entry'), schema,
+                metrics=self.metrics.get('entry'),
+                params=self.models['entry_classifier'].get_params()
+            )
+        if self.models['exit_predictor'] is not None:
+            published['exit'] = registry.publish(
+                'exit', self.models['exit_predictor'], self.scalers.get('exit'),
+                metrics=self.metrics.get('exit'),
+                params=self.models['exit_predictor'].get_params()
+            )
+        return published
+    
+    def load_from_registry(self, registry) -> bool:
+        """Load the active registry versions of the entry and exit models"""
+        for registry_name, model_name in (('entry', 'entry_classifier'), ('exit', 'exit_predictor')):
+            loaded = registry.get(registry_name)
+            if loaded is None:
+                continue
+            self.models[model_name] = loaded.model
+            if loaded.scaler is not None:
+                self.scalers[registry_name] = loaded.scaler
+            self.feature_names[registry_name] = list(loaded.schema.names)
+        return self.models['entry_classifier'] is not None
+    
     def load_models(self, directory: str):
         """Load saved models and scalers"""
         import os
@@ -291,6 +334,7 @@ def train_enhanced_models(db_path: str):
     """Train all ML models with enhanced features"""
     
     from database import Database
+    from ml.models.registry import get_model_registry
     
     db = Database(db_path)
     trainer = EnhancedMLTrainer()
@@ -303,6 +347,7 @@ def train_enhanced_models(db_path: str):
     
     # Save models
     trainer.save_models("data/models/enhanced")
+    trainer.publish_models(get_model_registry())
     
     logger.info("Enhanced ML models trained and saved")
 
@@ -0,0 +1,565 @@
+# ml/training/retraining.py
+"""
+Background retraining of the entry model from closed positions
+
+Each closed position becomes a training row (the online feature vector at
+entry, labelled by realized PnL). A separate process folds the rows into the
+model incrementally and refits from scratch only when drift is detected,
+publishing to the model registry so the bot hot-swaps the new version.
+"""
+import os
+import copy
+import json
+import time
+import queue
+import logging
+import multiprocessing
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from ml.features.schema import ENHANCED_SCHEMA
+from ml.models.registry import DEFAULT_ROOT as REGISTRY_ROOT, ModelRegistry
+
+logger = logging.getLogger(__name__)
+
+RETRAIN_DEFAULTS = {
+    'model_name': 'entry',
+    'model_kind': 'sgd',            # 'sgd' (partial_fit) or 'forest' (warm-started trees)
+    'registry_root': REGISTRY_ROOT,
+    'rows_path': 'data/ml/training_rows.jsonl',
+    'log_path': 'data/ml/retrain_log.jsonl',
+    'min_batch_rows': 20,           # closed positions that trigger an update
+    'max_batch_wait': 3600.0,       # seconds before a smaller batch is used anyway
+    'min_train_rows': 100,          # rows needed for the first fit
+    'max_train_rows': 20000,        # full refits use the most recent rows
+    'drift_refit_rows': 1000,       # drift-triggered refits use only this recent history
+    'holdout_every': 5,             # every Nth row is kept out of training for validation
+    'holdout_rows': 200,            # most recent holdout rows used for validation
+    'drift_window': 200,            # recent rows compared against the last full refit
+    'loss_tolerance': 0.15,         # recent log loss this far above the reference is drift
+    'psi_threshold': 0.25,          # feature population stability index that is drift
+    'publish_tolerance': 0.01,      # publish unless validation log loss worsens by more
+    'forest_trees': 200,
+    'trees_per_update': 20,
+    'keep_versions': 10,            # registry versions kept after each publish
+    'niceness': 10,
+    'queue_size': 10000
+}
+
+_EPS = 1e-6
+
+
+def classification_metrics(y: np.ndarray, proba: np.ndarray) -> Dict:
+    """
+    Validation metrics of entry probabilities
+
+    :param y: 0/1 labels
+    :param proba: Predicted probability of 1
+    :return: Dictionary with log_loss, brier, accuracy and auc (None with one class)
+    """
+    from sklearn.metrics import roc_auc_score
+
+    y = np.asarray(y, dtype=float)
+    p = np.clip(np.asarray(proba, dtype=float), _EPS, 1 - _EPS)
+    metrics = {
+        'log_loss': float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p))),
+        'brier': float(np.mean((p - y) ** 2)),
+        'accuracy': float(np.mean((p >= 0.5) == (y == 1))),
+        'auc': None,
+        'rows': int(len(y))
+    }
+    if 0 < y.sum() < len(y):
+        metrics['auc'] = float(roc_auc_score(y, p))
+    return metrics
+
+
+def population_stability(reference: np.ndarray, recent: np.ndarray, bins: int = 10) -> np.ndarray:
+    """
+    Population stability index per feature (0.1 = moderate, 0.25 = large shift)
+
+    The PSI two same-distribution samples show by chance, about
+    (bins - 1) * (1/n_reference + 1/n_recent), is subtracted so small windows
+    don't read as drift.
+
+    :param reference: Rows the model was fitted on
+    :param recent: Recent rows
+    :param bins: Quantile bins taken from the reference
+    :return: PSI per column
+    """
+    psi = np.zeros(reference.shape[1])
+    for j in range(reference.shape[1]):
+        edges = np.unique(np.quantile(reference[:, j], np.linspace(0, 1, bins + 1)[1:-1]))
+        if len(edges) == 0:
+            continue
+        expected = np.bincount(np.searchsorted(edges, reference[:, j], side='right'),
+                               minlength=len(edges) + 1) / len(reference)
+        actual = np.bincount(np.searchsorted(edges, recent[:, j], side='right'),
+                             minlength=len(edges) + 1) / len(recent)
+        expected = np.maximum(expected, _EPS)
+        actual = np.maximum(actual, _EPS)
+        noise = len(edges) * (1 / len(reference) + 1 / len(recent))
+        psi[j] = max(0.0, float(np.sum((actual - expected) * np.log(actual / expected))) - noise)
+    return psi
+
+
+class RetrainingWorker:
+    """
+    Incremental trainer (runs inside the retraining process)
+
+    Rows are appended to rows_path so a restart resumes from the full
+    history. update() works test-then-train: the current model first scores
+    the new rows (the prequential loss feeding drift detection), then learns
+    them with partial_fit (sgd) or by adding trees fitted on the recent window
+    (forest). Rising prequential loss or a shift in the feature distribution
+    since the last full refit triggers a full refit instead. Every Nth row is
+    held out; the candidate and the model the bot is serving are both scored
+    on the recent holdout rows, and the candidate is published only if it is
+    no worse.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        """
+        :param settings: Overrides of RETRAIN_DEFAULTS
+        """
+        self.settings = {**RETRAIN_DEFAULTS, **(settings or {})}
+        self.name = self.settings['model_name']
+        self.registry = ModelRegistry(self.settings['registry_root'])
+        self.schema = ENHANCED_SCHEMA
+
+        self.X: List[np.ndarray] = []
+        self.y: List[int] = []
+        self.holdout: List[bool] = []
+        self.pending = 0
+        self._first_pending = None
+
+        self.model = None
+        self.scaler = None
+        self.reference = None       # recent rows and validation log loss at the last full refit
+        self.recent_losses = deque(maxlen=self.settings['drift_window'])
+        self._load_rows()
+        self._resume()
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+
+    def _load_rows(self):
+        path = self.settings['rows_path']
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                try:
+                    self._append(json.loads(line))
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Skipping unreadable training row in {path}: {e}")
+        # Everything on disk is pending until the first update
+        self.pending = len(self.y)
+        self._first_pending = time.monotonic() if self.pending else None
+        logger.info(f"Loaded {len(self.y)} training rows from {path}")
+
+    def _resume(self):
+        """Continue from the serving model if this service published it"""
+        serving = self.registry.get(self.name)
+        if serving is None or serving.metadata.get('params', {}).get('model_kind') != self.settings['model_kind']:
+            return
+        if serving.schema.fingerprint != self.schema.fingerprint:
+            return
+        self.model, self.scaler = serving.model, serving.scaler
+        train_rows = [x for x, held in zip(self.X, self.holdout) if not held]
+        if train_rows:
+            self.reference = {'rows': np.asarray(train_rows[-self.settings['drift_window']:]),
+                              'loss': serving.metadata.get('metrics', {}).get('log_loss') or 0.0}
+        # Rows on disk are already in the model; later full refits still use them
+        self.pending = 0
+        self._first_pending = None
+        logger.info(f"Resuming from {self.name} v{serving.version}")
+
+    def _append(self, row: Dict):
+        self.X.append(self.schema.vectorize([row['features']])[0])
+        self.y.append(int(row['label']))
+        self.holdout.append(len(self.y) % self.settings['holdout_every'] == 0)
+
+    def add(self, row: Dict):
+        """
+        Add a closed-position row
+
+        :param row: {'features': {...}, 'label': 0/1, 'pnl_pct', 'address', 'entry_time', 'exit_time'}
+        """
+        self._append(row)
+        os.makedirs(os.path.dirname(self.settings['rows_path']) or '.', exist_ok=True)
+        with open(self.settings['rows_path'], 'a') as f:
+            f.write(json.dumps(row, default=str) + '\n')
+        self.pending += 1
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+
+    def due(self) -> bool:
+        """Whether enough rows (or time) have accumulated for an update"""
+        if not self.pending:
+            return False
+        if len(self.y) < self.settings['min_train_rows']:
+            return False
+        return (self.pending >= self.settings['min_batch_rows']
+                or time.monotonic() - self._first_pending >= self.settings['max_batch_wait'])
+
+    # ------------------------------------------------------------------
+    # Models
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _proba(model, scaler, X: np.ndarray) -> np.ndarray:
+        if scaler is not None:
+            X = scaler.transform(X)
+        proba = model.predict_proba(X)
+        classes = list(getattr(model, 'classes_', [0, 1]))
+        return proba[:, classes.index(1)] if 1 in classes else np.zeros(len(X))
+
+    def _fit_full(self, X: np.ndarray, y: np.ndarray):
+        from sklearn.preprocessing import StandardScaler
+
+        scaler = StandardScaler().fit(X)
+        Xs = scaler.transform(X)
+        if self.settings['model_kind'] == 'forest':
+            from sklearn.ensemble import RandomForestClassifier
+            model = RandomForestClassifier(n_estimators=self.settings['forest_trees'], max_depth=10,
+                                           min_samples_leaf=5, warm_start=True, random_state=42, n_jobs=1)
+        else:
+            from sklearn.linear_model import SGDClassifier
+            model = SGDClassifier(loss='log_loss', alpha=1e-3, max_iter=1000, tol=1e-4, random_state=42)
+        model.fit(Xs, y)
+        return model, scaler
+
+    def _fit_incremental(self, model, scaler, X: np.ndarray, y: np.ndarray, window: np.ndarray,
+                         window_y: np.ndarray):
+        """Update a copy of the model; the scaler stays fixed until the next full refit"""
+        model = copy.deepcopy(model)
+        if self.settings['model_kind'] == 'forest':
+            # New trees see the recent window; the oldest trees age out
+            if len(np.unique(window_y)) < 2:
+                return None
+            model.set_params(n_estimators=len(model.estimators_) + self.settings['trees_per_update'],
+                             warm_start=True)
+            model.fit(scaler.transform(window), window_y)
+            excess = len(model.estimators_) - self.settings['forest_trees']
+            if excess > 0:
+                model.estimators_ = model.estimators_[excess:]
+                model.n_estimators = len(model.estimators_)
+        else:
+            model.partial_fit(scaler.transform(X), y, classes=np.array([0, 1]))
+        return model
+
+    def _drift(self, recent: np.ndarray) -> Dict:
+        """Prequential loss ratio and feature PSI since the last full refit"""
+        drift = {'loss_ratio': None, 'psi_max': None, 'psi_feature': None}
+        if self.reference is None:
+            return drift
+        if len(self.recent_losses) >= self.settings['min_batch_rows'] and self.reference['loss'] > 0:
+            drift['loss_ratio'] = float(np.mean(self.recent_losses) / self.reference['loss'])
+        if len(recent) >= self.settings['min_batch_rows']:
+            psi = population_stability(self.reference['rows'], recent)
+            drift['psi_max'] = float(psi.max())
+            drift['psi_feature'] = self.schema.names[int(psi.argmax())]
+        return drift
+
+    def update(self, force_full: bool = False) -> Dict:
+        """
+        Fold the pending rows into the model (or refit) and publish if it validates
+
+        :param force_full: Refit from scratch regardless of drift
+        :return: Retrain record (kind, reason, wall time, metrics before/after and their delta)
+        """
+        s = self.settings
+        start = time.perf_counter()
+        X = np.asarray(self.X)
+        y = np.asarray(self.y)
+        holdout = np.asarray(self.holdout)
+        new = np.zeros(len(y), dtype=bool)
+        new[len(y) - self.pending:] = True
+        train = ~holdout
+        n_new = self.pending
+        self.pending = 0
+        self._first_pending = None
+
+        valid_idx = np.flatnonzero(holdout)[-s['holdout_rows']:]
+        X_valid, y_valid = X[valid_idx], y[valid_idx]
+
+        # Test-then-train: score the new rows before learning them
+        new_train = new & train
+        if self.model is not None and new_train.any():
+            p = np.clip(self._proba(self.model, self.scaler, X[new_train]), _EPS, 1 - _EPS)
+            yt = y[new_train]
+            self.recent_losses.extend((-(yt * np.log(p) + (1 - yt) * np.log(1 - p))).tolist())
+
+        train_idx = np.flatnonzero(train)
+        recent = X[train_idx[-s['drift_window']:]]
+        drift = self._drift(recent)
+
+        if self.model is None:
+            kind, reason = 'full', 'initial fit'
+        elif force_full:
+            kind, reason = 'full', 'requested'
+        elif drift['loss_ratio'] is not None and drift['loss_ratio'] > 1 + s['loss_tolerance']:
+            kind, reason = 'full', f"performance drift (loss x{drift['loss_ratio']:.2f})"
+        elif drift['psi_max'] is not None and drift['psi_max'] > s['psi_threshold']:
+            kind, reason = 'full', f"feature drift ({drift['psi_feature']} PSI {drift['psi_max']:.2f})"
+        else:
+            kind, reason = 'incremental', f"{n_new} new rows"
+
+        record = {'timestamp': datetime.now(timezone.utc).isoformat(), 'kind': kind, 'reason': reason,
+                  'rows_new': n_new, 'rows_total': int(len(y)), 'drift': drift, 'published': None}
+
+        # After drift the old regime would dominate a refit on all history
+        fit_idx = train_idx[-(s['drift_refit_rows'] if 'drift' in reason else s['max_train_rows']):]
+        if len(np.unique(y[fit_idx])) < 2:
+            record.update(kind='skipped', reason='training rows have a single class',
+                          train_ms=(time.perf_counter() - start) * 1000)
+            return record
+
+        fit_start = time.perf_counter()
+        scaler = self.scaler
+        if kind == 'full':
+            model, scaler = self._fit_full(X[fit_idx], y[fit_idx])
+        else:
+            window = train_idx[-s['drift_window']:]
+            model = self._fit_incremental(self.model, self.scaler, X[new_train], y[new_train],
+                                          X[window], y[window])
+            if model is None:
+                record.update(kind='skipped', reason='recent window has a single class',
+                              train_ms=(time.perf_counter() - start) * 1000)
+                return record
+        record['fit_ms'] = (time.perf_counter() - fit_start) * 1000
+
+        # Compare against what the bot is serving, on rows neither has trained on
+        self.registry.refresh(self.name)
+        serving = self.registry.get(self.name)
+        before = (classification_metrics(y_valid, self._proba(serving.model, serving.scaler, X_valid))
+                  if serving is not None and len(y_valid) else None)
+        after = classification_metrics(y_valid, self._proba(model, scaler, X_valid)) if len(y_valid) else None
+        record['before'] = before
+        record['after'] = after
+        record['delta'] = ({k: (after[k] - before[k]) if after[k] is not None and before[k] is not None else None
+                            for k in ('log_loss', 'brier', 'accuracy', 'auc')}
+                           if before and after else None)
+
+        accept = before is None or after is None or after['log_loss'] <= before['log_loss'] + s['publish_tolerance']
+        if accept:
+            self.model, self.scaler = model, scaler
+            if kind == 'full':
+                self.reference = {'rows': recent, 'loss': after['log_loss'] if after else 0.0}
+                self.recent_losses.clear()
+            record['published'] = self.registry.publish(
+                self.name, model, scaler, self.schema,
+                metrics={**(after or {}), 'train_rows': int(len(fit_idx))},
+                params={'retrain_kind': kind, 'reason': reason, 'model_kind': s['model_kind']}
+            )
+            self.registry.prune(self.name, s['keep_versions'])
+        elif self.model is None:
+            # Keep learning even while the serving model is better
+            self.model, self.scaler = model, scaler
+            self.reference = {'rows': recent, 'loss': after['log_loss'] if after else 0.0}
+
+        record['train_ms'] = (time.perf_counter() - start) * 1000
+        self._log(record)
+        return record
+
+    def _log(self, record: Dict):
+        try:
+            os.makedirs(os.path.dirname(self.settings['log_path']) or '.', exist_ok=True)
+            with open(self.settings['log_path'], 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+        except OSError as e:
+            logger.error(f"Error writing retrain log: {e}")
+
+
+def _service_main(rows: 'multiprocessing.Queue', results: 'multiprocessing.Queue', settings: Dict):
+    """Retraining process: drain rows, update when due, report each retrain"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - ml-retrain - %(levelname)s - %(message)s')
+    if hasattr(os, 'nice') and settings.get('niceness'):
+        try:
+            # Yield the CPU to the trading process
+            os.nice(settings['niceness'])
+        except OSError:
+            pass
+
+    worker = RetrainingWorker(settings)
+    results.put({'type': 'ready', 'rows_total': len(worker.y)})
+    running = True
+    while running:
+        force_full = False
+        try:
+            message = rows.get(timeout=1.0)
+        except queue.Empty:
+            message = ()
+        # Drain whatever else is queued before deciding
+        while message is not None:
+            if message:
+                kind, payload = message
+                if kind == 'row':
+                    worker.add(payload)
+                elif kind == 'refit':
+                    force_full = True
+            try:
+                message = rows.get_nowait()
+            except queue.Empty:
+                break
+        if message is None:
+            running = False
+
+        if (force_full and worker.y) or worker.due():
+            try:
+                record = worker.update(force_full=force_full)
+                results.put({'type': 'retrain', **record})
+            except Exception as e:
+                logger.error(f"Retrain failed: {e}")
+                results.put({'type': 'error', 'error': str(e)})
+
+
+class RetrainingService:
+    """
+    Handle on the retraining process (used by the trading bot)
+
+    record_closed_position() only enqueues a row, so the trading loop never
+    waits on training; retrain results come back through poll().
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        """
+        :param settings: Overrides of RETRAIN_DEFAULTS
+        """
+        self.settings = {**RETRAIN_DEFAULTS, **(settings or {})}
+        self._context = multiprocessing.get_context('spawn')
+        self._rows = None
+        self._results = None
+        self._process = None
+        self.history = deque(maxlen=50)
+
+        self.stats = {
+            'rows_submitted': 0,
+            'rows_dropped': 0,
+            'retrains': 0,
+            'incremental': 0,
+            'full_refits': 0,
+            'published': 0,
+            'errors': 0,
+            'last_train_ms': 0.0,
+            'total_train_ms': 0.0
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        """Start the retraining process"""
+        if self.running:
+            return
+        self._rows = self._context.Queue(maxsize=self.settings['queue_size'])
+        self._results = self._context.Queue()
+        self._process = self._context.Process(target=_service_main, name='ml-retrain', daemon=True,
+                                              args=(self._rows, self._results, self.settings))
+        self._process.start()
+        logger.info(f"Retraining service started (pid {self._process.pid}, {self.settings['model_kind']} "
+                    f"'{self.settings['model_name']}' model)")
+
+    def record_closed_position(self, address: str, features: Dict, pnl_pct: float,
+                               entry_time=None, exit_time=None) -> bool:
+        """
+        Queue a training row for a closed position
+
+        :param address: Token address
+        :param features: Online feature vector at entry
+        :param pnl_pct: Realized PnL of the whole position, percent
+        :param entry_time: When the position was opened
+        :param exit_time: When it was closed
+        :return: True if queued
+        """
+        if not self.running or not features:
+            return False
+        row = {'address': address, 'features': {k: float(v) for k, v in features.items()},
+               'label': int(pnl_pct > 0), 'pnl_pct': float(pnl_pct),
+               'entry_time': str(entry_time) if entry_time else None,
+               'exit_time': str(exit_time or datetime.now(timezone.utc))}
+        try:
+            self._rows.put_nowait(('row', row))
+        except queue.Full:
+            self.stats['rows_dropped'] += 1
+            return False
+        self.stats['rows_submitted'] += 1
+        return True
+
+    def request_refit(self) -> bool:
+        """Ask for a full refit at the next opportunity"""
+        if not self.running:
+            return False
+        try:
+            self._rows.put_nowait(('refit', None))
+            return True
+        except queue.Full:
+            return False
+
+    def poll(self) -> List[Dict]:
+        """
+        Collect finished retrains (non-blocking)
+
+        :return: Retrain records since the last poll
+        """
+        records = []
+        if self._results is None:
+            return records
+        while True:
+            try:
+                message = self._results.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            kind = message.pop('type', None)
+            if kind == 'error':
+                self.stats['errors'] += 1
+                logger.error(f"Retraining error: {message.get('error')}")
+            elif kind == 'retrain':
+                records.append(message)
+                self.history.append(message)
+                self.stats['retrains'] += 1
+                if message['kind'] == 'full':
+                    self.stats['full_refits'] += 1
+                elif message['kind'] == 'incremental':
+                    self.stats['incremental'] += 1
+                if message.get('published'):
+                    self.stats['published'] += 1
+                self.stats['last_train_ms'] = message.get('train_ms', 0.0)
+                self.stats['total_train_ms'] += message.get('train_ms', 0.0)
+        return records
+
+    def get_stats(self) -> Dict:
+        """
+        Get retraining metrics
+
+        :return: Dictionary with counters, wall time and the latest quality delta
+        """
+        self.poll()
+        stats = dict(self.stats)
+        stats['running'] = self.running
+        if self.history:
+            last = self.history[-1]
+            stats['last_retrain'] = {k: last.get(k) for k in ('timestamp', 'kind', 'reason', 'rows_total',
+                                                               'train_ms', 'delta', 'published')}
+        return stats
+
+    def stop(self, timeout: float = 30.0):
+        """Let the process finish its current retrain and exit"""
+        if self._process is None:
+            return
+        try:
+            self._rows.put(None, timeout=timeout)
+        except (queue.Full, OSError, ValueError):
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            logger.warning("Retraining process did not exit; terminating")
+            self._process.terminate()
+            self._process.join(5)
+        self.poll()
+        self._process = None
@@ -3,9 +3,9 @@
 Ultra Enhanced Trading Monitor with Advanced Analytics and Alerts
 Features: Real-time P&L tracking, position analysis, ML performance, alerts, and more
 """
-import sqlite3
 import time
 import os
+import sys
 from datetime import datetime, timedelta
 from colorama import init, Fore, Style, Back
 import pandas as pd
@@ -13,6 +13,11 @@ import numpy as np
 from collections import deque
 import json
 
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.storage.connection_pool import connect
+
 # Initialize colorama for Windows
 init()
 
@@ -38,7 +43,7 @@ class UltraEnhancedMonitor:
         
         # Check for active config by looking at recent database entries
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = connect(self.db_path, read_only=True)
             cursor = conn.cursor()
             
             # Check if we have real transactions
@@ -80,8 +85,8 @@ class UltraEnhancedMonitor:
             return 9.05  # Your known simulation balance
 
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Get read-only WAL connection (never blocks the bot's writer)"""
+        return connect(self.db_path, read_only=True)
     
     def check_database(self):
         """Check if database exists"""
@@ -99,23 +104,13 @@ class UltraEnhancedMonitor:
             # Start with initial balance
             balance = self.initial_balance
             
-            # Calculate from all trades
+            # Net SOL flow over all trades
             cursor.execute("""
-                SELECT action, amount, price 
-                FROM trades 
-                ORDER BY id
+                SELECT COALESCE(SUM(CASE WHEN action='SELL' THEN amount
+                                         WHEN action='BUY' THEN -amount END), 0)
+                FROM trades
             """)
-            
-            trades = cursor.fetchall()
-            
-            for action, amount, price in trades:
-                if amount is None:
-                    continue
-                    
-                if action == 'BUY':
-                    balance -= float(amount)
-                elif action == 'SELL':
-                    balance += float(amount)
+            balance += float(cursor.fetchone()[0] or 0)
             
             # Get open positions
             cursor.execute("""
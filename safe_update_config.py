@@ -345,9 +345,55 @@ SOLANA_RPC_URL=https://api.mainnet-beta.solana.com
     print("  3. Run: python verify_wallet.py")
     print("  4. Start bot: python start_bot.py real")
 
+def apply_trading_params_diff(diff_path, params_path="config/trading_params.json"):
+    """Merge a parameter diff (e.g. from scripts/parameter_sweep.py) into trading_params.json"""
+    
+    print("🔧 TRADING PARAMETERS UPDATE")
+    print("=" * 60)
+    
+    with open(diff_path, 'r') as f:
+        diff = json.load(f)
+    # Sweep diffs carry metadata next to the parameter changes
+    changes = diff.get('changes', diff)
+    
+    with open(params_path, 'r') as f:
+        params = json.load(f)
+    
+    if not changes:
+        print("  ℹ️  Diff is empty, nothing to update")
+        return
+    
+    # Backup before touching the live parameters
+    backup_dir = Path(f"backups_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    backup_dir.mkdir(exist_ok=True)
+    shutil.copy2(params_path, backup_dir / params_path.replace('/', '_'))
+    print(f"📁 Backed up {params_path} to {backup_dir}/")
+    
+    print("\n📋 Changes:")
+    for name, value in changes.items():
+        marker = "~" if name in params else "+"
+        print(f"  {marker} {name}: {params.get(name)} -> {value}")
+        params[name] = value
+    
+    with open(params_path, 'w') as f:
+        json.dump(params, f, indent=4)
+    
+    print(f"\n✅ Updated {len(changes)} parameter(s) in {params_path}")
+    print("  Restart the bot to pick up the new parameters")
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Safe configuration update")
+    parser.add_argument("--trading-params-diff", metavar="PATH",
+                        help="Apply a trading_params.json diff instead of the wallet update")
+    args = parser.parse_args()
+    
     try:
-        safe_update_files()
+        if args.trading_params_diff:
+            apply_trading_params_diff(args.trading_params_diff)
+        else:
+            safe_update_files()
     except KeyboardInterrupt:
         print("\n\n❌ Update cancelled by user")
     except Exception as e:
@@ -0,0 +1,36 @@
+# scripts/audit_query_plans.py - Flag registered queries that fall back to full table scans
+
+import os
+import sys
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.storage.database import Database
+from core.storage.query_audit import format_report
+
+
+def main():
+    """Print the EXPLAIN QUERY PLAN audit for the trading database"""
+    parser = argparse.ArgumentParser(description='Audit query plans for full table scans')
+    parser.add_argument('--db', default='data/db/sol_bot.db', help='Path to SQLite database')
+    parser.add_argument('queries', nargs='*', help='Only audit these query names')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ Database not found at {args.db}")
+        sys.exit(1)
+
+    # Opening through Database applies any pending migrations first
+    db = Database(args.db)
+    results = db.audit_query_plans(args.queries or None)
+    db.close()
+
+    print(format_report(results))
+    if any(r['flagged'] or 'error' in r for r in results):
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
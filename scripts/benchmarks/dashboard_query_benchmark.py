@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dashboard and monitor queries against a synthetic 1M-trade database
+
+Builds the database through Database (so every migration and index is in
+place), prints the query-plan audit and times each registered query.
+
+Usage:
+    python scripts/benchmarks/dashboard_query_benchmark.py [--trades 1000000] [--tokens 20000] [--open 50]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.storage.database import Database
+from core.storage.query_audit import registered_queries, format_report
+
+# Interactive queries must stay under this; full-history rollups are reported only
+BUDGET_MS = 10.0
+FULL_HISTORY = {'token_rollup', 'monitor_trade_counts', 'monitor_net_flow',
+                'monitor_open_positions', 'monitor_leaderboard'}
+
+
+def populate(db, n_trades, n_tokens, open_positions=50, days=90, seed=7):
+    """
+    Fill the database with synthetic tokens and BUY/SELL round trips
+
+    Every BUY is followed by a SELL of the same size except for the last
+    ``open_positions`` tokens, which stay open like a live bot's book.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=days)
+    step = days * 86400 / n_trades
+    tokens = [f"{'Sim' if i % 2 else ''}TOKEN{i:06d}" for i in range(n_tokens)]
+    insert_sql = '''
+    INSERT INTO trades (contract_address, action, amount, price, timestamp, tx_hash,
+                        gain_loss_sol, percentage_change, price_multiple)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    with db.pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO tokens (contract_address, ticker, name, safety_score, last_updated) VALUES (?, ?, ?, ?, ?)",
+            [(t, f"T{i}", 'Bench Token', rng.uniform(0, 100),
+              (now - timedelta(seconds=rng.uniform(0, 86400))).isoformat())
+             for i, t in enumerate(tokens)]
+        )
+
+        batch = []
+        open_from = n_trades - 2 * open_positions
+        for i in range(0, n_trades - 1, 2):
+            token = rng.choice(tokens)
+            amount = rng.uniform(0.05, 0.5)
+            buy_price = rng.uniform(1e-6, 1e-3)
+            sell_price = buy_price * rng.uniform(0.5, 2.0)
+            batch.append((token, 'BUY', amount, buy_price,
+                          (start + timedelta(seconds=i * step)).isoformat(), None, 0.0, 0.0, 1.0))
+            if i < open_from:
+                batch.append((token, 'SELL', amount, sell_price,
+                              (start + timedelta(seconds=(i + 1) * step)).isoformat(), None,
+                              amount * (sell_price / buy_price - 1),
+                              (sell_price / buy_price - 1) * 100, sell_price / buy_price))
+            else:
+                # Open position: a second entry on a fresh token instead of an exit
+                batch.append((tokens[(i // 2) % n_tokens], 'BUY', amount, buy_price,
+                              (start + timedelta(seconds=(i + 1) * step)).isoformat(), None, 0.0, 0.0, 1.0))
+            if len(batch) >= 50000:
+                conn.executemany(insert_sql, batch)
+                batch = []
+        if batch:
+            conn.executemany(insert_sql, batch)
+        conn.execute("ANALYZE")
+
+    # Bulk rows bypass record_trade, so derive the ledger from them
+    db.rebuild_position_ledger()
+    return tokens
+
+
+def time_query(conn, sql, params, repeats):
+    """Median and worst wall time of a query in milliseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dashboard query benchmark')
+    parser.add_argument('--trades', type=int, default=1_000_000, help='Synthetic trades to generate')
+    parser.add_argument('--tokens', type=int, default=20000, help='Distinct tokens')
+    parser.add_argument('--open', type=int, default=50, help='Positions left open')
+    parser.add_argument('--repeats', type=int, default=20, help='Timed runs per query')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+
+        start = time.perf_counter()
+        tokens = populate(db, args.trades, args.tokens, args.open)
+        print(f"Built {args.trades:,} trades / {args.tokens:,} tokens in {time.perf_counter() - start:.1f}s\n")
+
+        print(format_report(db.audit_query_plans()))
+        print()
+
+        sample_token = tokens[len(tokens) // 2]
+        over_budget = []
+        print(f"{'query':<28}{'median ms':>11}{'max ms':>10}  budget")
+        with db.pool.reader() as conn:
+            for query in registered_queries():
+                # Point lookups use a real token instead of the placeholder
+                params = tuple(sample_token if p == 'token' else p for p in query.params)
+                median, worst = time_query(conn, query.sql, params, args.repeats)
+                if query.name in FULL_HISTORY:
+                    budget = 'full history'
+                elif median <= BUDGET_MS:
+                    budget = 'ok'
+                else:
+                    budget = 'OVER'
+                    over_budget.append(query.name)
+                print(f"{query.name:<28}{median:>11.2f}{worst:>10.2f}  {budget}")
+        db.close()
+
+    if over_budget:
+        print(f"\n{len(over_budget)} interactive queries over {BUDGET_MS:.0f}ms: {', '.join(over_budget)}")
+        sys.exit(1)
+    print(f"\nAll interactive queries under {BUDGET_MS:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: connect-per-call SQLite access vs the pooled WAL Database
+
+Usage:
+    python scripts/benchmarks/db_benchmark.py [--ops 2000]
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import tempfile
+from datetime import datetime, timezone
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.storage.database import Database
+
+
+class LegacyDatabase:
+    """The previous access pattern: a fresh connection for every call"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS tokens (
+            contract_address TEXT PRIMARY KEY, ticker TEXT, name TEXT,
+            price_usd REAL, volume_24h REAL, last_updated TEXT
+        )''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, contract_address TEXT, action TEXT,
+            amount REAL, price REAL, timestamp TEXT, tx_hash TEXT
+        )''')
+        conn.commit()
+        conn.close()
+
+    def store_token(self, token_data):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("PRAGMA table_info(tokens)")
+            columns = [info[1] for info in cursor.fetchall()]
+            data = {k: v for k, v in token_data.items() if k in columns}
+            cursor.execute(
+                f"INSERT OR REPLACE INTO tokens ({', '.join(data)}) VALUES ({', '.join('?' * len(data))})",
+                list(data.values())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def record_trade(self, contract_address, action, amount, price):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(
+                "INSERT INTO trades (contract_address, action, amount, price, timestamp) VALUES (?, ?, ?, ?, ?)",
+                (contract_address, action, amount, price, datetime.now(timezone.utc).isoformat())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_token(self, contract_address):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM tokens WHERE contract_address = ?", (contract_address,))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute("PRAGMA table_info(tokens)")
+                columns = [info[1] for info in cursor.fetchall()]
+                return dict(zip(columns, row))
+            return None
+        finally:
+            conn.close()
+
+    def close(self):
+        pass
+
+
+def run(db, ops):
+    """Time token upserts, trade inserts and token reads"""
+    results = {}
+
+    start = time.perf_counter()
+    for i in range(ops):
+        db.store_token({
+            'contract_address': f"TOKEN{i % 500:04d}",
+            'ticker': f"T{i}",
+            'name': 'Bench Token',
+            'price_usd': 0.001 * i,
+            'volume_24h': 1000.0 + i,
+        })
+    results['token upserts/sec'] = ops / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(ops):
+        db.record_trade(f"TOKEN{i % 500:04d}", 'BUY' if i % 2 == 0 else 'SELL', 0.1, 0.001)
+    results['trade inserts/sec'] = ops / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(ops):
+        db.get_token(f"TOKEN{i % 500:04d}")
+    results['token reads/sec'] = ops / (time.perf_counter() - start)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite access micro-benchmark')
+    parser.add_argument('--ops', type=int, default=2000, help='Operations per phase')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = LegacyDatabase(os.path.join(tmp, 'legacy.db'))
+        before = run(legacy, args.ops)
+
+        pooled = Database(os.path.join(tmp, 'pooled.db'))
+        after = run(pooled, args.ops)
+        pooled.close()
+
+    print(f"{'metric':<22}{'before':>12}{'after':>12}{'speedup':>10}")
+    for metric in before:
+        print(f"{metric:<22}{before[metric]:>12,.0f}{after[metric]:>12,.0f}"
+              f"{after[metric] / before[metric]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
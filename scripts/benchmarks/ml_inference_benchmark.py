@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark: MLPredictor entry scoring, per-token vs batched
+
+Trains a RandomForest entry model on synthetic create_features-shaped data,
+saves it the way EnhancedMLTrainer does (model, scaler, feature schema) and
+scores candidate batches of 1, 32 and 512 tokens:
+
+- legacy: the old per-token path (dict -> array in insertion order,
+  scaler.transform, predict + predict_proba)
+- batched: MLPredictor.predict_batch (schema mapping, in-place scaling,
+  one predict_proba)
+
+Also reports the worst event-loop stall while batches run through
+predict_batch_async versus inline.
+
+Usage:
+    python scripts/benchmarks/ml_inference_benchmark.py [--trees 200] [--repeats 20]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import warnings
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ml.features import ENHANCED_SCHEMA, FEATURE_NAMES
+from ml.models.ml_predictor import MLPredictor
+
+BATCH_SIZES = (1, 32, 512)
+
+
+def train_model(directory, trees, seed=1):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(5000, len(FEATURE_NAMES))), columns=list(FEATURE_NAMES))
+    y = ((X['price_change_1h'] + 0.5 * X['volume_ratio'] + rng.normal(0, 1, len(X))) > 0).astype(int)
+    scaler = StandardScaler()
+    model = RandomForestClassifier(n_estimators=trees, max_depth=10, random_state=seed)
+    model.fit(scaler.fit_transform(X), y)
+    joblib.dump(model, os.path.join(directory, 'entry_classifier.pkl'))
+    joblib.dump(scaler, os.path.join(directory, 'entry_scaler.pkl'))
+    ENHANCED_SCHEMA.save(directory)
+    return model, scaler
+
+
+def candidates(n, seed=2):
+    rng = np.random.default_rng(seed)
+    return [dict(zip(FEATURE_NAMES, values.tolist())) for values in rng.normal(size=(n, len(FEATURE_NAMES)))]
+
+
+def legacy_predict(model, scaler, features):
+    """The pre-batching MLPredictor.predict_entry"""
+    feature_array = np.array([list(features.values())])
+    scaled = scaler.transform(feature_array)
+    prediction = model.predict(scaled)[0]
+    confidence = model.predict_proba(scaled)[0, 1]
+    return {'should_enter': bool(prediction), 'confidence': float(confidence)}
+
+
+def percentile(samples, q):
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+async def loop_stall(predictor, rows, use_executor, duration=1.0):
+    """Worst gap between 1 ms ticks of a heartbeat task while batches are scored"""
+    worst = 0.0
+    done = False
+
+    async def heartbeat():
+        nonlocal worst
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst = max(worst, now - last)
+            last = now
+
+    task = asyncio.create_task(heartbeat())
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        if use_executor:
+            await predictor.predict_batch_async(rows)
+        else:
+            predictor.predict_batch(rows)
+            await asyncio.sleep(0)
+    done = True
+    await task
+    return worst * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ML inference benchmark')
+    parser.add_argument('--trees', type=int, default=200, help='RandomForest trees')
+    parser.add_argument('--repeats', type=int, default=20, help='Timed batches per size')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    # The legacy path feeds a bare array to a scaler fitted on a DataFrame
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model, scaler = train_model(tmp, args.trees)
+        predictor = MLPredictor()
+        predictor.load_models(tmp)
+        # Warm up both paths
+        predictor.predict_batch(candidates(4))
+        legacy_predict(model, scaler, candidates(1)[0])
+
+        print(f"RandomForest, {args.trees} trees, {len(FEATURE_NAMES)} features, "
+              f"schema v{ENHANCED_SCHEMA.version} ({ENHANCED_SCHEMA.fingerprint})\n")
+        print(f"{'batch':>6}  {'path':<8}{'p50 ms':>10}{'p95 ms':>10}{'tokens/s':>12}")
+        for size in BATCH_SIZES:
+            rows = candidates(size)
+            for path in ('legacy', 'batched'):
+                samples = []
+                for _ in range(args.repeats if size < 512 or path == 'batched' else max(2, args.repeats // 10)):
+                    start = time.perf_counter()
+                    if path == 'legacy':
+                        for row in rows:
+                            legacy_predict(model, scaler, row)
+                    else:
+                        predictor.predict_batch(rows)
+                    samples.append(time.perf_counter() - start)
+                rate = size / np.median(samples)
+                print(f"{size:>6}  {path:<8}{percentile(samples, 50):>10.2f}{percentile(samples, 95):>10.2f}{rate:>12,.0f}")
+
+        rows = candidates(512)
+        inline = asyncio.run(loop_stall(predictor, rows, use_executor=False))
+        threaded = asyncio.run(loop_stall(predictor, rows, use_executor=True))
+        print(f"\nWorst event-loop stall while scoring 512-token batches: "
+              f"inline {inline:.1f} ms, executor {threaded:.1f} ms")
+        predictor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark: ModelRegistry load time, memory and hot swap
+
+Publishes a large RandomForest entry model, then loads it in fresh processes
+the way the bot used to (joblib.load of the pickle at startup) and through
+the registry with and without memory-mapping, reporting load time, retained
+RSS and the registry's own footprint estimate. Finally activates a
+new version while a predictor keeps scoring and reports the swap latency.
+
+Usage:
+    python scripts/benchmarks/model_registry_benchmark.py [--trees 300] [--samples 20000]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ml.features import FEATURE_NAMES
+from ml.models.ml_predictor import MLPredictor
+from ml.models.registry import ModelRegistry
+
+
+def rss_mb():
+    """Current resident set size (Linux), else 0"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        return 0.0
+
+
+def child(root, mode):
+    """Load the model in this (fresh) process and print the measurements"""
+    import joblib
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    if mode == 'pickle':
+        model = joblib.load(os.path.join(root, 'entry_classifier.pkl'))
+        footprint = None
+    else:
+        registry = ModelRegistry(root, mmap_threshold_mb=0 if mode == 'mmap' else None)
+        loaded = registry.get('entry')
+        model = loaded.model
+        footprint = loaded.resident_bytes / 1e6
+    load_ms = (time.perf_counter() - start) * 1000
+    model.predict_proba(np.zeros((1, len(FEATURE_NAMES))))
+    print(json.dumps({'load_ms': load_ms, 'rss_mb': rss_mb() - base_rss,
+                      'footprint_mb': footprint}))
+
+
+def measure(root, mode):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, '--root', root],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def hot_swap(root, X, scaler, trees):
+    """Activate a new version while scoring; report the swap as seen by the predictor"""
+    import warnings
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    registry = ModelRegistry(root)
+    predictor = MLPredictor()
+    predictor.use_registry(registry, 'entry', reload_interval=0.0)
+    rows = [dict(zip(FEATURE_NAMES, r)) for r in np.random.default_rng(5).normal(size=(256, len(FEATURE_NAMES)))]
+    predictor.predict_batch(rows)
+    old_version = predictor.stats['model_version']
+
+    model = RandomForestClassifier(n_estimators=trees, max_depth=12, random_state=7, n_jobs=-1)
+    model.fit(scaler.transform(X), (X.iloc[:, 1] > 0).astype(int))
+    start = time.perf_counter()
+    registry.publish('entry', model, scaler)
+    publish_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    while predictor.stats['model_version'] == old_version:
+        t = time.perf_counter()
+        predictor.predict_batch(rows)
+        latencies.append((time.perf_counter() - t) * 1000)
+    predictor.close()
+    return old_version, predictor.stats['model_version'], publish_ms, latencies[-1], registry.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Model registry benchmark')
+    parser.add_argument('--trees', type=int, default=300, help='RandomForest trees')
+    parser.add_argument('--samples', type=int, default=20000, help='Training rows')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--root', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    if args.child:
+        child(args.root, args.child)
+        return
+
+    import joblib
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(args.samples, len(FEATURE_NAMES))), columns=list(FEATURE_NAMES))
+    y = ((X.iloc[:, 0] + rng.normal(0, 1, len(X))) > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=args.trees, random_state=1, n_jobs=-1).fit(scaler.transform(X), y)
+
+    with tempfile.TemporaryDirectory() as root:
+        joblib.dump(model, os.path.join(root, 'entry_classifier.pkl'))
+        registry = ModelRegistry(root)
+        registry.publish('entry', model, scaler, metrics={'accuracy': 0.0})
+        size = registry.metadata('entry')['file_bytes'] / 1e6
+        print(f"RandomForest, {args.trees} trees, {size:.0f} MB on disk\n")
+        print(f"{'load path':<22}{'load ms':>10}{'RSS MB':>10}{'estimate MB':>13}")
+        for label, mode in (('joblib.load (before)', 'pickle'), ('registry, read', 'read'),
+                            ('registry, mmap', 'mmap')):
+            r = measure(root, mode)
+            estimate = f"{r['footprint_mb']:.0f}" if r['footprint_mb'] is not None else '-'
+            print(f"{label:<22}{r['load_ms']:>10.0f}{r['rss_mb']:>10.0f}{estimate:>13}")
+
+        old, new, publish_ms, swap_ms, stats = hot_swap(root, X, scaler, max(10, args.trees // 3))
+        print(f"\nHot swap v{old} -> v{new}: publish {publish_ms:.0f} ms, "
+              f"first batch after activation {swap_ms:.0f} ms (includes the load), "
+              f"{stats['reloads']} reload, {stats['load_failures']} failures")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-tick partial-exit evaluation cost for open positions
+
+Compares the old per-check SQLite lookups (one SUM over partial_exits per
+position per tick, without and with an index on (contract_address,
+buy_timestamp)) against PartialExitManager's in-memory state and exit
+engine. Prices follow a random walk, so the in-memory run also pays for the
+occasional partial sell and its state write.
+
+Usage:
+    python scripts/benchmarks/partial_exit_benchmark.py [--positions 100] [--ticks 200] [--history 20000]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import sqlite3
+import argparse
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.storage.database import Database
+from core.strategies.partial_exits import PartialExitManager
+
+CONFIG = {
+    'partial_exits': {
+        'levels': [
+            {'profit_pct': 0.5, 'exit_pct': 0.3},
+            {'profit_pct': 1.0, 'exit_pct': 0.3},
+            {'profit_pct': 2.0, 'exit_pct': 0.3}
+        ],
+        'trailing_stop': {'enabled': True, 'activation': 1.5, 'distance': 0.2}
+    }
+}
+
+LEGACY_REMAINING_SQL = '''
+    SELECT SUM(amount) as sold_amount
+    FROM partial_exits
+    WHERE contract_address = ? AND buy_timestamp = ?
+'''
+
+
+class FakeTrader:
+    """Fills every sell at the requested minimum output"""
+
+    async def sell_token(self, contract_address, amount, min_sol_output):
+        return {'success': True, 'sol_received': min_sol_output / 0.95, 'signature': 'bench'}
+
+
+def make_positions(n):
+    return [{
+        'contract_address': f"TOKEN{i:06d}",
+        'symbol': f"T{i}",
+        'buy_timestamp': f"2025-06-01T00:{i // 60:02d}:{i % 60:02d}",
+        'price': 1.0,
+        'amount': 0.5
+    } for i in range(n)]
+
+
+def price_paths(positions, ticks, seed=7):
+    """Random-walk prices per tick; a few positions run far enough to hit exit levels"""
+    rng = random.Random(seed)
+    prices = {p['contract_address']: 1.0 for p in positions}
+    paths = []
+    for _ in range(ticks):
+        for address in prices:
+            prices[address] = max(0.01, prices[address] * (1 + rng.gauss(0.004, 0.05)))
+        paths.append(dict(prices))
+    return paths
+
+
+def seed_history(conn, n_rows, with_index):
+    """Partial exits from closed positions, as the old schema stored them"""
+    conn.execute('''
+    CREATE TABLE partial_exits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contract_address TEXT, symbol TEXT, buy_timestamp TIMESTAMP,
+        amount REAL, price REAL, profit_sol REAL, reason TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+    rng = random.Random(3)
+    conn.executemany(
+        "INSERT INTO partial_exits (contract_address, symbol, buy_timestamp, amount, price, profit_sol, reason) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(f"OLD{rng.randrange(n_rows // 3 or 1):06d}", 'OLD', '2025-05-01T00:00:00',
+          0.1, 1.5, 0.05, 'Partial exit') for _ in range(n_rows)])
+    if with_index:
+        conn.execute("CREATE INDEX idx_partial_exits_position ON partial_exits(contract_address, buy_timestamp)")
+    conn.commit()
+
+
+def run_legacy(path, positions, paths, history, with_index):
+    """Lower bound of the old cost: one remaining-size query per position per tick"""
+    conn = sqlite3.connect(path)
+    seed_history(conn, history, with_index)
+    tick_ms = []
+    for prices in paths:
+        start = time.perf_counter()
+        for position in positions:
+            conn.execute(LEGACY_REMAINING_SQL,
+                         (position['contract_address'], position['buy_timestamp'])).fetchone()
+            _ = prices[position['contract_address']]
+        tick_ms.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return tick_ms, 0
+
+
+async def run_in_memory(db, positions, paths):
+    manager = PartialExitManager(CONFIG, db, FakeTrader())
+    keys = {position['contract_address']: manager.register_position(position) for position in positions}
+    tick_ms = []
+    for prices in paths:
+        start = time.perf_counter()
+        manager.on_prices({keys[address]: price for address, price in prices.items()})
+        # Fired sells run as tasks; count them in the tick that triggered them
+        await manager.exit_engine.drain()
+        tick_ms.append((time.perf_counter() - start) * 1000)
+    return tick_ms, manager.exit_engine.stats['sells']
+
+
+def summarize(tick_ms):
+    ordered = sorted(tick_ms)
+    return sum(ordered) / len(ordered), ordered[int(len(ordered) * 0.99)], ordered[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Partial exit evaluation benchmark')
+    parser.add_argument('--positions', type=int, default=100, help='Open positions')
+    parser.add_argument('--ticks', type=int, default=200, help='Price ticks')
+    parser.add_argument('--history', type=int, default=20000, help='Historical partial_exits rows')
+    args = parser.parse_args()
+
+    # Exit logging would dominate the timings
+    logging.basicConfig(level=logging.ERROR)
+
+    positions = make_positions(args.positions)
+    paths = price_paths(positions, args.ticks)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            'sql (no index)': run_legacy(os.path.join(tmp, 'legacy.db'), positions, paths,
+                                         args.history, with_index=False),
+            'sql (indexed)': run_legacy(os.path.join(tmp, 'legacy_idx.db'), positions, paths,
+                                        args.history, with_index=True),
+        }
+        db = Database(os.path.join(tmp, 'bot.db'))
+        results['in-memory'] = asyncio.run(run_in_memory(db, positions, paths))
+        db.close()
+
+    print(f"{args.positions} positions, {args.ticks} ticks, {args.history} historical exits\n")
+    print(f"{'mode':<16}{'avg ms/tick':>13}{'p99 ms':>10}{'max ms':>10}{'us/position':>13}{'sells':>7}")
+    for mode, (tick_ms, sells) in results.items():
+        avg, p99, worst = summarize(tick_ms)
+        print(f"{mode:<16}{avg:>13.3f}{p99:>10.3f}{worst:>10.3f}"
+              f"{avg * 1000 / args.positions:>13.1f}{sells:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark: background retraining vs refitting from scratch
+
+Streams synthetic closed positions (entry feature vectors labelled by PnL)
+whose relationship to the features changes halfway through (concept drift),
+in batches of --batch rows:
+
+- scratch: what train_ml_model.py does, a RandomForest refit on every row so
+  far, per batch
+- incremental: RetrainingWorker (test-then-train updates, full refit only on
+  detected drift, publish only if validation doesn't regress)
+
+Reports wall time per batch, when full refits fired and the validation
+log-loss deltas. Then measures the worst event-loop stall while retraining
+runs inline versus in the RetrainingService process.
+
+Usage:
+    python scripts/benchmarks/retraining_benchmark.py [--rows 4000] [--batch 50] [--kind sgd]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from ml.features import FEATURE_NAMES
+from ml.training.retraining import RetrainingService, RetrainingWorker, classification_metrics
+
+
+def closed_positions(n, seed=0):
+    """Feature dicts and PnL; the winning pattern flips (and volume shifts) halfway"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(FEATURE_NAMES)))
+    half = n // 2
+    X[half:, FEATURE_NAMES.index('volume_ratio')] += 1.5
+    w_before = np.zeros(len(FEATURE_NAMES))
+    w_before[[0, 5, 11]] = [1.5, 1.0, -1.0]
+    w_after = np.zeros(len(FEATURE_NAMES))
+    w_after[[0, 5, 11]] = [-1.5, 0.5, 1.0]
+    logits = np.where(np.arange(n)[:, None] < half, X @ w_before[:, None], X @ w_after[:, None]).ravel()
+    pnl = logits + rng.normal(0, 1, n)
+    return [{'features': dict(zip(FEATURE_NAMES, x.tolist())), 'label': int(p > 0), 'pnl_pct': float(p)}
+            for x, p in zip(X, pnl)]
+
+
+def scratch_refit(rows):
+    """Full RandomForest refit on everything so far (the hand-run scripts)"""
+    from sklearn.ensemble import RandomForestClassifier
+    X = np.array([[r['features'][f] for f in FEATURE_NAMES] for r in rows])
+    y = np.array([r['label'] for r in rows])
+    start = time.perf_counter()
+    RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=1).fit(X, y)
+    return (time.perf_counter() - start) * 1000
+
+
+def stream(rows, batch, kind, root):
+    settings = {'registry_root': os.path.join(root, 'registry'), 'rows_path': os.path.join(root, 'rows.jsonl'),
+                'log_path': os.path.join(root, 'log.jsonl'), 'min_batch_rows': batch, 'min_train_rows': 200,
+                'model_kind': kind}
+    worker = RetrainingWorker(settings)
+    records, scratch_ms = [], []
+    for i, row in enumerate(rows, 1):
+        worker.add(row)
+        if worker.due():
+            records.append(worker.update())
+            scratch_ms.append(scratch_refit(rows[:i]))
+    return records, scratch_ms
+
+
+async def loop_stall(train, duration):
+    """Worst gap between 1 ms heartbeats while train() keeps the CPU busy"""
+    gaps, done = [], False
+
+    async def heartbeat():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(heartbeat())
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        await train()
+    done = True
+    await task
+    return max(gaps) * 1000, float(np.percentile(gaps, 99)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Retraining benchmark')
+    parser.add_argument('--rows', type=int, default=4000, help='Closed positions to stream')
+    parser.add_argument('--batch', type=int, default=50, help='Rows per retrain')
+    parser.add_argument('--kind', default='sgd', choices=['sgd', 'forest'])
+    parser.add_argument('--stall-seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    rows = closed_positions(args.rows)
+
+    with tempfile.TemporaryDirectory() as root:
+        records, scratch_ms = stream(rows, args.batch, args.kind, root)
+        incremental_ms = [r['train_ms'] for r in records]
+        print(f"{len(records)} retrains of {args.batch} rows ({args.kind}), drift at row {args.rows // 2}\n")
+        print(f"{'':<26}{'median ms':>10}{'max ms':>10}{'total s':>10}")
+        print(f"{'scratch RandomForest':<26}{np.median(scratch_ms):>10.1f}{max(scratch_ms):>10.1f}"
+              f"{sum(scratch_ms) / 1000:>10.1f}")
+        print(f"{'incremental service':<26}{np.median(incremental_ms):>10.1f}{max(incremental_ms):>10.1f}"
+              f"{sum(incremental_ms) / 1000:>10.1f}")
+
+        fulls = [r for r in records if r['kind'] == 'full']
+        print(f"\nFull refits ({len(fulls)}, first 12):")
+        for r in fulls[:12]:
+            delta = (r.get('delta') or {}).get('log_loss')
+            print(f"  at row {r['rows_total']:>5}: {r['reason']}, {r['train_ms']:.0f} ms, "
+                  f"validation log loss {'n/a' if delta is None else f'{delta:+.3f}'}, "
+                  f"{'published v' + str(r['published']) if r['published'] else 'not published'}")
+        published = sum(1 for r in records if r['published'])
+        deltas = [r['delta']['log_loss'] for r in records if r.get('delta')]
+        print(f"Published {published}/{len(records)}; mean validation log-loss delta "
+              f"{np.mean(deltas) if deltas else 0:+.4f}")
+
+        # Final quality on the post-drift regime
+        worker = RetrainingWorker({'registry_root': os.path.join(root, 'registry'),
+                                   'rows_path': os.path.join(root, 'none.jsonl'), 'model_kind': args.kind})
+        tail = closed_positions(1000, seed=1)[500:]
+        X = np.array([[r['features'][f] for f in FEATURE_NAMES] for r in tail])
+        y = np.array([r['label'] for r in tail])
+        serving = worker.registry.get('entry')
+        m = classification_metrics(y, worker._proba(serving.model, serving.scaler, X))
+        print(f"Serving v{serving.version} on fresh post-drift rows: accuracy {m['accuracy']:.3f}, "
+              f"AUC {m['auc']:.3f}")
+
+    # Event-loop latency: inline refits vs the separate process
+    with tempfile.TemporaryDirectory() as root:
+        async def inline_refit():
+            scratch_refit(rows[:2000])
+            await asyncio.sleep(0)
+
+        worst_inline, p99_inline = asyncio.run(loop_stall(inline_refit, args.stall_seconds))
+
+        service = RetrainingService({'registry_root': os.path.join(root, 'registry'),
+                                     'rows_path': os.path.join(root, 'rows.jsonl'),
+                                     'log_path': os.path.join(root, 'log.jsonl'),
+                                     'min_batch_rows': args.batch, 'min_train_rows': 200,
+                                     'model_kind': args.kind})
+        service.start()
+        feed = iter(rows * 10)
+
+        async def submit():
+            for _ in range(args.batch):
+                row = next(feed)
+                service.record_closed_position('TOKEN', row['features'], row['pnl_pct'])
+            await asyncio.sleep(0.01)
+
+        worst_service, p99_service = asyncio.run(loop_stall(submit, args.stall_seconds))
+        service.stop()
+        stats = service.get_stats()
+        print(f"\nEvent loop, worst / p99 heartbeat gap:")
+        print(f"  inline scratch refits:  {worst_inline:7.1f} / {p99_inline:.1f} ms")
+        print(f"  retraining process:     {worst_service:7.1f} / {p99_service:.1f} ms "
+              f"({stats['retrains']} retrains, {stats['rows_submitted']} rows, {os.cpu_count()} CPU)")
+
+
+if __name__ == "__main__":
+    main()
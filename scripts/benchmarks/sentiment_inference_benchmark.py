@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batched, cached sentiment inference vs one pipeline call per tweet
+
+Simulates repeated discovery scans of --tokens tokens with --tweets tweets
+each, where --overlap of every token's tweets were already seen in the
+previous scan (search_recent_tweets returns mostly the same tweets a few
+minutes later), and scores them:
+
+- before: TwitterSentimentAnalyzer's old loop, pipeline(text) per tweet,
+  tokens one after another on the event loop
+- after: SentimentInferenceService, all tokens' tweets coalesced into
+  length-sorted padded batches on the inference thread, cached by tweet ID
+
+Reports tweets/sec through the model, p95 per-token latency and the worst
+event-loop stall. Needs transformers and torch (downloads the model on
+first run).
+
+Usage:
+    python scripts/benchmarks/sentiment_inference_benchmark.py [--tokens 10] [--tweets 100] [--scans 3]
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.analysis.sentiment_inference import DEFAULT_MODEL, SentimentInferenceService
+
+OPENERS = ["just aped into", "loading more", "dumping my", "not sure about", "huge volume on", "rug alert",
+           "chart looks clean on", "devs are shipping on", "whales are selling", "accumulating"]
+CLOSERS = ["to the moon 🚀", "this is going to zero", "nfa dyor", "insane community behind this one",
+           "liquidity pulled, stay away", "next 100x gem", "looks like a slow bleed",
+           "breakout incoming, volume confirms it", "team wallet keeps selling, careful", ""]
+
+
+def scans(tokens, tweets, n_scans, overlap, seed=0):
+    """[(symbol, [(tweet_id, text), ...]), ...] per scan"""
+    rng = np.random.default_rng(seed)
+    next_id = 0
+    current = {}
+    result = []
+    for _ in range(n_scans):
+        scan = []
+        for t in range(tokens):
+            symbol = f"TKN{t}"
+            kept = current.get(symbol, [])[:int(tweets * overlap)]
+            fresh = []
+            for _ in range(tweets - len(kept)):
+                words = rng.integers(0, 12)
+                text = (f"{OPENERS[rng.integers(len(OPENERS))]} ${symbol} " +
+                        " ".join(["wagmi"] * int(words)) + f" {CLOSERS[rng.integers(len(CLOSERS))]}")
+                fresh.append((next_id, text))
+                next_id += 1
+            current[symbol] = fresh + kept  # newest first, as search returns them
+            scan.append((symbol, current[symbol]))
+        result.append(scan)
+    return result
+
+
+async def watch_loop(work):
+    """Run work() while a 1 ms heartbeat measures the worst event-loop stall"""
+    gaps, done = [], False
+
+    async def heartbeat():
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    task = asyncio.create_task(heartbeat())
+    result = await work()
+    done = True
+    await task
+    return result, max(gaps) * 1000 if gaps else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sentiment inference benchmark')
+    parser.add_argument('--tokens', type=int, default=10)
+    parser.add_argument('--tweets', type=int, default=100, help='Tweets per token per scan')
+    parser.add_argument('--scans', type=int, default=3)
+    parser.add_argument('--overlap', type=float, default=0.7, help='Share of tweets seen in the previous scan')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    try:
+        from transformers import pipeline
+    except ImportError:
+        print("❌ transformers (and torch) are required for this benchmark")
+        sys.exit(1)
+
+    model = pipeline("sentiment-analysis", model=args.model, device=-1)
+    model("warm up")
+    data = scans(args.tokens, args.tweets, args.scans, args.overlap)
+
+    # Before: one forward pass per tweet, on the loop
+    async def per_tweet():
+        latencies, scored, busy = [], 0, 0.0
+        for scan in data:
+            for symbol, tweets in scan:
+                start = time.perf_counter()
+                for _, text in tweets:
+                    model(text)[0]
+                    scored += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+                busy += latencies[-1] / 1000
+                await asyncio.sleep(0)
+        return latencies, scored, busy
+
+    (before_lat, before_scored, before_busy), before_stall = asyncio.run(watch_loop(per_tweet))
+
+    # After: the service, tokens of a scan analysed concurrently
+    service = SentimentInferenceService(model=model, batch_size=args.batch_size)
+
+    async def batched():
+        latencies = []
+
+        async def token(tweets):
+            start = time.perf_counter()
+            await service.score(tweets)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        for scan in data:
+            await asyncio.gather(*(token(tweets) for _, tweets in scan))
+        return latencies
+
+    after_lat, after_stall = asyncio.run(watch_loop(batched))
+    stats = service.get_stats()
+    service.close()
+
+    total = args.tokens * args.tweets * args.scans
+    print(f"{args.scans} scans x {args.tokens} tokens x {args.tweets} tweets ({total} tweets, "
+          f"{args.overlap:.0%} repeated between scans), {os.cpu_count()} CPU\n")
+    print(f"{'':<24}{'scored':>8}{'tweets/s':>10}{'p95 token ms':>14}{'wall s':>8}{'loop stall ms':>15}")
+    print(f"{'pipeline per tweet':<24}{before_scored:>8}{before_scored / before_busy:>10.0f}"
+          f"{np.percentile(before_lat, 95):>14.0f}{before_busy:>8.1f}{before_stall:>15.0f}")
+    print(f"{'batched service':<24}{stats['tweets_scored']:>8}{stats['tweets_per_sec']:>10.0f}"
+          f"{np.percentile(after_lat, 95):>14.0f}{stats['total_infer_ms'] / 1000:>8.1f}{after_stall:>15.0f}")
+    print(f"\nCache hit rate {stats['cache_hit_rate']:.0%}, {stats['batches']} forward passes "
+          f"(avg {stats['avg_batch_size']:.0f} tweets)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SnapshotStore write throughput and query latency
+
+Records a monitor-like stream (every token observed once per tick) spread
+over several days, then times the queries the backtester and the feature
+pipeline run: a full time range, a one-day range for a token subset, a
+single-token 10-minute series and a MarketHistory build.
+
+Usage:
+    python scripts/benchmarks/snapshot_store_benchmark.py [--tokens 2000] [--days 3] [--tick-seconds 60]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.backtesting import MarketHistory
+from core.storage.snapshot_store import SnapshotStore
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot store benchmark')
+    parser.add_argument('--tokens', type=int, default=2000, help='Tokens observed per tick')
+    parser.add_argument('--days', type=int, default=3, help='Days of observations')
+    parser.add_argument('--tick-seconds', type=int, default=60, help='Seconds between observations')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    addresses = [f"TOKEN{i:06d}" for i in range(args.tokens)]
+    price = rng.lognormal(-9, 2, args.tokens)
+    volume = rng.lognormal(10, 1.8, args.tokens)
+    liquidity = rng.lognormal(9.5, 1.5, args.tokens)
+    holders = rng.lognormal(5, 1.5, args.tokens).round()
+    t0 = 1_750_032_000  # midnight UTC
+    ticks = args.days * 86400 // args.tick_seconds
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SnapshotStore(tmp, max_buffer_rows=50_000, flush_interval=1e9)
+
+        start = time.perf_counter()
+        for tick in range(ticks):
+            price *= np.exp(rng.normal(0, 0.01, args.tokens))
+            ts = t0 + tick * args.tick_seconds
+            for i, address in enumerate(addresses):
+                store.record(address, price[i], ts, volume_24h=volume[i], liquidity_usd=liquidity[i],
+                             mcap=price[i] * 1e9, holders=holders[i])
+        store.flush()
+        write_s = time.perf_counter() - start
+        rows = store.stats['rows_flushed']
+
+        disk = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(tmp) for f in files)
+        print(f"{rows:,} observations ({args.tokens} tokens x {ticks} ticks, {args.days} days)")
+        print(f"  record+flush: {write_s:.1f}s ({rows / write_s / 1000:.0f}k rows/s), "
+              f"{store.stats['segments_written']} segments, {disk / rows:.1f} bytes/row on disk")
+
+        # Fresh store: queries start from cold memory maps
+        store = SnapshotStore(tmp)
+        subset = addresses[::max(1, args.tokens // 50)][:50]
+        day_start = t0 + 86400 * (args.days // 2)
+        for _ in range(2):
+            full, full_ms = timed(store.query)
+            part, part_ms = timed(store.query, day_start, day_start + 86400, subset)
+            series, series_ms = timed(store.token_series, addresses[0])
+            history, history_ms = timed(MarketHistory.from_snapshot_store, store)
+
+        print(f"\n{'query':<38}{'rows':>12}{'ms':>10}")
+        print(f"{'full range, all tokens':<38}{len(full['timestamp']):>12,}{full_ms:>10.1f}")
+        print(f"{'one day, 50 tokens':<38}{len(part['timestamp']):>12,}{part_ms:>10.1f}")
+        print(f"{'one token, 10-min series':<38}{len(series):>12,}{series_ms:>10.1f}")
+        print(f"{'MarketHistory (10-min bars)':<38}{history.n_bars * history.n_tokens:>12,}{history_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
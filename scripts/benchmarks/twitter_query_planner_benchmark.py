@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark: consolidated Twitter searches vs one search per token and influencer
+
+Serves a local stand-in for the v2 recent search endpoint (with --latency
+ms per request) that answers each query with tweets mentioning the queried
+cashtags, from the queried accounts when the query has from: clauses, and
+runs a sentiment scan of --tokens tokens for the tracked influencers:
+
+- before: the old query shapes, one token search plus one search per
+  influencer per token, awaited one after another
+- after: TwitterQueryPlanner, symbols and from: clauses OR-combined within
+  the query length limit, searches run concurrently
+
+Reports API calls per scan, wall time, the tweets each token received and
+how many scans fit the Basic tier's 60 searches per 15 minutes.
+
+Usage:
+    python scripts/benchmarks/twitter_query_planner_benchmark.py [--tokens 10] [--latency 150]
+"""
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+
+import aiohttp
+from aiohttp import web
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.analysis.twitter_query_planner import INFLUENCER_EXCLUSIONS, TwitterQueryPlanner, token_query
+from utils.rate_limiter import RateLimiter
+
+ACCOUNTS = ["ansemtrades", "thecryptoskull", "solbuckets", "solanalegend", "blknoiz06", "CryptoGodJohn",
+            "inversebrah"]
+BASIC_TIER_PER_WINDOW = 60
+
+
+def search_app(latency_ms, calls):
+    """Recent search stand-in: tweets matching the query's cashtags and authors"""
+    rng = random.Random(0)
+    next_id = [0]
+
+    async def search(request):
+        calls.append(request.query['query'])
+        await asyncio.sleep(latency_ms / 1000)
+        query = request.query['query']
+        max_results = int(request.query.get('max_results', 10))
+        symbols = sorted(set(re.findall(r'[$#](\w+)', query)))
+        authors = re.findall(r'from:(\w+)', query)
+        users = {a: str(1000 + i) for i, a in enumerate(authors or ['someone'])}
+        data = []
+        for _ in range(max_results):
+            symbol = rng.choice(symbols)
+            author = rng.choice(list(users))
+            next_id[0] += 1
+            data.append({'id': str(next_id[0]), 'text': f"bullish on ${symbol} gem", 'author_id': users[author],
+                         'created_at': '2024-01-01T00:00:00.000Z',
+                         'public_metrics': {'like_count': 1, 'retweet_count': 0, 'reply_count': 0}})
+        return web.json_response({
+            'data': data,
+            'includes': {'users': [{'id': uid, 'username': a, 'public_metrics': {'followers_count': 10}}
+                                   for a, uid in users.items()]}
+        })
+
+    app = web.Application()
+    app.router.add_get('/2/tweets/search/recent', search)
+    return app
+
+
+async def old_scan(planner, symbols):
+    """The old analyzer: per token, one search then one per influencer, sequentially"""
+    received = {}
+    for symbol in symbols:
+        tweets = await planner.search(token_query([symbol]), 100)
+        received[symbol] = len(tweets.data) if tweets else 0
+        for account in ACCOUNTS:
+            await planner.search(f"from:{account} ${symbol} {INFLUENCER_EXCLUSIONS}", 10)
+    return received
+
+
+async def new_scan(planner, symbols):
+    tweets, influencers = await asyncio.gather(planner.search_tokens(symbols),
+                                               planner.search_influencers(ACCOUNTS, symbols))
+    return {s: len(tweets[s].data) if s in tweets else 0 for s in symbols}, \
+        {s: len(influencers.get(s, [])) for s in symbols}
+
+
+async def run(args):
+    calls = []
+    runner = web.AppRunner(search_app(args.latency, calls))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/2/tweets/search/recent"
+    symbols = [f"TKN{i}" for i in range(args.tokens)]
+
+    async with aiohttp.ClientSession() as session:
+        results = {}
+        for label, scan in (('before', old_scan), ('after', new_scan)):
+            calls.clear()
+            limiter = RateLimiter('twitter-bench', requests_per_minute=1e6, burst=1000)
+            planner = TwitterQueryPlanner('token', max_query_length=args.max_query_length,
+                                          max_symbols_per_query=args.symbols_per_query,
+                                          session=session, rate_limiter=limiter, url=url)
+            start = time.perf_counter()
+            received = await scan(planner, symbols)
+            results[label] = (len(calls), time.perf_counter() - start, received,
+                              max(len(q) for q in calls))
+    await runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Twitter query planner benchmark')
+    parser.add_argument('--tokens', type=int, default=10, help='Tokens per sentiment scan')
+    parser.add_argument('--latency', type=float, default=150.0, help='Simulated API latency (ms)')
+    parser.add_argument('--max-query-length', type=int, default=512)
+    parser.add_argument('--symbols-per-query', type=int, default=4)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    results = asyncio.run(run(args))
+
+    before_calls, before_s, before_tweets, _ = results['before']
+    after_calls, after_s, (after_tweets, influencer_tweets), longest = results['after']
+    print(f"Scan of {args.tokens} tokens x {len(ACCOUNTS)} influencers, {args.latency:.0f} ms per API call, "
+          f"query limit {args.max_query_length} (longest sent: {longest})\n")
+    print(f"{'':<30}{'API calls':>10}{'wall s':>9}{'scans / 15 min':>16}{'min tweets/token':>18}")
+    for label, calls, seconds, received in (('one search per token/account', before_calls, before_s, before_tweets),
+                                            ('query planner', after_calls, after_s, after_tweets)):
+        print(f"{label:<30}{calls:>10}{seconds:>9.2f}{BASIC_TIER_PER_WINDOW / calls:>16.1f}"
+              f"{min(received.values()):>18}")
+    print(f"\nInfluencer tweets fanned out per token: min {min(influencer_tweets.values())}, "
+          f"max {max(influencer_tweets.values())}")
+
+
+if __name__ == "__main__":
+    main()
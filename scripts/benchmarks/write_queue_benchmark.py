@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event-loop stall from direct SQLite writes vs the write-behind queue
+
+A heartbeat task measures how late the loop wakes up while a scan-like
+coroutine stores tokens (with repeats) and records trades.
+
+Usage:
+    python scripts/benchmarks/write_queue_benchmark.py [--tokens 5000] [--trades 200]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from core.storage.database import Database
+from core.storage.write_queue import AsyncWriteQueue
+
+
+async def heartbeat(lags, stop, interval=0.001):
+    """Record how late each 1ms sleep wakes up"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+
+
+async def workload(store, record, n_tokens, n_trades):
+    """Scan-like token upserts (about 3 sightings per token) plus trades"""
+    rng = random.Random(3)
+    addresses = [f"TOKEN{i:06d}" for i in range(max(1, n_tokens // 3))]
+    for i in range(n_tokens):
+        await store({
+            'contract_address': rng.choice(addresses),
+            'ticker': f"T{i}",
+            'price_usd': rng.random(),
+            'volume_24h': rng.uniform(1e3, 1e6),
+        })
+        if i % 50 == 0:
+            await asyncio.sleep(0)
+    for i in range(n_trades):
+        await record(contract_address=rng.choice(addresses), action='BUY' if i % 2 == 0 else 'SELL',
+                     amount=0.1, price=0.001)
+
+
+async def run(mode, db, n_tokens, n_trades):
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+
+    if mode == 'direct':
+        async def store(token):
+            db.store_token(token)
+
+        async def record(**kwargs):
+            db.record_trade(**kwargs)
+
+        await workload(store, record, n_tokens, n_trades)
+        stats = {}
+    else:
+        queue = AsyncWriteQueue(db)
+        await workload(queue.store_token, queue.record_trade, n_tokens, n_trades)
+        await queue.close()
+        stats = queue.get_stats()
+
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    lags.sort()
+    return {
+        'elapsed_s': elapsed,
+        'p99_lag_ms': lags[int(len(lags) * 0.99)] if lags else 0.0,
+        'max_lag_ms': lags[-1] if lags else 0.0,
+        'stats': stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write-behind queue benchmark')
+    parser.add_argument('--tokens', type=int, default=5000, help='Token upserts')
+    parser.add_argument('--trades', type=int, default=200, help='Trades recorded')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for mode in ('direct', 'queue'):
+            db = Database(os.path.join(tmp, f'{mode}.db'))
+            results[mode] = asyncio.run(run(mode, db, args.tokens, args.trades))
+            db.close()
+
+    print(f"{'mode':<8}{'elapsed s':>11}{'p99 lag ms':>12}{'max lag ms':>12}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['elapsed_s']:>11.2f}{result['p99_lag_ms']:>12.2f}{result['max_lag_ms']:>12.2f}")
+
+    stats = results['queue']['stats']
+    print(f"\nqueue: {stats['tokens_enqueued']} upserts -> {stats['rows_flushed']} rows "
+          f"in {stats['flushes']} flushes ({stats['tokens_coalesced']} coalesced), "
+          f"avg {stats['avg_rows_per_flush']:.0f} rows / {stats['avg_flush_ms']:.1f}ms per flush, "
+          f"max depth {stats['max_queue_depth']}, avg trade commit {stats['avg_trade_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Walk-forward evaluation of an entry model
+
+Builds the engineered feature matrix for every closed trade (cached under
+data/ml/feature_cache, so only the first run pays for it), then fits and
+scores purged walk-forward folds in parallel and prints precision, recall,
+AUC and simulated trading P&L per fold:
+
+    python scripts/evaluate_model.py --model rf --folds 5
+    python scripts/evaluate_model.py --rows data/ml/training_rows.jsonl --model sgd
+
+Usage:
+    python scripts/evaluate_model.py [--db data/db/sol_bot.db --snapshots data/snapshots | --rows FILE]
+                                     [--model rf|gb|sgd] [--folds 5] [--embargo-minutes 60]
+                                     [--workers N] [--threshold 0.5] [--fee-pct 1.0] [--no-cache]
+"""
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime, timezone
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.evaluation.cross_validation import (DEFAULT_CACHE_DIR, FeatureCache, WalkForwardEvaluator, closed_trades,
+                                            rows_dataset, snapshot_dataset, source_fingerprint)
+
+MODELS = ('rf', 'gb', 'sgd')
+
+
+def make_estimator(name):
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if name == 'gb':
+        from sklearn.ensemble import GradientBoostingClassifier
+        model = GradientBoostingClassifier(n_estimators=200, learning_rate=0.05, max_depth=6,
+                                           min_samples_split=50, subsample=0.8, random_state=42)
+    elif name == 'sgd':
+        from sklearn.linear_model import SGDClassifier
+        model = SGDClassifier(loss='log_loss', alpha=1e-3, max_iter=1000, tol=1e-4, random_state=42)
+    else:
+        from sklearn.ensemble import RandomForestClassifier
+        model = RandomForestClassifier(n_estimators=200, max_depth=10, min_samples_leaf=5,
+                                       random_state=42, n_jobs=1)
+    return make_pipeline(StandardScaler(), model)
+
+
+def load_dataset(args, cache):
+    if args.rows:
+        key = ['rows', source_fingerprint(args.rows)]
+        build = lambda: rows_dataset(args.rows)
+    else:
+        def build():
+            from core.storage.database import Database
+            from core.storage.snapshot_store import SnapshotStore
+            db = Database(args.db)
+            try:
+                trades = closed_trades(db)
+            finally:
+                db.close()
+            return snapshot_dataset(trades, SnapshotStore(args.snapshots), args.bar_minutes * 60)
+        key = ['snapshots', source_fingerprint(args.db, args.snapshots), args.bar_minutes]
+
+    if cache is None:
+        return build()
+    return cache.get_or_build(key, build)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward model evaluation')
+    parser.add_argument('--db', default='data/db/sol_bot.db', help='Trading database (closed trades)')
+    parser.add_argument('--snapshots', default='data/snapshots', help='Snapshot store (features)')
+    parser.add_argument('--rows', default=None, metavar='FILE',
+                        help='Use the retraining service rows (data/ml/training_rows.jsonl) instead')
+    parser.add_argument('--bar-minutes', type=int, default=10)
+    parser.add_argument('--model', default='rf', choices=MODELS)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--embargo-minutes', type=float, default=60.0)
+    parser.add_argument('--max-train', type=int, default=None, help='Rolling training window in rows')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--threshold', type=float, default=0.5, help='Entry probability for precision and P&L')
+    parser.add_argument('--fee-pct', type=float, default=1.0, help='Round-trip cost per simulated trade')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--no-cache', action='store_true', help='Rebuild the feature matrix')
+    parser.add_argument('--output', default='data/ml/evaluation', help='Directory for the fold table')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    sources = [args.rows] if args.rows else [args.db, args.snapshots]
+    missing = [p for p in sources if not os.path.exists(p)]
+    if missing:
+        print(f"❌ Not found: {', '.join(missing)}")
+        return
+
+    cache = None if args.no_cache else FeatureCache(args.cache_dir)
+    dataset = load_dataset(args, cache)
+    if cache is not None:
+        source = 'cache' if cache.stats['hits'] else f"built in {cache.stats['build_ms'] / 1000:.1f}s"
+    else:
+        source = 'built'
+    print(f"Dataset: {len(dataset)} closed trades x {len(dataset.feature_names)} features ({source})")
+    if len(dataset) == 0:
+        print("❌ No closed trades with features to evaluate")
+        return
+
+    evaluator = WalkForwardEvaluator(make_estimator(args.model), n_splits=args.folds,
+                                     embargo_seconds=args.embargo_minutes * 60, max_train_size=args.max_train,
+                                     threshold=args.threshold, fee_pct=args.fee_pct, workers=args.workers)
+    result = evaluator.evaluate(dataset)
+
+    print(f"\n{'fold':>4}{'train':>8}{'test':>6}{'prec':>7}{'recall':>8}{'AUC':>7}{'trades':>8}"
+          f"{'P&L %':>9}{'all %':>9}")
+    for fold in result.folds:
+        if 'skipped' in fold:
+            print(f"{fold['fold']:>4}{fold['train_rows']:>8}{fold['test_rows']:>6}  skipped: {fold['skipped']}")
+            continue
+        auc = f"{fold['auc']:.3f}" if fold['auc'] is not None else '  n/a'
+        print(f"{fold['fold']:>4}{fold['train_rows']:>8}{fold['test_rows']:>6}{fold['precision']:>7.3f}"
+              f"{fold['recall']:>8.3f}{auc:>7}{fold['trades']:>8}{fold['pnl_pct']:>9.1f}"
+              f"{fold['baseline_pnl_pct']:>9.1f}")
+
+    summary = result.summary()
+    if summary['folds']:
+        print(f"\nMean precision {summary['precision']:.3f}, recall {summary['recall']:.3f}, "
+              f"AUC {summary['auc'] or 0:.3f} (+/- {summary['auc_std']:.3f}); "
+              f"P&L {summary['pnl_pct']:+.1f}% over {summary['trades']:.0f} trades vs "
+              f"{summary['baseline_pnl_pct']:+.1f}% taking all; {result.elapsed_s:.1f}s")
+
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(args.output, f"walk_forward_{args.model}_{stamp}.csv")
+    result.save(path)
+    print(f"✅ Fold table saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
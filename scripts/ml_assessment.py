@@ -8,14 +8,20 @@ import pandas as pd
 import numpy as np
 import sqlite3
 import json
-from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
 from datetime import datetime, timedelta
 import joblib
+import os
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.evaluation import EvaluationDataset, WalkForwardEvaluator, epoch_seconds
+
 class MLModelAssessment:
     def __init__(self, db_path='data/db/sol_bot.db', model_path='data/models/ml_model.pkl'):
         self.db_path = db_path
@@ -162,14 +168,35 @@ class MLModelAssessment:
         print("MODEL PERFORMANCE EVALUATION")
         print("="*60)
         
-        # Prepare features and labels
-        features = self._prepare_features(df)
-        labels = (df['gain_loss_sol'] > 0).astype(int)
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            features, labels, test_size=0.2, random_state=42, stratify=labels
+        # Prepare features and labels, time-ordered
+        ordered = df['timestamp'].argsort(kind='stable').to_numpy()
+        features = self._prepare_features(df).iloc[ordered].reset_index(drop=True)
+        labels = (df['gain_loss_sol'] > 0).astype(int).iloc[ordered].reset_index(drop=True)
+        dataset = EvaluationDataset.from_frame(
+            features, labels,
+            pnl=df['percentage_change'].fillna(0).iloc[ordered].to_numpy(),
+            times=epoch_seconds(df['timestamp'].iloc[ordered])
         )
+        evaluator = WalkForwardEvaluator(RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42),
+                                         n_splits=5)
+        
+        # Holdout: the last purged walk-forward fold, so the model never trains
+        # on trades closed after (or within the embargo before) the test period
+        folds = evaluator.splitter.split(np.asarray(dataset.times), np.asarray(dataset.label_end))
+        if not folds:
+            print(f"\nNot enough trades for a time-ordered holdout ({len(df)} trades)")
+            return {
+                'test_accuracy': 0.0,
+                'auc_score': 0.0,
+                'cv_mean': 0.0,
+                'cv_std': 0.0,
+                'feature_importance': pd.DataFrame(columns=['feature', 'importance'])
+            }
+        train_idx, test_idx = folds[-1]
+        X_train, X_test = features.iloc[train_idx], features.iloc[test_idx]
+        y_train, y_test = labels.iloc[train_idx], labels.iloc[test_idx]
+        print(f"\nHoldout: last {len(X_test)} trades, trained on {len(X_train)} earlier trades "
+              f"({evaluator.splitter.embargo_seconds / 3600:.0f}h embargo)")
         
         # Train new model for evaluation
         model = RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42)
@@ -177,20 +204,26 @@ class MLModelAssessment:
         
         # Predictions
         y_pred = model.predict(X_test)
-        y_pred_proba = model.predict_proba(X_test)[:, 1]
+        y_pred_proba = model.predict_proba(X_test)[:, list(model.classes_).index(1)] if 1 in model.classes_ \
+            else np.zeros(len(X_test))
         
         # Performance metrics
         print("\nClassification Report:")
-        print(classification_report(y_test, y_pred, target_names=['Loss', 'Profit']))
+        print(classification_report(y_test, y_pred, labels=[0, 1], target_names=['Loss', 'Profit'], zero_division=0))
         
-        # ROC-AUC Score
-        auc_score = roc_auc_score(y_test, y_pred_proba)
+        # ROC-AUC Score (undefined when the recent block is all wins or all losses)
+        auc_score = roc_auc_score(y_test, y_pred_proba) if y_test.nunique() > 1 else 0.5
         print(f"ROC-AUC Score: {auc_score:.3f}")
         
-        # Cross-validation
-        cv_scores = cross_val_score(model, features, labels, cv=5, scoring='accuracy')
-        print(f"\nCross-Validation Scores: {cv_scores}")
+        # Walk-forward cross-validation (time-ordered, purged, folds in parallel)
+        cv = evaluator.evaluate(dataset)
+        cv_scores = np.array([f['accuracy'] for f in cv.folds if 'skipped' not in f] or [0.0])
+        print(f"\nWalk-Forward Scores: {np.round(cv_scores, 3)}")
         print(f"Average CV Score: {cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
+        summary = cv.summary()
+        if summary['folds']:
+            print(f"Walk-Forward AUC: {summary['auc'] or 0:.3f}, simulated P&L {summary['pnl_pct']:+.1f}% "
+                  f"over {summary['trades']:.0f} trades (taking all: {summary['baseline_pnl_pct']:+.1f}%)")
         
         # Feature importance
         feature_names = features.columns.tolist()
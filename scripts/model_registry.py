@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Inspect and manage the ML model registry
+
+The running bot picks up an activated version on its next reload check
+(ml_reload_interval, 60 s by default) without a restart:
+
+    python scripts/model_registry.py list
+    python scripts/model_registry.py import entry data/models/enhanced
+    python scripts/model_registry.py activate entry 3
+    python scripts/model_registry.py load entry
+
+Usage:
+    python scripts/model_registry.py [--root data/models/registry] {list,show,activate,import,load,prune} ...
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.models.registry import DEFAULT_ROOT, ModelRegistry
+
+
+def list_models(registry):
+    names = registry.names()
+    if not names:
+        print(f"No models in {registry.root}")
+        return
+    print(f"{'model':<10}{'version':>8}  {'active':<7}{'type':<30}{'MB':>8}  {'created':<26}metrics")
+    for name in names:
+        current = registry.current_version(name)
+        for version in registry.versions(name):
+            meta = registry.metadata(name, version)
+            metrics = ', '.join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+                                for k, v in meta.get('metrics', {}).items())
+            print(f"{name:<10}{version:>8}  {'*' if version == current else '':<7}"
+                  f"{meta.get('model_type', '?'):<30}{meta.get('file_bytes', 0) / 1e6:>8.1f}  "
+                  f"{meta.get('created_at', '?')[:25]:<26}{metrics}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ML model registry')
+    parser.add_argument('--root', default=DEFAULT_ROOT, help='Registry directory')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help='List models and versions')
+    show = sub.add_parser('show', help='Print the metadata of a version')
+    show.add_argument('name')
+    show.add_argument('version', type=int, nargs='?')
+    activate = sub.add_parser('activate', help='Make a version active (or roll back)')
+    activate.add_argument('name')
+    activate.add_argument('version', type=int)
+    imp = sub.add_parser('import', help='Publish a model saved by EnhancedMLTrainer.save_models')
+    imp.add_argument('name')
+    imp.add_argument('directory')
+    imp.add_argument('--model-file', default='entry_classifier.pkl')
+    imp.add_argument('--scaler-file', default='entry_scaler.pkl')
+    imp.add_argument('--no-activate', action='store_true')
+    load = sub.add_parser('load', help='Load the active version and report load time and memory')
+    load.add_argument('name')
+    load.add_argument('--no-mmap', action='store_true', help='Read the file instead of memory-mapping it')
+    prune = sub.add_parser('prune', help='Delete old versions')
+    prune.add_argument('name')
+    prune.add_argument('--keep', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    registry = ModelRegistry(args.root, mmap_threshold_mb=None if getattr(args, 'no_mmap', False) else 32)
+
+    if args.command == 'list':
+        list_models(registry)
+    elif args.command == 'show':
+        print(json.dumps(registry.metadata(args.name, args.version), indent=2))
+    elif args.command == 'activate':
+        if not registry.activate(args.name, args.version):
+            sys.exit(1)
+        print(f"✅ {args.name} v{args.version} is active")
+    elif args.command == 'import':
+        version = registry.import_directory(args.name, args.directory, args.model_file,
+                                            args.scaler_file, activate=not args.no_activate)
+        if version is None:
+            print(f"❌ Could not import {args.directory}")
+            sys.exit(1)
+        print(f"✅ Imported {args.directory} as {args.name} v{version}")
+    elif args.command == 'load':
+        loaded = registry.get(args.name)
+        if loaded is None:
+            print(f"❌ No loadable active version of {args.name}")
+            sys.exit(1)
+        print(json.dumps(loaded.info(), indent=2))
+    elif args.command == 'prune':
+        print(f"Deleted {registry.prune(args.name, args.keep)} old versions of {args.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Parameter sweep over trading_params.json with the vectorized backtester
+
+Evaluates grid, random or Bayesian candidates on every core, optionally with
+walk-forward validation, then writes a ranked candidate table and a config
+diff that safe_update_config.py can apply:
+
+    python scripts/parameter_sweep.py --method bayesian --n 2000 --folds 4
+    python safe_update_config.py --trading-params-diff config/trading_params_sweep_diff.json
+
+Usage:
+    python scripts/parameter_sweep.py [--db data/db/sol_bot.db | --snapshots data/snapshots]
+                                      [--method random] [--n 500]
+                                      [--folds 0] [--workers N] [--objective calmar]
+                                      [--synthetic TOKENS]
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.backtesting import MarketHistory
+from core.backtesting.sweep import DEFAULT_SPACE, OBJECTIVES, ParameterSweep
+
+# Coarse grid over the exit levels, for --method grid
+EXIT_GRID = {
+    'take_profit_pct': [0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0],
+    'stop_loss_pct': [0.03, 0.05, 0.1, 0.15, 0.2, 0.3],
+    'trailing_stop_enabled': [False, True],
+    'trailing_stop_distance_pct': [0.05, 0.1, 0.2],
+}
+
+
+def load_history(args):
+    if args.synthetic:
+        from scripts.benchmarks.backtest_benchmark import synthetic_history
+        return synthetic_history(args.synthetic, args.days, args.bar_minutes)
+
+    if args.snapshots:
+        from core.storage.snapshot_store import SnapshotStore
+        return MarketHistory.from_snapshot_store(SnapshotStore(args.snapshots),
+                                                 bar_seconds=args.bar_minutes * 60)
+
+    from core.storage.database import Database
+    db = Database(args.db)
+    try:
+        return MarketHistory.from_database(db, bar_seconds=args.bar_minutes * 60)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel trading parameter sweep')
+    parser.add_argument('--db', default='data/db/sol_bot.db', help='Trading database')
+    parser.add_argument('--snapshots', default=None, metavar='DIR',
+                        help='Replay recorded market snapshots (e.g. data/snapshots) instead of the database')
+    parser.add_argument('--params', default='config/trading_params.json', help='Current parameters')
+    parser.add_argument('--method', default='random', choices=['grid', 'random', 'bayesian'])
+    parser.add_argument('--n', type=int, default=500, help='Candidates (random/bayesian)')
+    parser.add_argument('--folds', type=int, default=0, help='Walk-forward folds (0 = in-sample)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--objective', default='calmar', choices=sorted(OBJECTIVES))
+    parser.add_argument('--entry-rule', default='analyzer', choices=['analyzer', 'simple'])
+    parser.add_argument('--bar-minutes', type=int, default=10, help='Bar width in minutes')
+    parser.add_argument('--synthetic', type=int, default=0, metavar='TOKENS',
+                        help='Sweep over a synthetic universe instead of the database')
+    parser.add_argument('--days', type=int, default=30, help='Days of synthetic history')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='data/optimization', help='Directory for the ranked table')
+    parser.add_argument('--diff', default='config/trading_params_sweep_diff.json',
+                        help='Config diff for safe_update_config.py')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with open(args.params) as f:
+        params = json.load(f)
+
+    history = load_history(args)
+    if history.n_bars < 2 or history.n_tokens == 0:
+        print("❌ Not enough price history to sweep")
+        return
+    print(f"History: {history.n_tokens} tokens x {history.n_bars} bars ({history.nbytes / 1e6:.0f} MB)")
+
+    sweep = ParameterSweep(history, params, space=DEFAULT_SPACE, objective=args.objective,
+                           workers=args.workers, walk_forward_folds=args.folds,
+                           entry_rule=args.entry_rule)
+    if args.method == 'grid':
+        result = sweep.run_grid(EXIT_GRID)
+    elif args.method == 'random':
+        result = sweep.run_random(args.n, seed=args.seed)
+    else:
+        result = sweep.run_bayesian(args.n, seed=args.seed)
+
+    table_path = os.path.join(args.output, f"sweep_{args.method}_{datetime.now():%Y%m%d_%H%M%S}.csv")
+    result.save(table_path, args.diff, params)
+
+    print(f"\n{len(result.table)} candidates in {result.elapsed_s:.1f}s ({args.objective})")
+    if args.folds:
+        print("Ranked on every window but the last; 'holdout' is the score on the held-out final window")
+    print(f"\n{'rank':<6}{'score':>9}{'holdout':>9}{'return %':>10}{'max dd %':>10}{'win %':>8}{'closed':>8}  params")
+    for rank, row in result.table.head(10).iterrows():
+        print(f"{rank + 1:<6}{row['score']:>9.2f}{row['holdout_score']:>9.2f}{row['return_pct']:>10.1f}"
+              f"{row['max_drawdown_pct']:>10.1f}{row['win_rate_pct']:>8.1f}{row['closed_positions']:>8}  "
+              f"{row['params']}")
+
+    if result.walk_forward:
+        print("\nWalk-forward:")
+        for fold in result.walk_forward:
+            print(f"  fold {fold['fold']}: in-sample {fold['in_sample_score']:.2f}, "
+                  f"out-of-sample {fold['out_of_sample_score']:.2f} "
+                  f"(best possible {fold['best_possible_score']:.2f})")
+
+    print(f"\n📁 Ranked table: {table_path}")
+    print(f"📋 Config diff:  {args.diff} ({len(result.config_diff(params))} changes)")
+    print(f"   Apply with: python safe_update_config.py --trading-params-diff {args.diff}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# scripts/rebuild_position_ledger.py - Verify or rebuild the open-position ledger
+
+import os
+import sys
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.storage.database import Database
+
+
+def main():
+    """Recompute the position ledger from trades and report any drift"""
+    parser = argparse.ArgumentParser(description='Verify or rebuild the position ledger')
+    parser.add_argument('--db', default='data/db/sol_bot.db', help='Path to SQLite database')
+    parser.add_argument('--verify', action='store_true',
+                        help='Only report drift, do not rewrite the ledger')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ Database not found at {args.db}")
+        sys.exit(1)
+
+    db = Database(args.db)
+    report = db.rebuild_position_ledger(verify_only=args.verify)
+    db.close()
+
+    if 'error' in report:
+        print(f"❌ Ledger check failed: {report['error']}")
+        sys.exit(1)
+
+    print(f"📒 Checked {report['positions_checked']} tokens against the trades table")
+
+    for contract in report['missing']:
+        print(f"   missing from ledger: {contract}")
+    for contract in report['unexpected']:
+        print(f"   no trades for ledger row: {contract}")
+    for item in report['drift']:
+        print(f"   {item['contract_address']} {item['field']}: "
+              f"ledger={item['ledger']} expected={item['expected']}")
+
+    clean = not (report['missing'] or report['unexpected'] or report['drift'])
+    if clean:
+        print("✅ Ledger matches trade history")
+    elif report['rebuilt']:
+        print("🔧 Ledger rebuilt from trade history")
+    else:
+        print("⚠️  Drift detected - run without --verify to rebuild")
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,12 @@ import sys
 import json
 from datetime import datetime
 
+# --profile-startup: print an import-time breakdown of startup (measured in a
+# fresh interpreter) and exit without starting the bot
+if __name__ == "__main__" and '--profile-startup' in sys.argv:
+    from utils.startup_profiler import profile_entry_point
+    sys.exit(profile_entry_point('start_bot'))
+
 # Core imports
 from config.bot_config import BotConfiguration
 from core.data.token_scanner import TokenScanner
@@ -0,0 +1,12 @@
+"""Shared test fixtures"""
+import pytest
+
+from core.storage.database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh, migrated Database in a temporary directory"""
+    database = Database(str(tmp_path / 'bot.db'))
+    yield database
+    database.close()
@@ -0,0 +1,82 @@
+"""Tests for the cross-sectional factor engine behind CitadelBarraStrategy.rank_candidates"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from citadel_barra_strategy import ALPHA_NAMES, FACTOR_NAMES, CitadelBarraStrategy
+
+OPTIONAL_FIELDS = ('price_change_1h', 'price_change_6h', 'price_change_24h', 'holders', 'rsi',
+                   'avg_volume_7d', 'ml_confidence')
+
+
+def candidates(n=60, missing=0.25, seed=0):
+    """Synthetic discovery tokens, a share of them missing optional fields"""
+    rng = np.random.default_rng(seed)
+    tokens = []
+    for i in range(n):
+        volume = float(rng.lognormal(11, 2))
+        token = {
+            'contract_address': f"TKN{i:04d}",
+            'price_change_1h': float(rng.normal(0, 15)),
+            'price_change_6h': float(rng.normal(0, 40)),
+            'price_change_24h': float(rng.normal(5, 80)),
+            'volume_24h': volume,
+            'liquidity_usd': float(rng.lognormal(10, 1.5)),
+            'mcap': float(rng.lognormal(13, 2)),
+            'holders': int(rng.lognormal(5, 1.5)),
+            'rsi': float(rng.uniform(5, 95)),
+            'avg_volume_7d': volume / float(rng.lognormal(0, 0.8)),
+            'ml_confidence': float(rng.uniform(0, 1))
+        }
+        for key in OPTIONAL_FIELDS:
+            if rng.random() < missing:
+                del token[key]
+        tokens.append(token)
+    # Every optional field missing at once, and a bare address
+    tokens.append({key: value for key, value in tokens[0].items() if key not in OPTIONAL_FIELDS})
+    tokens.append({'contract_address': 'BARE'})
+    return tokens
+
+
+@pytest.fixture
+def strategy():
+    return CitadelBarraStrategy({}, None)
+
+
+def test_rank_candidates_matches_analyze_token(strategy):
+    tokens = candidates()
+    assert any(len(token) < 11 for token in tokens)
+    expected = [asyncio.run(strategy.analyze_token(token)) for token in tokens]
+    ranked = strategy.rank_candidates(tokens)
+
+    assert len(ranked) == len(tokens)
+    assert [result['rank'] for result in ranked] == list(range(1, len(tokens) + 1))
+    scores = [result['combined_alpha'] for result in ranked]
+    assert scores == sorted(scores, reverse=True)
+
+    for result in ranked:
+        i = next(j for j, token in enumerate(tokens) if token is result['token'])
+        loop = expected[i]
+        assert result['combined_alpha'] == pytest.approx(loop['combined_alpha'], abs=1e-9)
+        assert result['final_score'] == pytest.approx(loop['final_score'], abs=1e-9)
+        assert result['recommendation'] == loop['recommendation']
+        assert result['alpha_signals'] == pytest.approx({name: loop['alpha_signals'][name] for name in ALPHA_NAMES},
+                                                        abs=1e-9)
+        for name in FACTOR_NAMES:
+            assert getattr(result['factors'], name) == pytest.approx(getattr(loop['factors'], name), abs=1e-9)
+        assert result['reasons'] == loop['reasons']
+        assert set(result['factor_zscores']) == set(FACTOR_NAMES)
+
+
+def test_rank_candidates_top_and_candidate_signals(strategy):
+    tokens = candidates(n=20)
+    best = strategy.rank_candidates(tokens, top=5)
+    assert [result['token'] for result in best] == [result['token'] for result in strategy.rank_candidates(tokens)[:5]]
+
+    # The per-row helper the bot uses returns the same dict as rank_candidates minus the ranking keys
+    frame = strategy.score_universe(tokens)
+    i = tokens.index(best[0]['token'])
+    signals = strategy.candidate_signals(frame, i)
+    assert signals == {key: value for key, value in best[0].items()
+                       if key not in ('token', 'rank', 'factor_zscores')}
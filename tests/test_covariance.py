@@ -0,0 +1,118 @@
+"""Tests for the streaming EW covariance service"""
+import numpy as np
+
+from core.analysis.covariance import StreamingCovariance
+from core.storage.snapshot_store import SnapshotStore
+
+BAR_SECONDS = 300
+START = 1_700_000_100.0  # a bar boundary
+
+
+def simulate(tokens=9, bars=200, ticks=3, seed=0):
+    """Tick prices (bars * ticks, tokens) with NaN before each token's listing"""
+    rng = np.random.default_rng(seed)
+    steps = bars * ticks
+    market = rng.normal(0, 0.004, steps)
+    beta = rng.uniform(0, 2, tokens)
+    returns = market[:, None] * beta + rng.normal(0, 0.006, (steps, tokens))
+    prices = rng.lognormal(-8, 3, tokens) * np.exp(np.cumsum(returns, axis=0))
+    # Every third token is listed part-way through
+    listed = np.where(np.arange(tokens) % 3 == 2, rng.integers(0, bars // 2, tokens), 0) * ticks
+    prices[np.arange(steps)[:, None] < listed] = np.nan
+    times = START + (np.arange(steps) // ticks) * BAR_SECONDS + (np.arange(steps) % ticks + 0.5) * BAR_SECONDS / ticks
+    return times, prices
+
+
+def feed(service, addresses, times, prices):
+    for t, row in zip(times, prices):
+        service.update_prices({a: p for a, p in zip(addresses, row) if p == p}, t)
+    service.flush()
+
+
+def batch_reference(bar_prices, decay, min_periods):
+    """Pairwise weighted np.cov / correlation over each pair's common bars"""
+    returns = np.diff(np.log(bar_prices), axis=0)
+    n = returns.shape[1]
+    cov = np.full((n, n), np.nan)
+    corr = np.full((n, n), np.nan)
+    for i in range(n):
+        for j in range(i, n):
+            both = ~np.isnan(returns[:, i]) & ~np.isnan(returns[:, j])
+            if both.sum() < min_periods:
+                continue
+            first = np.argmax(both)
+            x, y = returns[first:, i], returns[first:, j]
+            weights = decay ** np.arange(len(x))[::-1]
+            c = np.cov(x, y, aweights=weights)
+            cov[i, j] = cov[j, i] = c[0, 1]
+            corr[i, j] = corr[j, i] = c[0, 1] / np.sqrt(c[0, 0] * c[1, 1])
+    return cov, corr
+
+
+def test_matches_batch_weighted_covariance():
+    ticks = 3
+    times, prices = simulate(ticks=ticks)
+    addresses = [f"TKN{i}" for i in range(prices.shape[1])]
+    service = StreamingCovariance(bar_seconds=BAR_SECONDS, halflife_bars=24, min_periods=10)
+    feed(service, addresses, times, prices)
+
+    # The last tick of each bar is its close
+    cov_ref, corr_ref = batch_reference(prices[ticks - 1::ticks], service.decay, service.min_periods)
+    cov, corr = service.covariance(addresses), service.correlation(addresses)
+    assert np.array_equal(np.isnan(cov), np.isnan(cov_ref))
+    scale = np.sqrt(np.outer(np.diag(cov_ref), np.diag(cov_ref)))
+    assert np.nanmax(np.abs(cov - cov_ref) / scale) < 1e-9
+    assert np.nanmax(np.abs(corr - corr_ref)) < 1e-9
+
+    # Late listings are reported once they have min_periods bars in common
+    assert np.isfinite(cov).all()
+    psd = service.covariance(addresses, psd=True)
+    assert np.linalg.eigvalsh(psd).min() >= -1e-15
+
+
+def test_late_listing_waits_for_min_periods():
+    service = StreamingCovariance(bar_seconds=BAR_SECONDS, min_periods=5)
+    rng = np.random.default_rng(1)
+    for bar in range(20):
+        prices = {'OLD': float(np.exp(rng.normal()))}
+        if bar >= 16:
+            prices['NEW'] = float(np.exp(rng.normal()))
+        service.update(prices, START + bar * BAR_SECONDS)
+    service.flush()
+
+    cov = service.covariance(['OLD', 'NEW', 'UNKNOWN'])
+    assert np.isfinite(cov[0, 0])
+    # NEW has 3 returns, below min_periods; UNKNOWN was never seen
+    assert np.isnan(cov[1]).all() and np.isnan(cov[2]).all()
+    assert np.isnan(service.mean(['NEW']))[0]
+
+
+def test_warm_start_from_snapshot_store_matches_live_feed(tmp_path):
+    times, prices = simulate()
+    addresses = [f"TKN{i}" for i in range(prices.shape[1])]
+    live = StreamingCovariance(bar_seconds=BAR_SECONDS, halflife_bars=24, min_periods=10)
+    feed(live, addresses, times, prices)
+
+    store = SnapshotStore(str(tmp_path), max_buffer_rows=100_000)
+    for t, row in zip(times, prices):
+        store.record_prices({a: p for a, p in zip(addresses, row) if p == p}, t)
+    store.flush()
+    warm = StreamingCovariance(bar_seconds=BAR_SECONDS, halflife_bars=24, min_periods=10)
+    # One replayed observation per token and bar (the last tick wins)
+    assert warm.load_history(store, start=START) == int((~np.isnan(prices[2::3])).sum())
+    warm.flush()
+
+    np.testing.assert_allclose(warm.covariance(addresses), live.covariance(addresses), rtol=1e-9)
+    np.testing.assert_allclose(warm.returns_history(addresses)[1], live.returns_history(addresses)[1], rtol=1e-9)
+
+
+def test_remove_frees_the_slot():
+    service = StreamingCovariance(bar_seconds=BAR_SECONDS, max_tokens=2, min_periods=2)
+    for bar in range(5):
+        service.update({'A': 1.0 + bar, 'B': 2.0 + bar, 'C': 3.0}, START + bar * BAR_SECONDS)
+    assert 'C' not in service and service.get_stats()['tokens_ignored'] > 0
+
+    assert service.remove('A')
+    service.update({'C': 3.0}, START + 5 * BAR_SECONDS)
+    assert 'C' in service and len(service) == 2
+    assert np.isnan(service.covariance(['C', 'B'])[0]).all()
@@ -0,0 +1,163 @@
+"""Tests for the discovery queue and the trading loop's use of it"""
+import time
+import asyncio
+
+from core.data.discovery import DiscoveryEngine, DiscoverySource, PollingSource
+from core.trading.trading_bot import TradingBot
+
+
+def token(address):
+    return {'contract_address': address, 'symbol': address}
+
+
+def test_bare_source_reports_nothing():
+    async def run():
+        source = DiscoverySource('bare')
+        assert await source.fetch() == []
+        assert [t async for t in source.stream()] == []
+        assert not source.is_streaming
+
+    asyncio.run(run())
+
+
+def test_publish_waits_for_consumer_when_queue_full():
+    async def run():
+        engine = DiscoveryEngine(queue_size=1)
+        assert await engine.publish(token('A'))
+        second = asyncio.create_task(engine.publish(token('B')))
+        await asyncio.sleep(0.01)
+        assert not second.done()
+        assert engine.stats['backpressure_waits'] == 1
+
+        batch = await engine.get_batch(max_items=5)
+        assert [e.address for e in batch] == ['A']
+        assert await asyncio.wait_for(second, 1.0)
+        assert [e.address for e in await engine.get_batch(max_items=5)] == ['B']
+
+    asyncio.run(run())
+
+
+def test_duplicates_are_dropped():
+    async def run():
+        engine = DiscoveryEngine()
+        assert await engine.publish(token('A'))
+        assert not await engine.publish(token('A'))
+        assert engine.stats['duplicates'] == 1
+
+    asyncio.run(run())
+
+
+def test_discard_stale_keeps_fresh_candidates_in_order():
+    async def run():
+        engine = DiscoveryEngine(max_event_age=60)
+        for address in ('OLD', 'NEW1', 'NEW2'):
+            await engine.publish(token(address))
+        engine._queue._queue[0] = engine._queue._queue[0]._replace(discovered_at=time.time() - 120)
+
+        assert engine.discard_stale() == 1
+        assert engine.stats['stale'] == 1
+        assert [e.address for e in await engine.get_batch(max_items=5)] == ['NEW1', 'NEW2']
+        # A dropped token can be rediscovered
+        assert await engine.publish(token('OLD'))
+
+    asyncio.run(run())
+
+
+def test_wait_for_candidates_yields_when_queue_not_empty():
+    async def run():
+        engine = DiscoveryEngine()
+        await engine.publish(token('A'))
+        ticks = []
+
+        async def other():
+            ticks.append(1)
+
+        task = asyncio.create_task(other())
+        assert await engine.wait_for_candidates(10)
+        assert ticks == [1]
+        await task
+
+    asyncio.run(run())
+
+
+def test_polling_source_feeds_engine():
+    async def run():
+        async def fetch():
+            return [token('A'), token('B')]
+
+        engine = DiscoveryEngine([PollingSource('poll', fetch, interval=10)])
+        await engine.start()
+        batch = await engine.get_batch(max_items=5, timeout=1.0)
+        await engine.stop()
+        assert [e.address for e in batch] == ['A', 'B']
+
+    asyncio.run(run())
+
+
+class FakeSafety:
+    def can_trade(self, balance):
+        return True, ''
+
+    def save_state(self):
+        pass
+
+
+class FakeScanner:
+    def __init__(self, discovery):
+        self.discovery = discovery
+
+
+def full_book_bot(discovery):
+    bot = TradingBot.__new__(TradingBot)
+    bot.running = True
+    bot.config = {'scan_interval': 0.01}
+    bot.safety_manager = FakeSafety()
+    bot.simulation_mode = True
+    bot.balance = 1.0
+    bot.trading_params = {'max_open_positions': 1}
+    bot.positions = {'HELD': {}}
+    bot.token_scanner = FakeScanner(discovery)
+    bot.alert_manager = None
+    return bot
+
+
+def test_full_book_trading_loop_does_not_starve_other_tasks():
+    async def run():
+        discovery = DiscoveryEngine(max_event_age=60)
+        await discovery.publish(token('WAITING'))
+        bot = full_book_bot(discovery)
+        heartbeats = []
+
+        async def exit_monitor():
+            while len(heartbeats) < 5:
+                heartbeats.append(time.monotonic())
+                await asyncio.sleep(0.001)
+            bot.running = False
+
+        loop_task = asyncio.create_task(bot.trading_loop())
+        await asyncio.wait_for(exit_monitor(), 1.0)
+        await asyncio.wait_for(loop_task, 1.0)
+
+        assert len(heartbeats) == 5
+        # The candidate is still queued: nothing took it while the book was full
+        assert discovery.get_stats()['queue_depth'] == 1
+
+    asyncio.run(run())
+
+
+def test_full_book_trading_loop_ages_out_stale_candidates():
+    async def run():
+        discovery = DiscoveryEngine(max_event_age=60)
+        await discovery.publish(token('STALE'))
+        discovery._queue._queue[0] = discovery._queue._queue[0]._replace(discovered_at=time.time() - 120)
+        bot = full_book_bot(discovery)
+
+        loop_task = asyncio.create_task(bot.trading_loop())
+        await asyncio.sleep(0.05)
+        bot.running = False
+        await asyncio.wait_for(loop_task, 1.0)
+
+        assert discovery.get_stats()['queue_depth'] == 0
+        assert discovery.stats['stale'] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,235 @@
+"""Tests for the exit book/engine and partial exits driven through it"""
+import asyncio
+
+import pytest
+
+from core.storage.database import Database
+from core.strategies.partial_exits import PartialExitManager
+from core.trading.exit_engine import ExitBook, ExitEngine, exit_levels_from_params
+
+CONFIG = {
+    'partial_exits': {
+        'levels': [
+            {'profit_pct': 0.5, 'exit_pct': 0.5},
+            {'profit_pct': 1.0, 'exit_pct': 0.5}
+        ],
+        'trailing_stop': {'enabled': True, 'activation': 1.5, 'distance': 0.2}
+    }
+}
+
+
+def test_stop_wins_over_take_profit_on_same_tick():
+    book = ExitBook()
+    # A stop above the take profit: both are crossed at 1.2
+    book.add('A', 1.0, stop_loss=1.3, take_profit=1.1)
+    signal = book.evaluate('A', 1.2)
+    assert signal.reason == 'stop_loss'
+    assert signal.fraction == 1.0
+
+
+def test_highest_stop_reported_when_price_falls_through_several():
+    book = ExitBook()
+    book.add('A', 1.0, stop_loss=0.9, trailing_activation=1.2, trailing_distance_pct=0.1)
+    assert book.evaluate('A', 1.5) is None
+    signal = book.evaluate('A', 0.5)
+    assert signal.reason == 'trailing_stop'
+    assert signal.level == pytest.approx(1.35)
+
+
+def test_rungs_crossed_in_one_tick_sell_combined_share():
+    book = ExitBook()
+    book.add('A', 1.0, partial_levels=((1.5, 0.5), (2.0, 0.5), (3.0, 1.0)))
+    signal = book.evaluate('A', 2.1)
+    assert signal.reason == 'partial_exit'
+    assert signal.fraction == pytest.approx(0.75)
+    assert [level[0] for level in signal.levels] == [1.5, 2.0]
+
+    book.consume(signal)
+    assert book.evaluate('A', 2.1) is None
+    signal = book.evaluate('A', 3.0)
+    assert signal.reason == 'take_profit'
+    assert signal.fraction == 1.0
+
+
+def test_engine_fires_stop_losses_first():
+    async def run():
+        sold = []
+
+        async def sell(signal):
+            sold.append(signal.key)
+            return True
+
+        engine = ExitEngine(sell)
+        engine.register('TP', 1.0, take_profit=1.1)
+        engine.register('SL', 1.0, stop_loss=0.9)
+        signals = engine.on_prices({'TP': 1.2, 'SL': 0.8})
+        await engine.drain()
+
+        assert [s.key for s in signals] == ['SL', 'TP']
+        assert sold == ['SL', 'TP']
+        assert len(engine.book) == 0
+        assert engine.stats['sells'] == 2
+
+    asyncio.run(run())
+
+
+def test_failed_sell_leaves_levels_in_place():
+    async def run():
+        attempts = []
+
+        async def sell(signal):
+            attempts.append(signal.reason)
+            return len(attempts) > 1
+
+        engine = ExitEngine(sell)
+        engine.register('A', 1.0, stop_loss=0.9)
+        engine.on_prices({'A': 0.85})
+        await engine.drain()
+        engine.on_prices({'A': 0.85})
+        await engine.drain()
+
+        assert attempts == ['stop_loss', 'stop_loss']
+        assert engine.stats['failed_sells'] == 1
+        assert 'A' not in engine.book
+
+    asyncio.run(run())
+
+
+def test_partial_exit_ladder_from_params():
+    levels = exit_levels_from_params(1.0, {
+        'use_partial_exits': True,
+        'partial_exit_levels': [0.5, 1.0],
+        'partial_exit_percents': [0.5, 0.5],
+        'trailing_stop_enabled': False
+    })
+    assert levels['take_profit'] is None
+    assert levels['partial_levels'] == ((1.5, 0.5), (2.0, 1.0))
+
+
+class FakeTrader:
+    def __init__(self):
+        self.sells = []
+
+    async def sell_token(self, contract_address, amount, min_sol_output):
+        self.sells.append(amount)
+        return {'success': True, 'sol_received': min_sol_output / 0.95, 'signature': 'test'}
+
+
+POSITION = {'contract_address': 'TOKEN', 'symbol': 'TKN', 'buy_timestamp': '2025-06-01T00:00:00',
+            'price': 1.0, 'amount': 100.0}
+
+
+def test_partial_exits_fire_from_price_ticks(tmp_path):
+    async def run():
+        db = Database(str(tmp_path / 'bot.db'))
+        trader = FakeTrader()
+        exits = []
+        manager = PartialExitManager(CONFIG, db, trader, on_exit=lambda s, state: exits.append(s.reason))
+        key = manager.register_position(POSITION)
+
+        manager.on_prices({key: 1.6})
+        await manager.exit_engine.drain()
+        assert trader.sells == [pytest.approx(50.0)]
+        # The rung is consumed: the same price does not sell again
+        manager.on_prices({key: 1.7})
+        await manager.exit_engine.drain()
+        assert len(trader.sells) == 1
+
+        # Arm the trailing stop (activation 2.5) and take the second rung on the way
+        manager.on_prices({key: 3.0})
+        await manager.exit_engine.drain()
+        state = manager.positions[key]
+        assert state.remaining_amount == pytest.approx(25.0)
+        assert state.trailing_activated
+        assert state.stop_price == pytest.approx(2.4)
+
+        manager.on_prices({key: 2.3})
+        await manager.exit_engine.drain()
+        assert trader.sells[-1] == pytest.approx(25.0)
+        assert exits == ['partial_exit', 'partial_exit', 'trailing_stop']
+        assert key not in manager.positions
+        assert key not in manager.exit_engine.book
+        db.close()
+
+    asyncio.run(run())
+
+
+def test_partial_exit_state_rehydrates_into_exit_engine(tmp_path):
+    async def run():
+        path = str(tmp_path / 'bot.db')
+        db = Database(path)
+        manager = PartialExitManager(CONFIG, db, FakeTrader())
+        key = manager.register_position(POSITION)
+        manager.on_prices({key: 3.0})
+        await manager.exit_engine.drain()
+        db.close()
+
+        db = Database(path)
+        trader = FakeTrader()
+        restored = PartialExitManager(CONFIG, db, trader)
+        assert key in restored.exit_engine.book
+        # Both rungs already executed; the armed trailing stop fires below 2.4
+        restored.on_prices({key: 2.9})
+        await restored.exit_engine.drain()
+        assert trader.sells == []
+        restored.on_prices({key: 2.3})
+        await restored.exit_engine.drain()
+        assert trader.sells == [pytest.approx(25.0)]
+        db.close()
+
+    asyncio.run(run())
+
+
+class FakePositionDb:
+    def __init__(self):
+        self.updates = []
+
+    def get_open_positions(self):
+        return []
+
+    def save_position(self, position):
+        pass
+
+    def update_position(self, position):
+        self.updates.append(position['status'])
+
+
+class FakeRiskManager:
+    class params:
+        take_profit_pct = 0.5
+        trailing_stop_enabled = True
+        max_hold_time_hours = 24
+
+    daily_loss = 0.0
+
+    def calculate_stop_loss(self, entry_price, volatility):
+        return entry_price * 0.9
+
+    def update_trailing_stop(self, position_id, current_price):
+        raise AssertionError("trailing stop is maintained by the exit engine")
+
+
+def test_position_manager_follows_partial_exit_engine(tmp_path):
+    async def run():
+        from core.trading.position_manager import PositionManager
+
+        db = Database(str(tmp_path / 'bot.db'))
+        manager = PartialExitManager(CONFIG, db, FakeTrader())
+        positions = PositionManager(FakePositionDb(), FakeRiskManager(), partial_exits=manager)
+        position = positions.open_position('TOKEN', 'TKN', 1.0, 1.0, {'sol_price_usd': 1.0})
+
+        positions.update_positions({'TOKEN': {'price_usd': 1.6}})
+        await manager.exit_engine.drain()
+        assert position.status == 'partially_closed'
+        # Nothing registered in the manager's own book: one exit path per position
+        assert len(positions.exit_book) == 0
+
+        positions.update_positions({'TOKEN': {'price_usd': 0.8}})
+        await manager.exit_engine.drain()
+        assert position.status == 'closed'
+        assert position.exit_reason == 'stop_loss'
+        assert positions.positions == {}
+        assert len(manager.exit_engine.book) == 0
+        db.close()
+
+    asyncio.run(run())
@@ -0,0 +1,67 @@
+"""Tests for the versioned schema migrations"""
+import sqlite3
+
+from core.storage.migrations import LATEST_VERSION, MIGRATIONS, get_schema_version, migrate
+
+
+def schema(conn):
+    return sorted(conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'").fetchall())
+
+
+def test_versions_are_consecutive():
+    assert [m.version for m in MIGRATIONS] == list(range(1, LATEST_VERSION + 1))
+
+
+def test_fresh_database_migrates_to_latest(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'fresh.db'))
+    assert migrate(conn) == list(range(1, LATEST_VERSION + 1))
+    conn.commit()
+    assert get_schema_version(conn) == LATEST_VERSION
+
+
+def test_migrate_twice_is_a_no_op(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'twice.db'))
+    migrate(conn)
+    conn.commit()
+    before = schema(conn)
+    assert migrate(conn) == []
+    assert schema(conn) == before
+
+
+def test_every_step_can_rerun_on_an_unversioned_database(tmp_path):
+    """Older builds created the same tables without recording a version"""
+    conn = sqlite3.connect(str(tmp_path / 'legacy.db'))
+    migrate(conn)
+    conn.commit()
+    migrated = schema(conn)
+
+    conn.execute("PRAGMA user_version = 0")
+    assert migrate(conn) == list(range(1, LATEST_VERSION + 1))
+    conn.commit()
+    assert schema(conn) == migrated
+
+
+def test_legacy_trades_table_gains_pnl_columns(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    conn.execute('''
+    CREATE TABLE trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, contract_address TEXT, action TEXT,
+        amount REAL, price REAL, timestamp TEXT, tx_hash TEXT
+    )''')
+    conn.execute("INSERT INTO trades (contract_address, action, amount, price, timestamp) "
+                 "VALUES ('A', 'BUY', 1.0, 0.5, '2025-06-01T00:00:00')")
+    conn.commit()
+
+    migrate(conn)
+    conn.commit()
+    columns = [info[1] for info in conn.execute("PRAGMA table_info(trades)")]
+    assert {'gain_loss_sol', 'percentage_change', 'price_multiple'} <= set(columns)
+    assert conn.execute("SELECT gain_loss_sol, price_multiple FROM trades").fetchone() == (0.0, 1.0)
+
+
+def test_partial_target_version(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'partial.db'))
+    assert migrate(conn, target_version=2) == [1, 2]
+    conn.commit()
+    assert migrate(conn) == list(range(3, LATEST_VERSION + 1))
@@ -0,0 +1,125 @@
+"""Tests for MLPredictor's schema-checked batch inference"""
+import asyncio
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from ml.features.schema import SCHEMA_FILENAME, FeatureSchema, resolve_schema
+from ml.models.ml_predictor import MLPredictor
+
+NAMES = ('momentum', 'volume_ratio', 'liquidity', 'holders')
+
+
+def training_data(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(NAMES))) * [1, 5, 100, 20] + [0, 10, 500, 50]
+    y = (X[:, 0] + rng.normal(0, 0.5, n) > 0).astype(int)
+    return X, y
+
+
+def save_model(directory, names=NAMES, version=1):
+    X, y = training_data()
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(scaler.transform(X), y)
+    os.makedirs(directory, exist_ok=True)
+    joblib.dump(model, os.path.join(directory, 'entry_classifier.pkl'))
+    joblib.dump(scaler, os.path.join(directory, 'entry_scaler.pkl'))
+    FeatureSchema(tuple(names), version=version).save(str(directory))
+    return model, scaler
+
+
+def rows(n=40, seed=1):
+    rng = np.random.default_rng(seed)
+    X, _ = training_data(n, seed)
+    result = []
+    for values in X:
+        row = dict(zip(NAMES, values))
+        # Key order never matters, extra keys are ignored, missing ones take the fill value
+        row = dict(reversed(list(row.items())))
+        row['unused'] = 1.0
+        if rng.random() < 0.2:
+            del row['holders']
+        result.append(row)
+    return result
+
+
+def test_batch_matches_per_token_and_direct_model(tmp_path):
+    model, scaler = save_model(tmp_path)
+    predictor = MLPredictor(threshold=0.5)
+    predictor.load_models(str(tmp_path))
+    assert predictor.is_loaded
+    try:
+        batch = rows()
+        proba = predictor.predict_proba_batch(batch)
+        single = [predictor.predict_entry(row) for row in batch]
+        assert [p['confidence'] for p in single] == pytest.approx(proba.tolist(), abs=1e-12)
+        assert [p['should_enter'] for p in single] == [bool(p >= 0.5) for p in proba]
+
+        X = np.array([[row.get(name, 0.0) for name in NAMES] for row in batch])
+        expected = model.predict_proba(scaler.transform(X))[:, list(model.classes_).index(1)]
+        np.testing.assert_allclose(proba, expected, atol=1e-12)
+
+        # A smaller batch after a larger one reuses the buffer without stale rows
+        np.testing.assert_allclose(predictor.predict_proba_batch(batch[:3]), expected[:3], atol=1e-12)
+        assert predictor.get_stats()['schema_version'] == 1
+    finally:
+        predictor.close()
+
+
+def test_async_batch_runs_on_the_inference_thread(tmp_path):
+    save_model(tmp_path)
+    predictor = MLPredictor()
+    predictor.load_models(str(tmp_path))
+    try:
+        batch = rows()
+        result = asyncio.run(predictor.predict_batch_async(batch))
+        assert result == predictor.predict_batch(batch)
+    finally:
+        predictor.close()
+
+
+def test_schema_width_mismatch_refuses_the_model(tmp_path):
+    save_model(tmp_path, names=NAMES + ('extra',), version=2)
+    with pytest.raises(ValueError, match='expects 4'):
+        resolve_schema(str(tmp_path), joblib.load(tmp_path / 'entry_classifier.pkl'),
+                       joblib.load(tmp_path / 'entry_scaler.pkl'))
+
+    predictor = MLPredictor()
+    predictor.load_models(str(tmp_path))
+    try:
+        assert not predictor.is_loaded
+        assert predictor.predict_batch(rows(3)) == [{'should_enter': False, 'confidence': 0.0}] * 3
+    finally:
+        predictor.close()
+
+
+def test_schema_fingerprint_mismatch_is_rejected(tmp_path):
+    save_model(tmp_path)
+    path = tmp_path / SCHEMA_FILENAME
+    data = json.loads(path.read_text())
+    # Features reordered after saving: the stored fingerprint no longer matches
+    data['features'] = list(reversed(data['features']))
+    path.write_text(json.dumps(data))
+
+    with pytest.raises(ValueError, match='fingerprint'):
+        FeatureSchema.load(str(tmp_path))
+    predictor = MLPredictor()
+    predictor.load_models(str(tmp_path))
+    try:
+        assert not predictor.is_loaded
+    finally:
+        predictor.close()
+
+
+def test_schema_vectorize_maps_by_name():
+    schema = FeatureSchema(('a', 'b', 'c'), fill_value=-1.0)
+    X = schema.vectorize([{'c': 3, 'a': 1}, {'b': 2, 'z': 9, 'a': None}])
+    np.testing.assert_array_equal(X, [[1, -1, 3], [-1, 2, -1]])
+    assert schema.missing({'a': 1}) == ('b', 'c')
+    with pytest.raises(ValueError):
+        FeatureSchema(('a', 'a'))
@@ -0,0 +1,115 @@
+"""Tests for the versioned model registry and hot swapping in MLPredictor"""
+import os
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from ml.features.schema import FeatureSchema
+from ml.models.ml_predictor import MLPredictor
+from ml.models.registry import CURRENT_FILE, MODEL_FILE, ModelRegistry
+
+SCHEMA = FeatureSchema(('x0', 'x1', 'x2'))
+
+
+def fitted(sign, seed=0):
+    """Scaler and model whose entry probability rises with sign * x0"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(200, 3))
+    y = (sign * X[:, 0] > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    return LogisticRegression().fit(scaler.transform(X), y), scaler
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(str(tmp_path / 'registry'))
+
+
+def test_publish_writes_versions_and_activates(registry):
+    model, scaler = fitted(1)
+    assert registry.publish('entry', model, scaler, SCHEMA, metrics={'auc': 0.9}) == 1
+    assert registry.publish('entry', *fitted(-1), SCHEMA, activate=False) == 2
+
+    assert registry.versions('entry') == [1, 2]
+    assert registry.current_version('entry') == 1
+    assert registry.names() == ['entry']
+    metadata = registry.metadata('entry')
+    assert metadata['metrics'] == {'auc': 0.9}
+    assert metadata['schema_fingerprint'] == SCHEMA.fingerprint
+    # No temporary directories left behind
+    assert sorted(os.listdir(os.path.join(registry.root, 'entry'))) == [CURRENT_FILE, 'v0001', 'v0002']
+
+
+def test_get_loads_the_active_version_once(registry):
+    model, scaler = fitted(1)
+    registry.publish('entry', model, scaler, SCHEMA)
+    assert registry.get('missing') is None
+
+    loaded = registry.get('entry')
+    assert loaded.version == 1 and loaded.schema == SCHEMA
+    np.testing.assert_allclose(loaded.model.coef_, model.coef_)
+    assert registry.get('entry') is loaded
+    assert registry.get_stats()['loads'] == 1
+
+
+def test_refresh_swaps_in_the_activated_version_and_rolls_back(registry):
+    registry.publish('entry', *fitted(1), SCHEMA)
+    first = registry.get('entry')
+    assert registry.refresh('entry') == []
+
+    registry.publish('entry', *fitted(-1), SCHEMA)
+    assert registry.refresh('entry') == ['entry']
+    assert registry.get('entry').version == 2
+
+    assert registry.activate('entry', 1)
+    assert registry.refresh() == ['entry']
+    assert registry.get('entry').version == 1
+    assert first.version == 1  # readers holding the old object are unaffected
+    assert not registry.activate('entry', 9)
+
+
+def test_failed_load_keeps_the_previous_version(registry):
+    registry.publish('entry', *fitted(1), SCHEMA)
+    registry.get('entry')
+    version = registry.publish('entry', *fitted(-1), SCHEMA)
+    with open(os.path.join(registry.root, 'entry', f"v{version:04d}", MODEL_FILE), 'wb') as f:
+        f.write(b'not a model')
+
+    assert registry.refresh('entry') == []
+    assert registry.get('entry').version == 1
+    assert registry.get_stats()['load_failures'] == 1
+
+
+def test_prune_keeps_newest_and_active(registry):
+    for _ in range(4):
+        registry.publish('entry', *fitted(1), SCHEMA)
+    registry.activate('entry', 1)
+    assert registry.prune('entry', keep=2) == 1
+    assert registry.versions('entry') == [1, 3, 4]
+
+
+def test_predictor_hot_swaps_between_batches(registry):
+    registry.publish('entry', *fitted(1), SCHEMA)
+    predictor = MLPredictor(threshold=0.5)
+    try:
+        assert predictor.use_registry(registry, 'entry', reload_interval=0)
+        rows = [{'x0': 2.0, 'x1': 0.0, 'x2': 0.0}]
+        assert predictor.predict_entry(rows[0])['should_enter']
+        assert predictor.get_stats()['model_version'] == 1
+
+        registry.publish('entry', *fitted(-1), SCHEMA)
+        assert not predictor.predict_batch(rows)[0]['should_enter']
+        assert predictor.get_stats()['model']['version'] == 2
+    finally:
+        predictor.close()
+
+
+def test_predictor_without_an_active_version(registry):
+    predictor = MLPredictor()
+    try:
+        assert not predictor.use_registry(registry, 'entry')
+        assert predictor.predict_entry({'x0': 1.0}) == {'should_enter': False, 'confidence': 0.0}
+    finally:
+        predictor.close()
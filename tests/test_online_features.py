@@ -0,0 +1,96 @@
+"""Tests for OnlineFeatureEngine against the batch EnhancedMLTrainer.create_features"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from ml.features import FEATURE_NAMES, OnlineFeatureEngine
+from ml.training.ml_enhancement_strategy import EnhancedMLTrainer
+
+BAR = 600
+T0 = 1_750_032_000  # midnight UTC
+
+
+def observations(n_tokens, days, seed=3):
+    """Irregular per-token observations: ~4 per bar, partial fields, occasional outages"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for token in range(n_tokens):
+        t = T0 + rng.integers(0, 86400 // 2)
+        end = T0 + days * 86400
+        price, volume = rng.lognormal(-8, 2), rng.lognormal(10, 1)
+        liquidity, mcap, holders = rng.lognormal(9, 1), rng.lognormal(13, 1), float(rng.integers(10, 500))
+        while t < end:
+            # Flat stretches exercise the constant-window edge cases
+            if rng.random() > 0.1:
+                price *= np.exp(rng.normal(0, 0.02))
+            volume *= np.exp(rng.normal(0, 0.05))
+            liquidity *= np.exp(rng.normal(0, 0.01))
+            mcap *= np.exp(rng.normal(0, 0.02))
+            holders = max(1.0, holders + rng.integers(-2, 4))
+            row = {'address': f"TOKEN{token:04d}", 'timestamp': float(t), 'price': price, 'volume': volume,
+                   'liquidity': liquidity, 'market_cap': mcap, 'holders': holders}
+            # Price-only monitor ticks and the odd missing field
+            for field in ('volume', 'liquidity', 'market_cap', 'holders'):
+                if rng.random() < 0.3:
+                    row[field] = np.nan
+            rows.append(row)
+            t += int(rng.exponential(150)) + 1
+            if rng.random() < 0.005:
+                t += int(rng.integers(2, 40)) * BAR  # outage
+    return pd.DataFrame(rows).sort_values('timestamp', kind='stable', ignore_index=True)
+
+
+def stream(obs):
+    """Feed every distinct timestamp to the engine; keep the last vector of each (token, bar)"""
+    engine = OnlineFeatureEngine(bar_seconds=BAR)
+    online = {}
+    for ts, group in obs.groupby('timestamp', sort=True):
+        features = engine.update(group['address'].tolist(), ts, group['price'].to_numpy(),
+                                 group['volume'].to_numpy(), group['liquidity'].to_numpy(),
+                                 group['market_cap'].to_numpy(), group['holders'].to_numpy())
+        bar = int(ts // BAR) * BAR
+        for address, vector in zip(group['address'], features):
+            online[(address, bar)] = vector
+    return engine, online
+
+
+def test_streamed_features_match_create_features():
+    # Two days fill the longest (144-bar) windows
+    obs = observations(3, 2)
+    engine, online = stream(obs)
+    trainer = EnhancedMLTrainer()
+
+    compared = 0
+    for address, token_obs in obs.groupby('address'):
+        series = token_obs.set_index(pd.to_datetime(token_obs['timestamp'], unit='s', utc=True))
+        series = series[['price', 'volume', 'liquidity', 'market_cap', 'holders']]
+        series = series.resample(f'{BAR}s').last().ffill()
+        expected = trainer.create_features(series)[list(FEATURE_NAMES)].to_numpy()
+        bars = (series.index - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+        actual = np.array([online.get((address, int(b)), np.full(len(FEATURE_NAMES), np.nan)) for b in bars])
+
+        # Gap bars never saw an update; their values roll into the next update's state
+        seen = ~np.isnan(actual).any(axis=1)
+        assert seen.sum() > 144
+        expected, actual = expected[seen], actual[seen]
+        compared += len(actual)
+
+        finite = np.isfinite(expected)
+        assert np.array_equal(expected[~finite], actual[~finite])
+        np.testing.assert_allclose(actual[finite], expected[finite], rtol=1e-6, atol=1e-6)
+
+        # The latest vector is what the bot reads per token
+        assert engine.features(address) == pytest.approx(dict(zip(FEATURE_NAMES, actual[-1])))
+    assert compared > 0
+
+
+def test_remove_and_prune_drop_token_state():
+    engine = OnlineFeatureEngine(bar_seconds=BAR)
+    for bar in range(3):
+        engine.update(['A', 'B'], T0 + bar * BAR, [1.0 + bar, 2.0], [1e4, 1e4], [1e4, 1e4], [1e6, 1e6], [100, 100])
+    engine.update(['A'], T0 + 10 * BAR, [5.0], [1e4], [1e4], [1e6], [100])
+
+    assert engine.prune(T0 + 10 * BAR, 5 * BAR) == 1
+    assert 'B' not in engine and engine.features('B') is None
+    assert engine.remove('A')
+    assert len(engine) == 0
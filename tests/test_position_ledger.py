@@ -0,0 +1,71 @@
+"""Tests for the incremental position ledger maintained by record_trade"""
+import random
+
+import pytest
+
+
+def ledger(db):
+    with db.pool.reader() as conn:
+        cursor = conn.execute("SELECT * FROM position_ledger")
+        columns = [col[0] for col in cursor.description]
+        return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+
+def test_upsert_accumulates_per_token(db):
+    assert db.record_trade('A', 'buy', 2.0, 1.0)
+    assert db.record_trade('A', 'BUY', 2.0, 2.0)
+    assert db.record_trade('A', 'SELL', 1.0, 3.0, gain_loss_sol=0.5,
+                           percentage_change=50.0, price_multiple=1.5)
+
+    row = ledger(db)['A']
+    assert row['total_bought'] == pytest.approx(4.0)
+    assert row['total_sold'] == pytest.approx(1.0)
+    assert row['net_amount'] == pytest.approx(3.0)
+    assert row['avg_entry_price'] == pytest.approx(1.5)
+    assert row['realized_pnl_sol'] == pytest.approx(0.5)
+    assert row['trade_count'] == 3
+    assert row['first_entry_time'] is not None
+
+
+def test_active_orders_follow_the_ledger(db):
+    db.record_trade('OPEN', 'BUY', 1.0, 1.0)
+    db.record_trade('CLOSED', 'BUY', 1.0, 1.0)
+    db.record_trade('CLOSED', 'SELL', 1.0, 2.0, gain_loss_sol=1.0,
+                    percentage_change=100.0, price_multiple=2.0)
+
+    orders = db.get_active_orders()
+    assert list(orders['contract_address']) == ['OPEN']
+    assert orders['amount'].iloc[0] == pytest.approx(1.0)
+
+
+def test_incremental_ledger_matches_rebuild(db):
+    rng = random.Random(5)
+    for _ in range(200):
+        token = f"T{rng.randrange(12)}"
+        if rng.random() < 0.6:
+            db.record_trade(token, 'BUY', rng.uniform(0.1, 2.0), rng.uniform(0.5, 2.0))
+        else:
+            db.record_trade(token, 'SELL', rng.uniform(0.1, 1.0), rng.uniform(0.5, 3.0),
+                            gain_loss_sol=rng.uniform(-0.5, 0.5), percentage_change=1.0,
+                            price_multiple=1.01)
+
+    report = db.rebuild_position_ledger(verify_only=True)
+    assert report['positions_checked'] == len(ledger(db))
+    assert report['missing'] == [] and report['unexpected'] == [] and report['drift'] == []
+
+
+def test_rebuild_repairs_trades_written_around_the_ledger(db):
+    db.record_trade('A', 'BUY', 1.0, 1.0)
+    # Scripts that insert into trades directly bypass the ledger
+    with db.pool.writer() as conn:
+        conn.execute("INSERT INTO trades (contract_address, action, amount, price, timestamp) "
+                     "VALUES ('B', 'BUY', 2.0, 1.0, '2025-06-01T00:00:00')")
+
+    report = db.rebuild_position_ledger(verify_only=True)
+    assert report['missing'] == ['B']
+    assert not report['rebuilt']
+
+    report = db.rebuild_position_ledger()
+    assert report['rebuilt']
+    assert ledger(db)['B']['net_amount'] == pytest.approx(2.0)
+    assert db.rebuild_position_ledger(verify_only=True)['missing'] == []
@@ -0,0 +1,56 @@
+"""Tests for the purged, embargoed walk-forward folds"""
+import numpy as np
+
+from ml.evaluation.cross_validation import PurgedWalkForward
+
+
+def test_folds_are_consecutive_blocks_after_their_training_rows():
+    times = np.arange(60, dtype=float)
+    folds = PurgedWalkForward(n_splits=5, min_train_size=1).split(times)
+    assert len(folds) == 5
+    previous_end = None
+    for train, test in folds:
+        assert train.max() < test.min()
+        assert np.all(np.diff(test) == 1)
+        if previous_end is not None:
+            assert test[0] == previous_end
+        previous_end = test[-1] + 1
+    assert previous_end == 60
+
+
+def test_overlapping_labels_are_purged():
+    times = np.arange(60, dtype=float)
+    # Every outcome is known 5 seconds after entry
+    label_end = times + 5
+    for train, test in PurgedWalkForward(n_splits=5, min_train_size=1).split(times, label_end):
+        assert np.all(label_end[train] < times[test[0]])
+        # Only the rows whose outcome overlaps the test block are dropped
+        assert train[-1] == test[0] - 6
+
+
+def test_embargo_widens_the_gap():
+    times = np.arange(60, dtype=float)
+    label_end = times + 5
+    for train, test in PurgedWalkForward(n_splits=5, embargo_seconds=3, min_train_size=1).split(times, label_end):
+        assert np.all(label_end[train] < times[test[0]] - 3)
+        assert train[-1] == test[0] - 9
+
+
+def test_a_long_position_is_purged_from_later_folds_too():
+    times = np.arange(60, dtype=float)
+    label_end = times.copy()
+    label_end[3] = 45.0  # opened early, closed inside the fourth test block
+    for train, test in PurgedWalkForward(n_splits=5, min_train_size=1).split(times, label_end):
+        assert (3 in train) == (times[test[0]] > 45.0)
+
+
+def test_rolling_window_and_min_train_size():
+    times = np.arange(60, dtype=float)
+    folds = PurgedWalkForward(n_splits=5, max_train_size=8, min_train_size=1).split(times)
+    assert all(len(train) <= 8 for train, _ in folds)
+    assert all(train[-1] == test[0] - 1 for train, test in folds)
+
+    # The first fold only has 10 training rows
+    folds = PurgedWalkForward(n_splits=5, min_train_size=15).split(times)
+    assert len(folds) == 4
+    assert folds[0][1][0] == 20
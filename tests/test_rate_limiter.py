@@ -0,0 +1,122 @@
+"""Tests for the shared token-bucket rate limiter"""
+import asyncio
+
+import pytest
+
+from utils import rate_limiter
+from utils.rate_limiter import (PRIORITY_ANALYSIS, PRIORITY_DISCOVERY, PRIORITY_EXIT, RateLimiter,
+                                limiter_for_url, parse_retry_after)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+def test_bucket_refills_at_the_configured_rate(clock):
+    limiter = RateLimiter('test', requests_per_minute=60, burst=3)
+    assert [limiter.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+    clock.now += 0.5
+    assert not limiter.try_acquire()
+    clock.now += 0.5
+    assert limiter.try_acquire()
+
+    # Idle time refills up to the burst, not beyond
+    clock.now += 60
+    assert [limiter.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_endpoint_budget_applies_on_top_of_the_api_budget(clock):
+    limiter = RateLimiter('test', requests_per_minute=600, burst=10, endpoints={'/slow': 60})
+    assert limiter.try_acquire(endpoint='/slow')
+    assert not limiter.try_acquire(endpoint='/slow')
+    assert limiter.try_acquire(endpoint='/fast')
+
+
+def test_rate_limited_pauses_and_halves_the_rate(clock):
+    limiter = RateLimiter('test', requests_per_minute=60, burst=1, recovery_successes=1)
+    limiter.on_rate_limited(retry_after=5)
+    assert limiter.remaining_pause() == pytest.approx(5)
+    assert limiter.get_stats()['requests_per_minute'] == pytest.approx(30)
+
+    clock.now += 4
+    assert not limiter.try_acquire()
+    clock.now += 3
+    assert limiter.try_acquire()
+
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.get_stats()['requests_per_minute'] == pytest.approx(60)
+
+
+def test_waiters_are_granted_in_lane_order_then_fifo():
+    async def run():
+        # 20 grants per second after the single burst token is spent
+        limiter = RateLimiter('test', requests_per_minute=1200, burst=1)
+        assert await limiter.acquire() == 0.0
+
+        order = []
+
+        async def request(priority, label):
+            await limiter.acquire(priority)
+            order.append(label)
+
+        tasks = []
+        for priority, label in [(PRIORITY_DISCOVERY, 'discovery-1'), (PRIORITY_ANALYSIS, 'analysis-1'),
+                                (PRIORITY_DISCOVERY, 'discovery-2'), (PRIORITY_EXIT, 'exit-1'),
+                                (PRIORITY_ANALYSIS, 'analysis-2')]:
+            tasks.append(asyncio.create_task(request(priority, label)))
+        await asyncio.sleep(0)
+        assert limiter.get_stats()['queue_depth'] == 5
+
+        await asyncio.gather(*tasks)
+        assert order == ['exit-1', 'analysis-1', 'analysis-2', 'discovery-1', 'discovery-2']
+
+        lanes = limiter.get_stats()['lanes']
+        assert lanes['exit']['granted'] == 1
+        assert lanes['discovery']['max_wait_ms'] > lanes['exit']['max_wait_ms']
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def run():
+        limiter = RateLimiter('test', requests_per_minute=1200, burst=1)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire(PRIORITY_EXIT))
+        waiting = asyncio.create_task(limiter.acquire(PRIORITY_DISCOVERY))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.wait_for(waiting, timeout=1)
+        assert limiter.get_stats()['queue_depth'] == 0
+
+    asyncio.run(run())
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+def test_limiter_for_url_shares_one_limiter_per_api():
+    limiter, endpoint = limiter_for_url('https://public-api.birdeye.so/defi/price?address=x')
+    assert endpoint == '/defi/price'
+    assert limiter is limiter_for_url('https://birdeye.so/other')[0]
+    assert limiter_for_url('https://example.com/defi/price') == (None, None)
@@ -0,0 +1,118 @@
+"""Tests for the TTL/LRU response cache and its request coalescing"""
+import asyncio
+
+import pytest
+
+from utils import response_cache
+from utils.response_cache import ResponseCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(response_cache, 'time', clock)
+    return clock
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = ResponseCache('test', default_ttl=10, ttls={'/price': 2})
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=cache.ttl_for('/price'))
+
+    clock.now += 5
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    clock.now += 5
+    assert cache.get('a', 'gone') == 'gone'
+    assert cache.get_stats()['expirations'] == 2
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache('test', max_entries=3)
+    for key in 'abc':
+        cache.set(key, key)
+    assert cache.get('a') == 'a'  # now the most recently used
+    cache.set('d', 'd')
+
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['a', 'c', 'd']
+    assert cache.get_stats()['evictions'] == 1
+
+
+def test_make_cache_key_ignores_parameter_order():
+    assert make_cache_key('/x', {'a': 1, 'b': 2}) == make_cache_key('/x', {'b': 2, 'a': 1})
+    assert make_cache_key('/x', {'ids': [1, 2]}) != make_cache_key('/x', {'ids': [1, 3]})
+    assert make_cache_key('/x') == make_cache_key('/x', {})
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        cache = ResponseCache('test')
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {'price': 1.5}
+
+        results = await asyncio.gather(*(cache.get_or_fetch('k', fetch) for _ in range(10)))
+        assert calls == 1
+        assert all(result == {'price': 1.5} for result in results)
+        assert cache.get_stats()['coalesced'] == 9
+
+        # Later callers hit the stored value
+        assert await cache.get_or_fetch('k', fetch) == {'price': 1.5}
+        assert calls == 1
+
+    asyncio.run(run())
+
+
+def test_none_results_are_not_cached():
+    async def run():
+        cache = ResponseCache('test')
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            return None
+
+        assert await cache.get_or_fetch('k', fetch) is None
+        assert await cache.get_or_fetch('k', fetch) is None
+        assert calls == 2
+        assert len(cache) == 0
+
+        # A custom predicate can reject other results too
+        async def empty():
+            return []
+
+        await cache.get_or_fetch('e', empty, should_cache=bool)
+        assert len(cache) == 0
+
+    asyncio.run(run())
+
+
+def test_fetch_errors_reach_every_caller_and_are_not_cached():
+    async def run():
+        cache = ResponseCache('test')
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError('api down')
+
+        results = await asyncio.gather(*(cache.get_or_fetch('k', fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(cache) == 0
+        assert cache.get_stats()['inflight'] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,112 @@
+"""Tests for batched, cached tweet sentiment inference"""
+import asyncio
+
+import pytest
+
+from core.analysis.sentiment_inference import SentimentInferenceService
+
+
+class FakePipeline:
+    """Text-classification pipeline stand-in: positive iff the text mentions 'moon'"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, texts, batch_size, truncation, max_length):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError('model crashed')
+        return [{'label': 'positive' if 'moon' in text else 'negative', 'score': len(text) / 100}
+                for text in texts]
+
+
+@pytest.fixture
+def model():
+    return FakePipeline()
+
+
+@pytest.fixture
+def service(model):
+    service = SentimentInferenceService(model=model, max_wait_ms=5)
+    yield service
+    service.close()
+
+
+def test_cached_tweets_are_not_scored_again(service, model):
+    async def run():
+        first = await service.score([('1', 'to the moon'), ('2', 'rug pull'), ('3', 'x' * 40)])
+        assert first['1']['label'] == 'positive'
+        assert first['2']['label'] == 'negative'
+        # Results map back to their tweet even though the batch is sorted by length
+        assert first['3']['score'] == pytest.approx(0.4)
+        assert len(model.calls) == 1
+
+        again = await service.score([('1', 'to the moon'), ('2', 'rug pull'), ('4', 'moon soon')])
+        assert again['1'] == first['1'] and again['2'] == first['2']
+        assert model.calls[-1] == ['moon soon']
+
+        cached = await service.score([('1', 'edited text is ignored'), ('4', 'moon soon')])
+        assert cached['1'] == first['1']
+        assert len(model.calls) == 2
+
+    asyncio.run(run())
+    stats = service.get_stats()
+    assert stats['cache_hits'] == 4
+    assert stats['tweets_scored'] == 4
+
+
+def test_concurrent_scans_share_one_batch(service, model):
+    async def run():
+        return await asyncio.gather(service.score([('1', 'moon'), ('2', 'dump')]),
+                                    service.score([('2', 'dump'), ('3', 'gem moon')]))
+
+    a, b = asyncio.run(run())
+    assert len(model.calls) == 1
+    assert sorted(model.calls[0]) == ['dump', 'gem moon', 'moon']
+    assert a['2'] == b['2']
+
+
+def test_tweets_without_an_id_are_keyed_by_text(service, model):
+    async def run():
+        first = await service.score([(None, 'moon'), (None, '')])
+        second = await service.score([(None, 'moon')])
+        return first, second
+
+    first, second = asyncio.run(run())
+    key = SentimentInferenceService.key(None, 'moon')
+    assert list(first) == [key]  # empty texts are skipped
+    assert second[key] == first[key]
+    assert len(model.calls) == 1
+
+
+def test_failed_inference_is_not_cached():
+    model = FakePipeline(fail=True)
+    service = SentimentInferenceService(model=model, max_wait_ms=1)
+    try:
+        async def run():
+            assert await service.score([('1', 'moon')]) == {}
+            model.fail = False
+            return await service.score([('1', 'moon')])
+
+        assert asyncio.run(run())['1']['label'] == 'positive'
+        assert len(model.calls) == 2
+        assert service.get_stats()['failures'] == 1
+    finally:
+        service.close()
+
+
+def test_cache_evicts_least_recently_used():
+    model = FakePipeline()
+    service = SentimentInferenceService(model=model, max_wait_ms=1, cache_size=2)
+    try:
+        async def run():
+            await service.score([('1', 'a'), ('2', 'b')])
+            await service.score([('1', 'a')])  # 1 is now the most recently used
+            await service.score([('3', 'c')])
+            await service.score([('1', 'a'), ('2', 'b')])
+
+        asyncio.run(run())
+        assert model.calls == [['a', 'b'], ['c'], ['b']]
+    finally:
+        service.close()
@@ -0,0 +1,47 @@
+"""Tests for the parameter sweep's pool reuse and held-out ranking"""
+import math
+
+from core.backtesting.sweep import ParameterSweep, random_candidates
+from scripts.benchmarks.backtest_benchmark import synthetic_history
+
+
+def make_sweep(folds):
+    history = synthetic_history(10, 2, 10)
+    return ParameterSweep(history, {}, workers=1, walk_forward_folds=folds, entry_rule='simple')
+
+
+def test_pool_and_shared_history_reused_across_rounds():
+    sweep = make_sweep(folds=1)
+    candidates = random_candidates(sweep.space, 2)
+    with sweep:
+        pool, shared = sweep._pool, sweep._shared
+        sweep.evaluate(candidates)
+        sweep.evaluate(candidates)
+        assert sweep._pool is pool
+        assert sweep._shared is shared
+    assert sweep._pool is None
+    assert sweep._shared is None
+
+
+def test_run_outside_context_releases_pool():
+    sweep = make_sweep(folds=0)
+    result = sweep.run_bayesian(4, initial=2, batch=2)
+    assert len(result.table) == 4
+    assert sweep._pool is None
+
+
+def test_final_window_held_out_of_ranking():
+    sweep = make_sweep(folds=2)
+    rows = sweep.evaluate(random_candidates(sweep.space, 3))
+    for row in rows:
+        scores = row['window_scores']
+        assert len(scores) == 3
+        assert math.isclose(row['score'], sum(scores[:-1]) / 2)
+        assert row['holdout_score'] == scores[-1]
+
+
+def test_no_holdout_without_folds():
+    sweep = make_sweep(folds=0)
+    row = sweep.evaluate(random_candidates(sweep.space, 1))[0]
+    assert row['score'] == row['window_scores'][0]
+    assert math.isnan(row['holdout_score'])
@@ -0,0 +1,115 @@
+"""Tests for the consolidated Twitter query planner"""
+import asyncio
+
+import pytest
+
+from core.analysis.twitter_query_planner import (SearchResult, Tweet, TwitterQueryPlanner, TwitterUser,
+                                                 clean_symbol)
+from utils.rate_limiter import RateLimiter
+
+SYMBOLS = ['BONK', 'WIF', 'POPCAT', 'MEW', 'BOME', 'SLERF', 'MYRO', 'PONKE', 'GIGA', 'MOODENG',
+           'FWOG', 'RETARDIO', 'MICHI', 'SC', 'LOCKIN', 'CHILLGUY']
+ACCOUNTS = ['@solanalegend', 'CryptoKaleo', 'blknoiz06', 'Ansem', 'MustStopMurad', 'inversebrah', 'DegenSpartan']
+
+
+def planner(**kwargs):
+    return TwitterQueryPlanner('token', rate_limiter=RateLimiter('twitter-test', 6000, burst=100), **kwargs)
+
+
+@pytest.mark.parametrize('limit,per_query', [(512, 4), (512, 50), (160, 50), (1024, 50)])
+def test_token_queries_cover_every_symbol_within_the_limit(limit, per_query):
+    plans = planner(max_query_length=limit, max_symbols_per_query=per_query).plan_token_queries(SYMBOLS)
+    assert all(len(plan.query) <= limit for plan in plans)
+    assert all(len(plan.symbols) <= per_query for plan in plans)
+    assert [s for plan in plans for s in plan.symbols] == SYMBOLS
+    for plan in plans:
+        assert all(f"${s} OR #{s}" in plan.query for s in plan.symbols)
+    if per_query >= len(SYMBOLS):
+        assert len(plans) < len(SYMBOLS)
+
+
+def test_token_queries_clean_and_dedupe_symbols():
+    plans = planner().plan_token_queries(['$BONK', 'BONK', 'W.I.F', '', None])
+    assert [s for plan in plans for s in plan.symbols] == ['BONK', 'WIF']
+
+
+@pytest.mark.parametrize('limit', [256, 512, 1024])
+def test_influencer_queries_cover_every_pair_within_the_limit(limit):
+    plans = planner(max_query_length=limit).plan_influencer_queries(ACCOUNTS, SYMBOLS)
+    assert all(len(plan.query) <= limit for plan in plans)
+    pairs = [(a, s) for plan in plans for a in plan.accounts for s in plan.symbols]
+    expected = [(a.lstrip('@'), s) for a in ACCOUNTS for s in SYMBOLS]
+    assert sorted(pairs) == sorted(expected)
+    assert len(plans) < len(ACCOUNTS) * len(SYMBOLS)
+    assert all(10 <= plan.max_results <= 100 for plan in plans)
+    assert planner().plan_influencer_queries([], SYMBOLS) == []
+
+
+def test_mentioned_matches_whole_cashtags_and_hashtags():
+    symbols = ['WIF', 'SC', 'BONK']
+    assert TwitterQueryPlanner.mentioned("loading $wif and #BONK", symbols) == ['WIF', 'BONK']
+    assert TwitterQueryPlanner.mentioned("$WIFE and $SCAM, not tokens", symbols) == []
+    assert TwitterQueryPlanner.mentioned("aping $SC.", symbols) == ['SC']
+
+
+def fake_search(responses):
+    """Replace planner.search: answer each query from the first matching responder"""
+    queries = []
+
+    async def search(query, max_results=100, priority=None):
+        queries.append(query)
+        for matches, result in responses:
+            if matches(query):
+                return result
+        return SearchResult([], {'users': []})
+
+    return search, queries
+
+
+def test_token_results_are_routed_back_to_each_token():
+    p = planner(max_symbols_per_query=3)
+    tweets = [Tweet('1', 'buying $BONK now'), Tweet('2', '$WIF and #BONK both pumping'),
+              Tweet('3', 'gm, nothing here'), Tweet('4', 'POPCAT gem $POPCAT'), Tweet('5', 'solo search tweet')]
+    p.search, queries = fake_search([
+        (lambda q: '$BONK' in q, SearchResult(tweets[:4], {'users': []})),
+        (lambda q: '$MEW' in q, SearchResult([tweets[4]], {'users': []})),
+    ])
+
+    results = asyncio.run(p.search_tokens(['BONK', 'WIF', 'POPCAT', 'MEW']))
+    assert len(queries) == 2
+    assert [t.id for t in results['BONK'].data] == ['1', '2']
+    assert [t.id for t in results['WIF'].data] == ['2']
+    assert [t.id for t in results['POPCAT'].data] == ['4']
+    # A search for one token attributes untagged tweets to it
+    assert [t.id for t in results['MEW'].data] == ['5']
+    # Untagged tweets from a shared search belong to no token
+    assert all(t.id != '3' for result in results.values() for t in result.data)
+
+
+def test_results_keep_the_callers_symbol_spelling():
+    p = planner()
+    p.search, _ = fake_search([(lambda q: True, SearchResult([Tweet('1', 'aping $DOGWIFHAT')], {'users': []}))])
+    results = asyncio.run(p.search_tokens(['$dogwifhat', 'OTHER']))
+    assert list(results) == ['$dogwifhat']
+    assert clean_symbol('$dogwifhat') == 'dogwifhat'
+
+
+def test_influencer_tweets_are_routed_to_token_and_account():
+    p = planner()
+    users = [TwitterUser('10', 'ansem'), TwitterUser('20', 'CryptoKaleo'), TwitterUser('30', 'stranger')]
+    tweets = [Tweet('1', '$BONK looks ready', author_id='10'),
+              Tweet('2', 'still holding $WIF, adding $BONK', author_id='20'),
+              Tweet('3', '$BONK to zero', author_id='30'),
+              Tweet('4', 'no cashtag here', author_id='10')]
+    p.search, queries = fake_search([(lambda q: True, SearchResult(tweets, {'users': users}))])
+
+    results = asyncio.run(p.search_influencers(['Ansem', 'CryptoKaleo'], ['BONK', 'WIF']))
+    assert len(queries) == 1
+    assert [(account, tweet.id) for account, tweet in results['BONK']] == [('Ansem', '1'), ('CryptoKaleo', '2')]
+    assert [(account, tweet.id) for account, tweet in results['WIF']] == [('CryptoKaleo', '2')]
+
+
+def test_search_without_a_bearer_token_is_skipped():
+    p = TwitterQueryPlanner(None, rate_limiter=RateLimiter('twitter-test', 6000))
+    assert asyncio.run(p.search('anything')) is None
+    assert p.get_stats()['skipped_no_token'] == 1
@@ -0,0 +1,81 @@
+"""Tests for the write-behind queue in front of Database"""
+import asyncio
+
+from core.storage.write_queue import AsyncWriteQueue, close_all_write_queues, get_write_queue
+
+
+def token_count(db):
+    with db.pool.reader() as conn:
+        return conn.execute("SELECT COUNT(*) FROM tokens").fetchone()[0]
+
+
+def test_close_flushes_pending_tokens(db):
+    async def run():
+        queue = AsyncWriteQueue(db, max_batch_size=1000, flush_interval=3600)
+        for i in range(50):
+            assert queue.enqueue_token({'contract_address': f"T{i}", 'ticker': f"T{i}"})
+        assert token_count(db) == 0
+        assert queue.get_stats()['queue_depth'] == 50
+
+        await queue.close()
+        assert token_count(db) == 50
+        assert queue.get_stats()['queue_depth'] == 0
+
+    asyncio.run(run())
+
+
+def test_close_all_write_queues_flushes_shared_queues(db):
+    async def run():
+        queue = get_write_queue(db, flush_interval=3600)
+        await queue.store_token(contract_address='A', ticker='A')
+        await close_all_write_queues()
+        assert token_count(db) == 1
+        # A closed queue is replaced on next use
+        assert get_write_queue(db) is not queue
+
+    asyncio.run(run())
+    asyncio.run(close_all_write_queues())
+
+
+def test_updates_to_one_token_are_coalesced(db):
+    async def run():
+        queue = AsyncWriteQueue(db, flush_interval=3600)
+        queue.enqueue_token({'contract_address': 'A', 'price_usd': 1.0})
+        queue.enqueue_token({'contract_address': 'A', 'price_usd': 2.0})
+        assert queue.stats['tokens_coalesced'] == 1
+        assert await queue.flush() == 1
+        await queue.close()
+
+    asyncio.run(run())
+    assert db.get_token('A')['price_usd'] == 2.0
+
+
+def test_batch_size_triggers_flush(db):
+    async def run():
+        queue = AsyncWriteQueue(db, max_batch_size=10, flush_interval=3600)
+        for i in range(10):
+            queue.enqueue_token({'contract_address': f"T{i}"})
+        for _ in range(100):
+            if queue.stats['flushes']:
+                break
+            await asyncio.sleep(0.01)
+        assert queue.stats['rows_flushed'] == 10
+        await queue.close()
+
+    asyncio.run(run())
+
+
+def test_trade_is_committed_when_record_trade_returns(db):
+    async def run():
+        queue = AsyncWriteQueue(db)
+        assert await queue.record_trade(contract_address='A', action='BUY', amount=1.0, price=1.0)
+        assert len(db.get_trade_history('A')) == 1
+        await queue.close()
+
+    asyncio.run(run())
+
+
+def test_enqueue_outside_event_loop_writes_directly(db):
+    queue = AsyncWriteQueue(db)
+    assert queue.enqueue_token({'contract_address': 'A'})
+    assert token_count(db) == 1
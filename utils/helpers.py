@@ -10,29 +10,11 @@ from typing import Dict, List, Optional, Union, Any
 from datetime import datetime, timedelta, UTC
 from solders.pubkey import Pubkey
 from config.bot_config import BotConfiguration
+from utils.rate_limiter import limiter_for_url, parse_retry_after, PRIORITY_ANALYSIS
+from utils.http_client import get_http_session
 
 logger = logging.getLogger('trading_bot.utils')
 
-# Rate limiting tracking for different API endpoints
-RATE_LIMIT_STATE = {
-    'dexscreener': {
-        'consecutive_limits': 0,
-        'backoff_until': 0,
-        'last_request_time': 0,
-        'request_count': 0,
-        'window_start': time.time(),
-        'max_requests_per_minute': 30
-    },
-    'coingecko': {
-        'consecutive_limits': 0,
-        'backoff_until': 0,
-        'last_request_time': 0,
-        'request_count': 0,
-        'window_start': time.time(),
-        'max_requests_per_minute': 10  # CoinGecko's free tier is very limited
-    }
-}
-
 # Cache for price data
 PRICE_CACHE = {
     'sol_usd': {
@@ -58,15 +40,26 @@ def is_valid_solana_address(address: str) -> bool:
     except Exception:
         return False
 
+def _cached_sol_price() -> Dict:
+    """Cached SOL price response, or the fallback price if nothing is cached"""
+    if PRICE_CACHE['sol_usd']['price'] > 0:
+        return {'solana': {'usd': PRICE_CACHE['sol_usd']['price']}}
+    return {'solana': {'usd': 100.0}}  # Fallback price
+
 async def fetch_with_retries(url: str, method: str = 'GET', 
                            headers: Optional[Dict] = None,
                            params: Optional[Dict] = None, 
                            json_data: Optional[Dict] = None,
                            max_retries: int = 5,
-                           base_delay: int = 2) -> Optional[Dict]:
+                           base_delay: int = 2,
+                           priority: int = PRIORITY_ANALYSIS) -> Optional[Dict]:
     """
     Fetch data from API with improved retry and rate limiting mechanism
     
+    Requests to APIs with a shared limiter (DexScreener, CoinGecko, Birdeye)
+    wait for budget in the given priority lane; a 429 pauses that limiter for
+    every caller, honouring Retry-After.
+    
     :param url: URL to fetch
     :param method: HTTP method
     :param headers: HTTP headers
@@ -74,6 +67,7 @@ async def fetch_with_retries(url: str, method: str = 'GET',
     :param json_data: JSON data for POST requests
     :param max_retries: Maximum retry attempts
     :param base_delay: Base delay between retries
+    :param priority: Rate limiter lane (PRIORITY_EXIT, PRIORITY_ANALYSIS or PRIORITY_DISCOVERY)
     :return: API response as dictionary or None
     """
     # First check for problematic tokens in URL
@@ -99,221 +93,148 @@ async def fetch_with_retries(url: str, method: str = 'GET',
     if 'jup.ag' in url and params and 'amount' in params and not isinstance(params['amount'], str):
         params['amount'] = str(params['amount'])
     
-    # Determine which API is being used
-    api_type = None
-    if 'dexscreener.com' in url:
-        api_type = 'dexscreener'
-    elif 'coingecko.com' in url:
-        api_type = 'coingecko'
-        
-        # Special handling for CoinGecko SOL price - check cache first
-        if 'solana' in url and 'price' in url:
-            current_time = time.time()
-            if (PRICE_CACHE['sol_usd']['price'] > 0 and 
-                current_time - PRICE_CACHE['sol_usd']['timestamp'] < PRICE_CACHE['sol_usd']['ttl']):
-                # Return cached price
-                return {'solana': {'usd': PRICE_CACHE['sol_usd']['price']}}
-            
-            # Stricter rate limits for CoinGecko
-            if RATE_LIMIT_STATE['coingecko']['request_count'] >= RATE_LIMIT_STATE['coingecko']['max_requests_per_minute']:
-                # Instead of waiting, return cached value if available
-                if PRICE_CACHE['sol_usd']['price'] > 0:
-                    return {'solana': {'usd': PRICE_CACHE['sol_usd']['price']}}
-                # Otherwise, use fallback price
-                return {'solana': {'usd': 100.0}}  # Fallback price
+    limiter, endpoint = limiter_for_url(url)
     
-    # Check if we're in a backoff period for this API
-    current_time = time.time()
-    if api_type and current_time < RATE_LIMIT_STATE[api_type]['backoff_until']:
-        # Still in backoff period, wait longer
-        wait_remaining = int(RATE_LIMIT_STATE[api_type]['backoff_until'] - current_time)
-        logger.warning(f"Still in rate limit backoff period for {api_type}. Waiting {wait_remaining} seconds.")
-        await asyncio.sleep(wait_remaining)
-    
-    # Track requests per minute for rate limiting
-    if api_type:
-        # Reset window if it's been more than a minute
-        if current_time - RATE_LIMIT_STATE[api_type]['window_start'] > 60:
-            RATE_LIMIT_STATE[api_type]['window_start'] = current_time
-            RATE_LIMIT_STATE[api_type]['request_count'] = 0
-        
-        # Increment request count
-        RATE_LIMIT_STATE[api_type]['request_count'] += 1
-        RATE_LIMIT_STATE[api_type]['last_request_time'] = current_time
-        
-        # If approaching rate limit, add delay
-        if RATE_LIMIT_STATE[api_type]['request_count'] >= RATE_LIMIT_STATE[api_type]['max_requests_per_minute']:
-            # Calculate time until window resets
-            time_to_reset = 60 - (current_time - RATE_LIMIT_STATE[api_type]['window_start'])
-            logger.warning(f"Approaching rate limit for {api_type}. Sleeping {time_to_reset:.1f} seconds.")
-            
-            # For CoinGecko, if we hit rate limit and have cached data, return that
-            if api_type == 'coingecko' and 'solana' in url and 'price' in url:
-                if PRICE_CACHE['sol_usd']['price'] > 0:
-                    return {'solana': {'usd': PRICE_CACHE['sol_usd']['price']}}
-                # If no cached data, use fallback
-                return {'solana': {'usd': 100.0}}
-                
-            await asyncio.sleep(time_to_reset)
-            
-            # Reset window
-            RATE_LIMIT_STATE[api_type]['window_start'] = time.time()
-            RATE_LIMIT_STATE[api_type]['request_count'] = 1
-    
-    # Add small delay between consecutive requests to the same API
-    if api_type and current_time - RATE_LIMIT_STATE[api_type]['last_request_time'] < 0.5:
-        # Add small jitter to prevent request bursts
-        await asyncio.sleep(random.uniform(0.3, 0.7))
+    # Special handling for CoinGecko SOL price - serve from cache rather than wait
+    is_sol_price = 'coingecko.com' in url and 'solana' in url and 'price' in url
+    if is_sol_price:
+        if (PRICE_CACHE['sol_usd']['price'] > 0 and 
+            time.time() - PRICE_CACHE['sol_usd']['timestamp'] < PRICE_CACHE['sol_usd']['ttl']):
+            return _cached_sol_price()
+        # CoinGecko's budget is tiny; a stale price beats queueing behind it
+        if not limiter.try_acquire(priority, endpoint):
+            return _cached_sol_price()
     
     # Perform request with retries
     try:
-        async with aiohttp.ClientSession() as session:
-            for attempt in range(max_retries):
-                try:
-                    if method.upper() == 'POST':
-                        async with session.post(
-                            url, 
-                            headers=headers, 
-                            params=params, 
-                            json=json_data, 
-                            timeout=30
-                        ) as response:
-                            # Check for rate limiting response
-                            if response.status == 429:
-                                logger.warning(f"Rate limited by {url}, waiting for retry")
+        session = get_http_session()
+        for attempt in range(max_retries):
+            try:
+                # The SOL price request already took its budget above
+                if limiter and not (is_sol_price and attempt == 0):
+                    await limiter.acquire(priority, endpoint)
+                    
+                if method.upper() == 'POST':
+                    async with session.post(
+                        url, 
+                        headers=headers, 
+                        params=params, 
+                        json=json_data, 
+                        timeout=30
+                    ) as response:
+                        # Check for rate limiting response
+                        if response.status == 429:
+                            logger.warning(f"Rate limited by {url}, waiting for retry")
                                 
-                                # Apply exponential backoff with jitter
-                                if api_type:
-                                    RATE_LIMIT_STATE[api_type]['consecutive_limits'] += 1
-                                    backoff_seconds = min(900, base_delay * (2 ** RATE_LIMIT_STATE[api_type]['consecutive_limits']))
-                                    jitter = random.uniform(0.8, 1.2)  # Add 20% jitter
-                                    wait_time = int(backoff_seconds * jitter)
-                                    
-                                    # Set backoff timestamp
-                                    RATE_LIMIT_STATE[api_type]['backoff_until'] = current_time + wait_time
+                            if limiter:
+                                # Pauses every caller of this API, then the next
+                                # attempt queues in its lane until the pause ends
+                                limiter.on_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
                                     
-                                    logger.warning(f"Rate limited by {api_type}, waiting {wait_time} seconds")
-                                    
-                                    # For CoinGecko, if we hit rate limit and have cached data, return that
-                                    if api_type == 'coingecko' and 'solana' in url and 'price' in url:
-                                        if PRICE_CACHE['sol_usd']['price'] > 0:
-                                            return {'solana': {'usd': PRICE_CACHE['sol_usd']['price']}}
-                                        # If no cached data, use fallback
-                                        return {'solana': {'usd': 100.0}}
-                                    
-                                    await asyncio.sleep(wait_time)
-                                else:
-                                    # Generic backoff if API type not recognized
-                                    wait_time = base_delay * (2 ** attempt)
-                                    await asyncio.sleep(wait_time)
+                                # For CoinGecko, if we hit rate limit and have cached data, return that
+                                if is_sol_price:
+                                    return _cached_sol_price()
+                            else:
+                                # Generic backoff if API type not recognized
+                                wait_time = base_delay * (2 ** attempt)
+                                await asyncio.sleep(wait_time)
                                 
-                                continue
+                            continue
                             
-                            # Reset consecutive limit counter on successful non-429 response
-                            if api_type and response.status != 429:
-                                RATE_LIMIT_STATE[api_type]['consecutive_limits'] = 0
+                        # Reset the limiter's backoff on a successful non-429 response
+                        if limiter:
+                            limiter.on_success()
                             
-                            # For all other responses
-                            response.raise_for_status()
-                            try:
-                                data = await response.json()
+                        # For all other responses
+                        response.raise_for_status()
+                        try:
+                            data = await response.json()
                                 
-                                # Update cache for SOL price
-                                if api_type == 'coingecko' and 'solana' in url and 'price' in url:
-                                    if data and 'solana' in data and 'usd' in data['solana']:
-                                        PRICE_CACHE['sol_usd']['price'] = float(data['solana']['usd'])
-                                        PRICE_CACHE['sol_usd']['timestamp'] = current_time
+                            # Update cache for SOL price
+                            if is_sol_price:
+                                if data and 'solana' in data and 'usd' in data['solana']:
+                                    PRICE_CACHE['sol_usd']['price'] = float(data['solana']['usd'])
+                                    PRICE_CACHE['sol_usd']['timestamp'] = time.time()
                                 
-                                return data
-                            except Exception as e:
-                                logger.error(f"Error parsing JSON response: {e}")
-                                text_response = await response.text()
-                                logger.error(f"Response content: {text_response[:200]}")
-                                return None
-                    else:
-                        async with session.get(
-                            url, 
-                            headers=headers, 
-                            params=params, 
-                            timeout=30
-                        ) as response:
-                            # Check for rate limiting response
-                            if response.status == 429:
-                                logger.warning(f"Rate limited by {url}, waiting for retry")
+                            return data
+                        except Exception as e:
+                            logger.error(f"Error parsing JSON response: {e}")
+                            text_response = await response.text()
+                            logger.error(f"Response content: {text_response[:200]}")
+                            return None
+                else:
+                    async with session.get(
+                        url, 
+                        headers=headers, 
+                        params=params, 
+                        timeout=30
+                    ) as response:
+                        # Check for rate limiting response
+                        if response.status == 429:
+                            logger.warning(f"Rate limited by {url}, waiting for retry")
                                 
-                                # Apply exponential backoff with jitter
-                                if api_type:
-                                    RATE_LIMIT_STATE[api_type]['consecutive_limits'] += 1
-                                    backoff_seconds = min(900, base_delay * (2 ** RATE_LIMIT_STATE[api_type]['consecutive_limits']))
-                                    jitter = random.uniform(0.8, 1.2)  # Add 20% jitter
-                                    wait_time = int(backoff_seconds * jitter)
-                                    
-                                    # Set backoff timestamp
-                                    RATE_LIMIT_STATE[api_type]['backoff_until'] = current_time + wait_time
-                                    
-                                    logger.warning(f"Rate limited by {api_type}, waiting {wait_time} seconds")
-                                    
-                                    # For CoinGecko, if we hit rate limit and have cached data, return that
-                                    if api_type == 'coingecko' and 'solana' in url and 'price' in url:
-                                        if PRICE_CACHE['sol_usd']['price'] > 0:
-                                            return {'solana': {'usd': PRICE_CACHE['sol_usd']['price']}}
-                                        # If no cached data, use fallback
-                                        return {'solana': {'usd': 100.0}}
+                            if limiter:
+                                # Pauses every caller of this API, then the next
+                                # attempt queues in its lane until the pause ends
+                                limiter.on_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
                                     
-                                    await asyncio.sleep(wait_time)
-                                else:
-                                    # Generic backoff if API type not recognized
-                                    wait_time = base_delay * (2 ** attempt)
-                                    await asyncio.sleep(wait_time)
+                                # For CoinGecko, if we hit rate limit and have cached data, return that
+                                if is_sol_price:
+                                    return _cached_sol_price()
+                            else:
+                                # Generic backoff if API type not recognized
+                                wait_time = base_delay * (2 ** attempt)
+                                await asyncio.sleep(wait_time)
                                 
-                                continue
+                            continue
                             
-                            # Reset consecutive limit counter on successful non-429 response
-                            if api_type and response.status != 429:
-                                RATE_LIMIT_STATE[api_type]['consecutive_limits'] = 0
+                        # Reset the limiter's backoff on a successful non-429 response
+                        if limiter:
+                            limiter.on_success()
                             
-                            # For 404 errors on DexScreener, try an alternative endpoint
-                            if response.status == 404 and 'dexscreener.com' in url:
-                                if '/pairs/solana' in url:
-                                    # Try alternative endpoint
-                                    alternative_url = "https://api.dexscreener.com/latest/dex/search?q=solana"
-                                    logger.warning(f"404 on {url}, trying alternative endpoint: {alternative_url}")
-                                    return await fetch_with_retries(alternative_url, method, headers, params, json_data)
+                        # For 404 errors on DexScreener, try an alternative endpoint
+                        if response.status == 404 and 'dexscreener.com' in url:
+                            if '/pairs/solana' in url:
+                                # Try alternative endpoint
+                                alternative_url = "https://api.dexscreener.com/latest/dex/search?q=solana"
+                                logger.warning(f"404 on {url}, trying alternative endpoint: {alternative_url}")
+                                return await fetch_with_retries(alternative_url, method, headers, params, json_data,
+                                                                priority=priority)
                                     
-                            # For all other responses
-                            response.raise_for_status()
-                            try:
-                                data = await response.json()
+                        # For all other responses
+                        response.raise_for_status()
+                        try:
+                            data = await response.json()
                                 
-                                # Update cache for SOL price
-                                if api_type == 'coingecko' and 'solana' in url and 'price' in url:
-                                    if data and 'solana' in data and 'usd' in data['solana']:
-                                        PRICE_CACHE['sol_usd']['price'] = float(data['solana']['usd'])
-                                        PRICE_CACHE['sol_usd']['timestamp'] = current_time
+                            # Update cache for SOL price
+                            if is_sol_price:
+                                if data and 'solana' in data and 'usd' in data['solana']:
+                                    PRICE_CACHE['sol_usd']['price'] = float(data['solana']['usd'])
+                                    PRICE_CACHE['sol_usd']['timestamp'] = time.time()
                                 
-                                return data
-                            except Exception as e:
-                                logger.error(f"Error parsing JSON response: {e}")
-                                text_response = await response.text()
-                                logger.error(f"Response content: {text_response[:200]}")
-                                return None
+                            return data
+                        except Exception as e:
+                            logger.error(f"Error parsing JSON response: {e}")
+                            text_response = await response.text()
+                            logger.error(f"Response content: {text_response[:200]}")
+                            return None
                 
-                except aiohttp.ClientResponseError as e:
-                    if e.status == 429:  # Rate limit exceeded
-                        # This is now handled in the rate limit check above
-                        pass
-                    else:
-                        logger.warning(f"Request error on attempt {attempt + 1}/{max_retries} for {url}: {e}")
+            except aiohttp.ClientResponseError as e:
+                if e.status == 429:  # Rate limit exceeded
+                    # This is now handled in the rate limit check above
+                    pass
+                else:
+                    logger.warning(f"Request error on attempt {attempt + 1}/{max_retries} for {url}: {e}")
                 
-                except Exception as e:
-                    logger.warning(f"Fetch attempt {attempt + 1}/{max_retries} failed for {url}: {e}")
+            except Exception as e:
+                logger.warning(f"Fetch attempt {attempt + 1}/{max_retries} failed for {url}: {e}")
                 
-                # Apply exponential backoff with jitter
-                if attempt < max_retries - 1:
-                    backoff = base_delay * (2 ** attempt)
-                    jitter = random.uniform(0.8, 1.2)  # Add 20% jitter
-                    wait_time = backoff * jitter
-                    await asyncio.sleep(wait_time)
+            # Apply exponential backoff with jitter
+            if attempt < max_retries - 1:
+                backoff = base_delay * (2 ** attempt)
+                jitter = random.uniform(0.8, 1.2)  # Add 20% jitter
+                wait_time = backoff * jitter
+                await asyncio.sleep(wait_time)
     except Exception as e:
         # Catch any exceptions at the session level, which could cause the recursion error
         logger.error(f"Session-level error fetching {url}: {e}")
@@ -0,0 +1,125 @@
+"""
+Process-wide pooled aiohttp session shared by every HTTP client
+"""
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import aiohttp
+
+from config.bot_config import BotConfiguration
+
+logger = logging.getLogger('trading_bot.http_client')
+
+# Used for settings missing from BotConfiguration.HTTP_CLIENT_SETTINGS
+DEFAULT_SETTINGS = {
+    'limit': 100,              # open connections in total
+    'limit_per_host': 10,      # open connections per host
+    'ttl_dns_cache': 300,      # seconds a DNS answer is reused
+    'keepalive_timeout': 30,   # seconds an idle connection is kept
+    'total_timeout': 30,       # seconds per request, end to end
+    'connect_timeout': 10,
+    'sock_read_timeout': 20
+}
+
+
+class HttpClientRegistry:
+    """
+    Owns one pooled ClientSession per event loop
+
+    Clients borrow the session and must not close it; close() at shutdown
+    releases the connector. Keep-alive connections, the DNS cache and
+    per-host limits are then shared by Birdeye, DexScreener, Jupiter,
+    CoinGecko and alert webhooks instead of each opening its own pool.
+    """
+
+    def __init__(self, **settings):
+        """
+        Initialize the registry
+
+        :param settings: Overrides for DEFAULT_SETTINGS
+        """
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {'sessions_created': 0}
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the shared session for the running loop, creating it on first use
+
+        :return: Pooled aiohttp ClientSession
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            # A session can't outlive its loop; one from an earlier asyncio.run is dead
+            settings = self.settings
+            connector = aiohttp.TCPConnector(
+                limit=settings['limit'],
+                limit_per_host=settings['limit_per_host'],
+                ttl_dns_cache=settings['ttl_dns_cache'],
+                keepalive_timeout=settings['keepalive_timeout']
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=settings['total_timeout'],
+                connect=settings['connect_timeout'],
+                sock_read=settings['sock_read_timeout']
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._loop = loop
+            self.stats['sessions_created'] += 1
+            logger.debug(f"Created shared HTTP session (limit {settings['limit']}, "
+                         f"{settings['limit_per_host']} per host)")
+        return self._session
+
+    def get_stats(self) -> Dict:
+        """
+        Get connection pool metrics
+
+        :return: Dictionary with session count and open connections
+        """
+        stats = dict(self.stats)
+        session = self._session
+        connector = session.connector if session is not None and not session.closed else None
+        stats['open'] = connector is not None
+        stats['connections'] = len(getattr(connector, '_acquired', ())) if connector else 0
+        return stats
+
+    async def close(self):
+        """Close the shared session (call on shutdown)"""
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            try:
+                await session.close()
+            except Exception as e:
+                logger.error(f"Error closing shared HTTP session: {e}")
+
+
+_registry: Optional[HttpClientRegistry] = None
+
+
+def get_http_registry() -> HttpClientRegistry:
+    """Get the process-wide registry configured from BotConfiguration.HTTP_CLIENT_SETTINGS"""
+    global _registry
+    if _registry is None:
+        _registry = HttpClientRegistry(**getattr(BotConfiguration, 'HTTP_CLIENT_SETTINGS', {}))
+    return _registry
+
+
+def get_http_session(session: Optional[aiohttp.ClientSession] = None) -> aiohttp.ClientSession:
+    """
+    Get the session a client should use (must be called from a running loop)
+
+    :param session: Session injected into the client, if any
+    :return: The injected session while it is open, otherwise the shared pooled one
+    """
+    if session is not None and not session.closed:
+        return session
+    return get_http_registry().get_session()
+
+
+async def close_http_sessions():
+    """Close the shared session (call on shutdown)"""
+    if _registry is not None:
+        await _registry.close()
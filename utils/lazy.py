@@ -0,0 +1,162 @@
+"""
+Deferred imports and component construction
+
+Heavy optional dependencies (TensorFlow, XGBoost, TA-Lib, transformers,
+pandas) cost seconds and hundreds of MB to import. Modules bind them with
+lazy_import() so the import happens on first attribute access, and build
+expensive objects (models, pipelines) through LazyComponent so nothing is
+constructed for a feature that is disabled or never used.
+"""
+import time
+import types
+import logging
+import importlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger('trading_bot.lazy')
+
+# name -> {'kind', 'loaded', 'load_ms', 'error'} for every lazy import/component
+_registry: Dict[str, Dict[str, Any]] = {}
+_registry_lock = threading.Lock()
+
+
+def _record(name: str, kind: str, **values):
+    with _registry_lock:
+        entry = _registry.setdefault(name, {'kind': kind, 'loaded': False, 'load_ms': 0.0, 'error': None})
+        entry.update(values)
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access
+
+    ``pd = lazy_import('pandas')`` then ``pd.DataFrame(...)`` imports pandas
+    the first time it runs. A missing package raises ImportError at that
+    point, not when the importing module loads.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        _record(name, 'module')
+
+    def _load(self):
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    start = time.perf_counter()
+                    try:
+                        module = importlib.import_module(self.__name__)
+                    except ImportError as e:
+                        _record(self.__name__, 'module', error=str(e))
+                        raise
+                    load_ms = (time.perf_counter() - start) * 1000
+                    self.__dict__['_lazy_module'] = module
+                    _record(self.__name__, 'module', loaded=True, load_ms=load_ms)
+                    logger.debug(f"Imported {self.__name__} on first use in {load_ms:.0f} ms")
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Bind a module without importing it yet
+
+    :param name: Dotted module name
+    :return: Proxy that imports the module on first attribute access
+    """
+    return LazyModule(name)
+
+
+def optional_import(name: str) -> Optional[types.ModuleType]:
+    """
+    Import a module if it is installed
+
+    :param name: Dotted module name
+    :return: The module, or None if it (or one of its dependencies) is missing
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        logger.debug(f"Optional dependency {name} unavailable: {e}")
+        return None
+
+
+def is_loaded(module: Any) -> bool:
+    """Whether a lazy_import() proxy (or a plain module) has been imported"""
+    if isinstance(module, LazyModule):
+        return module.__dict__['_lazy_module'] is not None
+    return module is not None
+
+
+class LazyComponent:
+    """
+    An object built by a factory the first time it is needed
+
+    get() builds once (thread-safe) and caches the result. A disabled
+    component is never built and get() returns None; so does one whose
+    factory failed, which is logged once and not retried.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], enabled: bool = True):
+        """
+        :param name: Name for logs and the startup report
+        :param factory: Zero-argument callable that builds the object
+        :param enabled: False to never build it
+        """
+        self.name = name
+        self.factory = factory
+        self.enabled = enabled
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+        _record(name, 'component', enabled=enabled)
+
+    @property
+    def loaded(self) -> bool:
+        return self._built and self._value is not None
+
+    def get(self) -> Any:
+        """
+        Build the component if needed
+
+        :return: The component, or None if disabled or it could not be built
+        """
+        if self._built or not self.enabled:
+            return self._value
+        with self._lock:
+            if not self._built:
+                start = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                    load_ms = (time.perf_counter() - start) * 1000
+                    _record(self.name, 'component', loaded=True, load_ms=load_ms)
+                    logger.info(f"Built {self.name} on first use in {load_ms:.0f} ms")
+                except Exception as e:
+                    logger.error(f"Could not build {self.name}: {e}")
+                    _record(self.name, 'component', error=str(e))
+                self._built = True
+        return self._value
+
+
+def get_lazy_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get deferred-load metrics
+
+    :return: {name: {'kind', 'loaded', 'load_ms', 'error'}} for every lazy import and component
+    """
+    with _registry_lock:
+        return {name: dict(entry) for name, entry in _registry.items()}
@@ -0,0 +1,357 @@
+"""
+Shared async token-bucket rate limiter with priority lanes
+"""
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from config.bot_config import BotConfiguration
+
+logger = logging.getLogger('trading_bot.rate_limiter')
+
+# Lanes, served strictly in this order when requests compete for budget
+PRIORITY_EXIT = 0        # price checks for open positions
+PRIORITY_ANALYSIS = 1    # buy-candidate analysis
+PRIORITY_DISCOVERY = 2   # trending / discovery scans
+
+PRIORITY_NAMES = {
+    PRIORITY_EXIT: 'exit',
+    PRIORITY_ANALYSIS: 'analysis',
+    PRIORITY_DISCOVERY: 'discovery'
+}
+
+# Used for APIs missing from BotConfiguration.API_RATE_LIMITS
+DEFAULT_BUDGET = {'requests_per_minute': 60, 'burst': 1}
+
+# Host suffix -> limiter name, for callers that only have a URL
+HOST_LIMITERS = {
+    'birdeye.so': 'birdeye',
+    'dexscreener.com': 'dexscreener',
+    'coingecko.com': 'coingecko'
+}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta seconds or HTTP date)
+
+    :param value: Header value
+    :return: Seconds to wait, or None if absent or unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class _Bucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second"""
+
+    def __init__(self, requests_per_minute: float, burst: int):
+        self.base_rate = max(requests_per_minute, 0.001) / 60.0
+        self.rate = self.base_rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available"""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter shared by every client of one API
+
+    Callers ``await acquire(priority, endpoint)`` before each request. When
+    budget is short, waiting callers are granted in lane order (exits, then
+    analysis, then discovery) and FIFO within a lane. A request must fit both
+    the API-wide bucket and its endpoint's bucket if one is configured.
+
+    ``on_rate_limited`` pauses the whole API for ``Retry-After`` (or an
+    exponential backoff) and halves the refill rate; ``on_success`` restores
+    it gradually, so budgets follow what the server will actually accept.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int = 1,
+                 endpoints: Optional[Dict[str, Union[float, Dict]]] = None,
+                 base_backoff: float = 2.0, max_backoff: float = 900.0,
+                 min_rate_fraction: float = 0.1, recovery_successes: int = 20):
+        """
+        Initialize the limiter
+
+        :param name: API name used in logs
+        :param requests_per_minute: API-wide budget
+        :param burst: Requests that may be sent back to back after an idle period
+        :param endpoints: Per-endpoint budgets, either requests per minute or
+                          {'requests_per_minute': ..., 'burst': ...}
+        :param base_backoff: First pause after a 429 without Retry-After (seconds)
+        :param max_backoff: Longest pause after repeated 429s (seconds)
+        :param min_rate_fraction: Floor for the adaptive rate, as a fraction of the budget
+        :param recovery_successes: Successful requests per step back towards the budget
+        """
+        self.name = name
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery_successes = max(1, recovery_successes)
+
+        self._bucket = _Bucket(requests_per_minute, burst)
+        self._endpoint_buckets: Dict[str, _Bucket] = {}
+        for endpoint, budget in (endpoints or {}).items():
+            if isinstance(budget, dict):
+                self._endpoint_buckets[endpoint] = _Bucket(budget['requests_per_minute'], budget.get('burst', 1))
+            else:
+                self._endpoint_buckets[endpoint] = _Bucket(budget, 1)
+
+        self._paused_until = 0.0
+        self._consecutive_limits = 0
+        self._successes = 0
+
+        # (priority, sequence, endpoint, future)
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.stats = {
+            'rate_limited': 0,
+            'lanes': {
+                lane: {'granted': 0, 'total_wait_ms': 0.0, 'max_wait_ms': 0.0}
+                for lane in PRIORITY_NAMES.values()
+            }
+        }
+
+    def _bind(self, loop: asyncio.AbstractEventLoop):
+        """Attach loop-bound state to the running loop"""
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._waiters = []
+            self._dispatcher = None
+
+    def _wait_time(self, endpoint: Optional[str], now: float) -> float:
+        """Seconds until a request to ``endpoint`` fits every budget"""
+        wait = max(self._paused_until - now, self._bucket.wait_time(now))
+        bucket = self._endpoint_buckets.get(endpoint)
+        if bucket is not None:
+            wait = max(wait, bucket.wait_time(now))
+        return wait
+
+    def _take(self, endpoint: Optional[str]):
+        self._bucket.tokens -= 1
+        bucket = self._endpoint_buckets.get(endpoint)
+        if bucket is not None:
+            bucket.tokens -= 1
+
+    def _record(self, priority: int, waited: float):
+        lane = self.stats['lanes'][PRIORITY_NAMES.get(priority, 'discovery')]
+        waited_ms = waited * 1000
+        lane['granted'] += 1
+        lane['total_wait_ms'] += waited_ms
+        lane['max_wait_ms'] = max(lane['max_wait_ms'], waited_ms)
+
+    def try_acquire(self, priority: int = PRIORITY_ANALYSIS, endpoint: Optional[str] = None) -> bool:
+        """
+        Take budget only if it is available right now
+
+        :param priority: Request lane
+        :param endpoint: Endpoint path with its own budget, if any
+        :return: True if the request may be sent
+        """
+        if self._waiters or self._wait_time(endpoint, time.monotonic()) > 0:
+            return False
+        self._take(endpoint)
+        self._record(priority, 0.0)
+        return True
+
+    async def acquire(self, priority: int = PRIORITY_ANALYSIS, endpoint: Optional[str] = None) -> float:
+        """
+        Wait until a request may be sent
+
+        :param priority: Request lane (PRIORITY_EXIT, PRIORITY_ANALYSIS or PRIORITY_DISCOVERY)
+        :param endpoint: Endpoint path with its own budget, if any
+        :return: Seconds spent waiting
+        """
+        loop = asyncio.get_running_loop()
+        self._bind(loop)
+        start = time.monotonic()
+
+        # Nobody queued ahead and budget available: go straight through
+        if not self._waiters and self._wait_time(endpoint, start) <= 0:
+            self._take(endpoint)
+            self._record(priority, 0.0)
+            return 0.0
+
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), endpoint, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = loop.create_task(self._dispatch())
+        else:
+            self._wakeup.set()
+
+        await future
+        waited = time.monotonic() - start
+        self._record(priority, waited)
+        return waited
+
+    async def _dispatch(self):
+        """Grant queued requests in lane order as budget refills"""
+        while True:
+            # Callers that were cancelled while queued give up their place
+            self._waiters = [w for w in self._waiters if not w[3].done()]
+            if not self._waiters:
+                return
+            heapq.heapify(self._waiters)
+
+            now = time.monotonic()
+            delay = None
+            granted = None
+            for waiter in sorted(self._waiters):
+                wait = self._wait_time(waiter[2], now)
+                if wait <= 0:
+                    granted = waiter
+                    break
+                delay = wait if delay is None else min(delay, wait)
+
+            if granted is not None:
+                self._take(granted[2])
+                self._waiters.remove(granted)
+                granted[3].set_result(None)
+                continue
+
+            # Sleep until budget refills, or until a new caller might fit sooner
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """
+        Back off after a 429
+
+        :param retry_after: Server-requested pause in seconds, if given
+        """
+        self._consecutive_limits += 1
+        self._successes = 0
+        self.stats['rate_limited'] += 1
+
+        if retry_after is None:
+            backoff = self.base_backoff * (2 ** (self._consecutive_limits - 1))
+            retry_after = min(self.max_backoff, backoff) * random.uniform(0.8, 1.2)
+
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + retry_after)
+
+        bucket = self._bucket
+        bucket.refill(now)
+        bucket.tokens = 0.0
+        bucket.rate = max(bucket.base_rate * self.min_rate_fraction, bucket.rate / 2)
+
+        logger.warning(f"Rate limited by {self.name}: pausing {retry_after:.1f}s, "
+                       f"budget now {bucket.rate * 60:.0f} req/min")
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def on_success(self):
+        """Record an accepted request and recover towards the configured budget"""
+        self._consecutive_limits = 0
+        bucket = self._bucket
+        if bucket.rate >= bucket.base_rate:
+            return
+        self._successes += 1
+        if self._successes >= self.recovery_successes:
+            self._successes = 0
+            bucket.refill(time.monotonic())
+            bucket.rate = min(bucket.base_rate, bucket.rate + bucket.base_rate * 0.1)
+
+    def remaining_pause(self) -> float:
+        """Seconds left in the current 429 pause"""
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def get_stats(self) -> Dict:
+        """
+        Get limiter metrics
+
+        :return: Dictionary with per-lane waits, queue depth and current budget
+        """
+        lanes = {}
+        for lane, values in self.stats['lanes'].items():
+            lane_stats = dict(values)
+            granted = lane_stats['granted']
+            lane_stats['avg_wait_ms'] = lane_stats['total_wait_ms'] / granted if granted else 0.0
+            lanes[lane] = lane_stats
+        return {
+            'name': self.name,
+            'rate_limited': self.stats['rate_limited'],
+            'requests_per_minute': self._bucket.rate * 60,
+            'budget_per_minute': self._bucket.base_rate * 60,
+            'queue_depth': sum(1 for w in self._waiters if not w[3].done()),
+            'paused_for': self.remaining_pause(),
+            'lanes': lanes
+        }
+
+
+# One limiter per API for the whole process
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(name: str, **overrides) -> RateLimiter:
+    """
+    Get or create the shared limiter for an API
+
+    Budgets come from BotConfiguration.API_RATE_LIMITS; keyword arguments
+    override them the first time the limiter is created.
+
+    :param name: API name, e.g. 'birdeye'
+    :return: RateLimiter instance
+    """
+    limiter = _limiters.get(name)
+    if limiter is None:
+        config = dict(DEFAULT_BUDGET)
+        config.update(getattr(BotConfiguration, 'API_RATE_LIMITS', {}).get(name, {}))
+        config.update(overrides)
+        limiter = RateLimiter(name, **config)
+        _limiters[name] = limiter
+    return limiter
+
+
+def limiter_for_url(url: str) -> Tuple[Optional[RateLimiter], Optional[str]]:
+    """
+    Find the shared limiter and endpoint path for a URL
+
+    :param url: Request URL
+    :return: (limiter, endpoint path), or (None, None) for unmanaged hosts
+    """
+    parsed = urlparse(url)
+    host = parsed.hostname or ''
+    for suffix, name in HOST_LIMITERS.items():
+        if host == suffix or host.endswith('.' + suffix):
+            return get_rate_limiter(name), parsed.path
+    return None, None
+
+
+def get_all_limiter_stats() -> Dict[str, Dict]:
+    """Get metrics for every limiter created so far"""
+    return {name: limiter.get_stats() for name, limiter in _limiters.items()}
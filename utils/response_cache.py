@@ -0,0 +1,213 @@
+"""
+Bounded TTL/LRU cache with request coalescing for API clients
+"""
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from config.bot_config import BotConfiguration
+
+logger = logging.getLogger('trading_bot.response_cache')
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL = 300.0
+
+
+def make_cache_key(endpoint: str, params: Optional[Dict] = None) -> Hashable:
+    """
+    Build a hashable key for an endpoint and its query parameters
+
+    Cheaper than serialising the parameters and independent of their order.
+
+    :param endpoint: API path
+    :param params: Query parameters
+    :return: Hashable cache key
+    """
+    if not params:
+        return (endpoint,)
+    try:
+        return (endpoint, frozenset(params.items()))
+    except TypeError:
+        # Unhashable values (lists, dicts): fall back to their repr
+        return (endpoint, frozenset((k, repr(v)) for k, v in params.items()))
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache whose entries expire after a per-endpoint TTL
+
+    ``get_or_fetch`` coalesces concurrent misses for the same key: the first
+    caller runs the fetch and everyone else awaits its result, so a burst of
+    identical requests costs one API call.
+    """
+
+    def __init__(self, name: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 default_ttl: float = DEFAULT_TTL, ttls: Optional[Dict[str, float]] = None):
+        """
+        Initialize the cache
+
+        :param name: Cache name used in logs and stats
+        :param max_entries: Entries kept before the least recently used is evicted
+        :param default_ttl: Lifetime in seconds for endpoints without their own TTL
+        :param ttls: Per-endpoint lifetimes in seconds
+        """
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+
+        # key -> (expires_at, value), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'fetch_errors': 0
+        }
+
+    def ttl_for(self, endpoint: Optional[str]) -> float:
+        """TTL in seconds for an endpoint"""
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a live entry
+
+        :param key: Cache key
+        :param default: Returned on a miss or expired entry
+        :return: Cached value or default
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return default
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Store a value
+
+        :param key: Cache key
+        :param value: Value to store
+        :param ttl: Lifetime in seconds (defaults to default_ttl)
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, key: Hashable):
+        """Drop one entry"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]],
+                           ttl: Optional[float] = None,
+                           should_cache: Callable[[Any], bool] = None) -> Any:
+        """
+        Return the cached value or fetch it once for all concurrent callers
+
+        :param key: Cache key
+        :param fetch: Zero-argument coroutine function producing the value
+        :param ttl: Lifetime in seconds for the fetched value
+        :param should_cache: Predicate deciding whether a result is stored
+                             (default: anything but None)
+        :return: Cached or fetched value
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except BaseException as e:
+            self.stats['fetch_errors'] += 1
+            if isinstance(e, asyncio.CancelledError):
+                # Joined callers did not ask to be cancelled; let them see a miss
+                future.set_result(None)
+            else:
+                future.set_exception(e)
+                # Joined callers re-raise it; don't warn when nobody joined
+                future.exception()
+            raise
+        else:
+            if should_cache(value) if should_cache else value is not None:
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """
+        Get cache metrics
+
+        :return: Dictionary with hit/miss/eviction counters and size
+        """
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['name'] = self.name
+        stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['inflight'] = len(self._inflight)
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+# One cache per name for the whole process
+_caches: Dict[str, ResponseCache] = {}
+
+
+def get_response_cache(name: str, **kwargs) -> ResponseCache:
+    """
+    Get or create a shared cache
+
+    Settings come from BotConfiguration.API_CACHE_SETTINGS; keyword arguments
+    override them the first time the cache is created.
+
+    :param name: Cache name, e.g. 'birdeye'
+    :return: ResponseCache instance
+    """
+    cache = _caches.get(name)
+    if cache is None:
+        config = dict(getattr(BotConfiguration, 'API_CACHE_SETTINGS', {}).get(name, {}))
+        config.update(kwargs)
+        cache = ResponseCache(name, **config)
+        _caches[name] = cache
+    return cache
+
+
+def get_all_cache_stats() -> Dict[str, Dict]:
+    """Get metrics for every cache created so far"""
+    return {name: cache.get_stats() for name, cache in _caches.items()}
@@ -0,0 +1,118 @@
+"""
+Startup import profiler
+
+Imports an entry-point module in a fresh interpreter under ``-X importtime``
+and summarises where cold start goes: time per top-level package, the
+slowest individual modules with the chain that pulled them in, and which
+known-heavy optional dependencies were imported at all. Used by the
+``--profile-startup`` flag of main.py and start_bot.py.
+"""
+import os
+import re
+import sys
+import time
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+# Optional dependencies that should only load when their feature is used
+HEAVY_MODULES = ('tensorflow', 'torch', 'transformers', 'xgboost', 'talib', 'tweepy',
+                 'scipy', 'sklearn', 'pandas', 'matplotlib')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def parse_importtime(output: str) -> List[Dict]:
+    """
+    Parse ``-X importtime`` stderr
+
+    :param output: stderr text
+    :return: One {'module', 'self_us', 'cumulative_us', 'depth', 'parents'} dict per import,
+             parents being the chain of importers up to the entry module
+    """
+    rows = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            rows.append({'module': match[4], 'self_us': int(match[1]), 'cumulative_us': int(match[2]),
+                         'depth': len(match[3]) // 2})
+
+    # importtime prints children before their parent: walk backwards keeping
+    # the most recent module seen at each depth
+    stack: Dict[int, str] = {}
+    for row in reversed(rows):
+        stack[row['depth']] = row['module']
+        for depth in [d for d in stack if d > row['depth']]:
+            del stack[depth]
+        row['parents'] = [stack[d] for d in sorted(stack) if d < row['depth']]
+    return rows
+
+
+def summarize(rows: List[Dict], entry: str, top: int = 15) -> Dict:
+    """
+    :param rows: parse_importtime() output
+    :param entry: Entry-point module name
+    :param top: Slowest modules to list
+    :return: {'total_ms', 'entry_ms', 'modules', 'packages': [(name, ms, count)], 'slowest': [...],
+              'heavy': {name: ms}}
+    """
+    packages = defaultdict(lambda: [0, 0])
+    for row in rows:
+        package = packages[row['module'].split('.')[0]]
+        package[0] += row['self_us']
+        package[1] += 1
+    roots = [row for row in rows if row['depth'] == 0]
+    heavy = {name: packages[name][0] / 1000 for name in HEAVY_MODULES if name in packages}
+    return {
+        'total_ms': sum(row['cumulative_us'] for row in roots) / 1000,
+        'entry_ms': sum(row['cumulative_us'] for row in roots if row['module'] == entry) / 1000,
+        'modules': len(rows),
+        'packages': sorted(((name, us / 1000, count) for name, (us, count) in packages.items()),
+                           key=lambda p: p[1], reverse=True),
+        'slowest': sorted(rows, key=lambda r: r['cumulative_us'], reverse=True)[:top],
+        'heavy': heavy
+    }
+
+
+def profile_entry_point(module: str, top: int = 15, python: Optional[str] = None) -> int:
+    """
+    Import ``module`` in a fresh interpreter and print the startup breakdown
+
+    :param module: Entry-point module name, e.g. 'start_bot'
+    :param top: Rows per table
+    :param python: Interpreter (defaults to the running one)
+    :return: Exit status for the CLI (the child's import status)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([python or sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    summary = summarize(parse_importtime(result.stderr), module, top)
+
+    print(f"Startup import profile: {module} ({summary['modules']} modules, "
+          f"{summary['entry_ms']:.0f} ms importing {module}, {summary['total_ms']:.0f} ms all imports, "
+          f"{wall_ms:.0f} ms wall incl. interpreter)\n")
+
+    print(f"{'package':<32}{'self ms':>10}{'modules':>9}")
+    for name, ms, count in summary['packages'][:top]:
+        print(f"{name:<32}{ms:>10.1f}{count:>9}")
+
+    print(f"\n{'slowest imports (cumulative)':<48}{'ms':>9}  imported by")
+    for row in summary['slowest']:
+        chain = ' <- '.join(reversed(row['parents'][-3:])) or '-'
+        print(f"{row['module']:<48}{row['cumulative_us'] / 1000:>9.1f}  {chain}")
+
+    print("\nHeavy optional dependencies imported at startup:")
+    if summary['heavy']:
+        for name, ms in sorted(summary['heavy'].items(), key=lambda h: h[1], reverse=True):
+            print(f"  {name:<20}{ms:>9.1f} ms")
+    else:
+        print("  none (all deferred until first use)")
+
+    if result.returncode != 0:
+        error = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        print(f"\n❌ Importing {module} failed:")
+        print('\n'.join(error[-5:]))
+    return result.returncode